@@ -23,6 +23,10 @@ class Settings:
     SECRET_KEY: str = os.getenv("SECRET_KEY", "change-this-in-production-please")
     ALGORITHM: str = os.getenv("ALGORITHM", "HS256")
     ACCESS_TOKEN_EXPIRE_MINUTES: int = int(os.getenv("ACCESS_TOKEN_EXPIRE_MINUTES", "30"))
+    # 输入清理的资源限制：单个请求体的嵌套深度、节点数和字符串总字节数
+    SANITIZE_MAX_DEPTH: int = int(os.getenv("SANITIZE_MAX_DEPTH", "32"))
+    SANITIZE_MAX_NODES: int = int(os.getenv("SANITIZE_MAX_NODES", "10000"))
+    SANITIZE_MAX_BYTES: int = int(os.getenv("SANITIZE_MAX_BYTES", "1048576"))  # 1MB
     
     # ==================== 管理员凭据 ====================
     ADMIN_USERNAME: str = os.getenv("ADMIN_USERNAME", "admin")
@@ -31,7 +35,30 @@ class Settings:
     # ==================== 数据库配置 ====================
     # 注意：项目使用 SQLite，DATABASE_URL 主要用于兼容性，实际路径在 database.py 中处理
     DATABASE_URL: str = os.getenv("DATABASE_URL", "sqlite:///./august_lab.db")
-    
+
+    # SQLite WAL 模式：开启后使用「单写连接 + 只读连接池」，读请求不再排在写请求之后
+    SQLITE_WAL_MODE: bool = os.getenv("SQLITE_WAL_MODE", "true").lower() in ("1", "true", "yes")
+    SQLITE_SYNCHRONOUS: str = os.getenv("SQLITE_SYNCHRONOUS", "NORMAL").upper()  # OFF / NORMAL / FULL / EXTRA
+    SQLITE_CACHE_SIZE: int = int(os.getenv("SQLITE_CACHE_SIZE", "-20000"))  # 负数单位为 KiB，约 20MB
+    SQLITE_MMAP_SIZE: int = int(os.getenv("SQLITE_MMAP_SIZE", "268435456"))  # 256MB
+    SQLITE_BUSY_TIMEOUT: int = int(os.getenv("SQLITE_BUSY_TIMEOUT", "30000"))  # 毫秒
+    SQLITE_READ_POOL_SIZE: int = int(os.getenv("SQLITE_READ_POOL_SIZE", "8"))  # 常驻只读连接数量
+    # 突发时允许额外创建的只读连接数；常驻 + 溢出不应小于线程池大小（默认 40），否则同步读接口在高并发下会互相等待连接而死锁
+    SQLITE_READ_POOL_OVERFLOW: int = int(os.getenv("SQLITE_READ_POOL_OVERFLOW", "32"))
+
+    # 单写者批量提交队列：同一批次内的写操作共享一次 COMMIT
+    WRITE_QUEUE_MAX_BATCH_SIZE: int = int(os.getenv("WRITE_QUEUE_MAX_BATCH_SIZE", "100"))
+    WRITE_QUEUE_MAX_LATENCY_MS: float = float(os.getenv("WRITE_QUEUE_MAX_LATENCY_MS", "10"))  # 攒批最长等待
+    WRITE_QUEUE_MAX_SIZE: int = int(os.getenv("WRITE_QUEUE_MAX_SIZE", "10000"))
+
+    # 公开读接口响应缓存（博客、作品、产品、个人信息）
+    RESPONSE_CACHE_ENABLED: bool = os.getenv("RESPONSE_CACHE_ENABLED", "true").lower() in ("1", "true", "yes")
+    RESPONSE_CACHE_MAX_ENTRIES: int = int(os.getenv("RESPONSE_CACHE_MAX_ENTRIES", "512"))
+    RESPONSE_CACHE_TTL: int = int(os.getenv("RESPONSE_CACHE_TTL", "300"))  # 秒；多 worker 时其他 worker 的旧条目最长保留这么久
+
+    # 博客、作品、产品的 FTS5 全文索引（BM25 排序）；关闭或 SQLite 不支持时退回 LIKE 扫描
+    FULLTEXT_SEARCH_ENABLED: bool = os.getenv("FULLTEXT_SEARCH_ENABLED", "true").lower() in ("1", "true", "yes")
+
     # ==================== 文件存储配置 ====================
     UPLOAD_DIR: str = os.getenv("UPLOAD_DIR", "./backend/uploads")
     PRODUCTS_DIR: str = os.getenv("PRODUCTS_DIR", "./backend/products")
@@ -57,6 +84,11 @@ class Settings:
     # 默认 300 次/小时，避免产品监控页轮询过快占满配额导致整站 429
     RATE_LIMIT_REQUESTS: int = int(os.getenv("RATE_LIMIT_REQUESTS", "300"))
     RATE_LIMIT_WINDOW: int = int(os.getenv("RATE_LIMIT_WINDOW", "3600"))  # 1小时
+    RATE_LIMIT_LOCK_STRIPES: int = int(os.getenv("RATE_LIMIT_LOCK_STRIPES", "64"))  # 按键哈希分片的锁数量
+    RATE_LIMIT_EVICTION_INTERVAL: int = int(os.getenv("RATE_LIMIT_EVICTION_INTERVAL", "300"))  # 空闲键清理间隔（秒）
+    # 限流状态后端：memory 为进程内计数；sqlite 在同机多个 uvicorn worker 之间共享计数
+    RATE_LIMIT_BACKEND: str = os.getenv("RATE_LIMIT_BACKEND", "memory").lower()
+    RATE_LIMIT_STORE_PATH: str = os.getenv("RATE_LIMIT_STORE_PATH", "./rate_limit.db")  # 相对路径基于项目根目录
     
     # ==================== 邮件配置 ====================
     SMTP_HOST: Optional[str] = os.getenv("SMTP_HOST")
@@ -70,6 +102,55 @@ class Settings:
     
     # ==================== 会话配置 ====================
     SESSION_EXPIRE_HOURS: int = int(os.getenv("SESSION_EXPIRE_HOURS", "24"))
+    # 进程内会话缓存：热会话认证不查库；多 worker 时登出在其他 worker 上最长 TTL 秒后生效
+    SESSION_CACHE_ENABLED: bool = os.getenv("SESSION_CACHE_ENABLED", "true").lower() in ("1", "true", "yes")
+    SESSION_CACHE_MAX_ENTRIES: int = int(os.getenv("SESSION_CACHE_MAX_ENTRIES", "1024"))
+    SESSION_CACHE_TTL: int = int(os.getenv("SESSION_CACHE_TTL", "60"))  # 秒
+
+    # 过期会话、产品用户会话和 API 令牌的后台清理
+    EXPIRY_SWEEP_ENABLED: bool = os.getenv("EXPIRY_SWEEP_ENABLED", "true").lower() in ("1", "true", "yes")
+    EXPIRY_SWEEP_INTERVAL: int = int(os.getenv("EXPIRY_SWEEP_INTERVAL", "600"))  # 秒
+    EXPIRY_SWEEP_BATCH_SIZE: int = int(os.getenv("EXPIRY_SWEEP_BATCH_SIZE", "500"))  # 每个删除事务的行数
+    # 清理后增量 VACUUM 的最大页数，0 表示不执行；需要数据库为 auto_vacuum=INCREMENTAL
+    EXPIRY_SWEEP_VACUUM_PAGES: int = int(os.getenv("EXPIRY_SWEEP_VACUUM_PAGES", "0"))
+
+    # 产品 API 令牌缓存：多 worker 时撤销在其他 worker 上最长 TTL 秒后生效
+    API_TOKEN_CACHE_ENABLED: bool = os.getenv("API_TOKEN_CACHE_ENABLED", "true").lower() in ("1", "true", "yes")
+    API_TOKEN_CACHE_MAX_ENTRIES: int = int(os.getenv("API_TOKEN_CACHE_MAX_ENTRIES", "1024"))
+    API_TOKEN_CACHE_TTL: int = int(os.getenv("API_TOKEN_CACHE_TTL", "60"))  # 秒
+    API_TOKEN_USAGE_FLUSH_INTERVAL: float = float(os.getenv("API_TOKEN_USAGE_FLUSH_INTERVAL", "5"))  # 使用计数写回间隔（秒）
+
+    # 访问统计小时汇总：后台任务把 product_stats 新行汇总进 product_stats_rollups，分析接口读取汇总
+    ANALYTICS_ROLLUP_ENABLED: bool = os.getenv("ANALYTICS_ROLLUP_ENABLED", "true").lower() in ("1", "true", "yes")
+    ANALYTICS_ROLLUP_INTERVAL: int = int(os.getenv("ANALYTICS_ROLLUP_INTERVAL", "60"))  # 秒
+    ANALYTICS_ROLLUP_BATCH_SIZE: int = int(os.getenv("ANALYTICS_ROLLUP_BATCH_SIZE", "5000"))  # 每个写操作汇总的原始行数
+
+    # 批量遥测上报：事件先进入内存缓冲区，按数量或时间批量写入
+    TELEMETRY_BUFFER_MAX_EVENTS: int = int(os.getenv("TELEMETRY_BUFFER_MAX_EVENTS", "10000"))  # 缓冲区上限，满时返回 429
+    TELEMETRY_FLUSH_SIZE: int = int(os.getenv("TELEMETRY_FLUSH_SIZE", "500"))  # 缓冲达到该数量立即写入
+    TELEMETRY_FLUSH_INTERVAL: float = float(os.getenv("TELEMETRY_FLUSH_INTERVAL", "1"))  # 定时写入间隔（秒）
+    TELEMETRY_BATCH_MAX_EVENTS: int = int(os.getenv("TELEMETRY_BATCH_MAX_EVENTS", "500"))  # 单次请求最多事件数
+    TELEMETRY_MAX_RETRIES: int = int(os.getenv("TELEMETRY_MAX_RETRIES", "5"))  # 暂时性写入错误连续重试次数上限
+
+    # 产品数据批量读写：一次请求读取、写入或删除多个键
+    DATA_BATCH_MAX_KEYS: int = int(os.getenv("DATA_BATCH_MAX_KEYS", "100"))  # 单次请求最多键数
+    DATA_ACCESS_FLUSH_INTERVAL: float = float(os.getenv("DATA_ACCESS_FLUSH_INTERVAL", "5"))  # 访问计数写回间隔（秒）
+    # 大值按内容寻址存为文件，行内只保存哈希
+    DATA_BLOB_THRESHOLD_BYTES: int = int(os.getenv("DATA_BLOB_THRESHOLD_BYTES", "65536"))  # 序列化后超过该字节数写入文件
+    DATA_BLOB_COMPRESS: bool = os.getenv("DATA_BLOB_COMPRESS", "true").lower() in ("1", "true", "yes")  # zlib 压缩
+    DATA_BLOB_DIR: str = os.getenv("DATA_BLOB_DIR", "")  # 为空时使用数据库文件所在目录下的 data_blobs（不能位于静态文件目录内）
+    DATA_BLOB_GC_GRACE_SECONDS: float = float(os.getenv("DATA_BLOB_GC_GRACE_SECONDS", "3600"))  # 未引用文件保留时间（秒）
+    DATA_BLOB_GC_ENABLED: bool = os.getenv("DATA_BLOB_GC_ENABLED", "true").lower() in ("1", "true", "yes")
+    DATA_BLOB_GC_INTERVAL: int = int(os.getenv("DATA_BLOB_GC_INTERVAL", "3600"))  # 回收间隔（秒）
+
+    # 数据保留：过期的访问统计、API 调用、日志先汇总、归档为 gzip NDJSON，再分批删除
+    RETENTION_ENABLED: bool = os.getenv("RETENTION_ENABLED", "false").lower() in ("1", "true", "yes")
+    RETENTION_INTERVAL: int = int(os.getenv("RETENTION_INTERVAL", "3600"))  # 秒
+    RETENTION_BATCH_SIZE: int = int(os.getenv("RETENTION_BATCH_SIZE", "1000"))  # 每个删除事务的行数
+    RETENTION_STATS_DAYS: int = int(os.getenv("RETENTION_STATS_DAYS", "180"))  # 0 表示永久保留
+    RETENTION_API_CALLS_DAYS: int = int(os.getenv("RETENTION_API_CALLS_DAYS", "90"))
+    RETENTION_LOGS_DAYS: int = int(os.getenv("RETENTION_LOGS_DAYS", "30"))
+    RETENTION_ARCHIVE_DIR: str = os.getenv("RETENTION_ARCHIVE_DIR", "")  # 为空时使用数据库文件所在目录下的 retention_archive（不能位于静态文件目录内）
     
     # ==================== 环境判断 ====================
     @property
@@ -1,10 +1,16 @@
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, event
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
-from sqlalchemy.pool import StaticPool
+from sqlalchemy.pool import StaticPool, QueuePool, AsyncAdaptedQueuePool
+from fastapi import Request
 import os
 import logging
 from pathlib import Path
+from typing import Optional
+
+from .config import settings
 
 # 设置日志
 logger = logging.getLogger(__name__)
@@ -41,35 +47,219 @@ else:
     DEFAULT_DB_PATH.parent.mkdir(parents=True, exist_ok=True)
     SQLALCHEMY_DATABASE_URL = f"sqlite:///{DEFAULT_DB_PATH.as_posix()}"
 
-# SQLite使用StaticPool
-pool_class = StaticPool
-connect_args = {
-    "check_same_thread": False,
-    "timeout": 30,  # 30秒超时
-}
-pool_kwargs = {}
+# 数据库文件所在目录：归档、大值文件等不对外提供的数据默认放在这里，不放进静态文件目录
+_database_path = make_url(SQLALCHEMY_DATABASE_URL).database
+DATABASE_DIR = (
+    Path(_database_path).parent
+    if SQLALCHEMY_DATABASE_URL.startswith("sqlite") and _database_path and _database_path != ":memory:"
+    else PROJECT_ROOT
+)
+
+# SQLite 允许的 synchronous 取值（会被拼接进 PRAGMA，必须白名单校验）
+SQLITE_SYNCHRONOUS_VALUES = {"OFF", "NORMAL", "FULL", "EXTRA"}
+
+# 只读请求方法：这些请求默认分配只读连接
+READ_ONLY_METHODS = frozenset({"GET", "HEAD", "OPTIONS"})
+
+def _is_memory_sqlite(db_url: str) -> bool:
+    return db_url in ("sqlite:///:memory:", "sqlite://")
+
+def _apply_sqlite_pragmas(dbapi_connection, read_only: bool = False):
+    """为新建立的 SQLite 连接设置 PRAGMA"""
+    synchronous = settings.SQLITE_SYNCHRONOUS
+    if synchronous not in SQLITE_SYNCHRONOUS_VALUES:
+        logger.warning(f"无效的 SQLITE_SYNCHRONOUS 配置: {synchronous}，使用 NORMAL")
+        synchronous = "NORMAL"
+    
+    cursor = dbapi_connection.cursor()
+    try:
+        cursor.execute(f"PRAGMA busy_timeout = {int(settings.SQLITE_BUSY_TIMEOUT)}")
+        # journal_mode 是数据库级持久设置，任一连接设置一次即可，重复设置无副作用
+        cursor.execute("PRAGMA journal_mode = WAL")
+        cursor.execute(f"PRAGMA synchronous = {synchronous}")
+        cursor.execute(f"PRAGMA cache_size = {int(settings.SQLITE_CACHE_SIZE)}")
+        cursor.execute(f"PRAGMA mmap_size = {int(settings.SQLITE_MMAP_SIZE)}")
+        if read_only:
+            # 只读连接上的任何写操作都会直接报错，避免误用只读会话写库
+            cursor.execute("PRAGMA query_only = ON")
+    finally:
+        cursor.close()
+
+def create_sqlite_engines(db_url: str, wal_mode: bool = True, read_pool_size: int = 8,
+                          read_pool_overflow: int = 32):
+    """
+    创建 SQLite 写引擎和只读引擎
+    
+    WAL 模式下：写引擎只有一个连接（SQLite 同一时刻只允许一个写者），
+    只读引擎是有上限的连接池，读操作不会被写事务阻塞。
+    只读连接总数（常驻 + 溢出）需不小于线程池大小：同步路由在线程中持有连接，
+    响应序列化又要占用线程，连接数不足时所有线程都在等连接，持有连接的请求却拿不到线程收尾。
+    内存数据库或关闭 WAL 时退化为共享单连接（StaticPool），读写使用同一引擎。
+    
+    Args:
+        db_url: 数据库URL
+        wal_mode: 是否启用 WAL 模式
+        read_pool_size: 只读连接池常驻连接数
+        read_pool_overflow: 只读连接池突发时允许额外创建的连接数
+        
+    Returns:
+        (写引擎, 只读引擎)
+    """
+    busy_timeout_seconds = max(settings.SQLITE_BUSY_TIMEOUT / 1000, 1)
+    connect_args = {
+        "check_same_thread": False,
+        "timeout": busy_timeout_seconds,
+    }
+    
+    if not wal_mode or not db_url.startswith("sqlite") or _is_memory_sqlite(db_url):
+        write_engine = create_engine(
+            db_url,
+            connect_args=connect_args,
+            poolclass=StaticPool,
+            echo=False,  # 生产环境关闭SQL日志
+        )
+        return write_engine, write_engine
+    
+    write_engine = create_engine(
+        db_url,
+        connect_args=connect_args,
+        poolclass=QueuePool,
+        pool_size=1,
+        max_overflow=0,
+        pool_timeout=busy_timeout_seconds,
+        echo=False,
+    )
+    read_engine = create_engine(
+        db_url,
+        connect_args=connect_args,
+        poolclass=QueuePool,
+        pool_size=max(read_pool_size, 1),
+        max_overflow=max(read_pool_overflow, 0),
+        pool_timeout=busy_timeout_seconds,
+        echo=False,
+    )
+    
+    @event.listens_for(write_engine, "connect")
+    def _on_write_connect(dbapi_connection, connection_record):
+        _apply_sqlite_pragmas(dbapi_connection, read_only=False)
+    
+    @event.listens_for(read_engine, "connect")
+    def _on_read_connect(dbapi_connection, connection_record):
+        _apply_sqlite_pragmas(dbapi_connection, read_only=True)
+    
+    return write_engine, read_engine
+
+def _to_async_sqlite_url(db_url: str) -> str:
+    """把 sqlite:// URL 转换为 aiosqlite 驱动的 URL"""
+    if db_url.startswith("sqlite://"):
+        return "sqlite+aiosqlite://" + db_url[len("sqlite://"):]
+    return db_url
 
-# 创建引擎，添加连接池和错误处理配置
-engine = create_engine(
+def create_async_read_engine(db_url: str, wal_mode: bool = True, pool_size: int = 8):
+    """
+    创建异步只读引擎（aiosqlite）
+    
+    供热点公开读接口使用：查询在 aiosqlite 的后台线程中执行，
+    请求处理本身留在事件循环上，不再占用 FastAPI 默认的 40 个线程池线程。
+    WAL 模式下连接同样设置 query_only，与同步只读连接池行为一致。
+    
+    Args:
+        db_url: 数据库URL（同步驱动形式）
+        wal_mode: 是否启用 WAL 模式
+        pool_size: 连接池大小
+    """
+    busy_timeout_seconds = max(settings.SQLITE_BUSY_TIMEOUT / 1000, 1)
+    connect_args = {
+        "check_same_thread": False,
+        "timeout": busy_timeout_seconds,
+    }
+    async_url = _to_async_sqlite_url(db_url)
+    
+    if _is_memory_sqlite(db_url):
+        # 注意：内存数据库无法与同步引擎共享，异步读只能看到自己的空库
+        return create_async_engine(async_url, connect_args=connect_args, poolclass=StaticPool, echo=False)
+    
+    async_engine = create_async_engine(
+        async_url,
+        connect_args=connect_args,
+        poolclass=AsyncAdaptedQueuePool,
+        pool_size=max(pool_size, 1),
+        max_overflow=0,
+        pool_timeout=busy_timeout_seconds,
+        echo=False,
+    )
+    
+    if wal_mode:
+        @event.listens_for(async_engine.sync_engine, "connect")
+        def _on_async_read_connect(dbapi_connection, connection_record):
+            _apply_sqlite_pragmas(dbapi_connection, read_only=True)
+    
+    return async_engine
+
+# 创建引擎：engine 为写引擎（兼容原有用法），read_engine 为只读引擎
+engine, read_engine = create_sqlite_engines(
     SQLALCHEMY_DATABASE_URL,
-    connect_args=connect_args,
-    poolclass=pool_class,
-    echo=False,  # 生产环境关闭SQL日志
-    **pool_kwargs
+    wal_mode=settings.SQLITE_WAL_MODE,
+    read_pool_size=settings.SQLITE_READ_POOL_SIZE,
+    read_pool_overflow=settings.SQLITE_READ_POOL_OVERFLOW
 )
 
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+ReadSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=read_engine)
+
+# 异步只读引擎：仅用于热点公开读接口
+async_read_engine = create_async_read_engine(
+    SQLALCHEMY_DATABASE_URL,
+    wal_mode=settings.SQLITE_WAL_MODE,
+    pool_size=settings.SQLITE_READ_POOL_SIZE
+)
+AsyncReadSessionLocal = async_sessionmaker(async_read_engine, autoflush=False, expire_on_commit=False)
 
 Base = declarative_base()
 
-# 标准数据库依赖
-def get_db():
-    db = SessionLocal()
+def writes_on_read(func):
+    """
+    标记在 GET 请求中也会写库的路由
+    
+    get_db 默认为 GET/HEAD/OPTIONS 请求分配只读会话，被标记的路由会改为分配写会话。
+    需放在 @router.get 下方的第一个位置。
+    """
+    func._db_writes_on_read = True
+    return func
+
+def read_only(func):
+    """
+    标记不写库的非 GET 路由（如用 POST 传参的批量读取）
+    
+    get_db 默认为 POST 等请求分配写会话，被标记的路由会改为分配只读会话，不占用唯一的写连接。
+    需放在 @router.post 下方的第一个位置。
+    """
+    func._db_read_only = True
+    return func
+
+def _wants_read_session(request: Optional[Request]) -> bool:
+    """判断当前请求是否只需要只读会话"""
+    if request is None:
+        return False
+    endpoint = request.scope.get("endpoint")
+    if request.method not in READ_ONLY_METHODS:
+        return getattr(endpoint, "_db_read_only", False)
+    return not getattr(endpoint, "_db_writes_on_read", False)
+
+# 标准数据库依赖：只读路由使用只读连接池，写路由使用唯一的写连接
+def get_db(request: Request = None):
+    session_factory = ReadSessionLocal if _wants_read_session(request) else SessionLocal
+    db = session_factory()
     try:
         yield db
     finally:
         db.close()
 
+# 异步只读数据库依赖：用于 async def 的公开读接口
+async def get_async_db():
+    async with AsyncReadSessionLocal() as db:
+        yield db
+
 # 带错误处理的数据库依赖
 def get_db_with_error_handling():
     """带错误处理的数据库会话获取"""
@@ -81,7 +271,7 @@ def check_database_health() -> bool:
     """检查数据库连接健康状态"""
     try:
         from sqlalchemy import text
-        with engine.connect() as connection:
+        with read_engine.connect() as connection:
             connection.execute(text("SELECT 1"))
         return True
     except Exception as e:
@@ -6,6 +6,7 @@
 from sqlalchemy import create_engine, text
 from sqlalchemy.orm import sessionmaker
 from .database import Base, SQLALCHEMY_DATABASE_URL
+from .migrations import run_migrations
 from .models import Portfolio, Blog, Profile, Session, Product, ProductStats, ProductLog, ProductFeedback
 import json
 from datetime import datetime, timezone
@@ -21,6 +22,9 @@ def init_database():
     Base.metadata.create_all(bind=engine)
     print("数据库表创建完成")
     
+    # 已有数据库升级到当前结构（create_all 不会修改已存在的表）；失败时中止启动
+    run_migrations(engine)
+    
     # 创建会话
     SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
     db = SessionLocal()
@@ -13,6 +13,8 @@ from fastapi.responses import JSONResponse
 from fastapi.exceptions import RequestValidationError, ResponseValidationError
 from sqlalchemy.exc import SQLAlchemyError, IntegrityError, OperationalError
 from pydantic import ValidationError
+from starlette.datastructures import MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
 import uuid
 
 logger = logging.getLogger(__name__)
@@ -28,6 +30,7 @@ class APIErrorCode:
     NOT_FOUND = "NOT_FOUND"
     METHOD_NOT_ALLOWED = "METHOD_NOT_ALLOWED"
     CONFLICT = "CONFLICT"
+    PAYLOAD_TOO_LARGE = "PAYLOAD_TOO_LARGE"
     UNPROCESSABLE_ENTITY = "UNPROCESSABLE_ENTITY"
     TOO_MANY_REQUESTS = "TOO_MANY_REQUESTS"
     SERVICE_UNAVAILABLE = "SERVICE_UNAVAILABLE"
@@ -225,6 +228,7 @@ def setup_error_handlers(app: FastAPI):
             404: APIErrorCode.NOT_FOUND,
             405: APIErrorCode.METHOD_NOT_ALLOWED,
             409: APIErrorCode.CONFLICT,
+            413: APIErrorCode.PAYLOAD_TOO_LARGE,
             422: APIErrorCode.UNPROCESSABLE_ENTITY,
             429: APIErrorCode.TOO_MANY_REQUESTS,
             500: APIErrorCode.INTERNAL_SERVER_ERROR,
@@ -235,12 +239,16 @@ def setup_error_handlers(app: FastAPI):
         
         logger.warning(f"HTTP异常: {exc.status_code} - {exc.detail}")
         
-        return create_error_response(
+        response = create_error_response(
             error_code=error_code,
             message=exc.detail,
             status_code=exc.status_code,
             request_id=getattr(request.state, 'request_id', None)
         )
+        # 保留异常携带的响应头（如 Retry-After、WWW-Authenticate）
+        if exc.headers:
+            response.headers.update(exc.headers)
+        return response
     
     @app.exception_handler(RequestValidationError)
     async def validation_exception_handler(request: Request, exc: RequestValidationError):
@@ -350,20 +358,32 @@ def setup_error_handlers(app: FastAPI):
         )
 
 # 中间件：为每个请求添加请求ID
-async def request_id_middleware(request: Request, call_next):
+class RequestIDMiddleware:
     """
-    请求ID中间件
+    请求ID中间件（纯 ASGI 实现）
     
-    为每个请求生成唯一的请求ID，用于日志追踪
+    为每个请求生成唯一的请求ID，用于日志追踪；
+    请求ID写入 scope["state"]，异常处理器通过 request.state.request_id 读取
     """
-    request_id = str(uuid.uuid4())
-    request.state.request_id = request_id
     
-    # 添加请求ID到响应头
-    response = await call_next(request)
-    response.headers["X-Request-ID"] = request_id
+    def __init__(self, app: ASGIApp):
+        self.app = app
     
-    return response
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        
+        request_id = str(uuid.uuid4())
+        scope.setdefault("state", {})["request_id"] = request_id
+        
+        async def send_with_request_id(message: Message):
+            # 添加请求ID到响应头
+            if message["type"] == "http.response.start":
+                MutableHeaders(scope=message)["X-Request-ID"] = request_id
+            await send(message)
+        
+        await self.app(scope, receive, send_with_request_id)
 
 # 成功响应标准化
 def create_success_response(
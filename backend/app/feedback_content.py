@@ -0,0 +1,89 @@
+"""
+反馈公开内容
+公开反馈列表展示的标题、内容和管理员回复需要经过敏感内容过滤。过滤结果在反馈写入和更新时
+计算并保存到 public_* 列，排序键 sort_key（有回复取回复时间，否则取创建时间）同时写入，
+公开列表只需按 (product_id, status, sort_key) 索引分页读取，不再在每次请求时排序和过滤。
+
+字段由 ProductFeedback 的 before_insert / before_update 事件维护；绕过 ORM 的批量更新
+不会触发事件，读取时 public_* 为空的行会现场过滤一次，数据库迁移负责回填旧数据。
+"""
+
+import re
+from datetime import datetime, timezone
+from typing import Optional, Tuple
+
+# 基础敏感词列表（可根据需要扩展）
+# 注意：这里只是示例，实际使用时应该使用更完善的敏感词库或接入第三方内容审核服务
+SENSITIVE_WORDS = [
+    # 可以在这里添加需要过滤的敏感词
+]
+
+_SENSITIVE_PATTERNS = [re.compile(re.escape(word), re.IGNORECASE) for word in SENSITIVE_WORDS if word]
+
+# 移除可能的HTML标签和脚本（防止XSS）
+_SCRIPT_TAG = re.compile(r'<script[^>]*>.*?</script>', re.IGNORECASE | re.DOTALL)
+_EVENT_ATTRIBUTE = re.compile(r'\s*on\w+\s*=\s*["\'][^"\']*["\']', re.IGNORECASE)
+_JAVASCRIPT_PROTOCOL = re.compile(r'javascript:', re.IGNORECASE)
+_DATA_PROTOCOL = re.compile(r'data:\s*[^;]*;base64,', re.IGNORECASE)
+
+
+def filter_sensitive_content(content: Optional[str]) -> Optional[str]:
+    """
+    过滤敏感内容，确保符合监管要求
+
+    Args:
+        content: 原始内容
+
+    Returns:
+        过滤后的内容
+    """
+    if not content:
+        return content
+
+    filtered = content
+
+    # 过滤敏感词（简单替换为*）
+    for pattern in _SENSITIVE_PATTERNS:
+        filtered = pattern.sub(lambda match: '*' * len(match.group(0)), filtered)
+
+    # 移除script标签
+    filtered = _SCRIPT_TAG.sub('', filtered)
+    # 移除on事件属性
+    filtered = _EVENT_ATTRIBUTE.sub('', filtered)
+    # 移除javascript:协议
+    filtered = _JAVASCRIPT_PROTOCOL.sub('', filtered)
+    # 移除data:协议（可能包含恶意代码）
+    filtered = _DATA_PROTOCOL.sub('', filtered)
+
+    return filtered
+
+
+def apply_public_fields(feedback) -> None:
+    """根据原始字段计算公开字段和排序键"""
+    if feedback.created_at is None:
+        # created_at 由数据库默认值填充，插入前还拿不到，这里显式设置以便同时得到排序键
+        feedback.created_at = datetime.now(timezone.utc)
+    feedback.sort_key = feedback.replied_at or feedback.created_at
+    feedback.public_title = filter_sensitive_content(feedback.title)
+    feedback.public_content = filter_sensitive_content(feedback.content)
+    feedback.public_reply = filter_sensitive_content(feedback.admin_reply) if feedback.admin_reply else None
+
+
+def public_view(feedback) -> Tuple[str, str, Optional[str]]:
+    """
+    读取公开的 (标题, 内容, 回复)
+
+    公开字段尚未填充（绕过 ORM 写入、尚未回填）时现场过滤，不修改对象本身
+    """
+    if feedback.public_title is not None:
+        return feedback.public_title, feedback.public_content, feedback.public_reply
+    return (
+        filter_sensitive_content(feedback.title),
+        filter_sensitive_content(feedback.content),
+        filter_sensitive_content(feedback.admin_reply) if feedback.admin_reply else None,
+    )
+
+
+def sync_public_fields(mapper, connection, target) -> None:
+    """ProductFeedback 的 before_insert / before_update 事件处理函数"""
+    apply_public_fields(target)
@@ -0,0 +1,137 @@
+"""
+反馈汇总
+每个产品按 (反馈类型, 状态) 保存反馈数、评分和与评分条数，保存在 product_feedback_summary 表中。
+创建、更新、删除反馈的接口在同一事务中调用 record_feedback_change 增量调整，
+事务回滚时汇总一起回滚；管理后台各产品的反馈角标只需一次读取这张小表。
+
+绕过接口直接写入 product_feedback 的数据不会计入；新建汇总表时用已有反馈初始化一次。
+"""
+
+import logging
+from dataclasses import dataclass, field
+from typing import Dict, Optional, Tuple
+
+from sqlalchemy import text
+from sqlalchemy.orm import Session
+
+logger = logging.getLogger(__name__)
+
+# 状态为空的反馈按默认状态计入
+DEFAULT_STATUS = "pending"
+
+# 汇总表的唯一键，(产品, 类型, 状态)
+FeedbackKey = Tuple[int, str, str]
+
+_UPSERT = text(
+    "INSERT INTO product_feedback_summary "
+    "(product_id, feedback_type, status, count, rating_sum, rating_count) "
+    "VALUES (:product_id, :feedback_type, :status, :count, :rating_sum, :rating_count) "
+    "ON CONFLICT (product_id, feedback_type, status) DO UPDATE SET "
+    "count = count + excluded.count, "
+    "rating_sum = rating_sum + excluded.rating_sum, "
+    "rating_count = rating_count + excluded.rating_count"
+)
+
+_SEED = (
+    "INSERT INTO product_feedback_summary "
+    "(product_id, feedback_type, status, count, rating_sum, rating_count) "
+    f"SELECT product_id, feedback_type, COALESCE(status, '{DEFAULT_STATUS}'), "
+    "COUNT(*), COALESCE(SUM(rating), 0), COUNT(rating) "
+    "FROM product_feedback "
+    "WHERE NOT EXISTS (SELECT 1 FROM product_feedback_summary) "
+    f"GROUP BY product_id, feedback_type, COALESCE(status, '{DEFAULT_STATUS}')"
+)
+
+
+@dataclass
+class FeedbackSummary:
+    """单个产品的反馈汇总"""
+    product_id: int
+    total: int = 0
+    rating_sum: int = 0
+    rating_count: int = 0
+    by_type: Dict[str, int] = field(default_factory=dict)
+    by_status: Dict[str, int] = field(default_factory=dict)
+
+    @property
+    def average_rating(self) -> Optional[float]:
+        return self.rating_sum / self.rating_count if self.rating_count else None
+
+    def to_dict(self) -> Dict:
+        return {
+            "product_id": self.product_id,
+            "total_feedback": self.total,
+            "average_rating": self.average_rating,
+            "feedback_by_type": self.by_type,
+            "feedback_by_status": self.by_status,
+        }
+
+
+def snapshot(feedback) -> Tuple[FeedbackKey, Optional[int]]:
+    """记录反馈影响汇总的字段，更新前后各取一次传给 record_feedback_change"""
+    key = (feedback.product_id, feedback.feedback_type, feedback.status or DEFAULT_STATUS)
+    return key, feedback.rating
+
+
+def record_feedback_change(db: Session,
+                           before: Optional[Tuple[FeedbackKey, Optional[int]]],
+                           after: Optional[Tuple[FeedbackKey, Optional[int]]]):
+    """
+    按反馈变化调整汇总
+
+    Args:
+        db: 写入反馈所用的会话，汇总与反馈在同一事务中提交
+        before: 变化前的 snapshot，新建时为 None
+        after: 变化后的 snapshot，删除时为 None
+    """
+    if before == after:
+        return
+    for state, sign in ((before, -1), (after, 1)):
+        if state is None:
+            continue
+        (product_id, feedback_type, status), rating = state
+        db.execute(_UPSERT, {
+            "product_id": product_id,
+            "feedback_type": feedback_type,
+            "status": status,
+            "count": sign,
+            "rating_sum": sign * (rating or 0),
+            "rating_count": sign if rating is not None else 0,
+        })
+
+
+def read_summaries(db: Session, product_id: Optional[int] = None) -> Dict[int, FeedbackSummary]:
+    """
+    读取反馈汇总
+
+    Args:
+        product_id: 只读取单个产品；为 None 时读取全部仍存在的产品
+
+    Returns:
+        产品 ID -> FeedbackSummary，没有反馈的产品不出现在结果中
+    """
+    sql = (
+        "SELECT s.product_id, s.feedback_type, s.status, s.count, s.rating_sum, s.rating_count "
+        "FROM product_feedback_summary s JOIN products p ON p.id = s.product_id "
+        "WHERE s.count > 0"
+    )
+    params = {}
+    if product_id is not None:
+        sql += " AND s.product_id = :product_id"
+        params["product_id"] = product_id
+
+    summaries: Dict[int, FeedbackSummary] = {}
+    for row in db.execute(text(sql), params):
+        summary = summaries.setdefault(row.product_id, FeedbackSummary(row.product_id))
+        summary.total += row.count
+        summary.rating_sum += row.rating_sum
+        summary.rating_count += row.rating_count
+        summary.by_type[row.feedback_type] = summary.by_type.get(row.feedback_type, 0) + row.count
+        summary.by_status[row.status] = summary.by_status.get(row.status, 0) + row.count
+    return summaries
+
+
+def seed_feedback_summary(target, connection, **kw):
+    """建表后用已有反馈初始化空的汇总表（metadata after_create 事件）"""
+    if connection.exec_driver_sql(_SEED).rowcount:
+        logger.info("已用现有反馈初始化反馈汇总")
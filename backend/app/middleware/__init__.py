@@ -2,6 +2,15 @@
 中间件模块
 """
 
-from .rate_limit import RateLimitMiddleware
+from .rate_limit import (
+    RateLimitMiddleware, RateLimitBackend, RateLimitResult,
+    SlidingWindowRateLimiter, SQLiteRateLimiter, create_rate_limiter
+)
+from .spa import SPA404Middleware, NoCacheAPIMiddleware
+from .conditional import ConditionalGetMiddleware
 
-__all__ = ["RateLimitMiddleware"]
+__all__ = [
+    "RateLimitMiddleware", "RateLimitBackend", "RateLimitResult",
+    "SlidingWindowRateLimiter", "SQLiteRateLimiter", "create_rate_limiter",
+    "SPA404Middleware", "NoCacheAPIMiddleware", "ConditionalGetMiddleware"
+]
@@ -0,0 +1,89 @@
+"""
+条件请求中间件（纯 ASGI 实现）
+对带 ETag / Last-Modified 的 GET、HEAD 成功响应处理 If-None-Match / If-Modified-Since，
+验证通过时返回 304 并丢弃响应体
+"""
+
+from email.utils import parsedate_to_datetime
+from typing import Optional
+
+from starlette.datastructures import Headers
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+# 304 响应中保留的响应头（RFC 9110 15.4.5）
+NOT_MODIFIED_HEADERS = frozenset({
+    "cache-control", "content-location", "date", "etag", "expires", "vary", "last-modified",
+    "x-request-id", "x-ratelimit-limit", "x-ratelimit-remaining", "x-ratelimit-reset",
+})
+
+
+def _strip_weak(tag: str) -> str:
+    return tag[2:] if tag.startswith("W/") else tag
+
+
+def etag_matches(if_none_match: str, etag: str) -> bool:
+    """If-None-Match 使用弱比较：忽略 W/ 前缀，支持 * 和逗号分隔的多个值"""
+    if if_none_match.strip() == "*":
+        return True
+    target = _strip_weak(etag.strip())
+    return any(_strip_weak(candidate.strip()) == target for candidate in if_none_match.split(","))
+
+
+def not_modified_since(if_modified_since: str, last_modified: str) -> bool:
+    """Last-Modified 不晚于 If-Modified-Since 时视为未修改；日期无法解析时返回 False"""
+    try:
+        return parsedate_to_datetime(last_modified) <= parsedate_to_datetime(if_modified_since)
+    except (TypeError, ValueError):
+        return False
+
+
+def is_not_modified(request_headers: Headers, response_headers: Headers) -> bool:
+    """按 RFC 9110 13.2.2 判断：有 If-None-Match 时只看 ETag，否则看 If-Modified-Since"""
+    if_none_match = request_headers.get("if-none-match")
+    etag: Optional[str] = response_headers.get("etag")
+    if if_none_match is not None:
+        return etag is not None and etag_matches(if_none_match, etag)
+
+    if_modified_since = request_headers.get("if-modified-since")
+    last_modified = response_headers.get("last-modified")
+    if if_modified_since and last_modified:
+        return not_modified_since(if_modified_since, last_modified)
+    return False
+
+
+class ConditionalGetMiddleware:
+    """条件请求中间件：验证器匹配时把 200 响应改写为不带响应体的 304"""
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http" or scope["method"] not in ("GET", "HEAD"):
+            await self.app(scope, receive, send)
+            return
+
+        request_headers = Headers(scope=scope)
+        if "if-none-match" not in request_headers and "if-modified-since" not in request_headers:
+            await self.app(scope, receive, send)
+            return
+
+        not_modified = False
+
+        async def send_or_not_modified(message: Message):
+            nonlocal not_modified
+            if message["type"] == "http.response.start":
+                if message["status"] == 200 and is_not_modified(request_headers, Headers(raw=message["headers"])):
+                    not_modified = True
+                    kept = [
+                        (name, value) for name, value in message["headers"]
+                        if name.decode("latin-1").lower() in NOT_MODIFIED_HEADERS
+                    ]
+                    await send({"type": "http.response.start", "status": 304, "headers": kept})
+                    await send({"type": "http.response.body", "body": b"", "more_body": False})
+                    return
+            elif not_modified:
+                # 丢弃原响应体
+                return
+            await send(message)
+
+        await self.app(scope, receive, send_or_not_modified)
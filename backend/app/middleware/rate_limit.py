@@ -1,183 +1,441 @@
 """
 速率限制中间件
 防止API滥用
+
+使用滑动窗口计数器（sliding window counter）算法：每个键只保存「上一窗口计数 + 当前窗口计数」，
+按当前窗口已过去的比例对上一窗口计数加权，估算最近一个窗口内的请求数。
+每个键的状态大小固定，不再随请求数增长；锁按键的哈希分片，不同 IP 之间互不阻塞。
+状态存储可替换：默认保存在进程内，多 worker 部署时可改用本地 SQLite 文件在进程间共享。
 """
 
+import math
+import sqlite3
 import time
-import asyncio
-from collections import defaultdict
-from typing import Callable
-from fastapi import Request, status
+import threading
+from pathlib import Path
+from dataclasses import dataclass
+from typing import Dict, List, Optional
+from fastapi import status
 from fastapi.responses import JSONResponse
-from starlette.middleware.base import BaseHTTPMiddleware
-from starlette.responses import Response
+from starlette.concurrency import run_in_threadpool
+from starlette.datastructures import Headers, MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
 import logging
 
 logger = logging.getLogger(__name__)
 
-class RateLimitMiddleware(BaseHTTPMiddleware):
-    """速率限制中间件"""
-    
-    def __init__(self, app, requests_per_window: int = 100, window_seconds: int = 3600):
-        super().__init__(app)
-        self.requests_per_window = requests_per_window
+
+@dataclass
+class RateLimitResult:
+    """一次限流判定的结果"""
+    allowed: bool
+    limit: int
+    remaining: int
+    reset_at: int  # 当前计数窗口结束的 Unix 时间戳
+    retry_after: int  # 被拒绝时建议的重试等待秒数
+
+
+class _WindowState:
+    """单个键的固定大小限流状态"""
+    __slots__ = ("window_index", "previous_count", "current_count", "window_seconds")
+
+    def __init__(self, window_index: int, window_seconds: int,
+                 previous_count: int = 0, current_count: int = 0):
+        self.window_index = window_index
+        self.previous_count = previous_count
+        self.current_count = current_count
         self.window_seconds = window_seconds
-        # 存储每个IP的请求时间戳
-        self.request_times: dict[str, list[float]] = defaultdict(list)
-        # 清理过期记录的时间间隔（秒）
-        self.cleanup_interval = 300  # 5分钟
-        self.last_cleanup = time.time()
-        # 异步锁，保护并发访问
-        self._lock = asyncio.Lock()
-    
-    async def _cleanup_old_records(self):
-        """清理过期的请求记录"""
-        current_time = time.time()
-        if current_time - self.last_cleanup < self.cleanup_interval:
+
+    def hit(self, limit: int, now: float) -> RateLimitResult:
+        """
+        在该状态上记录一次请求并判断是否允许
+
+        被拒绝的请求不计数，避免持续重试把窗口一直顶满。
+        """
+        window_seconds = self.window_seconds
+        window_index = int(now // window_seconds)
+        if window_index != self.window_index:
+            # 进入新窗口：相邻窗口时当前计数变为上一窗口计数，否则全部清零
+            self.previous_count = self.current_count if window_index == self.window_index + 1 else 0
+            self.current_count = 0
+            self.window_index = window_index
+
+        elapsed_ratio = (now - window_index * window_seconds) / window_seconds
+        estimated = self.previous_count * (1 - elapsed_ratio) + self.current_count
+        reset_at = (window_index + 1) * window_seconds
+
+        if estimated + 1 > limit:
+            return RateLimitResult(
+                allowed=False,
+                limit=limit,
+                remaining=0,
+                reset_at=reset_at,
+                retry_after=self._retry_after(limit, elapsed_ratio)
+            )
+
+        self.current_count += 1
+        return RateLimitResult(
+            allowed=True,
+            limit=limit,
+            remaining=max(0, int(limit - estimated - 1)),
+            reset_at=reset_at,
+            retry_after=0
+        )
+
+    def _retry_after(self, limit: int, elapsed_ratio: float) -> int:
+        """估算估计值降到可以再放行一次请求所需的秒数"""
+        budget = limit - 1
+        if self.current_count <= budget and self.previous_count > 0:
+            # 当前窗口内随着上一窗口权重衰减即可放行
+            ratio_needed = 1 - (budget - self.current_count) / self.previous_count
+            wait = (ratio_needed - elapsed_ratio) * self.window_seconds
+        else:
+            # 需要等到下一窗口，此时当前计数成为上一窗口计数
+            wait = (1 - elapsed_ratio) * self.window_seconds
+            if self.current_count > 0:
+                wait += max(0.0, 1 - budget / self.current_count) * self.window_seconds
+        return max(1, math.ceil(wait))
+
+
+class RateLimitBackend:
+    """
+    限流状态存储后端基类
+
+    子类实现 hit、evict_idle 和 clear；基类负责后台清理线程的生命周期。
+    """
+
+    # hit 是否可能阻塞（文件锁、磁盘 I/O）；为 True 时中间件在线程池中调用，不占用事件循环
+    blocking = False
+
+    def __init__(self, eviction_interval: float = 300):
+        self.eviction_interval = max(eviction_interval, 1)
+        self._evictor: Optional[threading.Thread] = None
+        self._evictor_lock = threading.Lock()
+        self._stop_event = threading.Event()
+        self.evicted_keys = 0
+
+    def hit(self, key: str, limit: int, window_seconds: int, now: Optional[float] = None) -> RateLimitResult:
+        """记录一次请求并判断是否允许"""
+        raise NotImplementedError
+
+    def evict_idle(self, now: float) -> int:
+        """删除最近两个窗口内都没有请求的键，返回删除数量"""
+        raise NotImplementedError
+
+    def clear(self):
+        """清空所有计数"""
+        raise NotImplementedError
+
+    # ==================== 空闲键清理 ====================
+
+    def _ensure_evictor(self):
+        if self._evictor is not None:
             return
-        
-        async with self._lock:
-            cutoff_time = current_time - self.window_seconds
-            for ip in list(self.request_times.keys()):
-                # 只保留窗口内的记录
-                self.request_times[ip] = [
-                    timestamp for timestamp in self.request_times[ip]
-                    if timestamp > cutoff_time
+        with self._evictor_lock:
+            if self._evictor is None:
+                self._evictor = threading.Thread(target=self._run_evictor, name="rate-limit-evictor", daemon=True)
+                self._evictor.start()
+
+    def _run_evictor(self):
+        while not self._stop_event.wait(self.eviction_interval):
+            try:
+                self.evict_idle(time.time())
+            except Exception as e:
+                logger.error(f"清理限流记录失败: {e}")
+
+    def stop(self):
+        """停止后台清理线程（等待进行中的清理结束）"""
+        self._stop_event.set()
+        evictor = self._evictor
+        if evictor is not None and evictor is not threading.current_thread():
+            evictor.join(timeout=5)
+
+
+class SlidingWindowRateLimiter(RateLimitBackend):
+    """
+    进程内滑动窗口计数器限流引擎
+
+    状态按键哈希分布到多个分片，每个分片有自己的字典和锁；
+    后台线程定期清理两个窗口内都没有请求的空闲键。
+    多 worker 部署时每个进程各自计数，需要全局一致时使用 SQLiteRateLimiter。
+    """
+
+    def __init__(self, lock_stripes: int = 64, eviction_interval: float = 300):
+        super().__init__(eviction_interval)
+        self.lock_stripes = max(lock_stripes, 1)
+        self._shards: List[Dict[str, _WindowState]] = [{} for _ in range(self.lock_stripes)]
+        self._locks = [threading.Lock() for _ in range(self.lock_stripes)]
+
+    def _shard_for(self, key: str) -> int:
+        return hash(key) % self.lock_stripes
+
+    def hit(self, key: str, limit: int, window_seconds: int, now: Optional[float] = None) -> RateLimitResult:
+        self._ensure_evictor()
+        now = time.time() if now is None else now
+        shard = self._shard_for(key)
+
+        with self._locks[shard]:
+            states = self._shards[shard]
+            state = states.get(key)
+            if state is None:
+                state = states[key] = _WindowState(int(now // window_seconds), window_seconds)
+            return state.hit(limit, now)
+
+    def evict_idle(self, now: float) -> int:
+        """删除最近两个窗口内都没有请求的键，逐个分片加锁，返回删除数量"""
+        evicted = 0
+        for shard, states in enumerate(self._shards):
+            with self._locks[shard]:
+                idle_keys = [
+                    key for key, state in states.items()
+                    if int(now // state.window_seconds) > state.window_index + 1
                 ]
-                # 如果列表为空，删除该IP的记录
-                if not self.request_times[ip]:
-                    del self.request_times[ip]
-            
-            self.last_cleanup = current_time
-    
-    def _get_client_ip(self, request: Request) -> str:
+                for key in idle_keys:
+                    del states[key]
+            evicted += len(idle_keys)
+        self.evicted_keys += evicted
+        return evicted
+
+    def clear(self):
+        for shard, states in enumerate(self._shards):
+            with self._locks[shard]:
+                states.clear()
+
+    def __len__(self) -> int:
+        return sum(len(states) for states in self._shards)
+
+
+class SQLiteRateLimiter(RateLimitBackend):
+    """
+    基于本地 SQLite 文件的跨进程限流引擎
+
+    同一台机器上的多个 uvicorn worker 打开同一个文件即可共享计数，不依赖外部服务。
+    每次判定在一个 BEGIN IMMEDIATE 事务中读-改-写一行；计数不需要持久性，
+    因此关闭 fsync（synchronous=OFF），事务开销只是文件锁。
+    存储异常时放行请求（fail open），避免限流存储故障导致整站不可用。
+    判定会等待文件锁（最长 busy_timeout），因此标记为阻塞，由中间件放到线程池中执行。
+    """
+
+    blocking = True
+
+    def __init__(self, path: str, eviction_interval: float = 300, busy_timeout_ms: int = 1000):
+        super().__init__(eviction_interval)
+        self.path = str(path)
+        Path(self.path).parent.mkdir(parents=True, exist_ok=True)
+        # 一个进程只用一个连接：线程池中判定、清理线程删除，由锁串行化
+        self._conn = sqlite3.connect(
+            self.path, timeout=max(busy_timeout_ms, 0) / 1000,
+            isolation_level=None, check_same_thread=False
+        )
+        self._lock = threading.Lock()
+        with self._lock:
+            self._conn.execute("PRAGMA journal_mode = WAL")
+            self._conn.execute("PRAGMA synchronous = OFF")
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS rate_limit_windows ("
+                " key TEXT PRIMARY KEY,"
+                " window_index INTEGER NOT NULL,"
+                " previous_count INTEGER NOT NULL,"
+                " current_count INTEGER NOT NULL,"
+                " window_seconds INTEGER NOT NULL,"
+                " expires_at REAL NOT NULL"
+                ")"
+            )
+            self._conn.execute(
+                "CREATE INDEX IF NOT EXISTS idx_rate_limit_windows_expires ON rate_limit_windows (expires_at)"
+            )
+
+    def hit(self, key: str, limit: int, window_seconds: int, now: Optional[float] = None) -> RateLimitResult:
+        self._ensure_evictor()
+        now = time.time() if now is None else now
+
+        with self._lock:
+            try:
+                self._conn.execute("BEGIN IMMEDIATE")
+                try:
+                    row = self._conn.execute(
+                        "SELECT window_index, previous_count, current_count FROM rate_limit_windows WHERE key = ?",
+                        (key,)
+                    ).fetchone()
+                    if row is None:
+                        state = _WindowState(int(now // window_seconds), window_seconds)
+                    else:
+                        state = _WindowState(row[0], window_seconds, previous_count=row[1], current_count=row[2])
+                    result = state.hit(limit, now)
+                    self._conn.execute(
+                        "INSERT OR REPLACE INTO rate_limit_windows"
+                        " (key, window_index, previous_count, current_count, window_seconds, expires_at)"
+                        " VALUES (?, ?, ?, ?, ?, ?)",
+                        (key, state.window_index, state.previous_count, state.current_count,
+                         window_seconds, (state.window_index + 2) * window_seconds)
+                    )
+                    self._conn.execute("COMMIT")
+                except BaseException:
+                    self._conn.execute("ROLLBACK")
+                    raise
+                return result
+            except sqlite3.Error as e:
+                logger.error(f"限流存储访问失败，本次请求放行: {e}")
+                return RateLimitResult(allowed=True, limit=limit, remaining=limit, reset_at=int(now), retry_after=0)
+
+    def evict_idle(self, now: float) -> int:
+        """删除最近两个窗口内都没有请求的键，返回删除数量"""
+        with self._lock:
+            cursor = self._conn.execute("DELETE FROM rate_limit_windows WHERE expires_at <= ?", (now,))
+            evicted = max(cursor.rowcount, 0)
+        self.evicted_keys += evicted
+        return evicted
+
+    def clear(self):
+        with self._lock:
+            self._conn.execute("DELETE FROM rate_limit_windows")
+
+    def stop(self):
+        """停止清理线程并关闭连接；之后的判定因连接已关闭而放行"""
+        super().stop()
+        with self._lock:
+            self._conn.close()
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM rate_limit_windows").fetchone()[0]
+
+
+def create_rate_limiter(backend: str = "memory", lock_stripes: int = 64, eviction_interval: float = 300,
+                        store_path: Optional[str] = None) -> RateLimitBackend:
+    """
+    按配置创建限流引擎
+
+    Args:
+        backend: memory（进程内）或 sqlite（同机多 worker 共享）
+        lock_stripes: 进程内引擎的锁分片数
+        eviction_interval: 空闲键清理间隔（秒）
+        store_path: sqlite 后端的文件路径
+    """
+    backend = (backend or "memory").lower()
+    if backend == "sqlite":
+        if not store_path:
+            raise ValueError("sqlite 限流后端必须配置存储文件路径")
+        return SQLiteRateLimiter(store_path, eviction_interval=eviction_interval)
+    if backend != "memory":
+        logger.warning(f"未知的限流后端: {backend}，使用 memory")
+    return SlidingWindowRateLimiter(lock_stripes=lock_stripes, eviction_interval=eviction_interval)
+
+
+# 不做速率限制的路径
+EXEMPT_PATHS = frozenset({"/health", "/", "/docs", "/openapi.json", "/redoc"})
+
+
+class RateLimitMiddleware:
+    """速率限制中间件（纯 ASGI 实现）"""
+
+    def __init__(self, app: ASGIApp, requests_per_window: int = 100, window_seconds: int = 3600,
+                 lock_stripes: int = 64, eviction_interval: float = 300,
+                 backend: str = "memory", store_path: Optional[str] = None,
+                 limiter: Optional[RateLimitBackend] = None):
+        self.app = app
+        self.requests_per_window = requests_per_window
+        self.window_seconds = window_seconds
+        # 登录接口使用更严格的限制（防止暴力破解）
+        self.login_limit = 10  # 每小时最多10次登录尝试
+        self.login_window = 3600  # 1小时
+        # 引擎定义了 __len__，没有键时为假值，不能用 or 判断
+        if limiter is None:
+            limiter = create_rate_limiter(
+                backend, lock_stripes=lock_stripes, eviction_interval=eviction_interval, store_path=store_path
+            )
+        self.limiter = limiter
+
+    @staticmethod
+    def _get_client_ip(scope: Scope) -> str:
         """获取客户端IP地址"""
+        headers = Headers(scope=scope)
         # 优先从X-Forwarded-For获取（代理场景）
-        forwarded = request.headers.get("X-Forwarded-For")
+        forwarded = headers.get("X-Forwarded-For")
         if forwarded:
             # X-Forwarded-For可能包含多个IP，取第一个
             return forwarded.split(",")[0].strip()
-        
+
         # 从X-Real-IP获取
-        real_ip = request.headers.get("X-Real-IP")
+        real_ip = headers.get("X-Real-IP")
         if real_ip:
             return real_ip
-        
+
         # 最后从客户端获取
-        if request.client:
-            return request.client.host
-        
+        client = scope.get("client")
+        if client:
+            return client[0]
+
         return "unknown"
-    
-    async def dispatch(self, request: Request, call_next: Callable) -> Response:
+
+    async def _hit(self, key: str, limit: int, window_seconds: int, now: float) -> RateLimitResult:
+        """判定一次请求；可能阻塞的后端在线程池中执行"""
+        if self.limiter.blocking:
+            return await run_in_threadpool(self.limiter.hit, key, limit, window_seconds, now)
+        return self.limiter.hit(key, limit, window_seconds, now)
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
         """处理请求并应用速率限制"""
-        
-        # 跳过健康检查端点
-        if request.url.path in ["/health", "/", "/docs", "/openapi.json", "/redoc"]:
-            return await call_next(request)
-        
-        # 定期清理过期记录
-        await self._cleanup_old_records()
-        
+
+        # 跳过非 HTTP 请求和健康检查端点
+        if scope["type"] != "http" or scope["path"] in EXEMPT_PATHS:
+            await self.app(scope, receive, send)
+            return
+
         # 获取客户端IP
-        client_ip = self._get_client_ip(request)
-        
-        # 获取当前时间
+        client_ip = self._get_client_ip(scope)
         current_time = time.time()
-        
-        # 根据端点类型设置不同的限制策略
-        path = request.url.path
-        is_login = path == "/api/auth/login"
-        
-        # 登录接口使用更严格的限制（防止暴力破解）
-        if is_login:
-            login_limit = 10  # 每小时最多10次登录尝试
-            login_window = 3600  # 1小时
-            cutoff_time = current_time - login_window
-            
-            async with self._lock:
-                # 使用单独的键来跟踪登录请求
-                login_key = f"{client_ip}:login"
-                login_requests = self.request_times.get(login_key, [])
-                
-                # 清理窗口外的记录
-                login_requests[:] = [timestamp for timestamp in login_requests if timestamp > cutoff_time]
-                
-                # 检查是否超过登录限制
-                if len(login_requests) >= login_limit:
-                    logger.warning(f"登录速率限制触发: IP {client_ip} 在 {login_window} 秒内尝试登录 {len(login_requests)} 次")
-                    reset_time = int(cutoff_time + login_window)
-                    return JSONResponse(
-                        status_code=status.HTTP_429_TOO_MANY_REQUESTS,
-                        content={
-                            "error": {
-                                "code": "TOO_MANY_REQUESTS",
-                                "message": f"登录尝试过于频繁，请稍后再试（限制：{login_limit}次/小时）",
-                                "timestamp": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime(current_time))
-                            }
-                        },
-                        headers={
-                            "X-RateLimit-Limit": str(login_limit),
-                            "X-RateLimit-Remaining": "0",
-                            "X-RateLimit-Reset": str(reset_time),
-                            "Retry-After": str(login_window)
-                        }
-                    )
-                
-                # 记录本次登录尝试
-                login_requests.append(current_time)
-                self.request_times[login_key] = login_requests
-                request_count = len(login_requests)
-                limit_value = login_limit
-                window_value = login_window
+
+        # 根据端点类型设置不同的限制策略，登录请求使用单独的键
+        if scope["path"] == "/api/auth/login":
+            result = await self._hit(f"{client_ip}:login", self.login_limit, self.login_window, current_time)
+            if not result.allowed:
+                logger.warning(f"登录速率限制触发: IP {client_ip} 在 {self.login_window} 秒内登录尝试超过 {self.login_limit} 次")
+                response = self._too_many_requests(
+                    result, current_time,
+                    f"登录尝试过于频繁，请稍后再试（限制：{self.login_limit}次/小时）"
+                )
+                await response(scope, receive, send)
+                return
         else:
-            # 其他接口使用通用限制
-            cutoff_time = current_time - self.window_seconds
-            limit_value = self.requests_per_window
-            window_value = self.window_seconds
-            
-            # 使用锁保护并发访问
-            async with self._lock:
-                # 获取该IP的请求记录
-                ip_requests = self.request_times[client_ip]
-                
-                # 清理窗口外的记录
-                ip_requests[:] = [timestamp for timestamp in ip_requests if timestamp > cutoff_time]
-                
-                # 检查是否超过限制
-                if len(ip_requests) >= self.requests_per_window:
-                    logger.warning(f"速率限制触发: IP {client_ip} 在 {self.window_seconds} 秒内请求 {len(ip_requests)} 次")
-                    # 直接返回响应，而不是抛出异常，避免应用崩溃
-                    reset_time = int(cutoff_time + self.window_seconds)
-                    return JSONResponse(
-                        status_code=status.HTTP_429_TOO_MANY_REQUESTS,
-                        content={
-                            "error": {
-                                "code": "TOO_MANY_REQUESTS",
-                                "message": f"请求过于频繁，请在 {self.window_seconds} 秒后再试",
-                                "timestamp": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime(current_time))
-                            }
-                        },
-                        headers={
-                            "X-RateLimit-Limit": str(self.requests_per_window),
-                            "X-RateLimit-Remaining": "0",
-                            "X-RateLimit-Reset": str(reset_time),
-                            "Retry-After": str(self.window_seconds)
-                        }
-                    )
-                
-                # 记录本次请求
-                ip_requests.append(current_time)
-                request_count = len(ip_requests)
-        
+            result = await self._hit(client_ip, self.requests_per_window, self.window_seconds, current_time)
+            if not result.allowed:
+                logger.warning(f"速率限制触发: IP {client_ip} 在 {self.window_seconds} 秒内请求超过 {self.requests_per_window} 次")
+                # 直接返回响应，而不是抛出异常，避免应用崩溃
+                response = self._too_many_requests(
+                    result, current_time,
+                    f"请求过于频繁，请在 {self.window_seconds} 秒后再试"
+                )
+                await response(scope, receive, send)
+                return
+
+        async def send_with_rate_limit_headers(message: Message):
+            # 添加速率限制响应头
+            if message["type"] == "http.response.start":
+                headers = MutableHeaders(scope=message)
+                headers["X-RateLimit-Limit"] = str(result.limit)
+                headers["X-RateLimit-Remaining"] = str(result.remaining)
+                headers["X-RateLimit-Reset"] = str(result.reset_at)
+            await send(message)
+
         # 继续处理请求
-        response = await call_next(request)
-        
-        # 添加速率限制响应头
-        remaining = max(0, limit_value - request_count)
-        reset_time = int(cutoff_time + window_value)
-        response.headers["X-RateLimit-Limit"] = str(limit_value)
-        response.headers["X-RateLimit-Remaining"] = str(remaining)
-        response.headers["X-RateLimit-Reset"] = str(reset_time)
-        
-        return response
+        await self.app(scope, receive, send_with_rate_limit_headers)
+
+    @staticmethod
+    def _too_many_requests(result: RateLimitResult, current_time: float, message: str) -> JSONResponse:
+        return JSONResponse(
+            status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+            content={
+                "error": {
+                    "code": "TOO_MANY_REQUESTS",
+                    "message": message,
+                    "timestamp": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime(current_time))
+                }
+            },
+            headers={
+                "X-RateLimit-Limit": str(result.limit),
+                "X-RateLimit-Remaining": "0",
+                "X-RateLimit-Reset": str(result.reset_at),
+                "Retry-After": str(result.retry_after)
+            }
+        )
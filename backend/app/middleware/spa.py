@@ -0,0 +1,98 @@
+"""
+前端 SPA 回退与 API 缓存控制中间件（纯 ASGI 实现）
+"""
+
+from pathlib import Path
+from typing import Optional
+
+from starlette.datastructures import MutableHeaders
+from starlette.responses import FileResponse
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+# 这些前缀下的 404 是真实的 404，不回退到前端页面
+SPA_EXCLUDED_PREFIXES = ("api/", "uploads/", "products/")
+
+
+def spa_file_path(spa_dir: Optional[Path], relative_path: str) -> Optional[Path]:
+    """解析 SPA 静态文件路径，防止路径穿越；不存在或非法则返回 None。"""
+    if not spa_dir or not relative_path:
+        return None
+    parts = Path(relative_path).parts
+    if ".." in parts or relative_path.startswith("/"):
+        return None
+    full = (spa_dir / relative_path).resolve()
+    try:
+        full.resolve().relative_to(spa_dir.resolve())
+    except ValueError:
+        return None
+    return full if full.is_file() else None
+
+
+class SPA404Middleware:
+    """
+    SPA 回退中间件
+
+    先走正常路由（API 先匹配），只有返回 404 的 GET 且非 /api 等时才回退到 index.html，
+    避免 /api 被当成前端路由返回 HTML。被替换的 404 响应体直接丢弃，不会发给客户端。
+    """
+
+    def __init__(self, app: ASGIApp, spa_dir: Optional[Path] = None):
+        self.app = app
+        self.spa_dir = spa_dir
+
+    def _can_fallback(self, scope: Scope) -> bool:
+        if scope["type"] != "http" or scope["method"] != "GET":
+            return False
+        path = scope["path"].strip("/")
+        if path.startswith(SPA_EXCLUDED_PREFIXES) or path == "health":
+            return False
+        return bool(self.spa_dir and (self.spa_dir / "index.html").exists())
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if not self._can_fallback(scope):
+            await self.app(scope, receive, send)
+            return
+
+        not_found = False
+
+        async def send_unless_not_found(message: Message):
+            nonlocal not_found
+            if message["type"] == "http.response.start" and message["status"] == 404:
+                not_found = True
+            if not not_found:
+                await send(message)
+
+        await self.app(scope, receive, send_unless_not_found)
+
+        if not_found:
+            file_path = spa_file_path(self.spa_dir, scope["path"].strip("/"))
+            response = FileResponse(str(file_path or self.spa_dir / "index.html"))
+            await response(scope, receive, send)
+
+
+class NoCacheAPIMiddleware:
+    """
+    禁止浏览器缓存 /api 响应，避免 API 被误缓存成 HTML 后一直返回错误内容
+
+    路由自己设置了 Cache-Control 的响应（如带 ETag、要求重新验证的公开内容接口）保持原样
+    """
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http" or not scope["path"].startswith("/api/"):
+            await self.app(scope, receive, send)
+            return
+
+        async def send_with_no_cache(message: Message):
+            if message["type"] == "http.response.start":
+                headers = MutableHeaders(scope=message)
+                if "cache-control" in headers:
+                    await send(message)
+                    return
+                headers.append("Cache-Control", "no-store, no-cache, must-revalidate")
+                headers.append("Pragma", "no-cache")
+            await send(message)
+
+        await self.app(scope, receive, send_with_no_cache)
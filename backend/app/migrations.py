@@ -8,11 +8,19 @@ from sqlalchemy.orm import sessionmaker
 from .database import SQLALCHEMY_DATABASE_URL, Base
 from .models import Portfolio, Blog, Profile, Session
 import json
+import sqlite3
+from contextlib import contextmanager
 from datetime import datetime
 
+# 等待其他 worker 完成迁移的最长时间（秒）
+MIGRATION_LOCK_TIMEOUT = 300
+
+class DatabaseMigrationError(RuntimeError):
+    """迁移失败：数据库结构与模型不一致，应用不应继续启动"""
+
 class DatabaseMigration:
-    def __init__(self):
-        self.engine = create_engine(SQLALCHEMY_DATABASE_URL, connect_args={"check_same_thread": False})
+    def __init__(self, engine=None):
+        self.engine = engine or create_engine(SQLALCHEMY_DATABASE_URL, connect_args={"check_same_thread": False})
         self.SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=self.engine)
     
     def get_table_info(self, table_name):
@@ -106,6 +114,166 @@ class DatabaseMigration:
         
         print("版本 1.1 迁移完成")
     
+    def migrate_to_v1_2(self):
+        """迁移到版本 1.2：游标分页使用的 (产品, 时间) 复合索引"""
+        print("开始迁移到版本 1.2...")
+        
+        if self.table_exists("product_logs"):
+            self.create_index_if_not_exists(
+                "idx_product_logs_product_type_time",
+                "product_logs",
+                ["product_id", "log_type", "timestamp"]
+            )
+            # 新索引以 (product_id, log_type) 开头，旧索引已多余
+            with self.engine.connect() as conn:
+                conn.execute(text("DROP INDEX IF EXISTS idx_product_logs_product_type"))
+                conn.commit()
+        
+        if self.table_exists("product_feedback"):
+            self.create_index_if_not_exists(
+                "idx_feedback_product_created",
+                "product_feedback",
+                ["product_id", "created_at"]
+            )
+        
+        if self.table_exists("product_data_storage"):
+            self.create_index_if_not_exists(
+                "idx_data_storage_product_created",
+                "product_data_storage",
+                ["product_id", "created_at"]
+            )
+        
+        print("版本 1.2 迁移完成")
+    
+    def migrate_to_v1_3(self):
+        """迁移到版本 1.3：公开反馈的排序键和过滤后内容"""
+        print("开始迁移到版本 1.3...")
+        
+        if self.table_exists("product_feedback"):
+            self.add_column_if_not_exists("product_feedback", "sort_key DATETIME")
+            self.add_column_if_not_exists("product_feedback", "public_title VARCHAR(200)")
+            self.add_column_if_not_exists("product_feedback", "public_content TEXT")
+            self.add_column_if_not_exists("product_feedback", "public_reply TEXT")
+            
+            # 回填旧数据
+            from .models import ProductFeedback
+            from .feedback_content import apply_public_fields
+            db = self.SessionLocal()
+            try:
+                pending = db.query(ProductFeedback).filter(ProductFeedback.sort_key.is_(None)).all()
+                for feedback in pending:
+                    apply_public_fields(feedback)
+                db.commit()
+                print(f"已回填 {len(pending)} 条反馈的公开字段")
+            except Exception:
+                db.rollback()
+                raise
+            finally:
+                db.close()
+            
+            self.create_index_if_not_exists(
+                "idx_feedback_product_status_sort",
+                "product_feedback",
+                ["product_id", "status", "sort_key"]
+            )
+            # 新索引以 (product_id, status) 开头，旧索引已多余
+            with self.engine.connect() as conn:
+                conn.execute(text("DROP INDEX IF EXISTS idx_feedback_product_status"))
+                conn.commit()
+        
+        print("版本 1.3 迁移完成")
+    
+    def migrate_to_v1_4(self):
+        """迁移到版本 1.4：产品数据的 (产品, 键) 索引改为唯一索引"""
+        print("开始迁移到版本 1.4...")
+        
+        if self.table_exists("product_data_storage"):
+            indexes = self.get_table_info("product_data_storage")["indexes"]
+            current = next((idx for idx in indexes if idx['name'] == "idx_data_storage_product_key"), None)
+            if current is None or not current.get('unique'):
+                with self.engine.connect() as conn:
+                    # 并发写入可能留下重复的键，保留最新的一条
+                    result = conn.execute(text(
+                        "DELETE FROM product_data_storage WHERE id NOT IN ("
+                        "SELECT MAX(id) FROM product_data_storage GROUP BY product_id, storage_key)"
+                    ))
+                    if result.rowcount:
+                        print(f"已删除 {result.rowcount} 条重复的产品数据")
+                    conn.execute(text("DROP INDEX IF EXISTS idx_data_storage_product_key"))
+                    conn.execute(text(
+                        "CREATE UNIQUE INDEX idx_data_storage_product_key "
+                        "ON product_data_storage (product_id, storage_key)"
+                    ))
+                    conn.commit()
+                print("已创建唯一索引 idx_data_storage_product_key")
+            else:
+                print("唯一索引 idx_data_storage_product_key 已存在")
+        
+        print("版本 1.4 迁移完成")
+    
+    def migrate_to_v1_5(self):
+        """迁移到版本 1.5：产品数据大值存为文件的引用字段（已有数据保持行内存储）"""
+        print("开始迁移到版本 1.5...")
+        
+        if self.table_exists("product_data_storage"):
+            self.add_column_if_not_exists("product_data_storage", "blob_hash VARCHAR(64)")
+            self.add_column_if_not_exists("product_data_storage", "blob_encoding VARCHAR(16)")
+            self.create_index_if_not_exists("idx_data_storage_blob_hash", "product_data_storage", ["blob_hash"])
+        
+        print("版本 1.5 迁移完成")
+    
+    def migrate_to_v1_6(self):
+        """
+        迁移到版本 1.6：product_stats 主键改为 AUTOINCREMENT
+        
+        汇总任务按 id 水位线增量处理访问统计；没有 AUTOINCREMENT 时数据保留任务删除最大 id 的行后
+        SQLite 会复用水位线以下的 id，新访问既不会被汇总，也不在 id > 水位线的尾部查询中。
+        SQLite 不能修改已有表的主键，需要重建表。
+        """
+        print("开始迁移到版本 1.6...")
+        
+        if self.table_exists("product_stats"):
+            with self.engine.begin() as conn:
+                table_sql = conn.execute(text(
+                    "SELECT sql FROM sqlite_master WHERE type = 'table' AND name = 'product_stats'"
+                )).scalar() or ""
+                if "AUTOINCREMENT" in table_sql.upper():
+                    print("product_stats 已使用 AUTOINCREMENT")
+                else:
+                    from .models import ProductStats
+                    conn.execute(text("ALTER TABLE product_stats RENAME TO product_stats_old"))
+                    # 重命名后索引仍挂在旧表上，先删除以便新表使用同名索引
+                    old_indexes = conn.execute(text(
+                        "SELECT name FROM sqlite_master WHERE type = 'index' AND tbl_name = 'product_stats_old' "
+                        "AND sql IS NOT NULL"
+                    )).scalars().all()
+                    for name in old_indexes:
+                        conn.execute(text(f"DROP INDEX {name}"))
+                    ProductStats.__table__.create(conn)
+                    
+                    old_columns = {row[1] for row in conn.execute(text("PRAGMA table_info(product_stats_old)"))}
+                    columns = ", ".join(c.name for c in ProductStats.__table__.columns if c.name in old_columns)
+                    conn.execute(text(
+                        f"INSERT INTO product_stats ({columns}) SELECT {columns} FROM product_stats_old"
+                    ))
+                    conn.execute(text("DROP TABLE product_stats_old"))
+                    
+                    # 已汇总的行可能已被全部删除，序列至少从水位线开始
+                    floor = 0
+                    if self.table_exists("rollup_watermarks"):
+                        floor = conn.execute(text(
+                            "SELECT MAX(last_id) FROM rollup_watermarks WHERE source = 'product_stats'"
+                        )).scalar() or 0
+                    if not conn.execute(text(
+                        "UPDATE sqlite_sequence SET seq = MAX(seq, :floor) WHERE name = 'product_stats'"
+                    ), {"floor": floor}).rowcount:
+                        conn.execute(text(
+                            "INSERT INTO sqlite_sequence (name, seq) VALUES ('product_stats', :floor)"
+                        ), {"floor": floor})
+                    print("已重建 product_stats 表（AUTOINCREMENT）")
+        
+        print("版本 1.6 迁移完成")
+    
     def migrate_json_fields(self):
         """迁移 JSON 字段：确保空值被正确处理"""
         print("开始迁移 JSON 字段...")
@@ -141,6 +309,11 @@ class DatabaseMigration:
         
         try:
             self.migrate_to_v1_1()
+            self.migrate_to_v1_2()
+            self.migrate_to_v1_3()
+            self.migrate_to_v1_4()
+            self.migrate_to_v1_5()
+            self.migrate_to_v1_6()
             self.migrate_json_fields()
             print("所有迁移完成")
         except Exception as e:
@@ -189,10 +362,37 @@ class DatabaseMigration:
             print("数据库健康状态良好")
             return True
 
-def run_migrations():
-    """运行数据库迁移的入口函数"""
-    migration = DatabaseMigration()
-    migration.run_all_migrations()
+@contextmanager
+def migration_lock(engine):
+    """
+    串行执行迁移的跨进程锁
+    
+    多个 worker 同时启动时都会运行迁移，对数据库旁的锁文件持有 SQLite 排他锁，
+    后启动的 worker 等前一个完成后再运行（此时各迁移都已是空操作）。
+    """
+    database = engine.url.database
+    if engine.url.get_backend_name() != "sqlite" or not database or database == ":memory:":
+        yield
+        return
+    lock = sqlite3.connect(f"{database}.migrate-lock", timeout=MIGRATION_LOCK_TIMEOUT, isolation_level=None)
+    try:
+        lock.execute("BEGIN EXCLUSIVE")
+        yield
+    finally:
+        lock.close()
+
+def run_migrations(engine=None):
+    """
+    运行数据库迁移的入口函数
+    
+    各版本迁移都是幂等的，应用启动时（init_database）和 manage_db.py migrate 都会调用
+    """
+    migration = DatabaseMigration(engine)
+    try:
+        with migration_lock(migration.engine):
+            migration.run_all_migrations()
+    except Exception as e:
+        raise DatabaseMigrationError(f"数据库迁移失败: {e}") from e
 
 def check_health():
     """检查数据库健康状态的入口函数"""
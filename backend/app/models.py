@@ -1,6 +1,10 @@
-from sqlalchemy import Column, Integer, String, Text, Boolean, DateTime, JSON, Index, ForeignKey
+from sqlalchemy import Column, Integer, String, Text, Boolean, DateTime, JSON, Index, ForeignKey, LargeBinary, event
 from sqlalchemy.sql import func
 from .database import Base
+from .search_index import create_search_indexes, drop_search_indexes
+from .system_counters import create_counter_triggers, drop_counter_triggers
+from .feedback_content import sync_public_fields
+from .feedback_summary import seed_feedback_summary
 
 class Portfolio(Base):
     __tablename__ = "portfolio"
@@ -111,11 +115,52 @@ class ProductStats(Base):
     referrer = Column(String(500))
     
     # 复合索引：按产品和访问时间排序
+    # AUTOINCREMENT：汇总水位线按 id 推进，数据保留删除最大 id 的行后 id 不能被复用
     __table_args__ = (
         Index('idx_product_stats_product_time', 'product_id', 'access_time'),
         Index('idx_product_stats_ip_time', 'visitor_ip', 'access_time'),
+        {'sqlite_autoincrement': True},
     )
 
+class ProductStatsRollup(Base):
+    """访问统计的小时汇总，由 analytics_rollup 服务从 product_stats 增量生成"""
+    __tablename__ = "product_stats_rollups"
+    
+    id = Column(Integer, primary_key=True, index=True)
+    product_id = Column(Integer, ForeignKey('products.id', ondelete='CASCADE'), nullable=False)
+    bucket_start = Column(DateTime(timezone=True), nullable=False)  # 小时起点（UTC）
+    visits = Column(Integer, nullable=False, default=0)
+    duration_sum = Column(Integer, nullable=False, default=0)
+    last_access = Column(DateTime(timezone=True))
+    visitor_sketch = Column(LargeBinary)  # 访客集合，格式见 services/visitor_sketch.py
+    
+    # 唯一索引：每个产品每小时一行，按时间范围读取
+    __table_args__ = (
+        Index('idx_stats_rollup_product_bucket', 'product_id', 'bucket_start', unique=True),
+    )
+
+class ProductVisitorDaily(Base):
+    """每个产品每天的访客集合，与小时汇总在同一批次中由 analytics_rollup 服务维护"""
+    __tablename__ = "product_visitor_daily"
+    
+    id = Column(Integer, primary_key=True, index=True)
+    product_id = Column(Integer, ForeignKey('products.id', ondelete='CASCADE'), nullable=False)
+    day = Column(DateTime(timezone=True), nullable=False)  # 当天零点（UTC）
+    visitor_sketch = Column(LargeBinary, nullable=False)  # 访客集合，格式见 services/visitor_sketch.py
+    
+    # 唯一索引：每个产品每天一行，按日期范围读取
+    __table_args__ = (
+        Index('idx_visitor_daily_product_day', 'product_id', 'day', unique=True),
+    )
+
+class RollupWatermark(Base):
+    """汇总进度：源表中已汇总的最大 ID"""
+    __tablename__ = "rollup_watermarks"
+    
+    source = Column(String(50), primary_key=True)  # 源表名
+    last_id = Column(Integer, nullable=False, default=0)
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
+
 class ProductLog(Base):
     __tablename__ = "product_logs"
     
@@ -127,13 +172,28 @@ class ProductLog(Base):
     details = Column(JSON)  # 存储详细信息
     timestamp = Column(DateTime(timezone=True), server_default=func.now(), index=True)
     
-    # 复合索引：按产品、日志类型和时间排序
+    # 复合索引：按产品、日志类型和时间排序（错误、性能日志按时间分页）
     __table_args__ = (
-        Index('idx_product_logs_product_type', 'product_id', 'log_type'),
+        Index('idx_product_logs_product_type_time', 'product_id', 'log_type', 'timestamp'),
         Index('idx_product_logs_level_time', 'log_level', 'timestamp'),
         Index('idx_product_logs_product_time', 'product_id', 'timestamp'),
     )
 
+class ProductLogDaily(Base):
+    """日志的按天计数，由数据保留任务在删除过期原始日志前写入"""
+    __tablename__ = "product_log_daily"
+    
+    id = Column(Integer, primary_key=True, index=True)
+    product_id = Column(Integer, ForeignKey('products.id', ondelete='CASCADE'), nullable=False)
+    day = Column(DateTime(timezone=True), nullable=False)  # 当天零点（UTC）
+    log_type = Column(String(50), nullable=False)
+    log_level = Column(String(20), nullable=False)
+    count = Column(Integer, nullable=False, default=0)
+    
+    __table_args__ = (
+        Index('idx_log_daily_key', 'product_id', 'day', 'log_type', 'log_level', unique=True),
+    )
+
 class ProductFeedback(Base):
     __tablename__ = "product_feedback"
     
@@ -152,13 +212,36 @@ class ProductFeedback(Base):
     created_at = Column(DateTime(timezone=True), server_default=func.now(), index=True)
     updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
     replied_at = Column(DateTime(timezone=True))  # 回复时间
+    # 公开列表使用的字段，由 feedback_content 模块在写入时维护
+    sort_key = Column(DateTime(timezone=True))  # 有回复取回复时间，否则取创建时间
+    public_title = Column(String(200))  # 过滤后的标题
+    public_content = Column(Text)  # 过滤后的内容
+    public_reply = Column(Text)  # 过滤后的管理员回复
     
     # 复合索引：按产品、状态和创建时间排序
     __table_args__ = (
-        Index('idx_feedback_product_status', 'product_id', 'status'),
+        Index('idx_feedback_product_status_sort', 'product_id', 'status', 'sort_key'),
         Index('idx_feedback_type_created', 'feedback_type', 'created_at'),
         Index('idx_feedback_status_created', 'status', 'created_at'),
         Index('idx_feedback_rating_created', 'rating', 'created_at'),
+        Index('idx_feedback_product_created', 'product_id', 'created_at'),
+    )
+
+class ProductFeedbackSummary(Base):
+    """反馈的按产品汇总，由 feedback_summary 模块在反馈创建、更新、删除时增量维护"""
+    __tablename__ = "product_feedback_summary"
+    
+    id = Column(Integer, primary_key=True, index=True)
+    product_id = Column(Integer, ForeignKey('products.id', ondelete='CASCADE'), nullable=False)
+    feedback_type = Column(String(50), nullable=False)
+    status = Column(String(20), nullable=False)
+    count = Column(Integer, nullable=False, default=0)
+    rating_sum = Column(Integer, nullable=False, default=0)
+    rating_count = Column(Integer, nullable=False, default=0)
+    
+    # 唯一索引：每个产品的每种 (类型, 状态) 一行
+    __table_args__ = (
+        Index('idx_feedback_summary_key', 'product_id', 'feedback_type', 'status', unique=True),
     )
 
 class ProductAPIToken(Base):
@@ -204,13 +287,33 @@ class ProductAPICall(Base):
         Index('idx_api_call_endpoint_time', 'endpoint', 'timestamp'),
     )
 
+class ProductAPICallDaily(Base):
+    """API 调用的按天汇总，由数据保留任务在删除过期调用记录前写入"""
+    __tablename__ = "product_api_call_daily"
+    
+    id = Column(Integer, primary_key=True, index=True)
+    product_id = Column(Integer, ForeignKey('products.id', ondelete='CASCADE'), nullable=False)
+    day = Column(DateTime(timezone=True), nullable=False)  # 当天零点（UTC）
+    method = Column(String(10), nullable=False)
+    status_code = Column(Integer, nullable=False)
+    calls = Column(Integer, nullable=False, default=0)
+    response_time_sum = Column(Integer, nullable=False, default=0)  # 毫秒
+    request_bytes = Column(Integer, nullable=False, default=0)
+    response_bytes = Column(Integer, nullable=False, default=0)
+    
+    __table_args__ = (
+        Index('idx_api_call_daily_key', 'product_id', 'day', 'method', 'status_code', unique=True),
+    )
+
 class ProductDataStorage(Base):
     __tablename__ = "product_data_storage"
     
     id = Column(Integer, primary_key=True, index=True)
     product_id = Column(Integer, ForeignKey('products.id', ondelete='CASCADE'), nullable=False, index=True)
     storage_key = Column(String(255), nullable=False, index=True)
-    storage_value = Column(JSON)  # 存储JSON数据
+    storage_value = Column(JSON)  # 存储JSON数据（大值存为文件时为空）
+    blob_hash = Column(String(64))  # 大值文件的 SHA-256，见 services/data_blob_store.py
+    blob_encoding = Column(String(16))  # 大值文件编码：'raw', 'zlib'
     data_type = Column(String(50), default='json', index=True)  # 'json', 'text', 'binary'
     size_bytes = Column(Integer, default=0)
     is_encrypted = Column(Boolean, default=False)
@@ -219,10 +322,12 @@ class ProductDataStorage(Base):
     updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
     accessed_at = Column(DateTime(timezone=True))
     
-    # 复合索引：按产品和键排序
+    # 复合索引：每个产品的键唯一（批量写入按此索引 upsert）
     __table_args__ = (
-        Index('idx_data_storage_product_key', 'product_id', 'storage_key'),
+        Index('idx_data_storage_product_key', 'product_id', 'storage_key', unique=True),
         Index('idx_data_storage_type_size', 'data_type', 'size_bytes'),
+        Index('idx_data_storage_product_created', 'product_id', 'created_at'),
+        Index('idx_data_storage_blob_hash', 'blob_hash'),
     )
 
 class ProductUser(Base):
@@ -265,4 +370,27 @@ class ProductUserSession(Base):
         Index('idx_session_product_user', 'product_id', 'user_id'),
         Index('idx_session_expires', 'expires_at'),
         Index('idx_session_guest_expires', 'is_guest', 'expires_at'),
-    )
\ No newline at end of file
+    )
+
+class SystemCounter(Base):
+    """系统计数器，由 system_counters 模块创建的触发器增量维护"""
+    __tablename__ = "system_counters"
+    
+    name = Column(String(50), primary_key=True)
+    value = Column(Integer, nullable=False, default=0)
+    updated_at = Column(DateTime(timezone=True), server_default=func.now())
+
+# 全文索引：建表后创建 FTS5 索引表和同步触发器，删表前先删除
+event.listen(Base.metadata, "after_create", create_search_indexes)
+event.listen(Base.metadata, "before_drop", drop_search_indexes)
+
+# 系统计数器：建表后创建计数触发器并初始化，删表前先删除触发器
+event.listen(Base.metadata, "after_create", create_counter_triggers)
+event.listen(Base.metadata, "before_drop", drop_counter_triggers)
+
+# 反馈公开字段：写入和更新时计算过滤后的内容和排序键
+event.listen(ProductFeedback, "before_insert", sync_public_fields)
+event.listen(ProductFeedback, "before_update", sync_public_fields)
+
+# 反馈汇总：新建汇总表时用已有反馈初始化
+event.listen(Base.metadata, "after_create", seed_feedback_summary)
@@ -0,0 +1,118 @@
+"""
+游标（keyset）分页
+按 (排序列, id) 定位下一页：WHERE (排序列, id) < (上一页最后一行) ORDER BY 排序列, id LIMIT n，
+在 (product_id, 排序列) 复合索引上直接定位，深分页不再随 OFFSET 线性变慢。
+
+游标是不透明字符串（十六进制编码的 JSON），保存排序列在数据库中的原始存储值：
+SQLite 中同一时间列既有 CURRENT_TIMESTAMP 写入的「秒」格式，也有应用写入的「微秒」格式，
+用解析后的 datetime 重新绑定会与原值比较不等，导致同一行重复出现。
+"""
+
+import binascii
+import json
+from dataclasses import dataclass
+from typing import Any, List, Optional, Tuple
+
+from fastapi import HTTPException, status
+from sqlalchemy import String, and_, tuple_, type_coerce
+from sqlalchemy.orm import Query
+
+# 列表接口通过该响应头返回下一页游标（保持原有响应体结构不变）
+NEXT_CURSOR_HEADER = "X-Next-Cursor"
+
+
+@dataclass(frozen=True)
+class KeysetCursor:
+    """解码后的游标：上一页最后一行的排序列原始值和 id"""
+    key: str
+    value: Optional[str]
+    id: int
+
+
+def encode_cursor(key: str, value: Optional[str], row_id: int) -> str:
+    """编码游标（十六进制，不含 SQL 注入检测会拦截的字符）"""
+    payload = json.dumps([key, value, row_id], ensure_ascii=False, separators=(",", ":"))
+    return payload.encode("utf-8").hex()
+
+
+def decode_cursor(cursor: Optional[str], key: str) -> Optional[KeysetCursor]:
+    """
+    解码游标
+
+    Args:
+        cursor: 客户端传入的游标，为空时返回 None（使用偏移分页）
+        key: 接口的排序列，游标必须由同一排序列生成
+
+    Raises:
+        HTTPException: 游标格式错误或不属于该接口（400）
+    """
+    if not cursor:
+        return None
+    try:
+        cursor_key, value, row_id = json.loads(bytes.fromhex(cursor).decode("utf-8"))
+    except (ValueError, TypeError, UnicodeDecodeError, binascii.Error):
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="无效的分页游标")
+    if cursor_key != key or not isinstance(row_id, int) or not (value is None or isinstance(value, str)):
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="无效的分页游标")
+    return KeysetCursor(key=key, value=value, id=row_id)
+
+
+def _segments(descending: bool) -> List[bool]:
+    # 排序列为 NULL 的行在 SQLite 中升序排在最前、降序排在最后；True 表示非 NULL 段
+    return [True, False] if descending else [False, True]
+
+
+def keyset_page(query: Query, model_class, order_by: str, limit: int, skip: int = 0,
+                cursor: Optional[KeysetCursor] = None, descending: bool = True) -> Tuple[List[Any], Optional[str]]:
+    """
+    按 (order_by, id) 分页查询
+
+    没有游标时按 skip 偏移分页（兼容旧客户端）；两种方式都会返回下一页游标，
+    客户端可以从任何一页切换到游标分页。
+
+    Args:
+        query: 已加好过滤条件的 ORM 查询（原有排序会被替换）
+        model_class: 模型类（需有整数主键 id）
+        order_by: 排序列
+        limit: 每页数量
+        skip: 偏移量（仅在没有游标时使用）
+        cursor: 解码后的游标
+        descending: 是否降序
+
+    Returns:
+        (本页数据, 下一页游标)；已是最后一页时游标为 None
+    """
+    sort_column = getattr(model_class, order_by)
+    id_column = model_class.id
+    # 以字符串读出排序列的原始存储值，用于生成游标
+    raw_value = type_coerce(sort_column, String).label("cursor_value")
+    ordering = [sort_column.desc(), id_column.desc()] if descending else [sort_column.asc(), id_column.asc()]
+    base = query.order_by(None).add_columns(raw_value)
+
+    if cursor is None:
+        rows = base.order_by(*ordering).offset(max(skip, 0)).limit(limit).all()
+    else:
+        # 先取游标所在段中游标之后的行，不足一页时再从下一段开头补齐
+        rows = []
+        segments = _segments(descending)
+        start = segments.index(cursor.value is not None)
+        for position, non_null in enumerate(segments[start:]):
+            if non_null:
+                condition = sort_column.isnot(None)
+                if position == 0:
+                    cursor_key = tuple_(type_coerce(cursor.value, String), cursor.id)
+                    key = tuple_(sort_column, id_column)
+                    condition = key < cursor_key if descending else key > cursor_key
+            else:
+                condition = sort_column.is_(None)
+                if position == 0:
+                    condition = and_(condition, id_column < cursor.id if descending else id_column > cursor.id)
+            rows += base.filter(condition).order_by(*ordering).limit(limit - len(rows)).all()
+            if len(rows) >= limit:
+                break
+
+    items = [row[0] for row in rows]
+    next_cursor = None
+    if rows and len(rows) >= limit:
+        next_cursor = encode_cursor(order_by, rows[-1][-1], items[-1].id)
+    return items, next_cursor
@@ -9,6 +9,7 @@ from ..models import Session as SessionModel
 from ..schemas import LoginRequest, LoginResponse, MessageResponse
 from ..transaction import transactional, with_db_error_handling
 from ..config import settings
+from ..services.session_cache import session_cache
 import time
 import json
 
@@ -67,6 +68,7 @@ def login(login_data: LoginRequest, db: Session = Depends(get_db)):
     
     db.add(session)
     db.flush()  # 刷新但不提交
+    session_cache.set(session_id, session.user_id, expires_at)
     
     return LoginResponse(access_token=session_id)
 
@@ -78,6 +80,8 @@ def logout(
     db: Session = Depends(get_db)
 ):
     """管理员登出"""
+    # 先失效缓存，之后的请求都会回到数据库确认会话状态（失效的令牌不会被回填）
+    session_cache.invalidate(credentials.credentials)
     session = db.query(SessionModel).filter(
         SessionModel.id == credentials.credentials,
         SessionModel.is_active == True
@@ -89,14 +93,14 @@ def logout(
     
     return MessageResponse(message="登出成功")
 
-@router.get("/verify", response_model=MessageResponse)
-def verify_token(
-    credentials: HTTPAuthorizationCredentials = Depends(security),
-    db: Session = Depends(get_db)
-):
-    """验证登录状态"""
+def _authenticate(token: str, db: Session) -> str:
+    """校验访问令牌并返回 user_id：先查会话缓存，未命中时查库并回填缓存"""
+    user_id = session_cache.get(token)
+    if user_id is not None:
+        return user_id
+
     session = db.query(SessionModel).filter(
-        SessionModel.id == credentials.credentials,
+        SessionModel.id == token,
         SessionModel.is_active == True,
         SessionModel.expires_at > datetime.now(timezone.utc)
     ).first()
@@ -107,6 +111,16 @@ def verify_token(
             detail="无效的访问令牌"
         )
     
+    session_cache.set(token, session.user_id, session.expires_at)
+    return session.user_id
+
+@router.get("/verify", response_model=MessageResponse)
+def verify_token(
+    credentials: HTTPAuthorizationCredentials = Depends(security),
+    db: Session = Depends(get_db)
+):
+    """验证登录状态"""
+    _authenticate(credentials.credentials, db)
     return MessageResponse(message="令牌有效")
 
 # 认证依赖
@@ -115,16 +129,4 @@ def get_current_user(
     db: Session = Depends(get_db)
 ):
     """获取当前用户（认证中间件）"""
-    session = db.query(SessionModel).filter(
-        SessionModel.id == credentials.credentials,
-        SessionModel.is_active == True,
-        SessionModel.expires_at > datetime.now(timezone.utc)
-    ).first()
-    
-    if not session:
-        raise HTTPException(
-            status_code=status.HTTP_401_UNAUTHORIZED,
-            detail="无效的访问令牌"
-        )
-    
-    return session.user_id
\ No newline at end of file
+    return _authenticate(credentials.credentials, db)
\ No newline at end of file
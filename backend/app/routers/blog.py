@@ -1,47 +1,52 @@
 from fastapi import APIRouter, Depends, HTTPException, status
 from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
 from typing import List
 from datetime import datetime, timezone
 
-from ..database import get_db
+from ..database import get_db, get_async_db
 from ..models import Blog as BlogModel
 from ..schemas import Blog, BlogCreate, BlogUpdate, MessageResponse
 from ..transaction import transactional, with_db_error_handling
-from ..security import create_safe_query_executor, sql_injection_protection, validate_and_sanitize_input
+from ..security import (
+    create_safe_query_executor, create_async_safe_query_executor,
+    sql_injection_protection, validate_and_sanitize_input
+)
+from ..services.response_cache import cached_response, invalidates_response_cache
 from .auth import get_current_user
 
 router = APIRouter()
 
 @router.get("/", response_model=List[Blog])
+@cached_response("blog", List[Blog])
 @sql_injection_protection
-def get_blogs(
+async def get_blogs(
     skip: int = 0,
     limit: int = 100,
     published_only: bool = True,
     search: str = None,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """获取博客列表（公开接口）"""
-    safe_executor = create_safe_query_executor(db)
+    safe_executor = create_async_safe_query_executor(db)
     
     filters = {}
     if published_only:
         filters['is_published'] = True
     
     if search:
-        # 使用安全搜索
-        blogs = safe_executor.safe_search_query(
+        # 使用安全搜索（发布状态在 SQL 中过滤）
+        blogs = await safe_executor.safe_search_query(
             BlogModel, 
             ['title', 'content', 'summary'], 
             search, 
-            limit=min(limit, 100)
+            filters=filters,
+            limit=min(limit, 100),
+            offset=max(skip, 0)
         )
-        # 如果需要过滤已发布状态，再次过滤
-        if published_only:
-            blogs = [blog for blog in blogs if blog.is_published]
     else:
         # 使用安全过滤查询
-        blogs = safe_executor.safe_filter_query(
+        blogs = await safe_executor.safe_filter_query(
             BlogModel,
             filters,
             limit=min(limit, 100),
@@ -68,6 +73,7 @@ def get_blog(blog_id: int, db: Session = Depends(get_db)):
     return blog
 
 @router.post("/", response_model=Blog)
+@invalidates_response_cache("blog")
 @transactional(rollback_on_exception=True, max_retries=2)
 @with_db_error_handling
 def create_blog(
@@ -89,6 +95,7 @@ def create_blog(
     return blog
 
 @router.put("/{blog_id}", response_model=Blog)
+@invalidates_response_cache("blog", id_param="blog_id")
 @transactional(rollback_on_exception=True, max_retries=2)
 @with_db_error_handling
 def update_blog(
@@ -121,6 +128,7 @@ def update_blog(
     return blog
 
 @router.delete("/{blog_id}", response_model=MessageResponse)
+@invalidates_response_cache("blog", id_param="blog_id")
 @transactional(rollback_on_exception=True, max_retries=2)
 @with_db_error_handling
 def delete_blog(
@@ -1,42 +1,49 @@
 from fastapi import APIRouter, Depends, HTTPException, status
 from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
 from typing import List
 
-from ..database import get_db
+from ..database import get_db, get_async_db
 from ..models import Portfolio as PortfolioModel
 from ..schemas import Portfolio, PortfolioCreate, PortfolioUpdate, MessageResponse
 from ..transaction import transactional, with_db_error_handling
-from ..security import create_safe_query_executor, sql_injection_protection, validate_and_sanitize_input
+from ..security import (
+    create_safe_query_executor, create_async_safe_query_executor,
+    sql_injection_protection, validate_and_sanitize_input
+)
 from ..error_handlers import (
     ResourceNotFoundAPIError, ValidationAPIError, create_success_response, 
     create_paginated_response
 )
+from ..services.response_cache import cached_response, invalidates_response_cache
 from .auth import get_current_user
 
 router = APIRouter()
 
 @router.get("/", response_model=List[Portfolio])
+@cached_response("portfolio", List[Portfolio])
 @sql_injection_protection
-def get_portfolios(
+async def get_portfolios(
     skip: int = 0,
     limit: int = 100,
     search: str = None,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """获取作品列表（公开接口）"""
-    safe_executor = create_safe_query_executor(db)
+    safe_executor = create_async_safe_query_executor(db)
     
     if search:
         # 使用安全搜索
-        portfolios = safe_executor.safe_search_query(
+        portfolios = await safe_executor.safe_search_query(
             PortfolioModel, 
             ['title', 'description'], 
             search, 
-            limit=min(limit, 100)
+            limit=min(limit, 100),
+            offset=max(skip, 0)
         )
     else:
         # 使用安全过滤查询
-        portfolios = safe_executor.safe_filter_query(
+        portfolios = await safe_executor.safe_filter_query(
             PortfolioModel,
             {},
             limit=min(limit, 100),
@@ -60,6 +67,7 @@ def get_portfolio(portfolio_id: int, db: Session = Depends(get_db)):
     return portfolio
 
 @router.post("/", response_model=Portfolio)
+@invalidates_response_cache("portfolio")
 @transactional(rollback_on_exception=True, max_retries=2)
 @with_db_error_handling
 @sql_injection_protection
@@ -79,6 +87,7 @@ def create_portfolio(
     return portfolio
 
 @router.put("/{portfolio_id}", response_model=Portfolio)
+@invalidates_response_cache("portfolio", id_param="portfolio_id")
 @transactional(rollback_on_exception=True, max_retries=2)
 @with_db_error_handling
 @sql_injection_protection
@@ -107,6 +116,7 @@ def update_portfolio(
     return portfolio
 
 @router.delete("/{portfolio_id}", response_model=MessageResponse)
+@invalidates_response_cache("portfolio", id_param="portfolio_id")
 @transactional(rollback_on_exception=True, max_retries=2)
 @with_db_error_handling
 @sql_injection_protection
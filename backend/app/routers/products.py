@@ -1,21 +1,27 @@
-from fastapi import APIRouter, Depends, HTTPException, status, UploadFile, File, Request
+from fastapi import APIRouter, Depends, HTTPException, status, UploadFile, File, Request, Response
 from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import func, desc
+from pydantic import ValidationError
 from typing import List, Optional
+import asyncio
 import os
 import tempfile
 import shutil
 import secrets
 import logging
+import json
+import math
 from pathlib import Path
 
-from ..database import get_db
+from ..config import settings
+from ..database import get_db, get_async_db, read_only, writes_on_read
 from ..models import (
     Product as ProductModel, ProductStats as ProductStatsModel, 
     ProductLog as ProductLogModel, ProductFeedback as ProductFeedbackModel,
     ProductAPIToken as ProductAPITokenModel, ProductAPICall as ProductAPICallModel,
     ProductDataStorage as ProductDataStorageModel, ProductUser as ProductUserModel,
-    ProductUserSession as ProductUserSessionModel
+    ProductUserSession as ProductUserSessionModel, RollupWatermark
 )
 from ..schemas import (
     ExtensionInstallRequest,
@@ -23,21 +29,39 @@ from ..schemas import (
     Product, ProductCreate, ProductUpdate, ProductStats, ProductStatsCreate,
     ProductLog, ProductLogCreate, ProductUploadResponse, ProductAnalytics, MessageResponse,
     ProductFeedback, ProductFeedbackCreate, ProductFeedbackUpdate, ProductFeedbackStats,
-    ProductFeedbackPublic
+    ProductFeedbackPublic, ProductFeedbackSummary, ProductDataBatchKeys, ProductDataBatchPut
 )
 from fastapi import Form
+from fastapi.responses import StreamingResponse
 from datetime import datetime, timezone
 from ..transaction import transactional, with_db_error_handling
 from ..security import (
-    create_safe_query_executor, sql_injection_protection, validate_and_sanitize_input,
-    validate_extension_name, validate_extension_path
+    create_safe_query_executor, create_async_safe_query_executor,
+    sql_injection_protection, validate_and_sanitize_input, validate_extension_name, validate_extension_path
 )
 from ..error_handlers import (
     ResourceNotFoundAPIError, ValidationAPIError, create_success_response, 
     create_paginated_response
 )
+from ..pagination import NEXT_CURSOR_HEADER, decode_cursor
+from ..system_counters import read_counters
+from ..feedback_content import filter_sensitive_content, public_view
+from ..feedback_summary import read_summaries, record_feedback_change, snapshot
 from ..services import product_file_service
 from ..services.product_extension_service import product_extension_service
+from ..services.db_writer_service import db_writer_service, WriteQueueFullError
+from ..services.response_cache import response_cache, cached_response, invalidates_response_cache
+from ..services.expiry_sweeper import expiry_sweeper
+from ..services.api_token_cache import CachedApiToken, api_token_cache, token_usage_recorder
+from ..services.data_access_recorder import data_access_recorder
+from ..services.data_blob_store import data_blob_collector, data_blob_store
+from ..services.analytics_rollup import STATS_SOURCE, resolve_range, stats_rollup_job, summarize_stats
+from ..services.telemetry_buffer import TelemetryBufferFullError, telemetry_buffer
+from ..services.retention import retention_job, table_report
+from ..services.product_data_store import (
+    DATA_QUOTA_BYTES, DataQuotaExceededError, access_stats, delete_many, get_many, json_with_value, load_value,
+    put_many, storage_fields, value_bytes
+)
 from .auth import get_current_user
 
 logger = logging.getLogger(__name__)
@@ -77,17 +101,18 @@ def list_extensions(
         )
 
 @router.get("/", response_model=List[Product])
+@cached_response("products", List[Product])
 @sql_injection_protection
-def get_products(
+async def get_products(
     skip: int = 0,
     limit: int = 100,
     search: str = None,
     product_type: str = None,
     published_only: bool = True,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """获取产品列表（公开接口）"""
-    safe_executor = create_safe_query_executor(db)
+    safe_executor = create_async_safe_query_executor(db)
     
     # 构建过滤条件
     filters = {}
@@ -98,16 +123,17 @@ def get_products(
     
     if search:
         # 使用安全搜索
-        products = safe_executor.safe_search_query(
+        products = await safe_executor.safe_search_query(
             ProductModel, 
             ['title', 'description'], 
             search, 
             filters=filters,
-            limit=min(limit, 100)
+            limit=min(limit, 100),
+            offset=max(skip, 0)
         )
     else:
         # 使用安全过滤查询
-        products = safe_executor.safe_filter_query(
+        products = await safe_executor.safe_filter_query(
             ProductModel,
             filters,
             limit=min(limit, 100),
@@ -118,12 +144,13 @@ def get_products(
     return products
 
 @router.get("/{product_id}", response_model=Product)
+@cached_response("products", Product, id_param="product_id")
 @sql_injection_protection
-def get_product(product_id: int, db: Session = Depends(get_db)):
+async def get_product(product_id: int, db: AsyncSession = Depends(get_async_db)):
     """获取单个产品详情（公开接口）"""
-    safe_executor = create_safe_query_executor(db)
+    safe_executor = create_async_safe_query_executor(db)
     
-    product = safe_executor.safe_get_by_id(ProductModel, product_id)
+    product = await safe_executor.safe_get_by_id(ProductModel, product_id)
     
     if not product:
         raise ResourceNotFoundAPIError("产品", product_id)
@@ -136,6 +163,7 @@ def get_product(product_id: int, db: Session = Depends(get_db)):
     return product
 
 @router.post("/", response_model=Product)
+@invalidates_response_cache("products")
 @with_db_error_handling
 @sql_injection_protection
 def create_product(
@@ -172,6 +200,7 @@ def create_product(
         raise e
 
 @router.put("/{product_id}", response_model=Product)
+@invalidates_response_cache("products", id_param="product_id")
 @transactional(rollback_on_exception=True, max_retries=2)
 @with_db_error_handling
 @sql_injection_protection
@@ -200,6 +229,7 @@ def update_product(
     return product
 
 @router.delete("/{product_id}", response_model=MessageResponse)
+@invalidates_response_cache("products", id_param="product_id")
 @transactional(rollback_on_exception=True, max_retries=2)
 @with_db_error_handling
 @sql_injection_protection
@@ -225,6 +255,7 @@ def delete_product(
     return MessageResponse(message="产品删除成功")
 
 @router.post("/{product_id}/upload", response_model=ProductUploadResponse)
+@invalidates_response_cache("products", id_param="product_id")
 @transactional(rollback_on_exception=True, max_retries=2)
 @with_db_error_handling
 def upload_product_files(
@@ -330,16 +361,29 @@ def get_product_files(
     
     return product_file_service.get_product_files(product_id)
 
+def _missing_launch_file(product_id: int, entry_file: str) -> Optional[str]:
+    """检查产品目录和入口文件，缺失时返回错误说明，否则返回None"""
+    # 使用基于ID的固定路径（不再依赖数据库中的file_path）
+    product_dir = product_file_service.get_product_directory(product_id)
+    if not product_dir.exists():
+        return "产品文件不存在"
+    
+    # 检查入口文件是否存在
+    if not (product_dir / entry_file).exists():
+        return f"入口文件不存在: {entry_file}"
+    
+    return None
+
 @router.get("/{product_id}/launch")
 @sql_injection_protection
-def launch_product(
+async def launch_product(
     product_id: int,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """启动产品应用（公开接口）"""
-    safe_executor = create_safe_query_executor(db)
+    safe_executor = create_async_safe_query_executor(db)
     
-    product = safe_executor.safe_get_by_id(ProductModel, product_id)
+    product = await safe_executor.safe_get_by_id(ProductModel, product_id)
     
     if not product:
         raise ResourceNotFoundAPIError("产品", product_id)
@@ -350,20 +394,12 @@ def launch_product(
             detail="产品未发布"
         )
     
-    # 使用基于ID的固定路径（不再依赖数据库中的file_path）
-    product_dir = product_file_service.get_product_directory(product_id)
-    if not product_dir.exists():
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail="产品文件不存在"
-        )
-    
-    # 检查入口文件是否存在
-    entry_file_path = product_dir / product.entry_file
-    if not entry_file_path.exists():
+    # 文件检查是阻塞的磁盘 IO，放到线程里执行，不占用事件循环
+    missing = await asyncio.to_thread(_missing_launch_file, product_id, product.entry_file)
+    if missing:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
-            detail=f"入口文件不存在: {product.entry_file}"
+            detail=missing
         )
     
     return {
@@ -377,11 +413,13 @@ def launch_product(
 @sql_injection_protection
 def get_product_stats(
     product_id: int,
+    response: Response,
     skip: int = 0,
     limit: int = 100,
+    cursor: Optional[str] = None,
     db: Session = Depends(get_db)
 ):
-    """获取产品统计数据（公开接口）"""
+    """获取产品统计数据（公开接口），传入 cursor 时按游标分页，skip 被忽略"""
     safe_executor = create_safe_query_executor(db)
     
     product = safe_executor.safe_get_by_id(ProductModel, product_id)
@@ -389,29 +427,29 @@ def get_product_stats(
     if not product:
         raise ResourceNotFoundAPIError("产品", product_id)
     
+    position = decode_cursor(cursor, "access_time")
+    
     try:
-        # 查询统计数据（分页）
-        stats_query = db.query(ProductStatsModel).filter(
-            ProductStatsModel.product_id == product_id
-        ).order_by(ProductStatsModel.access_time.desc())
-        
-        total = stats_query.count()
-        stats = stats_query.offset(max(skip, 0)).limit(min(limit, 100)).all()
-        
-        # 计算汇总统计（使用聚合查询提高性能）
-        summary_query = db.query(
-            func.count(ProductStatsModel.id).label('total_visits'),
-            func.count(func.distinct(ProductStatsModel.visitor_ip)).label('unique_visitors'),
-            func.avg(ProductStatsModel.duration_seconds).label('average_duration'),
-            func.max(ProductStatsModel.access_time).label('last_access')
-        ).filter(
-            ProductStatsModel.product_id == product_id
-        ).first()
+        # 查询统计数据（分页，最新的在前）
+        stats, next_cursor = safe_executor.safe_keyset_query(
+            ProductStatsModel,
+            {"product_id": product_id},
+            order_by="access_time",
+            limit=min(limit, 100),
+            offset=max(skip, 0),
+            cursor=position
+        )
+        if next_cursor:
+            response.headers[NEXT_CURSOR_HEADER] = next_cursor
+        
+        # 汇总统计读取小时汇总表和尚未汇总的新记录
+        summary = summarize_stats(db, product_id)
         
-        total_visits = summary_query.total_visits or 0
-        unique_visitors = summary_query.unique_visitors or 0
-        average_duration = float(summary_query.average_duration) if summary_query.average_duration else 0.0
-        last_access = summary_query.last_access
+        # 总数与汇总中的访问次数相同，不再单独 count()
+        total_visits = summary.total_visits
+        unique_visitors = summary.unique_visitors
+        average_duration = summary.average_duration
+        last_access = summary.last_access
         
         return {
             "product_id": product_id,
@@ -433,9 +471,12 @@ def get_product_stats(
             "pagination": {
                 "skip": skip,
                 "limit": limit,
-                "total": total
+                "total": total_visits,
+                "next_cursor": next_cursor
             }
         }
+    except HTTPException:
+        raise
     except Exception as e:
         import traceback
         logger.error(f"获取产品统计数据失败: {str(e)}\n{traceback.format_exc()}")
@@ -444,29 +485,13 @@ def get_product_stats(
             detail=f"获取统计数据失败: {str(e)}"
         )
 
-@router.post("/{product_id}/stats", response_model=ProductStats)
-@transactional(rollback_on_exception=True, max_retries=2)
-@with_db_error_handling
-def record_product_stats(
-    product_id: int,
-    stats_data: ProductStatsCreate,
-    db: Session = Depends(get_db)
-):
-    """记录产品使用统计（公开接口）"""
-    safe_executor = create_safe_query_executor(db)
-    
-    product = safe_executor.safe_get_by_id(ProductModel, product_id)
-    
-    if not product:
-        raise ResourceNotFoundAPIError("产品", product_id)
-    
+def _prepare_stats_row(product_id: int, stats_dict: dict) -> dict:
+    """清理客户端上报的访问统计（单条和批量上报共用）"""
     # 对于统计数据，使用更宽松的验证策略
     # 因为统计数据通常来自客户端，包含用户代理、referrer等信息，这些可能包含特殊字符
-    stats_dict = stats_data.dict()
-    
     # 直接使用原始数据，只对关键字段进行基本验证
     safe_data = {
-        'product_id': product_id,  # 从URL参数获取，确保安全
+        'product_id': product_id,  # 由调用方给出（URL 参数或已校验的事件字段）
         'visitor_ip': stats_dict.get('visitor_ip', '')[:45] if stats_dict.get('visitor_ip') else None,  # 限制长度
         'session_id': stats_dict.get('session_id', '')[:100] if stats_dict.get('session_id') else None,  # 限制长度
         'duration_seconds': stats_dict.get('duration_seconds', 0) or 0,  # 确保是整数
@@ -474,9 +499,6 @@ def record_product_stats(
         'referrer': stats_dict.get('referrer', '')[:500] if stats_dict.get('referrer') else None,  # 限制长度
     }
     
-    # 如果没有提供 access_time，在 Python 端设置
-    safe_data['access_time'] = datetime.now(timezone.utc)
-    
     # 确保 duration_seconds 是有效的整数
     try:
         safe_data['duration_seconds'] = int(safe_data['duration_seconds'])
@@ -485,35 +507,55 @@ def record_product_stats(
     except (ValueError, TypeError):
         safe_data['duration_seconds'] = 0
     
-    try:
-        stats = ProductStatsModel(**safe_data)
-    except Exception as e:
-        import traceback
-        error_traceback = traceback.format_exc()
-        logger.error(f"创建ProductStatsModel失败: {str(e)}\n数据: {safe_data}\n{error_traceback}")
-        raise HTTPException(
-            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-            detail=f"创建统计数据失败: {str(e)}"
-        )
+    return safe_data
+
+def _insert_product_stats(db: Session, product_id: int, safe_data: dict):
+    """写入访问统计（在写线程中执行）"""
+    product = db.query(ProductModel.id).filter(ProductModel.id == product_id).first()
+    if not product:
+        raise ResourceNotFoundAPIError("产品", product_id)
+    
+    stats = ProductStatsModel(**safe_data)
     db.add(stats)
-    # 使用 flush() 将更改发送到数据库并生成 ID，但不提交事务
-    # @transactional 装饰器会在函数返回后自动提交事务
-    db.flush()
+    return stats
+
+@router.post("/{product_id}/stats", response_model=ProductStats)
+async def record_product_stats(
+    product_id: int,
+    stats_data: ProductStatsCreate
+):
+    """记录产品使用统计（公开接口）"""
+    safe_data = _prepare_stats_row(product_id, stats_data.dict())
     
-    # 注意：不要使用 db.refresh()，因为可能与事务装饰器的提交时机冲突
-    # flush() 后对象已经包含了生成的 ID 和我们设置的 access_time
-    # 这样就不需要从数据库刷新了
+    # 如果没有提供 access_time，在 Python 端设置
+    safe_data['access_time'] = datetime.now(timezone.utc)
     
-    return stats
+    # 交给单写者队列批量提交，等待提交完成后返回（flush 后对象已包含生成的 ID）
+    try:
+        return await db_writer_service.execute(_insert_product_stats, product_id, safe_data)
+    except WriteQueueFullError:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="写入队列繁忙，请稍后重试"
+        )
 
 @router.get("/{product_id}/analytics", response_model=ProductAnalytics)
 @sql_injection_protection
 def get_product_analytics(
     product_id: int,
+    range: str = "all",
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
     db: Session = Depends(get_db),
     current_user: str = Depends(get_current_user)
 ):
-    """获取产品分析数据（需要认证）"""
+    """
+    获取产品分析数据（需要认证）
+    
+    range 可选 24h / 7d / 30d / all / custom（custom 需提供 start，end 默认当前时间），
+    范围按小时对齐，数据来自小时汇总表。独立访客数在 512 人以内精确，
+    超过后为 HyperLogLog 估计值，相对标准误差约 1.6%（见 services/visitor_sketch.py）。
+    """
     safe_executor = create_safe_query_executor(db)
     
     product = safe_executor.safe_get_by_id(ProductModel, product_id)
@@ -521,89 +563,125 @@ def get_product_analytics(
     if not product:
         raise ResourceNotFoundAPIError("产品", product_id)
     
-    # 查询统计数据
-    stats = db.query(ProductStatsModel).filter(
-        ProductStatsModel.product_id == product_id
-    ).all()
-    
-    if not stats:
-        return ProductAnalytics(
-            product_id=product_id,
-            total_visits=0,
-            unique_visitors=0,
-            average_duration=0.0,
-            last_access=None,
-            popular_times=[]
-        )
+    try:
+        range_start, range_end = resolve_range(range, start, end)
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
     
-    # 计算分析数据
-    total_visits = len(stats)
-    unique_visitors = len(set(s.visitor_ip for s in stats if s.visitor_ip))
-    average_duration = sum(s.duration_seconds for s in stats) / total_visits if total_visits > 0 else 0
-    # 过滤掉access_time为None的记录
-    stats_with_time = [s for s in stats if s.access_time is not None]
-    last_access = max(s.access_time for s in stats_with_time) if stats_with_time else None
-    
-    # 简单的热门时间分析（按小时）
-    popular_times = []
-    hour_counts = {}
-    for stat in stats:
-        if stat.access_time:  # 检查access_time是否为None
-            hour = stat.access_time.hour
-            hour_counts[hour] = hour_counts.get(hour, 0) + 1
-    
-    for hour, count in sorted(hour_counts.items()):
-        popular_times.append({
-            "hour": hour,
-            "visits": count
-        })
+    summary = summarize_stats(db, product_id, range_start, range_end)
     
     return ProductAnalytics(
         product_id=product_id,
-        total_visits=total_visits,
-        unique_visitors=unique_visitors,
-        average_duration=average_duration,
-        last_access=last_access,
-        popular_times=popular_times
+        total_visits=summary.total_visits,
+        unique_visitors=summary.unique_visitors,
+        average_duration=summary.average_duration,
+        last_access=summary.last_access,
+        popular_times=summary.popular_times,
+        range_start=range_start,
+        range_end=range_end
     )
 
-@router.post("/{product_id}/logs", response_model=ProductLog)
-@transactional(rollback_on_exception=True, max_retries=2)
-@with_db_error_handling
-def create_product_log(
-    product_id: int,
-    log_data: ProductLogCreate,
-    db: Session = Depends(get_db)
-):
-    """创建产品日志（公开接口）"""
-    safe_executor = create_safe_query_executor(db)
-    
-    product = safe_executor.safe_get_by_id(ProductModel, product_id)
-    
+def _insert_product_log(db: Session, product_id: int, safe_data: dict):
+    """写入产品日志（在写线程中执行）"""
+    product = db.query(ProductModel.id).filter(ProductModel.id == product_id).first()
     if not product:
         raise ResourceNotFoundAPIError("产品", product_id)
     
-    # 验证和清理日志数据
-    safe_data = validate_and_sanitize_input(log_data.dict())
-    
     log = ProductLogModel(**safe_data)
     db.add(log)
     db.flush()
     db.refresh(log)
     return log
 
+@router.post("/{product_id}/logs", response_model=ProductLog)
+async def create_product_log(
+    product_id: int,
+    log_data: ProductLogCreate
+):
+    """创建产品日志（公开接口）"""
+    # 验证和清理日志数据
+    safe_data = validate_and_sanitize_input(log_data.dict())
+    
+    try:
+        return await db_writer_service.execute(_insert_product_log, product_id, safe_data)
+    except WriteQueueFullError:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="写入队列繁忙，请稍后重试"
+        )
+
+@router.post("/telemetry/batch", status_code=status.HTTP_202_ACCEPTED)
+async def ingest_telemetry_batch(request: Request):
+    """
+    批量上报访问统计和日志（公开接口）
+    
+    请求体为 {"stats": [...], "logs": [...]}，每个事件带 product_id，
+    也接受 navigator.sendBeacon 发送的 text/plain 请求体。
+    事件进入写缓冲区后立即返回 202；单个事件校验失败只跳过该事件，缓冲区已满时返回 429。
+    """
+    try:
+        payload = json.loads(await request.body())
+    except (ValueError, UnicodeDecodeError):
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="请求体不是有效的 JSON")
+    if not isinstance(payload, dict):
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="请求体必须是 JSON 对象")
+    
+    raw_stats = payload.get("stats", [])
+    raw_logs = payload.get("logs", [])
+    if not isinstance(raw_stats, list) or not isinstance(raw_logs, list):
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="stats 和 logs 必须是数组")
+    if len(raw_stats) + len(raw_logs) > settings.TELEMETRY_BATCH_MAX_EVENTS:
+        raise HTTPException(
+            status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+            detail=f"单次最多上报 {settings.TELEMETRY_BATCH_MAX_EVENTS} 个事件"
+        )
+    
+    # 同一批事件使用同一个接收时间，写入延迟不影响事件时间
+    received_at = datetime.now(timezone.utc)
+    stats, logs, rejected = [], [], 0
+    for event in raw_stats:
+        try:
+            stats_data = ProductStatsCreate(**event)
+        except (ValidationError, TypeError):
+            rejected += 1
+            continue
+        safe_data = _prepare_stats_row(stats_data.product_id, stats_data.dict())
+        safe_data['access_time'] = received_at
+        stats.append(safe_data)
+    for event in raw_logs:
+        try:
+            safe_data = validate_and_sanitize_input(ProductLogCreate(**event).dict())
+        except (ValidationError, TypeError, HTTPException):
+            rejected += 1
+            continue
+        safe_data['timestamp'] = received_at
+        logs.append(safe_data)
+    
+    try:
+        accepted = telemetry_buffer.add(stats, logs)
+    except TelemetryBufferFullError:
+        raise HTTPException(
+            status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+            detail="遥测缓冲区已满，请稍后重试",
+            headers={"Retry-After": str(max(math.ceil(telemetry_buffer.flush_interval), 1))}
+        )
+    
+    return {"accepted": accepted, "rejected": rejected}
+
 @router.get("/{product_id}/logs")
 @sql_injection_protection
 def get_product_logs(
     product_id: int,
+    response: Response,
     log_type: Optional[str] = None,
     log_level: Optional[str] = None,
     skip: int = 0,
     limit: int = 100,
+    cursor: Optional[str] = None,
     db: Session = Depends(get_db),
     current_user: str = Depends(get_current_user)
 ):
-    """获取产品日志（需要认证）"""
+    """获取产品日志（需要认证），下一页游标在 X-Next-Cursor 响应头中"""
     safe_executor = create_safe_query_executor(db)
     
     product = safe_executor.safe_get_by_id(ProductModel, product_id)
@@ -618,13 +696,17 @@ def get_product_logs(
     if log_level:
         filters["log_level"] = log_level
     
-    logs = safe_executor.safe_filter_query(
+    logs, next_cursor = safe_executor.safe_keyset_query(
         ProductLogModel,
         filters,
+        order_by='timestamp',
         limit=min(limit, 100),
         offset=max(skip, 0),
-        order_by='timestamp'
+        cursor=decode_cursor(cursor, 'timestamp'),
+        descending=False
     )
+    if next_cursor:
+        response.headers[NEXT_CURSOR_HEADER] = next_cursor
     
     return logs
 
@@ -670,13 +752,15 @@ def get_storage_stats(
 @sql_injection_protection
 def get_product_errors(
     product_id: int,
+    response: Response,
     severity: Optional[str] = None,
     skip: int = 0,
     limit: int = 100,
+    cursor: Optional[str] = None,
     db: Session = Depends(get_db),
     current_user: str = Depends(get_current_user)
 ):
-    """获取产品错误日志（需要认证）"""
+    """获取产品错误日志（需要认证），下一页游标在 X-Next-Cursor 响应头中"""
     safe_executor = create_safe_query_executor(db)
     
     product = safe_executor.safe_get_by_id(ProductModel, product_id)
@@ -692,16 +776,17 @@ def get_product_errors(
     if severity:
         filters["log_level"] = severity
     
-    # 使用原生查询以确保正确的排序（降序，最新的在前）
-    query = db.query(ProductLogModel).filter(
-        ProductLogModel.product_id == product_id,
-        ProductLogModel.log_type == "error"
+    # 降序，最新的在前
+    errors, next_cursor = safe_executor.safe_keyset_query(
+        ProductLogModel,
+        filters,
+        order_by='timestamp',
+        limit=min(limit, 100),
+        offset=max(skip, 0),
+        cursor=decode_cursor(cursor, 'timestamp')
     )
-    
-    if severity:
-        query = query.filter(ProductLogModel.log_level == severity)
-    
-    errors = query.order_by(desc(ProductLogModel.timestamp)).offset(max(skip, 0)).limit(min(limit, 100)).all()
+    if next_cursor:
+        response.headers[NEXT_CURSOR_HEADER] = next_cursor
     
     return errors
 
@@ -710,12 +795,14 @@ def get_product_errors(
 @sql_injection_protection
 def get_product_performance(
     product_id: int,
+    response: Response,
     skip: int = 0,
     limit: int = 100,
+    cursor: Optional[str] = None,
     db: Session = Depends(get_db),
     current_user: str = Depends(get_current_user)
 ):
-    """获取产品性能数据（需要认证）"""
+    """获取产品性能数据（需要认证），下一页游标在 X-Next-Cursor 响应头中"""
     safe_executor = create_safe_query_executor(db)
     
     product = safe_executor.safe_get_by_id(ProductModel, product_id)
@@ -723,11 +810,17 @@ def get_product_performance(
     if not product:
         raise ResourceNotFoundAPIError("产品", product_id)
     
-    # 使用原生查询以确保正确的排序（降序，最新的在前）
-    performance_logs = db.query(ProductLogModel).filter(
-        ProductLogModel.product_id == product_id,
-        ProductLogModel.log_type == "performance"
-    ).order_by(desc(ProductLogModel.timestamp)).offset(max(skip, 0)).limit(min(limit, 100)).all()
+    # 降序，最新的在前
+    performance_logs, next_cursor = safe_executor.safe_keyset_query(
+        ProductLogModel,
+        {"product_id": product_id, "log_type": "performance"},
+        order_by='timestamp',
+        limit=min(limit, 100),
+        offset=max(skip, 0),
+        cursor=decode_cursor(cursor, 'timestamp')
+    )
+    if next_cursor:
+        response.headers[NEXT_CURSOR_HEADER] = next_cursor
     
     return performance_logs
 
@@ -790,37 +883,144 @@ def run_product_diagnostic(
 @router.get("/monitoring/system-status")
 @sql_injection_protection
 def get_system_status(
+    refresh_storage: bool = False,
     current_user: str = Depends(get_current_user),
     db: Session = Depends(get_db)
 ):
-    """获取系统整体状态（需要认证）"""
-    # 获取产品统计
-    total_products = db.query(ProductModel).count()
-    published_products = db.query(ProductModel).filter(ProductModel.is_published == True).count()
-    
-    # 获取最近的错误日志
-    recent_errors = db.query(ProductLogModel).filter(
-        ProductLogModel.log_type == "error"
-    ).order_by(ProductLogModel.timestamp.desc()).limit(10).all()
+    """
+    获取系统整体状态（需要认证）
     
-    # 计算错误率（简化版本）
-    total_logs = db.query(ProductLogModel).count()
-    error_count = len(recent_errors)
+    产品数和日志数读取触发器维护的计数器（与原表同一事务更新，始终准确）；
+    存储占用由文件写入操作增量维护，refresh_storage=true 时重新全量扫描。
+    freshness 给出每个数字的最近变化时间和可能滞后的秒数。
+    """
+    counters = read_counters(db)
+    total_products, products_updated = counters["products_total"]
+    published_products, published_updated = counters["products_published"]
+    total_logs, logs_updated = counters["product_logs_total"]
+    error_logs, errors_updated = counters["product_logs_error"]
+    
+    # 计算错误率（简化版本：与原来一样只计最近的 10 条错误日志）
+    error_count = min(error_logs, 10)
     error_rate = (error_count / total_logs * 100) if total_logs > 0 else 0
     
+    storage = product_file_service.get_storage_stats(refresh=refresh_storage)
+    scanned_at = datetime.fromisoformat(storage["scanned_at"])
+    now = datetime.now(timezone.utc)
+    
+    def counter_freshness(updated_at):
+        return {
+            "updated_at": updated_at.replace(tzinfo=timezone.utc).isoformat() if updated_at else None,
+            "stale_seconds": 0
+        }
+    
     return {
-        "timestamp": "2024-01-01T00:00:00Z",
+        "timestamp": now.isoformat(),
         "overall_status": "good" if error_rate < 5 else "warning" if error_rate < 10 else "critical",
         "metrics": {
             "total_products": total_products,
             "published_products": published_products,
             "error_rate": round(error_rate, 2),
-            "recent_errors": len(recent_errors)
+            "recent_errors": error_count
         },
-        "storage": product_file_service.get_storage_stats()
+        "storage": storage,
+        "freshness": {
+            "total_products": counter_freshness(products_updated),
+            "published_products": counter_freshness(published_updated),
+            "error_rate": counter_freshness(max(filter(None, (logs_updated, errors_updated)), default=None)),
+            "recent_errors": counter_freshness(errors_updated),
+            # 绕过文件服务的改动（如命令行脚本）最多滞后到上次全量扫描
+            "storage": {
+                "updated_at": storage["updated_at"],
+                "stale_seconds": round((now - scanned_at).total_seconds(), 3)
+            }
+        }
+    }
+
+@router.get("/monitoring/write-queue")
+def get_write_queue_metrics(
+    current_user: str = Depends(get_current_user)
+):
+    """获取单写者队列的深度和批量提交统计（需要认证）"""
+    return db_writer_service.get_metrics()
+
+@router.get("/monitoring/response-cache")
+def get_response_cache_metrics(
+    current_user: str = Depends(get_current_user)
+):
+    """获取公开接口响应缓存的命中、未命中和淘汰统计（需要认证）"""
+    return response_cache.get_metrics()
+
+@router.get("/monitoring/expiry-sweeper")
+def get_expiry_sweeper_metrics(
+    current_user: str = Depends(get_current_user)
+):
+    """获取过期数据清理的运行次数和回收行数（需要认证）"""
+    return expiry_sweeper.get_metrics()
+
+@router.get("/monitoring/retention")
+def get_retention_report(
+    current_user: str = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    """获取各表行数、占用空间和数据保留任务的累计删除、归档、回收字节数（需要认证）"""
+    return {
+        **retention_job.get_metrics(),
+        "tables": table_report(db, retention_job.policies)
     }
 
+@router.get("/monitoring/telemetry")
+def get_telemetry_buffer_metrics(
+    current_user: str = Depends(get_current_user)
+):
+    """获取遥测缓冲区占用和批量写入统计（需要认证）"""
+    return telemetry_buffer.get_metrics()
+
+@router.get("/monitoring/analytics-rollup")
+def get_analytics_rollup_metrics(
+    current_user: str = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    """获取访问统计汇总任务的运行情况和水位线（需要认证）"""
+    watermark = db.get(RollupWatermark, STATS_SOURCE)
+    return {
+        **stats_rollup_job.get_metrics(),
+        "watermark": watermark.last_id if watermark else 0
+    }
+
+@router.get("/monitoring/api-tokens")
+def get_api_token_cache_metrics(
+    current_user: str = Depends(get_current_user)
+):
+    """获取 API 令牌缓存命中率和待写回的使用计数（需要认证）"""
+    return {
+        "cache": api_token_cache.get_metrics(),
+        "usage": token_usage_recorder.get_metrics()
+    }
+
+@router.get("/monitoring/data-access")
+def get_data_access_metrics(
+    current_user: str = Depends(get_current_user)
+):
+    """获取产品数据待写回的访问计数和刷新统计（需要认证）"""
+    return data_access_recorder.get_metrics()
+
+@router.get("/monitoring/data-blobs")
+def get_data_blob_metrics(
+    current_user: str = Depends(get_current_user)
+):
+    """获取产品数据大值文件的写入、去重复用统计和回收任务状态（需要认证）"""
+    return {**data_blob_store.get_metrics(), "collector": data_blob_collector.get_metrics()}
+
 # 产品反馈相关接口
+@router.get("/feedback/summary", response_model=List[ProductFeedbackSummary])
+def get_feedback_summaries(
+    db: Session = Depends(get_db),
+    current_user: str = Depends(get_current_user)
+):
+    """获取所有产品的反馈汇总，供管理后台显示反馈角标（需要认证）"""
+    return [summary.to_dict() for summary in read_summaries(db).values()]
+
 @router.post("/{product_id}/feedback", response_model=ProductFeedback)
 @transactional(rollback_on_exception=True, max_retries=2)
 @with_db_error_handling
@@ -850,51 +1050,10 @@ def create_product_feedback(
     feedback = ProductFeedbackModel(**safe_data)
     db.add(feedback)
     db.flush()
+    record_feedback_change(db, None, snapshot(feedback))
     db.refresh(feedback)
     return feedback
 
-def filter_sensitive_content(content: str) -> str:
-    """
-    过滤敏感内容，确保符合监管要求
-    
-    Args:
-        content: 原始内容
-        
-    Returns:
-        过滤后的内容
-    """
-    if not content:
-        return content
-    
-    import re
-    
-    # 基础敏感词列表（可根据需要扩展）
-    # 注意：这里只是示例，实际使用时应该使用更完善的敏感词库或接入第三方内容审核服务
-    sensitive_words = [
-        # 可以在这里添加需要过滤的敏感词
-    ]
-    
-    filtered = content
-    
-    # 过滤敏感词（简单替换为*）
-    for word in sensitive_words:
-        if word:
-            # 使用正则表达式进行大小写不敏感的替换
-            pattern = re.compile(re.escape(word), re.IGNORECASE)
-            filtered = pattern.sub('*' * len(word), filtered)
-    
-    # 移除可能的HTML标签和脚本（防止XSS）
-    # 移除script标签
-    filtered = re.sub(r'<script[^>]*>.*?</script>', '', filtered, flags=re.IGNORECASE | re.DOTALL)
-    # 移除on事件属性
-    filtered = re.sub(r'\s*on\w+\s*=\s*["\'][^"\']*["\']', '', filtered, flags=re.IGNORECASE)
-    # 移除javascript:协议
-    filtered = re.sub(r'javascript:', '', filtered, flags=re.IGNORECASE)
-    # 移除data:协议（可能包含恶意代码）
-    filtered = re.sub(r'data:\s*[^;]*;base64,', '', filtered, flags=re.IGNORECASE)
-    
-    return filtered
-
 @router.get("/{product_id}/feedback/public", response_model=List[ProductFeedbackPublic])
 @sql_injection_protection
 def get_product_feedback_public(
@@ -917,8 +1076,8 @@ def get_product_feedback_public(
     if not product:
         raise ResourceNotFoundAPIError("产品", product_id)
     
-    # 只查询已解决或已关闭的反馈
-    from sqlalchemy import desc, or_
+    # 只查询已解决或已关闭的反馈，按 (product_id, status, sort_key) 索引排序分页
+    # sort_key 在写入时计算：有回复取回复时间，否则取创建时间
     query = db.query(ProductFeedbackModel).filter(
         ProductFeedbackModel.product_id == product_id,
         ProductFeedbackModel.status.in_(['resolved', 'closed'])
@@ -928,32 +1087,26 @@ def get_product_feedback_public(
         query = query.filter(ProductFeedbackModel.feedback_type == feedback_type)
     
     # 限制返回数量，避免过多数据（最多20条）
-    # 优先按回复时间排序，如果没有回复则按创建时间排序
-    # 使用Python排序确保有回复的排在前面
-    all_feedback = query.all()
-    feedback_list = sorted(
-        all_feedback,
-        key=lambda x: (x.replied_at if x.replied_at else x.created_at),
-        reverse=True
-    )[max(skip, 0):max(skip, 0) + min(limit, 20)]
+    feedback_list = query.order_by(
+        ProductFeedbackModel.sort_key.desc(),
+        ProductFeedbackModel.id.desc()
+    ).offset(max(skip, 0)).limit(max(min(limit, 20), 0)).all()
     
     # 转换为公开格式（不包含敏感信息）
     public_feedback = []
     for feedback in feedback_list:
-        # 内容过滤：确保内容符合监管要求
-        filtered_content = filter_sensitive_content(feedback.content)
-        filtered_title = filter_sensitive_content(feedback.title)
-        filtered_reply = filter_sensitive_content(feedback.admin_reply) if feedback.admin_reply else None
+        # 内容在写入时已过滤
+        title, content, admin_reply = public_view(feedback)
         
         public_feedback.append(ProductFeedbackPublic(
             id=feedback.id,
             product_id=feedback.product_id,
             feedback_type=feedback.feedback_type,
             rating=feedback.rating,
-            title=filtered_title,
-            content=filtered_content,
+            title=title,
+            content=content,
             status=feedback.status,
-            admin_reply=filtered_reply,
+            admin_reply=admin_reply,
             created_at=feedback.created_at,
             replied_at=feedback.replied_at
         ))
@@ -964,14 +1117,16 @@ def get_product_feedback_public(
 @sql_injection_protection
 def get_product_feedback(
     product_id: int,
+    response: Response,
     feedback_type: Optional[str] = None,
     status: Optional[str] = None,
     skip: int = 0,
     limit: int = 100,
+    cursor: Optional[str] = None,
     db: Session = Depends(get_db),
     current_user: str = Depends(get_current_user)
 ):
-    """获取产品反馈列表（需要认证）"""
+    """获取产品反馈列表（需要认证），下一页游标在 X-Next-Cursor 响应头中"""
     safe_executor = create_safe_query_executor(db)
     
     product = safe_executor.safe_get_by_id(ProductModel, product_id)
@@ -986,18 +1141,17 @@ def get_product_feedback(
     if status:
         filters["status"] = status
     
-    # 使用原生查询以确保正确的排序（降序，最新的在前）
-    from sqlalchemy import desc
-    query = db.query(ProductFeedbackModel).filter(
-        ProductFeedbackModel.product_id == product_id
+    # 降序，最新的在前
+    feedback_list, next_cursor = safe_executor.safe_keyset_query(
+        ProductFeedbackModel,
+        filters,
+        order_by='created_at',
+        limit=min(limit, 100),
+        offset=max(skip, 0),
+        cursor=decode_cursor(cursor, 'created_at')
     )
-    
-    if feedback_type:
-        query = query.filter(ProductFeedbackModel.feedback_type == feedback_type)
-    if status:
-        query = query.filter(ProductFeedbackModel.status == status)
-    
-    feedback_list = query.order_by(desc(ProductFeedbackModel.created_at)).offset(max(skip, 0)).limit(min(limit, 100)).all()
+    if next_cursor:
+        response.headers[NEXT_CURSOR_HEADER] = next_cursor
     
     return feedback_list
 
@@ -1052,10 +1206,12 @@ def update_product_feedback(
         from datetime import datetime, timezone
         update_data['replied_at'] = datetime.now(timezone.utc)
     
+    before = snapshot(feedback)
     for field, value in update_data.items():
         setattr(feedback, field, value)
     
     db.flush()
+    record_feedback_change(db, before, snapshot(feedback))
     db.refresh(feedback)
     return feedback
 
@@ -1080,6 +1236,7 @@ def delete_product_feedback(
     if not feedback or feedback.product_id != product_id:
         raise ResourceNotFoundAPIError("反馈", feedback_id)
     
+    record_feedback_change(db, snapshot(feedback), None)
     db.delete(feedback)
     # 事务装饰器会处理提交
     
@@ -1099,45 +1256,44 @@ def get_product_feedback_stats(
     if not product:
         raise ResourceNotFoundAPIError("产品", product_id)
     
-    # 查询所有反馈
-    all_feedback = db.query(ProductFeedbackModel).filter(
+    # 按 (类型, 状态) 分组聚合，一次扫描得到总数、评分和分类计数
+    grouped = db.query(
+        ProductFeedbackModel.feedback_type,
+        ProductFeedbackModel.status,
+        func.count(ProductFeedbackModel.id),
+        func.sum(ProductFeedbackModel.rating),
+        func.count(ProductFeedbackModel.rating)
+    ).filter(
         ProductFeedbackModel.product_id == product_id
+    ).group_by(
+        ProductFeedbackModel.feedback_type,
+        ProductFeedbackModel.status
     ).all()
     
-    if not all_feedback:
-        return ProductFeedbackStats(
-            product_id=product_id,
-            total_feedback=0,
-            average_rating=None,
-            feedback_by_type={},
-            feedback_by_status={},
-            recent_feedback=[]
-        )
-    
-    # 计算统计数据
-    total_feedback = len(all_feedback)
-    
-    # 计算平均评分
-    ratings = [f.rating for f in all_feedback if f.rating is not None]
-    average_rating = sum(ratings) / len(ratings) if ratings else None
-    
-    # 按类型统计
+    total_feedback = 0
+    rating_sum = 0
+    rating_count = 0
     feedback_by_type = {}
-    for feedback in all_feedback:
-        feedback_by_type[feedback.feedback_type] = feedback_by_type.get(feedback.feedback_type, 0) + 1
-    
-    # 按状态统计
     feedback_by_status = {}
-    for feedback in all_feedback:
-        feedback_by_status[feedback.status] = feedback_by_status.get(feedback.status, 0) + 1
-    
-    # 最近的反馈
-    recent_feedback = sorted(all_feedback, key=lambda x: x.created_at, reverse=True)[:5]
+    for feedback_type, feedback_status, count, group_rating_sum, group_rating_count in grouped:
+        total_feedback += count
+        rating_sum += group_rating_sum or 0
+        rating_count += group_rating_count
+        feedback_by_type[feedback_type] = feedback_by_type.get(feedback_type, 0) + count
+        feedback_by_status[feedback_status] = feedback_by_status.get(feedback_status, 0) + count
+    
+    # 最近的反馈，走 (product_id, created_at) 索引
+    recent_feedback = db.query(ProductFeedbackModel).filter(
+        ProductFeedbackModel.product_id == product_id
+    ).order_by(
+        ProductFeedbackModel.created_at.desc(),
+        ProductFeedbackModel.id.desc()
+    ).limit(5).all() if total_feedback else []
     
     return ProductFeedbackStats(
         product_id=product_id,
         total_feedback=total_feedback,
-        average_rating=average_rating,
+        average_rating=rating_sum / rating_count if rating_count else None,
         feedback_by_type=feedback_by_type,
         feedback_by_status=feedback_by_status,
         recent_feedback=recent_feedback
@@ -1192,6 +1348,20 @@ def generate_api_token(
         "product_id": product_id
     }
 
+def _lookup_api_token(db: Session, token: str, product_id: int) -> Optional[CachedApiToken]:
+    """查找产品的有效 API 令牌：先查令牌缓存，未命中时查库并回填缓存"""
+    cached = api_token_cache.get(token, product_id)
+    if cached is not None:
+        return cached
+    
+    api_token = db.query(ProductAPITokenModel).filter(
+        ProductAPITokenModel.token == token,
+        ProductAPITokenModel.product_id == product_id,
+        ProductAPITokenModel.is_active == True
+    ).first()
+    
+    return api_token_cache.set(token, api_token) if api_token else None
+
 @router.post("/{product_id}/api/validate")
 @sql_injection_protection
 def validate_api_token(
@@ -1211,23 +1381,16 @@ def validate_api_token(
         raise ValidationAPIError("令牌不能为空")
     
     # 查找令牌
-    api_token = db.query(ProductAPITokenModel).filter(
-        ProductAPITokenModel.token == token,
-        ProductAPITokenModel.product_id == product_id,
-        ProductAPITokenModel.is_active == True
-    ).first()
+    api_token = _lookup_api_token(db, token, product_id)
     
     if not api_token:
         return {"valid": False, "reason": "令牌不存在或已失效"}
     
-    from datetime import datetime, timezone
-    if api_token.expires_at < datetime.now(timezone.utc):
+    if api_token.is_expired:
         return {"valid": False, "reason": "令牌已过期"}
     
-    # 更新使用记录
-    api_token.last_used_at = datetime.now(timezone.utc)
-    api_token.usage_count += 1
-    db.commit()
+    # 使用记录在内存中累加，由后台任务批量写回
+    token_usage_recorder.record(api_token.token_id)
     
     return {
         "valid": True,
@@ -1270,7 +1433,7 @@ def get_api_tokens(
             "created_at": token.created_at.isoformat() if token.created_at else None,
             "expires_at": token.expires_at.isoformat() if token.expires_at else None,
             "last_used_at": token.last_used_at.isoformat() if token.last_used_at else None,
-            "usage_count": token.usage_count or 0
+            "usage_count": (token.usage_count or 0) + token_usage_recorder.pending(token.id)
         })
     
     return result
@@ -1307,6 +1470,7 @@ def revoke_api_token(
     
     api_token.is_active = False
     db.flush()
+    api_token_cache.invalidate(token)
     
     return MessageResponse(message="API令牌已撤销")
 
@@ -1336,6 +1500,7 @@ def get_api_config(
     }
 
 @router.put("/{product_id}/api/config")
+@invalidates_response_cache("products", id_param="product_id")
 @transactional(rollback_on_exception=True, max_retries=2)
 @with_db_error_handling
 @sql_injection_protection
@@ -1387,14 +1552,16 @@ def update_api_config(
 @sql_injection_protection
 def get_api_calls(
     product_id: int,
+    response: Response,
     endpoint: Optional[str] = None,
     status_code: Optional[int] = None,
     skip: int = 0,
     limit: int = 100,
+    cursor: Optional[str] = None,
     db: Session = Depends(get_db),
     current_user: str = Depends(get_current_user)
 ):
-    """获取API调用日志（需要认证）"""
+    """获取API调用日志（需要认证），下一页游标在 X-Next-Cursor 响应头中"""
     safe_executor = create_safe_query_executor(db)
     
     product = safe_executor.safe_get_by_id(ProductModel, product_id)
@@ -1408,13 +1575,17 @@ def get_api_calls(
     if status_code:
         filters["status_code"] = status_code
     
-    api_calls = safe_executor.safe_filter_query(
+    api_calls, next_cursor = safe_executor.safe_keyset_query(
         ProductAPICallModel,
         filters,
+        order_by='timestamp',
         limit=min(limit, 100),
         offset=max(skip, 0),
-        order_by='timestamp'
+        cursor=decode_cursor(cursor, 'timestamp'),
+        descending=False
     )
+    if next_cursor:
+        response.headers[NEXT_CURSOR_HEADER] = next_cursor
     
     return api_calls
 
@@ -1445,11 +1616,7 @@ def proxy_api_call(
     token = auth_header.split(' ')[1]
     
     # 验证令牌
-    api_token = db.query(ProductAPITokenModel).filter(
-        ProductAPITokenModel.token == token,
-        ProductAPITokenModel.product_id == product_id,
-        ProductAPITokenModel.is_active == True
-    ).first()
+    api_token = _lookup_api_token(db, token, product_id)
     
     if not api_token:
         raise HTTPException(
@@ -1457,8 +1624,7 @@ def proxy_api_call(
             detail="无效的API令牌"
         )
     
-    from datetime import datetime, timezone
-    if api_token.expires_at < datetime.now(timezone.utc):
+    if api_token.is_expired:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="API令牌已过期"
@@ -1480,7 +1646,7 @@ def proxy_api_call(
         # 记录成功的API调用
         api_call = ProductAPICallModel(
             product_id=product_id,
-            token_id=api_token.id,
+            token_id=api_token.token_id,
             endpoint=path,
             method=request.method,
             status_code=200,
@@ -1498,7 +1664,7 @@ def proxy_api_call(
         # 记录失败的API调用
         api_call = ProductAPICallModel(
             product_id=product_id,
-            token_id=api_token.id,
+            token_id=api_token.token_id,
             endpoint=path,
             method=request.method,
             status_code=500,
@@ -1516,6 +1682,66 @@ def proxy_api_call(
         )
 
 # 产品数据存储相关接口
+def _check_data_batch(product_id: int, db: Session, key_count: int):
+    """批量读写的公共检查：键数上限和产品存在"""
+    if key_count > settings.DATA_BATCH_MAX_KEYS:
+        raise HTTPException(
+            status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+            detail=f"单次最多处理 {settings.DATA_BATCH_MAX_KEYS} 个键"
+        )
+    # with_db_error_handling 只放行 HTTPException
+    product = db.query(ProductModel.id).filter(ProductModel.id == product_id).first()
+    if not product:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=f"产品不存在: {product_id}")
+
+@router.post("/{product_id}/data/batch/get")
+@read_only
+@with_db_error_handling
+def batch_get_product_data(
+    product_id: int,
+    request_data: ProductDataBatchKeys,
+    db: Session = Depends(get_db),
+    current_user: str = Depends(get_current_user)
+):
+    """批量获取产品数据（需要认证），每个键单独返回 ok / not_found / invalid"""
+    _check_data_batch(product_id, db, len(request_data.keys))
+    return {"product_id": product_id, "results": get_many(db, product_id, request_data.keys)}
+
+@router.post("/{product_id}/data/batch/put")
+@transactional(rollback_on_exception=True, max_retries=2)
+@with_db_error_handling
+def batch_store_product_data(
+    product_id: int,
+    request_data: ProductDataBatchPut,
+    db: Session = Depends(get_db),
+    current_user: str = Depends(get_current_user)
+):
+    """
+    批量存储产品数据（需要认证）
+    
+    键已存在时更新，否则创建，每个键单独返回 created / updated / invalid；
+    写入后超出存储配额时整批不写入。
+    """
+    _check_data_batch(product_id, db, len(request_data.items))
+    try:
+        results = put_many(db, product_id, ((item.key, item.data) for item in request_data.items))
+    except DataQuotaExceededError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+    return {"product_id": product_id, "results": results}
+
+@router.post("/{product_id}/data/batch/delete")
+@transactional(rollback_on_exception=True, max_retries=2)
+@with_db_error_handling
+def batch_delete_product_data(
+    product_id: int,
+    request_data: ProductDataBatchKeys,
+    db: Session = Depends(get_db),
+    current_user: str = Depends(get_current_user)
+):
+    """批量删除产品数据（需要认证），每个键单独返回 deleted / not_found / invalid"""
+    _check_data_batch(product_id, db, len(request_data.keys))
+    return {"product_id": product_id, "results": delete_many(db, product_id, request_data.keys)}
+
 @router.post("/{product_id}/data/{key}")
 @transactional(rollback_on_exception=True, max_retries=2)
 @with_db_error_handling
@@ -1539,9 +1765,8 @@ def store_product_data(
         raise ValidationAPIError("存储键名无效")
     
     # 计算数据大小
-    import json
-    data_json = json.dumps(data)
-    data_size = len(data_json.encode('utf-8'))
+    payload = value_bytes(data)
+    data_size = len(payload)
     
     # 检查存储限制（100MB）
     if data_size > 100 * 1024 * 1024:
@@ -1553,10 +1778,12 @@ def store_product_data(
         ProductDataStorageModel.storage_key == key
     ).first()
     
+    # 大值写入文件，行内只保存引用
+    fields = storage_fields(data, payload)
     if existing:
         # 更新现有记录
-        existing.storage_value = data
-        existing.size_bytes = data_size
+        for name, value in fields.items():
+            setattr(existing, name, value)
         existing.updated_at = func.now()
         db.flush()
         storage_record = existing
@@ -1565,8 +1792,7 @@ def store_product_data(
         storage_record = ProductDataStorageModel(
             product_id=product_id,
             storage_key=key,
-            storage_value=data,
-            size_bytes=data_size
+            **fields
         )
         db.add(storage_record)
         db.flush()
@@ -1588,7 +1814,12 @@ def get_product_data(
     db: Session = Depends(get_db),
     current_user: str = Depends(get_current_user)
 ):
-    """获取产品数据（需要认证）"""
+    """
+    获取产品数据（需要认证）
+    
+    只读：访问次数由 data_access_recorder 定期批量写回。存为文件的大值不解析，
+    直接从磁盘流式写入响应的 data 字段。
+    """
     safe_executor = create_safe_query_executor(db)
     
     product = safe_executor.safe_get_by_id(ProductModel, product_id)
@@ -1604,21 +1835,22 @@ def get_product_data(
     if not storage_record:
         raise ResourceNotFoundAPIError("存储数据", key)
     
-    # 更新访问记录
-    storage_record.access_count += 1
-    storage_record.accessed_at = func.now()
-    db.commit()
+    # 记录访问（内存累加，定期写回）
+    data_access_recorder.record(product_id, [key])
+    access_count, accessed_at = access_stats(storage_record)
     
-    return {
+    result = {
         "product_id": product_id,
         "key": key,
-        "data": storage_record.storage_value,
         "size_bytes": storage_record.size_bytes,
-        "access_count": storage_record.access_count,
+        "access_count": access_count,
         "created_at": storage_record.created_at.isoformat(),
         "updated_at": storage_record.updated_at.isoformat(),
-        "accessed_at": storage_record.accessed_at.isoformat() if storage_record.accessed_at else None
+        "accessed_at": accessed_at
     }
+    if storage_record.blob_hash:
+        return StreamingResponse(json_with_value(result, storage_record), media_type="application/json")
+    return {**result, "data": storage_record.storage_value}
 
 @router.delete("/{product_id}/data/{key}")
 @transactional(rollback_on_exception=True, max_retries=2)
@@ -1647,6 +1879,7 @@ def delete_product_data(
         raise ResourceNotFoundAPIError("存储数据", key)
     
     db.delete(storage_record)
+    data_access_recorder.discard(product_id, [key])
     # 事务装饰器会处理提交
     
     return MessageResponse(message="数据删除成功")
@@ -1655,12 +1888,14 @@ def delete_product_data(
 @sql_injection_protection
 def list_product_data(
     product_id: int,
+    response: Response,
     skip: int = 0,
     limit: int = 100,
+    cursor: Optional[str] = None,
     db: Session = Depends(get_db),
     current_user: str = Depends(get_current_user)
 ):
-    """列出产品数据（需要认证）"""
+    """列出产品数据（需要认证），传入 cursor 时按游标分页，skip 被忽略"""
     safe_executor = create_safe_query_executor(db)
     
     product = safe_executor.safe_get_by_id(ProductModel, product_id)
@@ -1668,34 +1903,41 @@ def list_product_data(
         raise ResourceNotFoundAPIError("产品", product_id)
     
     # 查询数据列表
-    storage_records = safe_executor.safe_filter_query(
+    storage_records, next_cursor = safe_executor.safe_keyset_query(
         ProductDataStorageModel,
         {"product_id": product_id},
+        order_by='created_at',
         limit=min(limit, 100),
         offset=max(skip, 0),
-        order_by='created_at'
+        cursor=decode_cursor(cursor, 'created_at'),
+        descending=False
     )
+    if next_cursor:
+        response.headers[NEXT_CURSOR_HEADER] = next_cursor
     
     # 计算总存储大小
     total_size = db.query(func.sum(ProductDataStorageModel.size_bytes)).filter(
         ProductDataStorageModel.product_id == product_id
     ).scalar() or 0
     
+    records = []
+    for record in storage_records:
+        access_count, accessed_at = access_stats(record)
+        records.append({
+            "key": record.storage_key,
+            "size_bytes": record.size_bytes,
+            "access_count": access_count,
+            "created_at": record.created_at.isoformat(),
+            "updated_at": record.updated_at.isoformat(),
+            "accessed_at": accessed_at
+        })
+    
     return {
         "product_id": product_id,
         "total_records": len(storage_records),
         "total_size_bytes": total_size,
-        "records": [
-            {
-                "key": record.storage_key,
-                "size_bytes": record.size_bytes,
-                "access_count": record.access_count,
-                "created_at": record.created_at.isoformat(),
-                "updated_at": record.updated_at.isoformat(),
-                "accessed_at": record.accessed_at.isoformat() if record.accessed_at else None
-            }
-            for record in storage_records
-        ]
+        "next_cursor": next_cursor,
+        "records": records
     }
 @router.get("/{product_id}/storage/quota")
 @sql_injection_protection
@@ -1716,8 +1958,8 @@ def get_storage_quota(
         ProductDataStorageModel.product_id == product_id
     ).scalar() or 0
     
-    # 设置存储配额（100MB）
-    total_bytes = 100 * 1024 * 1024
+    # 存储配额（100MB）
+    total_bytes = DATA_QUOTA_BYTES
     available_bytes = max(0, total_bytes - used_bytes)
     usage_percentage = (used_bytes / total_bytes * 100) if total_bytes > 0 else 0
     
@@ -1750,6 +1992,7 @@ def clear_all_product_data(
     ).delete()
     
     db.flush()
+    data_access_recorder.discard(product_id)
     
     return {
         "message": f"已清空 {deleted_count} 条数据记录",
@@ -1784,14 +2027,15 @@ def export_product_data(
     }
     
     for record in storage_records:
+        access_count, accessed_at = access_stats(record)
         export_data["data"][record.storage_key] = {
-            "value": record.storage_value,
+            "value": load_value(record),
             "metadata": {
                 "size_bytes": record.size_bytes,
-                "access_count": record.access_count,
+                "access_count": access_count,
                 "created_at": record.created_at.isoformat(),
                 "updated_at": record.updated_at.isoformat(),
-                "accessed_at": record.accessed_at.isoformat() if record.accessed_at else None
+                "accessed_at": accessed_at
             }
         }
     
@@ -1849,8 +2093,8 @@ async def import_product_data(
                 value = item['value']
                 
                 # 计算数据大小
-                data_json = json.dumps(value)
-                data_size = len(data_json.encode('utf-8'))
+                payload = value_bytes(value)
+                data_size = len(payload)
                 
                 # 检查大小限制
                 if data_size > 10 * 1024 * 1024:  # 10MB per record
@@ -1863,18 +2107,18 @@ async def import_product_data(
                     ProductDataStorageModel.storage_key == key
                 ).first()
                 
+                fields = storage_fields(value, payload)
                 if existing:
                     # 更新现有记录
-                    existing.storage_value = value
-                    existing.size_bytes = data_size
+                    for name, field_value in fields.items():
+                        setattr(existing, name, field_value)
                     existing.updated_at = func.now()
                 else:
                     # 创建新记录
                     storage_record = ProductDataStorageModel(
                         product_id=product_id,
                         storage_key=key,
-                        storage_value=value,
-                        size_bytes=data_size
+                        **fields
                     )
                     db.add(storage_record)
                 
@@ -2300,6 +2544,7 @@ def update_session_data(
     }
 
 @router.get("/{product_id}/auth/session-data/{session_id}")
+@writes_on_read
 def get_session_data(
     product_id: int,
     session_id: str,
@@ -1,15 +1,18 @@
 from fastapi import APIRouter, Depends, HTTPException, status
 from sqlalchemy.orm import Session
 
-from ..database import get_db
+from ..database import get_db, writes_on_read
 from ..models import Profile as ProfileModel
 from ..schemas import Profile, ProfileUpdate, MessageResponse
 from ..transaction import transactional, with_db_error_handling
+from ..services.response_cache import cached_response, invalidates_response_cache
 from .auth import get_current_user
 
 router = APIRouter()
 
 @router.get("/", response_model=Profile)
+@cached_response("profile", Profile)
+@writes_on_read
 def get_profile(db: Session = Depends(get_db)):
     """获取个人信息（公开接口）"""
     profile = db.query(ProfileModel).filter(ProfileModel.id == 1).first()
@@ -32,6 +35,7 @@ def get_profile(db: Session = Depends(get_db)):
     return profile
 
 @router.put("/", response_model=Profile)
+@invalidates_response_cache("profile")
 @transactional(rollback_on_exception=True, max_retries=2)
 @with_db_error_handling
 def update_profile(
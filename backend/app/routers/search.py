@@ -0,0 +1,73 @@
+from fastapi import APIRouter, Depends, HTTPException, Query, status
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from ..database import get_async_db
+from ..models import Blog as BlogModel, Portfolio as PortfolioModel, Product as ProductModel
+from ..schemas import SearchHit, SearchResponse
+from ..security import create_async_safe_query_executor, sql_injection_protection
+from ..search_index import FALLBACK_SNIPPET_CHARS, highlight_text, render_highlight
+
+router = APIRouter()
+
+# 搜索类型 -> (模型, 搜索字段, 公开接口的固定过滤条件)
+SEARCH_SCOPES = {
+    "blog": (BlogModel, ["title", "summary", "content"], {"is_published": True}),
+    "portfolio": (PortfolioModel, ["title", "description"], {}),
+    "products": (ProductModel, ["title", "description"], {"is_published": True}),
+}
+
+
+def _fallback_snippet(item, fields, q: str):
+    """没有使用全文索引时，在 Python 中从第一个命中的正文字段截取片段"""
+    lowered = q.lower().split()
+    for field_name in fields[1:]:
+        text = getattr(item, field_name)
+        if text and any(term in text.lower() for term in lowered):
+            return highlight_text(text, q, FALLBACK_SNIPPET_CHARS)
+    return None
+
+
+@router.get("/", response_model=SearchResponse)
+@sql_injection_protection
+async def search(
+    q: str = Query(..., min_length=2, max_length=100, description="搜索词，多个词以空格分隔"),
+    type: str = Query("blog", description="搜索类型：blog / portfolio / products"),
+    skip: int = Query(0, ge=0),
+    limit: int = Query(20, ge=1, le=100),
+    db: AsyncSession = Depends(get_async_db)
+):
+    """
+    全文搜索（公开接口），按相关度排序并返回高亮标题和正文片段
+
+    title_highlight 和 snippet 是 HTML 转义后的文本，命中词以 <mark> 标签包裹；title 是未转义的原文。
+    """
+    scope = SEARCH_SCOPES.get(type)
+    if scope is None:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"不支持的搜索类型: {type}"
+        )
+    model_class, fields, filters = scope
+
+    safe_executor = create_async_safe_query_executor(db)
+    rows, total = await safe_executor.safe_search_page(
+        model_class, fields, q, limit=limit, offset=skip, filters=filters
+    )
+
+    items = []
+    for item, title_highlight, snippet, score in rows:
+        if title_highlight is None:
+            title_highlight = highlight_text(item.title, q)
+            snippet = _fallback_snippet(item, fields, q)
+        else:
+            title_highlight, snippet = render_highlight(title_highlight), render_highlight(snippet)
+        items.append(SearchHit(
+            id=item.id,
+            type=type,
+            title=item.title,
+            title_highlight=title_highlight,
+            snippet=snippet or None,
+            score=score
+        ))
+
+    return SearchResponse(query=q, type=type, items=items, total=total, skip=skip, limit=limit)
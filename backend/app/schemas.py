@@ -10,6 +10,9 @@ from .validators import (
     validate_markdown_content
 )
 
+# SQLite INTEGER 的最大值；客户端上报的整数超出时写入会失败
+SQLITE_INT_MAX = 2 ** 63 - 1
+
 # 作品相关模型
 class PortfolioBase(BaseModel):
     title: str = Field(..., min_length=1, max_length=200, description="作品标题")
@@ -292,10 +295,10 @@ class Product(ProductBase):
     updated_at: datetime
 
 class ProductStatsBase(BaseModel):
-    product_id: int
+    product_id: int = Field(..., ge=1, le=SQLITE_INT_MAX)
     visitor_ip: Optional[str] = None
     session_id: Optional[str] = None
-    duration_seconds: int = Field(0, ge=0, description="使用时长(秒)")
+    duration_seconds: int = Field(0, ge=0, le=SQLITE_INT_MAX, description="使用时长(秒)")
     user_agent: Optional[str] = None
     referrer: Optional[str] = None
 
@@ -309,7 +312,7 @@ class ProductStats(ProductStatsBase):
     access_time: datetime
 
 class ProductLogBase(BaseModel):
-    product_id: int
+    product_id: int = Field(..., ge=1, le=SQLITE_INT_MAX)
     log_type: str = Field(..., description="日志类型")
     log_level: str = Field("info", description="日志级别")
     message: str = Field(..., min_length=1, description="日志消息")
@@ -351,6 +354,8 @@ class ProductAnalytics(BaseModel):
     average_duration: float
     last_access: Optional[datetime]
     popular_times: List[Dict[str, Any]]
+    range_start: Optional[datetime] = None
+    range_end: Optional[datetime] = None
 
 # 产品反馈相关模型
 class ProductFeedbackBase(BaseModel):
@@ -449,6 +454,27 @@ class ProductFeedbackStats(BaseModel):
     feedback_by_status: Dict[str, int]
     recent_feedback: List[ProductFeedback]
 
+class ProductFeedbackSummary(BaseModel):
+    """单个产品的反馈汇总（管理后台反馈角标）"""
+    product_id: int
+    total_feedback: int
+    average_rating: Optional[float]
+    feedback_by_type: Dict[str, int]
+    feedback_by_status: Dict[str, int]
+
+# 产品数据批量读写相关模型
+class ProductDataBatchKeys(BaseModel):
+    """批量读取或删除的键"""
+    keys: List[str] = Field(..., description="存储键名列表")
+
+class ProductDataBatchItem(BaseModel):
+    key: str = Field(..., description="存储键名")
+    data: Dict[str, Any] = Field(..., description="存储的数据")
+
+class ProductDataBatchPut(BaseModel):
+    """批量写入的键值，键已存在时更新"""
+    items: List[ProductDataBatchItem] = Field(..., description="键值列表")
+
 # 扩展管理相关模型
 class ExtensionInstallRequest(BaseModel):
     path: str = Field(..., min_length=1, description="扩展路径或URL")
@@ -457,6 +483,23 @@ class ExtensionInstallRequest(BaseModel):
 class ExtensionConfigureRequest(BaseModel):
     config: Dict[str, Any] = Field(..., description="扩展配置")
 
+# 全文搜索相关模型
+class SearchHit(BaseModel):
+    id: int
+    type: str = Field(..., description="结果类型：blog / portfolio / products")
+    title: str
+    title_highlight: str = Field(..., description="命中词以 <mark> 标记的标题（HTML，原文已转义）")
+    snippet: Optional[str] = Field(None, description="命中词附近的正文片段，命中词以 <mark> 标记（HTML，原文已转义）")
+    score: float = Field(..., description="BM25 相关度，越小越相关")
+
+class SearchResponse(BaseModel):
+    query: str
+    type: str
+    items: List[SearchHit]
+    total: int
+    skip: int
+    limit: int
+
 # 通用响应模型
 class MessageResponse(BaseModel):
     message: str
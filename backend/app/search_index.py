@@ -0,0 +1,256 @@
+"""
+全文搜索索引
+为博客、作品和产品建立 SQLite FTS5 外部内容表，由触发器与原表保持同步。
+搜索按 BM25 排序，发布状态等过滤条件和分页都在同一条 SQL 中完成。
+
+使用 trigram 分词：中文和子串匹配的行为与原来的 LIKE '%词%' 一致（不区分 ASCII 大小写）。
+trigram 无法匹配少于三个字符的词，这类搜索退回 LIKE 扫描，过滤条件和分页同样在 SQL 中完成。
+
+高亮标题和摘要片段是 HTML：原文先转义，再在命中词两侧插入 <mark> 标签，可以直接插入页面。
+"""
+
+import html
+import logging
+import re
+import sqlite3
+from dataclasses import dataclass
+from functools import lru_cache
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple
+
+from sqlalchemy import and_, column, func, literal_column, or_, select, table
+from sqlalchemy.sql import Select
+
+from .config import settings
+
+logger = logging.getLogger(__name__)
+
+# trigram 分词能匹配的最短词长
+MIN_TERM_LENGTH = 3
+
+# 搜索结果中标记命中词的标签
+HIGHLIGHT_OPEN = "<mark>"
+HIGHLIGHT_CLOSE = "</mark>"
+# 生成高亮时先用控制字符标记命中词，原文转义后再替换为标签（见 render_highlight）
+MARK_OPEN = "\x02"
+MARK_CLOSE = "\x03"
+SNIPPET_ELLIPSIS = "…"
+SNIPPET_TOKENS = 24  # trigram 下一个 token 约为一个字符位置
+FALLBACK_SNIPPET_CHARS = 60
+
+
+@dataclass(frozen=True)
+class SearchIndex:
+    """一张表的全文索引定义"""
+    table: str
+    columns: Tuple[str, ...]  # 第一列为标题，最后一列为正文（摘要片段取自正文）
+    weights: Tuple[float, ...]  # bm25 列权重，顺序与 columns 一致
+
+    @property
+    def name(self) -> str:
+        return f"{self.table}_fts"
+
+
+SEARCH_INDEXES: Dict[str, SearchIndex] = {
+    "blog": SearchIndex("blog", ("title", "summary", "content"), (10.0, 4.0, 1.0)),
+    "portfolio": SearchIndex("portfolio", ("title", "description"), (10.0, 1.0)),
+    "products": SearchIndex("products", ("title", "description"), (10.0, 1.0)),
+}
+
+
+@lru_cache(maxsize=1)
+def fts5_available() -> bool:
+    """当前 SQLite 是否支持 FTS5 和 trigram 分词（需要 3.34+ 且编译了 FTS5）"""
+    try:
+        conn = sqlite3.connect(":memory:")
+        try:
+            conn.execute("CREATE VIRTUAL TABLE probe USING fts5(x, tokenize='trigram')")
+        finally:
+            conn.close()
+        return True
+    except sqlite3.Error as e:
+        logger.warning(f"SQLite 不支持 FTS5 trigram 分词，搜索将使用 LIKE 扫描: {e}")
+        return False
+
+
+def search_enabled() -> bool:
+    return settings.FULLTEXT_SEARCH_ENABLED and fts5_available()
+
+
+# ==================== 索引维护 ====================
+
+def _index_ddl(index: SearchIndex) -> List[str]:
+    """FTS5 外部内容表和同步触发器；更新触发器只在被索引的列变化时执行"""
+    columns = ", ".join(index.columns)
+    new_values = ", ".join(f"new.{name}" for name in index.columns)
+    old_values = ", ".join(f"old.{name}" for name in index.columns)
+    delete_old = (
+        f"INSERT INTO {index.name}({index.name}, rowid, {columns}) "
+        f"VALUES ('delete', old.id, {old_values});"
+    )
+    insert_new = f"INSERT INTO {index.name}(rowid, {columns}) VALUES (new.id, {new_values});"
+    return [
+        f"CREATE VIRTUAL TABLE IF NOT EXISTS {index.name} USING fts5("
+        f"{columns}, content='{index.table}', content_rowid='id', tokenize='trigram')",
+        f"CREATE TRIGGER IF NOT EXISTS {index.name}_ai AFTER INSERT ON {index.table} BEGIN "
+        f"{insert_new} END",
+        f"CREATE TRIGGER IF NOT EXISTS {index.name}_ad AFTER DELETE ON {index.table} BEGIN "
+        f"{delete_old} END",
+        f"CREATE TRIGGER IF NOT EXISTS {index.name}_au AFTER UPDATE OF {columns} ON {index.table} BEGIN "
+        f"{delete_old} {insert_new} END",
+    ]
+
+
+def _sqlite_object_exists(connection, name: str) -> bool:
+    return connection.exec_driver_sql(
+        "SELECT 1 FROM sqlite_master WHERE name = ?", (name,)
+    ).first() is not None
+
+
+def create_search_indexes(target, connection, **kw):
+    """
+    建表后创建全文索引（metadata after_create 事件）
+
+    已有数据库升级时索引表是新建的，用 'rebuild' 从原表导入现有数据；索引已存在时不做任何事。
+    """
+    if connection.dialect.name != "sqlite" or not search_enabled():
+        return
+    for index in SEARCH_INDEXES.values():
+        if not _sqlite_object_exists(connection, index.table):
+            continue
+        created = not _sqlite_object_exists(connection, index.name)
+        for statement in _index_ddl(index):
+            connection.exec_driver_sql(statement)
+        if created:
+            connection.exec_driver_sql(f"INSERT INTO {index.name}({index.name}) VALUES ('rebuild')")
+            logger.info(f"已创建全文索引 {index.name}")
+
+
+def drop_search_indexes(target, connection, **kw):
+    """删表前删除全文索引和触发器（metadata before_drop 事件），避免新表沿用旧索引"""
+    if connection.dialect.name != "sqlite":
+        return
+    for index in SEARCH_INDEXES.values():
+        for suffix in ("ai", "ad", "au"):
+            connection.exec_driver_sql(f"DROP TRIGGER IF EXISTS {index.name}_{suffix}")
+        connection.exec_driver_sql(f"DROP TABLE IF EXISTS {index.name}")
+
+
+# ==================== 搜索语句 ====================
+
+def split_search_terms(search_term: str) -> List[str]:
+    """按空白切分搜索词并去重，多个词之间是「同时包含」的关系"""
+    return list(dict.fromkeys(search_term.split()))
+
+
+def _match_expression(index: SearchIndex, fields: Sequence[str], terms: Iterable[str]) -> str:
+    # 每个词作为一个短语（双引号转义），用户输入中的 FTS5 运算符不会生效
+    expression = " ".join('"' + term.replace('"', '""') + '"' for term in terms)
+    if tuple(fields) != index.columns:
+        expression = "{" + " ".join(fields) + "} : (" + expression + ")"
+    return expression
+
+
+def _resolve_index(model_class, fields: Sequence[str], terms: Sequence[str]) -> Optional[SearchIndex]:
+    """返回可用于本次搜索的全文索引；词太短或字段不在索引中时返回 None"""
+    index = SEARCH_INDEXES.get(getattr(model_class, "__tablename__", None))
+    if index is None or not search_enabled():
+        return None
+    if not set(fields) <= set(index.columns):
+        return None
+    if any(len(term) < MIN_TERM_LENGTH for term in terms):
+        return None
+    return index
+
+
+def build_search_statement(model_class, fields: Sequence[str], search_term: str,
+                           conditions: Sequence[Any] = (), with_snippets: bool = False) -> Optional[Select]:
+    """
+    构建搜索语句
+
+    能使用全文索引时按 BM25 排序（最相关的在前），否则退回 LIKE 并按 ID 排序。
+    with_snippets 为 True 时额外返回三列：标题高亮、正文摘要片段和相关度得分（越小越相关）。
+
+    Args:
+        model_class: 模型类
+        fields: 搜索字段（均需为模型上存在的字段）
+        search_term: 搜索词
+        conditions: 附加的过滤条件（与搜索条件同时满足）
+        with_snippets: 是否返回高亮和摘要
+
+    Returns:
+        查询语句；没有有效搜索词时返回 None
+    """
+    terms = split_search_terms(search_term)
+    if not terms or not fields:
+        return None
+
+    index = _resolve_index(model_class, fields, terms)
+    if index is None:
+        like_conditions = [
+            or_(*[getattr(model_class, name).like(f"%{term}%") for name in fields])
+            for term in terms
+        ]
+        columns = [model_class]
+        if with_snippets:
+            columns += [literal_column("NULL").label("title_highlight"),
+                        literal_column("NULL").label("snippet"),
+                        literal_column("0.0").label("score")]
+        return (
+            select(*columns)
+            .where(and_(*like_conditions, *conditions))
+            .order_by(model_class.id)
+        )
+
+    fts = table(index.name, column("rowid"), column(index.name))
+    fts_ref = literal_column(index.name)
+    score = func.bm25(fts_ref, *index.weights)
+    columns = [model_class]
+    if with_snippets:
+        columns += [
+            func.highlight(fts_ref, 0, MARK_OPEN, MARK_CLOSE).label("title_highlight"),
+            func.snippet(fts_ref, len(index.columns) - 1, MARK_OPEN, MARK_CLOSE,
+                         SNIPPET_ELLIPSIS, SNIPPET_TOKENS).label("snippet"),
+            score.label("score"),
+        ]
+    return (
+        select(*columns)
+        .join(fts, fts.c.rowid == model_class.id)
+        .where(fts.c[index.name].match(_match_expression(index, fields, terms)), *conditions)
+        .order_by(score, model_class.id)
+    )
+
+
+def count_statement(statement: Select) -> Select:
+    """搜索语句对应的总数查询"""
+    return select(func.count()).select_from(
+        statement.with_only_columns(literal_column("1")).order_by(None).subquery()
+    )
+
+
+def render_highlight(marked: Optional[str]) -> Optional[str]:
+    """把以 MARK_OPEN/MARK_CLOSE 标记命中词的原文转为 HTML：先转义原文，再替换为 <mark> 标签"""
+    if marked is None:
+        return None
+    return html.escape(marked).replace(MARK_OPEN, HIGHLIGHT_OPEN).replace(MARK_CLOSE, HIGHLIGHT_CLOSE)
+
+
+def highlight_text(text: Optional[str], search_term: str, max_chars: Optional[int] = None) -> Optional[str]:
+    """
+    在 Python 中标记命中词（LIKE 退回路径没有 FTS5 的 highlight/snippet 函数），返回转义后的 HTML
+
+    max_chars 不为空时截取第一个命中词附近的片段。
+    """
+    if not text:
+        return text
+    terms = split_search_terms(search_term)
+    if not terms:
+        return html.escape(text)
+    pattern = re.compile("|".join(re.escape(term) for term in sorted(terms, key=len, reverse=True)),
+                         re.IGNORECASE)
+    if max_chars is not None and len(text) > max_chars:
+        first = pattern.search(text)
+        start = max((first.start() if first else 0) - max_chars // 3, 0)
+        end = start + max_chars
+        text = ((SNIPPET_ELLIPSIS if start > 0 else "") + text[start:end]
+                + (SNIPPET_ELLIPSIS if end < len(text) else ""))
+    return render_highlight(pattern.sub(lambda m: f"{MARK_OPEN}{m.group(0)}{MARK_CLOSE}", text))
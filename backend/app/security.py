@@ -8,16 +8,130 @@ import re
 import logging
 from typing import Any, Dict, List, Optional, Union
 from sqlalchemy.orm import Session, Query
-from sqlalchemy import text, and_, or_
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import text, and_, or_, select, func
 from sqlalchemy.exc import SQLAlchemyError
 from fastapi import HTTPException, status
 
+from .config import settings
+from .search_index import build_search_statement, count_statement
+from .pagination import KeysetCursor, keyset_page
+
 logger = logging.getLogger(__name__)
 
 class SQLInjectionError(Exception):
     """SQL注入攻击检测异常"""
     pass
 
+class InputLimitExceededError(Exception):
+    """输入数据超出嵌套深度、节点数或字节数限制"""
+    pass
+
+class SanitizeBudget:
+    """
+    一次清理操作的资源预算
+
+    同一个请求体的所有字段共享一个预算；超出任何一项限制都抛出 InputLimitExceededError。
+    未指定的限制取配置中的默认值。
+    """
+
+    def __init__(self, max_depth: Optional[int] = None, max_nodes: Optional[int] = None,
+                 max_bytes: Optional[int] = None):
+        self.max_depth = settings.SANITIZE_MAX_DEPTH if max_depth is None else max_depth
+        self.max_nodes = settings.SANITIZE_MAX_NODES if max_nodes is None else max_nodes
+        self.max_bytes = settings.SANITIZE_MAX_BYTES if max_bytes is None else max_bytes
+        self.nodes = 0
+        self.bytes = 0
+
+    def visit(self, value: Any, depth: int):
+        """记录访问一个节点（容器或叶子值）"""
+        self.nodes += 1
+        if self.nodes > self.max_nodes:
+            raise InputLimitExceededError(f"输入数据节点数超过限制 {self.max_nodes}")
+        if depth > self.max_depth:
+            raise InputLimitExceededError(f"输入数据嵌套深度超过限制 {self.max_depth}")
+        if isinstance(value, str):
+            self.bytes += len(value) if value.isascii() else len(value.encode("utf-8"))
+            if self.bytes > self.max_bytes:
+                raise InputLimitExceededError(f"输入数据大小超过限制 {self.max_bytes} 字节")
+
+class _SanitizeFrame:
+    """迭代清理时的一层容器：只在子值真正改变时才复制（写时复制）"""
+
+    __slots__ = ("source", "items", "copy", "key", "depth")
+
+    def __init__(self, source: Union[dict, list, tuple], depth: int):
+        self.source = source
+        self.items = iter(source.items()) if isinstance(source, dict) else enumerate(source)
+        # 元组总是转换为列表（与原有行为一致）
+        self.copy = list(source) if isinstance(source, tuple) else None
+        self.key = None
+        self.depth = depth
+
+    def put(self, key: Any, old_value: Any, new_value: Any):
+        if new_value is old_value:
+            return
+        if self.copy is None:
+            self.copy = dict(self.source) if isinstance(self.source, dict) else list(self.source)
+        self.copy[key] = new_value
+
+    def result(self) -> Union[dict, list]:
+        return self.source if self.copy is None else self.copy
+
+# str.lower() 之后，IGNORECASE 下仍与 ASCII 字母等价的非 ASCII 字符（ı ~ i、ſ ~ s），
+# 查找触发字面量前先折叠，保证不会漏掉规则的任何匹配
+_ASCII_CASE_EQUIVALENTS = str.maketrans({"\u0131": "i", "\u017f": "s"})
+
+class InjectionDetector:
+    """
+    预编译的SQL注入检测引擎
+
+    每条规则配一组触发字面量，规则的任何匹配都必须从其中一个字面量开始。
+    先用全部字面量组成的正则扫描一遍（正常输入大多到此为止），再对含有触发字面量的规则，
+    用以字面量开头的正则（可走 sre 的前缀快速扫描）逐个定位候选位置，只在候选位置用原规则 match 验证。
+    结果与逐条 re.search 完全一致，但不再对每条以 \\b 开头的规则逐字符尝试匹配。
+    """
+
+    def __init__(self, patterns: List[str], triggers: List[tuple]):
+        if len(patterns) != len(triggers) or not all(triggers):
+            raise ValueError("每条注入规则都必须配置触发字面量")
+        literals = {literal for group in triggers for literal in group}
+        self._any_trigger = re.compile("|".join(re.escape(literal) for literal in sorted(literals)))
+        self._rules = [
+            (
+                tuple(group),
+                re.compile("|".join(re.escape(literal) for literal in group)),
+                re.compile(pattern, re.IGNORECASE)
+            )
+            for pattern, group in zip(patterns, triggers)
+        ]
+
+    def search(self, input_value: str) -> Optional[str]:
+        """返回第一条命中的规则；未命中返回 None"""
+        lower_input = input_value.lower()
+        probe = lower_input
+        if not lower_input.isascii() and ("\u0131" in lower_input or "\u017f" in lower_input):
+            # 一对一替换，下标与 lower_input 保持一致
+            probe = lower_input.translate(_ASCII_CASE_EQUIVALENTS)
+        if not self._any_trigger.search(probe):
+            return None
+
+        for literals, trigger, rule in self._rules:
+            for literal in literals:
+                if literal in probe:
+                    break
+            else:
+                continue
+            candidate = trigger.search(probe)
+            while candidate:
+                start = candidate.start()
+                # match 从候选位置开始，\b 仍会参考前一个字符
+                if rule.match(lower_input, start):
+                    return rule.pattern
+                # 从下一个字符继续，不漏掉相互重叠的字面量
+                candidate = trigger.search(probe, start + 1)
+        return None
+
 class SecurityQueryBuilder:
     """安全查询构建器"""
     
@@ -46,6 +160,31 @@ class SecurityQueryBuilder:
         r"(\bsleep\s*\()",
     ]
     
+    # 与 INJECTION_PATTERNS 一一对应的触发字面量（小写），修改规则时必须同步修改
+    INJECTION_TRIGGERS = [
+        ("union", "select", "insert", "update", "delete", "drop", "create", "alter", "exec"),
+        ("--", "#", "/*", "*/"),
+        ("or", "and"),
+        ("or", "and"),
+        (";", "||", "&&"),
+        ("xp_cmdshell",),
+        ("sp_executesql",),
+        ("into",),
+        ("load_file",),
+        ("char",),
+        ("hex",),
+        ("concat",),
+        ("substring",),
+        ("ascii",),
+        ("order",),
+        ("group",),
+        ("having",),
+        ("limit",),
+        ("waitfor",),
+        ("benchmark",),
+        ("sleep",),
+    ]
+    
     @classmethod
     def detect_sql_injection(cls, input_value: str) -> bool:
         """
@@ -60,54 +199,81 @@ class SecurityQueryBuilder:
         if not isinstance(input_value, str):
             return False
         
-        # 转换为小写进行检测
-        lower_input = input_value.lower()
-        
-        for pattern in cls.INJECTION_PATTERNS:
-            if re.search(pattern, lower_input, re.IGNORECASE):
-                logger.warning(f"检测到潜在SQL注入攻击: {input_value}")
-                return True
+        if _injection_detector.search(input_value) is not None:
+            logger.warning(f"检测到潜在SQL注入攻击: {input_value}")
+            return True
         
         return False
     
     @classmethod
-    def sanitize_input(cls, input_value: Any) -> Any:
+    def sanitize_string(cls, input_value: str) -> str:
+        """
+        清理单个字符串：检测SQL注入，去除首尾空白并转义单引号
+        
+        Raises:
+            SQLInjectionError: 检测到SQL注入攻击时抛出
+        """
+        # 检测SQL注入
+        if cls.detect_sql_injection(input_value):
+            raise SQLInjectionError(f"检测到SQL注入攻击模式: {input_value}")
+        
+        # 基本清理：移除首尾空白，转义单引号；没有变化时返回原对象
+        return input_value.strip().replace("'", "''")
+    
+    @classmethod
+    def sanitize_input(cls, input_value: Any, budget: Optional[SanitizeBudget] = None) -> Any:
         """
         清理输入数据，防止SQL注入
         
+        用显式栈迭代遍历嵌套的 dict / list，不受 Python 递归深度限制；
+        只有值真正改变的容器才会被复制，没有变化的子树原样返回，非字符串叶子直接跳过。
+        元组会转换为列表，dict 的键不做检查。
+        
         Args:
             input_value: 输入值
+            budget: 资源预算，默认使用配置中的限制
             
         Returns:
             清理后的值
             
         Raises:
             SQLInjectionError: 检测到SQL注入攻击时抛出
+            InputLimitExceededError: 超出嵌套深度、节点数或字节数限制时抛出
         """
-        if input_value is None:
-            return None
-        
         if isinstance(input_value, str):
-            # 检测SQL注入
-            if cls.detect_sql_injection(input_value):
-                raise SQLInjectionError(f"检测到SQL注入攻击模式: {input_value}")
-            
-            # 基本清理：移除危险字符
-            sanitized = input_value.strip()
-            
-            # 转义单引号和双引号
-            sanitized = sanitized.replace("'", "''")
-            
-            return sanitized
-        
-        elif isinstance(input_value, (list, tuple)):
-            return [cls.sanitize_input(item) for item in input_value]
-        
-        elif isinstance(input_value, dict):
-            return {key: cls.sanitize_input(value) for key, value in input_value.items()}
+            if budget is not None:
+                budget.visit(input_value, 0)
+            return cls.sanitize_string(input_value)
         
-        else:
+        if not isinstance(input_value, (dict, list, tuple)):
             return input_value
+        
+        budget = budget or SanitizeBudget()
+        budget.visit(input_value, 1)
+        stack = [_SanitizeFrame(input_value, 1)]
+        while True:
+            frame = stack[-1]
+            entry = next(frame.items, None)
+            if entry is None:
+                # 当前容器处理完毕，把结果交给上一层
+                stack.pop()
+                result = frame.result()
+                if not stack:
+                    return result
+                parent = stack[-1]
+                parent.put(parent.key, frame.source, result)
+                continue
+            
+            key, value = entry
+            if isinstance(value, str):
+                budget.visit(value, frame.depth + 1)
+                frame.put(key, value, cls.sanitize_string(value))
+            elif isinstance(value, (dict, list, tuple)):
+                budget.visit(value, frame.depth + 1)
+                frame.key = key
+                stack.append(_SanitizeFrame(value, frame.depth + 1))
+            else:
+                budget.visit(value, frame.depth + 1)
     
     @classmethod
     def build_safe_filter(cls, model_class, filters: Dict[str, Any]) -> List:
@@ -152,6 +318,18 @@ class SecurityQueryBuilder:
         
         return safe_conditions
 
+_injection_detector = InjectionDetector(
+    SecurityQueryBuilder.INJECTION_PATTERNS,
+    SecurityQueryBuilder.INJECTION_TRIGGERS
+)
+
+def _check_search_page(limit: int, offset: int):
+    """校验搜索分页参数"""
+    if offset < 0:
+        raise ValueError("偏移量不能为负数")
+    if limit <= 0:
+        raise ValueError("限制数量必须大于0")
+
 class SafeQueryExecutor:
     """安全查询执行器"""
     
@@ -245,8 +423,78 @@ class SafeQueryExecutor:
                 detail="查询参数无效"
             )
     
+    def safe_keyset_query(self, model_class, filters: Dict[str, Any], order_by: str,
+                          limit: int, offset: int = 0,
+                          cursor: Optional[KeysetCursor] = None, descending: bool = True):
+        """
+        安全的分页过滤查询，支持游标分页
+        
+        Args:
+            model_class: 模型类
+            filters: 过滤条件
+            order_by: 排序字段（以 id 作为第二排序键）
+            limit: 限制数量
+            offset: 偏移量（没有游标时使用）
+            cursor: 解码后的游标（见 pagination.decode_cursor）
+            descending: 是否降序
+            
+        Returns:
+            (查询结果列表, 下一页游标)
+        """
+        try:
+            if not hasattr(model_class, order_by):
+                raise ValueError(f"排序字段 {order_by} 不存在")
+            if offset < 0:
+                raise ValueError("偏移量不能为负数")
+            if limit <= 0 or limit > 1000:  # 限制最大查询数量
+                raise ValueError("限制数量必须在1-1000之间")
+            
+            query = self.db_session.query(model_class)
+            safe_conditions = self.query_builder.build_safe_filter(model_class, filters)
+            if safe_conditions:
+                query = query.filter(and_(*safe_conditions))
+            
+            return keyset_page(query, model_class, order_by, limit, offset, cursor, descending)
+            
+        except (ValueError, SQLAlchemyError) as e:
+            logger.error(f"安全分页查询失败: {e}")
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail="查询参数无效"
+            )
+    
+    def _prepare_search(self, model_class, search_fields: List[str], search_term: str,
+                        filters: Optional[Dict[str, Any]] = None, with_snippets: bool = False):
+        """清理搜索词、校验字段并构建搜索语句；没有有效搜索词或字段时返回 None"""
+        # 清理搜索词
+        safe_search_term = self.query_builder.sanitize_input(search_term)
+        
+        if not safe_search_term or len(safe_search_term.strip()) < 2:
+            return None
+        
+        # 验证搜索字段
+        valid_fields = []
+        for field_name in search_fields:
+            if hasattr(model_class, field_name):
+                valid_fields.append(field_name)
+            else:
+                logger.warning(f"搜索字段 {field_name} 不存在于模型 {model_class.__name__}")
+        
+        if not valid_fields:
+            return None
+        
+        safe_conditions = []
+        if filters:
+            safe_conditions = self.query_builder.build_safe_filter(model_class, filters)
+        
+        # 有全文索引时按 BM25 排序，否则退回 LIKE；过滤条件都在同一条 SQL 中
+        return build_search_statement(
+            model_class, valid_fields, safe_search_term.strip(), safe_conditions, with_snippets
+        )
+    
     def safe_search_query(self, model_class, search_fields: List[str], 
-                         search_term: str, limit: int = 50):
+                         search_term: str, limit: int = 50,
+                         filters: Optional[Dict[str, Any]] = None, offset: int = 0):
         """
         安全的搜索查询
         
@@ -255,40 +503,23 @@ class SafeQueryExecutor:
             search_fields: 搜索字段列表
             search_term: 搜索词
             limit: 限制数量
+            filters: 附加的过滤条件（与搜索条件同时满足）
+            offset: 偏移量
             
         Returns:
-            搜索结果列表
+            搜索结果列表（按相关度排序）
         """
         try:
-            # 清理搜索词
-            safe_search_term = self.query_builder.sanitize_input(search_term)
-            
-            if not safe_search_term or len(safe_search_term.strip()) < 2:
-                return []
-            
-            # 验证搜索字段
-            valid_fields = []
-            for field_name in search_fields:
-                if hasattr(model_class, field_name):
-                    valid_fields.append(getattr(model_class, field_name))
-                else:
-                    logger.warning(f"搜索字段 {field_name} 不存在于模型 {model_class.__name__}")
-            
-            if not valid_fields:
+            _check_search_page(limit, offset)
+            statement = self._prepare_search(model_class, search_fields, search_term, filters)
+            if statement is None:
                 return []
             
-            # 构建搜索条件
-            search_pattern = f"%{safe_search_term}%"
-            search_conditions = [field.like(search_pattern) for field in valid_fields]
-            
             # 执行搜索
-            query = self.db_session.query(model_class).filter(
-                or_(*search_conditions)
-            ).limit(min(limit, 100))  # 限制最大搜索结果
-            
-            return query.all()
+            statement = statement.offset(offset).limit(min(limit, 100))  # 限制最大搜索结果
+            return self.db_session.execute(statement).scalars().all()
             
-        except (SQLInjectionError, SQLAlchemyError) as e:
+        except (ValueError, SQLInjectionError, SQLAlchemyError) as e:
             logger.error(f"安全搜索查询失败: {e}")
             raise HTTPException(
                 status_code=status.HTTP_400_BAD_REQUEST,
@@ -335,17 +566,170 @@ def create_safe_query_executor(db_session: Session) -> SafeQueryExecutor:
     """
     return SafeQueryExecutor(db_session)
 
+class AsyncSafeQueryExecutor:
+    """
+    异步安全查询执行器
+    
+    与 SafeQueryExecutor 的校验规则和错误响应保持一致，供 async def 读接口配合 AsyncSession 使用。
+    """
+    
+    def __init__(self, db_session: AsyncSession):
+        self.db_session = db_session
+        self.query_builder = SecurityQueryBuilder()
+    
+    async def _all(self, statement):
+        result = await self.db_session.execute(statement)
+        return result.scalars().all()
+    
+    # 搜索语句的构建与同步执行器相同，只有执行方式不同
+    _prepare_search = SafeQueryExecutor._prepare_search
+    
+    async def safe_get_by_id(self, model_class, item_id: Union[int, str]):
+        """安全的按ID查询，返回查询结果或None"""
+        try:
+            if isinstance(item_id, str):
+                if not item_id.isdigit():
+                    raise ValueError("ID必须是数字")
+                item_id = int(item_id)
+            
+            return await self.db_session.get(model_class, item_id)
+            
+        except (ValueError, SQLAlchemyError) as e:
+            logger.error(f"安全查询失败: {e}")
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail="无效的查询参数"
+            )
+    
+    async def safe_filter_query(self, model_class, filters: Dict[str, Any], 
+                               limit: Optional[int] = None, 
+                               offset: Optional[int] = None,
+                               order_by: Optional[str] = None):
+        """安全的过滤查询，参数含义同 SafeQueryExecutor.safe_filter_query"""
+        try:
+            safe_conditions = self.query_builder.build_safe_filter(model_class, filters)
+            
+            statement = select(model_class)
+            if safe_conditions:
+                statement = statement.where(and_(*safe_conditions))
+            
+            if order_by:
+                if not hasattr(model_class, order_by):
+                    raise ValueError(f"排序字段 {order_by} 不存在")
+                statement = statement.order_by(getattr(model_class, order_by))
+            
+            if offset is not None:
+                if offset < 0:
+                    raise ValueError("偏移量不能为负数")
+                statement = statement.offset(offset)
+            
+            if limit is not None:
+                if limit <= 0 or limit > 1000:  # 限制最大查询数量
+                    raise ValueError("限制数量必须在1-1000之间")
+                statement = statement.limit(limit)
+            
+            return await self._all(statement)
+            
+        except (ValueError, SQLAlchemyError) as e:
+            logger.error(f"安全过滤查询失败: {e}")
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail="查询参数无效"
+            )
+    
+    async def safe_search_query(self, model_class, search_fields: List[str], 
+                               search_term: str, limit: int = 50,
+                               filters: Optional[Dict[str, Any]] = None, offset: int = 0):
+        """安全的搜索查询，参数含义同 SafeQueryExecutor.safe_search_query"""
+        try:
+            _check_search_page(limit, offset)
+            statement = self._prepare_search(model_class, search_fields, search_term, filters)
+            if statement is None:
+                return []
+            
+            return await self._all(statement.offset(offset).limit(min(limit, 100)))  # 限制最大搜索结果
+            
+        except (ValueError, SQLInjectionError, SQLAlchemyError) as e:
+            logger.error(f"安全搜索查询失败: {e}")
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail="搜索参数无效"
+            )
+    
+    async def safe_search_page(self, model_class, search_fields: List[str], 
+                              search_term: str, limit: int = 20, offset: int = 0,
+                              filters: Optional[Dict[str, Any]] = None):
+        """
+        带高亮和摘要的分页搜索
+        
+        Returns:
+            (结果行列表, 总数)；每行为 (模型对象, 标题高亮, 摘要片段, 相关度得分)，
+            没有使用全文索引时高亮、摘要为 None
+        """
+        try:
+            _check_search_page(limit, offset)
+            statement = self._prepare_search(
+                model_class, search_fields, search_term, filters, with_snippets=True
+            )
+            if statement is None:
+                return [], 0
+            
+            total = (await self.db_session.execute(count_statement(statement))).scalar_one()
+            if total <= offset:
+                return [], total
+            result = await self.db_session.execute(statement.offset(offset).limit(min(limit, 100)))
+            return result.all(), total
+            
+        except (ValueError, SQLInjectionError, SQLAlchemyError) as e:
+            logger.error(f"安全搜索查询失败: {e}")
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail="搜索参数无效"
+            )
+    
+    async def safe_count_query(self, model_class, filters: Dict[str, Any] = None):
+        """安全的计数查询，返回符合条件的记录数量"""
+        try:
+            statement = select(func.count()).select_from(model_class)
+            
+            if filters:
+                safe_conditions = self.query_builder.build_safe_filter(model_class, filters)
+                if safe_conditions:
+                    statement = statement.where(and_(*safe_conditions))
+            
+            result = await self.db_session.execute(statement)
+            return result.scalar_one()
+            
+        except (SQLInjectionError, SQLAlchemyError) as e:
+            logger.error(f"安全计数查询失败: {e}")
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail="计数查询失败"
+            )
+
+def create_async_safe_query_executor(db_session: AsyncSession) -> AsyncSafeQueryExecutor:
+    """
+    创建异步安全查询执行器
+    
+    Args:
+        db_session: 异步数据库会话
+        
+    Returns:
+        AsyncSafeQueryExecutor实例
+    """
+    return AsyncSafeQueryExecutor(db_session)
+
 # 装饰器：自动进行SQL注入检测
 def sql_injection_protection(func):
     """
     SQL注入防护装饰器
     
-    自动检测函数参数中的SQL注入攻击模式
+    自动检测函数参数中的SQL注入攻击模式，同时支持普通函数和 async 函数
     """
     import functools
+    import inspect
     
-    @functools.wraps(func)
-    def wrapper(*args, **kwargs):
+    def check_arguments(args, kwargs):
         # 检测所有字符串参数
         for arg in args:
             if isinstance(arg, str) and SecurityQueryBuilder.detect_sql_injection(arg):
@@ -362,7 +746,18 @@ def sql_injection_protection(func):
                     status_code=status.HTTP_400_BAD_REQUEST,
                     detail="输入包含非法字符"
                 )
+    
+    if inspect.iscoroutinefunction(func):
+        @functools.wraps(func)
+        async def async_wrapper(*args, **kwargs):
+            check_arguments(args, kwargs)
+            return await func(*args, **kwargs)
         
+        return async_wrapper
+    
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        check_arguments(args, kwargs)
         return func(*args, **kwargs)
     
     return wrapper
@@ -440,6 +835,8 @@ def validate_and_sanitize_input(data: Dict[str, Any]) -> Dict[str, Any]:
     # 对于某些已知安全的字段，跳过SQL注入检测
     safe_fields = {'user_agent', 'referrer', 'session_id', 'visitor_ip'}
     
+    # 整个请求体的所有字段共享一个预算
+    budget = SanitizeBudget()
     try:
         cleaned_data = {}
         for key, value in data.items():
@@ -448,7 +845,7 @@ def validate_and_sanitize_input(data: Dict[str, Any]) -> Dict[str, Any]:
                 cleaned_data[key] = value.strip() if value else value
             else:
                 # 对其他字段进行完整的安全检查
-                cleaned_data[key] = SecurityQueryBuilder.sanitize_input(value)
+                cleaned_data[key] = SecurityQueryBuilder.sanitize_input(value, budget)
         return cleaned_data
     except SQLInjectionError as e:
         logger.error(f"输入验证失败: {e}")
@@ -456,6 +853,12 @@ def validate_and_sanitize_input(data: Dict[str, Any]) -> Dict[str, Any]:
             status_code=status.HTTP_400_BAD_REQUEST,
             detail="输入包含非法字符"
         )
+    except InputLimitExceededError as e:
+        logger.warning(f"输入验证失败: {e}")
+        raise HTTPException(
+            status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+            detail="输入数据超出限制"
+        )
 
 # 安全的原生SQL执行
 def execute_safe_raw_sql(db_session: Session, sql_template: str, 
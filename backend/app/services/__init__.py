@@ -4,5 +4,30 @@
 """
 
 from .product_file_service import ProductFileService, product_file_service
+from .db_writer_service import DatabaseWriterService, db_writer_service, WriteQueueFullError
+from .response_cache import ResponseCache, response_cache, cached_response, invalidates_response_cache
+from .session_cache import SessionCache, session_cache
+from .expiry_sweeper import ExpirySweeper, expiry_sweeper
+from .api_token_cache import ApiTokenCache, api_token_cache, TokenUsageRecorder, token_usage_recorder
+from .analytics_rollup import StatsRollupJob, stats_rollup_job
+from .telemetry_buffer import TelemetryBuffer, TelemetryBufferFullError, telemetry_buffer
+from .retention import RetentionJob, RetentionPolicy, retention_job
+from .product_data_store import DataQuotaExceededError
+from .data_access_recorder import DataAccessRecorder, data_access_recorder
+from .data_blob_store import DataBlobCollector, DataBlobStore, data_blob_collector, data_blob_store
 
-__all__ = ['ProductFileService', 'product_file_service']
\ No newline at end of file
+__all__ = [
+    'ProductFileService', 'product_file_service',
+    'DatabaseWriterService', 'db_writer_service', 'WriteQueueFullError',
+    'ResponseCache', 'response_cache', 'cached_response', 'invalidates_response_cache',
+    'SessionCache', 'session_cache',
+    'ExpirySweeper', 'expiry_sweeper',
+    'ApiTokenCache', 'api_token_cache', 'TokenUsageRecorder', 'token_usage_recorder',
+    'StatsRollupJob', 'stats_rollup_job',
+    'TelemetryBuffer', 'TelemetryBufferFullError', 'telemetry_buffer',
+    'RetentionJob', 'RetentionPolicy', 'retention_job',
+    'DataQuotaExceededError',
+    'DataAccessRecorder', 'data_access_recorder',
+    'DataBlobStore', 'data_blob_store',
+    'DataBlobCollector', 'data_blob_collector'
+]
\ No newline at end of file
@@ -0,0 +1,422 @@
+"""
+访问统计汇总服务
+后台任务按主键顺序把 product_stats 的新行汇总进小时汇总表 product_stats_rollups
+（访问次数、时长总和、最近访问时间、访客集合）和每日访客集合表 product_visitor_daily，
+并记录已汇总到的最大 ID（水位线）。
+
+独立访客数由访客集合合并得到：范围内完整的日期读取每日集合，首尾不完整的日期读取小时集合，
+合并结果的大小有上限（见 visitor_sketch），与时间范围长短无关。
+
+分析接口读取「时间范围内的汇总行 + 水位线之后尚未汇总的原始行」，结果与直接扫描原始表一致，
+无论原始行来自单条上报、批量上报还是直接写库；未汇总的尾部最多是一个汇总周期内的新数据。
+时间范围按小时对齐；access_time 为空的记录不属于任何时间桶，只在不限时间范围时直接从原始表计入。
+"""
+
+import asyncio
+import logging
+import time
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, List, Optional, Tuple
+
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+
+from ..config import settings
+from ..models import ProductStats, ProductStatsRollup, ProductVisitorDaily, RollupWatermark
+from .db_writer_service import DatabaseWriterService, db_writer_service
+from .visitor_sketch import VisitorSketch
+
+logger = logging.getLogger(__name__)
+
+# 按 ID 批量读取时每条语句的参数个数
+_ID_CHUNK = 500
+
+STATS_SOURCE = "product_stats"
+
+# 预设的时间范围
+RANGE_PRESETS: Dict[str, timedelta] = {
+    "24h": timedelta(hours=24),
+    "7d": timedelta(days=7),
+    "30d": timedelta(days=30),
+}
+
+
+def _naive_utc(value: datetime) -> datetime:
+    # SQLite 中的时间均为不带时区的 UTC
+    if value.tzinfo is not None:
+        value = value.astimezone(timezone.utc).replace(tzinfo=None)
+    return value
+
+
+def hour_bucket(value: datetime) -> datetime:
+    """时间所在小时的起点（不带时区的 UTC）"""
+    return _naive_utc(value).replace(minute=0, second=0, microsecond=0)
+
+
+def day_bucket(value: datetime) -> datetime:
+    """时间所在日期的零点（不带时区的 UTC）"""
+    return hour_bucket(value).replace(hour=0)
+
+
+def resolve_range(range_name: str = "all", start: Optional[datetime] = None,
+                  end: Optional[datetime] = None,
+                  now: Optional[datetime] = None) -> Tuple[Optional[datetime], Optional[datetime]]:
+    """
+    把范围参数解析为按小时对齐的 [起点, 终点)
+
+    Args:
+        range_name: 24h / 7d / 30d / all / custom
+        start: 自定义范围起点（custom 时必填）
+        end: 自定义范围终点（可选，默认当前时间）
+        now: 当前时间（测试用）
+
+    Returns:
+        (起点, 终点)；all 时均为 None
+
+    Raises:
+        ValueError: 范围名称无效或自定义范围不合法
+    """
+    now = now or datetime.now(timezone.utc)
+    if range_name == "all":
+        return None, None
+    if range_name in RANGE_PRESETS:
+        start, end = now - RANGE_PRESETS[range_name], now
+    elif range_name == "custom":
+        if start is None:
+            raise ValueError("自定义范围需要提供 start")
+        end = end or now
+    else:
+        raise ValueError(f"不支持的时间范围: {range_name}")
+    start_bucket = hour_bucket(start)
+    end_bucket = hour_bucket(end)
+    if end_bucket < _naive_utc(end):
+        end_bucket += timedelta(hours=1)  # 包含终点所在的小时
+    if end_bucket <= start_bucket:
+        raise ValueError("时间范围的终点必须晚于起点")
+    return start_bucket, end_bucket
+
+
+# ==================== 汇总读取 ====================
+
+@dataclass
+class StatsSummary:
+    """一段时间内的访问汇总"""
+    total_visits: int = 0
+    duration_sum: int = 0
+    last_access: Optional[datetime] = None
+    visitors: VisitorSketch = field(default_factory=VisitorSketch)
+    hour_counts: Dict[int, int] = field(default_factory=dict)
+
+    @property
+    def unique_visitors(self) -> int:
+        return self.visitors.cardinality()
+
+    @property
+    def average_duration(self) -> float:
+        return self.duration_sum / self.total_visits if self.total_visits else 0.0
+
+    @property
+    def popular_times(self):
+        return [{"hour": hour, "visits": count} for hour, count in sorted(self.hour_counts.items())]
+
+    def _add(self, hour: int, visits: int, duration_sum: int, last_access: Optional[datetime]):
+        self.total_visits += visits
+        self.duration_sum += duration_sum
+        self.hour_counts[hour] = self.hour_counts.get(hour, 0) + visits
+        if last_access is not None and (self.last_access is None or last_access > self.last_access):
+            self.last_access = last_access
+
+
+def summarize_stats(db: Session, product_id: int, start: Optional[datetime] = None,
+                    end: Optional[datetime] = None) -> StatsSummary:
+    """
+    汇总产品在 [start, end) 内的访问数据（start/end 应按小时对齐，为 None 时不限）
+
+    在同一个读事务中读取水位线、汇总行和未汇总的尾部，三者互相一致。
+    """
+    summary = StatsSummary()
+    watermark = db.execute(
+        select(RollupWatermark.last_id).where(RollupWatermark.source == STATS_SOURCE)
+    ).scalar() or 0
+
+    if watermark:
+        rollups = select(
+            ProductStatsRollup.id, ProductStatsRollup.bucket_start, ProductStatsRollup.visits,
+            ProductStatsRollup.duration_sum, ProductStatsRollup.last_access
+        ).where(ProductStatsRollup.product_id == product_id)
+        if start is not None:
+            rollups = rollups.where(ProductStatsRollup.bucket_start >= start)
+        if end is not None:
+            rollups = rollups.where(ProductStatsRollup.bucket_start < end)
+        buckets = []
+        for rollup_id, bucket_start, visits, duration_sum, last_access in db.execute(rollups):
+            summary._add(bucket_start.hour, visits, duration_sum, last_access)
+            buckets.append((rollup_id, day_bucket(bucket_start)))
+        _merge_visitors(db, summary.visitors, product_id, start, end, buckets)
+
+    # 尚未汇总的尾部：已有水位线时按主键范围扫描（+0 让 SQLite 不选用 product_id 索引扫描整个产品）
+    product_filter = ProductStats.product_id == product_id if not watermark else \
+        (ProductStats.product_id + 0) == product_id
+    tail = select(
+        ProductStats.access_time, ProductStats.duration_seconds, ProductStats.visitor_ip
+    ).where(ProductStats.id > watermark, product_filter, ProductStats.access_time.isnot(None))
+    if start is not None:
+        tail = tail.where(ProductStats.access_time >= start)
+    if end is not None:
+        tail = tail.where(ProductStats.access_time < end)
+    for access_time, duration_seconds, visitor_ip in db.execute(tail):
+        summary._add(access_time.hour, 1, duration_seconds or 0, access_time)
+        summary.visitors.add(visitor_ip)
+
+    if start is None and end is None:
+        # 没有访问时间的记录（极少）不进入汇总表，经 (product_id, access_time) 索引直接读取
+        untimed = select(ProductStats.duration_seconds, ProductStats.visitor_ip).where(
+            ProductStats.product_id == product_id, ProductStats.access_time.is_(None)
+        )
+        for duration_seconds, visitor_ip in db.execute(untimed):
+            summary.total_visits += 1
+            summary.duration_sum += duration_seconds or 0
+            summary.visitors.add(visitor_ip)
+
+    return summary
+
+
+def _merge_visitors(db: Session, visitors: VisitorSketch, product_id: int,
+                    start: Optional[datetime], end: Optional[datetime], buckets: List[Tuple[int, datetime]]):
+    """把范围内的访客集合并入 visitors：完整的日期用每日集合，其余小时桶用小时集合"""
+    daily = select(ProductVisitorDaily.day, ProductVisitorDaily.visitor_sketch).where(
+        ProductVisitorDaily.product_id == product_id
+    )
+    if start is not None:
+        daily = daily.where(ProductVisitorDaily.day >= start)
+    if end is not None:
+        daily = daily.where(ProductVisitorDaily.day < end)
+    covered = set()
+    for day, sketch in db.execute(daily):
+        if end is None or day + timedelta(days=1) <= end:
+            visitors.merge(VisitorSketch.from_bytes(sketch))
+            covered.add(day)
+
+    # 首尾不完整的日期，以及升级前只有小时汇总、还没有每日集合的日期
+    rollup_ids = [rollup_id for rollup_id, day in buckets if day not in covered]
+    for offset in range(0, len(rollup_ids), _ID_CHUNK):
+        sketches = select(ProductStatsRollup.visitor_sketch).where(
+            ProductStatsRollup.id.in_(rollup_ids[offset:offset + _ID_CHUNK])
+        )
+        for (sketch,) in db.execute(sketches):
+            visitors.merge(VisitorSketch.from_bytes(sketch))
+
+
+# ==================== 汇总写入 ====================
+
+@dataclass
+class _BucketDelta:
+    visits: int = 0
+    duration_sum: int = 0
+    last_access: Optional[datetime] = None
+    visitors: VisitorSketch = field(default_factory=VisitorSketch)
+
+
+def _roll_up_batch(session: Session, batch_size: int) -> int:
+    """把水位线之后的一批原始行汇总进小时汇总表，返回处理的原始行数（在写线程中执行）"""
+    watermark = session.get(RollupWatermark, STATS_SOURCE)
+    if watermark is None:
+        watermark = RollupWatermark(source=STATS_SOURCE, last_id=0)
+        session.add(watermark)
+
+    rows = session.execute(
+        select(ProductStats.id, ProductStats.product_id, ProductStats.access_time,
+               ProductStats.duration_seconds, ProductStats.visitor_ip)
+        .where(ProductStats.id > watermark.last_id)
+        .order_by(ProductStats.id)
+        .limit(batch_size)
+    ).all()
+    if not rows:
+        return 0
+
+    deltas: Dict[Tuple[int, datetime], _BucketDelta] = {}
+    daily_visitors: Dict[Tuple[int, datetime], VisitorSketch] = {}
+    for _, product_id, access_time, duration_seconds, visitor_ip in rows:
+        if access_time is None:
+            continue
+        delta = deltas.setdefault((product_id, hour_bucket(access_time)), _BucketDelta())
+        delta.visits += 1
+        delta.duration_sum += duration_seconds or 0
+        delta.visitors.add(visitor_ip)
+        if delta.last_access is None or access_time > delta.last_access:
+            delta.last_access = access_time
+        daily_visitors.setdefault((product_id, day_bucket(access_time)), VisitorSketch()).add(visitor_ip)
+
+    if daily_visitors:
+        # 先于小时汇总写入：新建的每日集合需要并入当天已有的小时集合
+        _merge_daily_visitors(session, daily_visitors)
+
+    if deltas:
+        product_ids = {product_id for product_id, _ in deltas}
+        buckets = [bucket for _, bucket in deltas]
+        existing = {
+            (rollup.product_id, rollup.bucket_start): rollup
+            for rollup in session.query(ProductStatsRollup).filter(
+                ProductStatsRollup.product_id.in_(product_ids),
+                ProductStatsRollup.bucket_start >= min(buckets),
+                ProductStatsRollup.bucket_start <= max(buckets)
+            )
+        }
+        for (product_id, bucket), delta in deltas.items():
+            rollup = existing.get((product_id, bucket))
+            if rollup is None:
+                session.add(ProductStatsRollup(
+                    product_id=product_id,
+                    bucket_start=bucket,
+                    visits=delta.visits,
+                    duration_sum=delta.duration_sum,
+                    last_access=delta.last_access,
+                    visitor_sketch=delta.visitors.to_bytes()
+                ))
+                continue
+            rollup.visits += delta.visits
+            rollup.duration_sum += delta.duration_sum
+            if rollup.last_access is None or delta.last_access > rollup.last_access:
+                rollup.last_access = delta.last_access
+            rollup.visitor_sketch = VisitorSketch.from_bytes(rollup.visitor_sketch).merge(delta.visitors).to_bytes()
+
+    watermark.last_id = rows[-1][0]
+    session.flush()
+    return len(rows)
+
+
+def _merge_daily_visitors(session: Session, daily_visitors: Dict[Tuple[int, datetime], VisitorSketch]):
+    days = [day for _, day in daily_visitors]
+    existing = {
+        (row.product_id, row.day): row
+        for row in session.query(ProductVisitorDaily).filter(
+            ProductVisitorDaily.product_id.in_({product_id for product_id, _ in daily_visitors}),
+            ProductVisitorDaily.day >= min(days),
+            ProductVisitorDaily.day <= max(days)
+        )
+    }
+    for (product_id, day), visitors in daily_visitors.items():
+        row = existing.get((product_id, day))
+        if row is not None:
+            row.visitor_sketch = VisitorSketch.from_bytes(row.visitor_sketch).merge(visitors).to_bytes()
+            continue
+        # 当天的第一批数据通常没有小时汇总；升级前已汇总的日期在这里补齐
+        hourly = session.execute(select(ProductStatsRollup.visitor_sketch).where(
+            ProductStatsRollup.product_id == product_id,
+            ProductStatsRollup.bucket_start >= day,
+            ProductStatsRollup.bucket_start < day + timedelta(days=1)
+        ))
+        for (sketch,) in hourly:
+            visitors.merge(VisitorSketch.from_bytes(sketch))
+        session.add(ProductVisitorDaily(product_id=product_id, day=day, visitor_sketch=visitors.to_bytes()))
+
+
+class StatsRollupJob:
+    """
+    访问统计汇总任务
+
+    每隔 interval_seconds 秒循环汇总 batch_size 行，直到追上最新数据；
+    每批作为一个写操作交给单写者队列，批与批之间让出事件循环。
+    首次运行时从头汇总已有的历史数据。
+    """
+
+    def __init__(
+        self,
+        writer: Optional[DatabaseWriterService] = None,
+        interval_seconds: float = 60,
+        batch_size: int = 5000,
+        enabled: bool = True
+    ):
+        self._writer = writer
+        self.interval_seconds = max(interval_seconds, 1)
+        self.batch_size = max(batch_size, 1)
+        self.enabled = enabled
+        self._task: Optional[asyncio.Task] = None
+        self._runs = 0
+        self._failed_runs = 0
+        self._rows_rolled_up = 0
+        self._last_run: Dict[str, Any] = {}
+
+    @property
+    def writer(self) -> DatabaseWriterService:
+        return self._writer or db_writer_service
+
+    # ==================== 生命周期 ====================
+
+    @property
+    def is_running(self) -> bool:
+        return self._task is not None and not self._task.done()
+
+    def start(self):
+        """在当前事件循环中启动后台汇总任务（重复调用无副作用）"""
+        if not self.enabled or self.is_running:
+            return
+        self._task = asyncio.get_running_loop().create_task(self._run(), name="stats-rollup")
+        logger.info(f"访问统计汇总任务已启动，间隔 {self.interval_seconds} 秒，每批 {self.batch_size} 行")
+
+    async def stop(self):
+        """停止后台汇总任务（未汇总的行由下次启动后继续处理）"""
+        if not self.is_running:
+            return
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+        logger.info("访问统计汇总任务已停止")
+
+    async def _run(self):
+        while True:
+            try:
+                await self.run_once()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                self._failed_runs += 1
+                logger.error(f"访问统计汇总失败: {str(e)}")
+            await asyncio.sleep(self.interval_seconds)
+
+    async def run_once(self) -> int:
+        """汇总到最新数据，返回本轮处理的原始行数"""
+        started_at = time.monotonic()
+        total = 0
+        while True:
+            processed = await self.writer.execute(_roll_up_batch, self.batch_size)
+            total += processed
+            if processed < self.batch_size:
+                break
+            await asyncio.sleep(0)
+
+        self._runs += 1
+        self._rows_rolled_up += total
+        self._last_run = {
+            "finished_at": datetime.now(timezone.utc).isoformat(),
+            "duration_ms": round((time.monotonic() - started_at) * 1000, 3),
+            "rows_rolled_up": total,
+        }
+        return total
+
+    # ==================== 监控 ====================
+
+    def get_metrics(self) -> Dict[str, Any]:
+        """获取汇总次数和处理行数统计"""
+        return {
+            "enabled": self.enabled,
+            "running": self.is_running,
+            "interval_seconds": self.interval_seconds,
+            "batch_size": self.batch_size,
+            "runs": self._runs,
+            "failed_runs": self._failed_runs,
+            "rows_rolled_up": self._rows_rolled_up,
+            "last_run": self._last_run,
+        }
+
+
+# 全局汇总任务实例
+stats_rollup_job = StatsRollupJob(
+    interval_seconds=settings.ANALYTICS_ROLLUP_INTERVAL,
+    batch_size=settings.ANALYTICS_ROLLUP_BATCH_SIZE,
+    enabled=settings.ANALYTICS_ROLLUP_ENABLED
+)
@@ -0,0 +1,298 @@
+"""
+产品 API 令牌缓存与使用计数
+按令牌哈希缓存已验证的令牌（令牌ID、产品ID、权限、过期时间），热令牌验证不再查询
+product_api_tokens；使用次数和最近使用时间先在内存中累加，由后台任务定期批量写回数据库，
+API 调用的热路径上不再有写事务。
+
+缓存在进程内：撤销只能立即失效当前 worker 的条目，其他 worker 最长一个 TTL 后回到数据库确认。
+"""
+
+import asyncio
+import hashlib
+import logging
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Optional, Tuple
+
+from sqlalchemy import func, update
+from sqlalchemy.orm import Session
+
+from ..config import settings
+from ..models import ProductAPIToken
+from .db_writer_service import DatabaseWriterService, db_writer_service
+
+logger = logging.getLogger(__name__)
+
+
+def token_digest(token: str) -> str:
+    """令牌的缓存键：只在内存中保存哈希，不保存令牌明文"""
+    return hashlib.sha256(token.encode("utf-8")).hexdigest()
+
+
+def _timestamp(value: datetime) -> float:
+    # SQLite 读回的 DateTime 不带时区，存储的是 UTC 时间
+    if value.tzinfo is None:
+        value = value.replace(tzinfo=timezone.utc)
+    return value.timestamp()
+
+
+@dataclass
+class CachedApiToken:
+    """一条缓存的已验证令牌"""
+    token_id: int
+    product_id: int
+    permissions: List[str]
+    expires_at: datetime
+    cached_until: float  # 缓存条目的过期时间（time.monotonic）
+
+    @property
+    def is_expired(self) -> bool:
+        return _timestamp(self.expires_at) <= time.time()
+
+
+class ApiTokenCache:
+    """
+    LRU + TTL 令牌缓存
+
+    只缓存有效（is_active）的令牌；已过期的令牌仍可命中，由调用方按 expires_at 返回「已过期」。
+    撤销的令牌在一个 TTL 内不会再被写入，避免撤销事务提交前的并发请求把旧状态缓存回来。
+    """
+
+    def __init__(self, max_entries: int = 1024, ttl_seconds: float = 60, enabled: bool = True):
+        self.max_entries = max(max_entries, 1)
+        self.ttl_seconds = ttl_seconds
+        self.enabled = enabled
+        self._entries: "OrderedDict[str, CachedApiToken]" = OrderedDict()
+        self._revoked: Dict[str, float] = {}  # 令牌哈希 -> 禁止回填截止时间（time.monotonic）
+        self._lock = threading.Lock()
+        self._hits = 0
+        self._misses = 0
+        self._evictions = 0
+        self._invalidations = 0
+
+    def get(self, token: str, product_id: int) -> Optional[CachedApiToken]:
+        """返回属于该产品的缓存令牌；未缓存或缓存过期时返回 None"""
+        if not self.enabled:
+            return None
+        key = token_digest(token)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry.product_id != product_id:
+                self._misses += 1
+                return None
+            if entry.cached_until <= time.monotonic():
+                del self._entries[key]
+                self._misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self._hits += 1
+            return entry
+
+    def set(self, token: str, api_token: ProductAPIToken) -> CachedApiToken:
+        """缓存一个有效令牌，返回构造的条目（缓存关闭或令牌刚被撤销时不写入）"""
+        key = token_digest(token)
+        entry = CachedApiToken(
+            token_id=api_token.id,
+            product_id=api_token.product_id,
+            permissions=list(api_token.permissions or []),
+            expires_at=api_token.expires_at,
+            cached_until=time.monotonic() + self.ttl_seconds
+        )
+        if not self.enabled:
+            return entry
+        with self._lock:
+            revoked_until = self._revoked.get(key)
+            if revoked_until is not None and revoked_until > time.monotonic():
+                return entry
+            self._entries[key] = entry
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self._evictions += 1
+        return entry
+
+    def invalidate(self, token: str) -> bool:
+        """使令牌的缓存失效（撤销时调用），返回是否删除了条目"""
+        key = token_digest(token)
+        now = time.monotonic()
+        with self._lock:
+            self._revoked = {k: until for k, until in self._revoked.items() if until > now}
+            self._revoked[key] = now + self.ttl_seconds
+            removed = self._entries.pop(key, None) is not None
+            if removed:
+                self._invalidations += 1
+            return removed
+
+    def clear(self):
+        """清空全部缓存"""
+        with self._lock:
+            self._entries.clear()
+            self._revoked.clear()
+
+    def get_metrics(self) -> Dict[str, Any]:
+        """获取命中、未命中和淘汰统计"""
+        with self._lock:
+            lookups = self._hits + self._misses
+            return {
+                "enabled": self.enabled,
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+                "ttl_seconds": self.ttl_seconds,
+                "hits": self._hits,
+                "misses": self._misses,
+                "hit_rate": round(self._hits / lookups, 4) if lookups else 0.0,
+                "evictions": self._evictions,
+                "invalidations": self._invalidations,
+            }
+
+
+def _apply_usage(session: Session, usage: List[Tuple[int, int, datetime]]) -> int:
+    """把累计的使用次数和最近使用时间写回令牌表，返回更新的令牌数"""
+    for token_id, count, last_used_at in usage:
+        session.execute(
+            update(ProductAPIToken)
+            .where(ProductAPIToken.id == token_id)
+            .values(
+                usage_count=func.coalesce(ProductAPIToken.usage_count, 0) + count,
+                last_used_at=last_used_at
+            )
+        )
+    return len(usage)
+
+
+class TokenUsageRecorder:
+    """
+    令牌使用计数器
+
+    record() 只在内存中累加；flush() 把累计值作为一个写操作交给单写者队列，
+    写入失败时累计值合并回内存，下次刷新重试。进程异常退出时最多丢失一个刷新周期的计数。
+    """
+
+    def __init__(self, writer: Optional[DatabaseWriterService] = None, flush_interval: float = 5):
+        self._writer = writer
+        self.flush_interval = max(flush_interval, 0.1)
+        self._pending: Dict[int, List[Any]] = {}  # token_id -> [次数, 最近使用时间]
+        self._lock = threading.Lock()
+        self._task: Optional[asyncio.Task] = None
+        self._flushes = 0
+        self._failed_flushes = 0
+        self._uses_flushed = 0
+
+    @property
+    def writer(self) -> DatabaseWriterService:
+        return self._writer or db_writer_service
+
+    def record(self, token_id: int, used_at: Optional[datetime] = None):
+        """记录一次令牌使用"""
+        used_at = used_at or datetime.now(timezone.utc)
+        with self._lock:
+            pending = self._pending.get(token_id)
+            if pending is None:
+                self._pending[token_id] = [1, used_at]
+            else:
+                pending[0] += 1
+                pending[1] = max(pending[1], used_at)
+
+    def pending(self, token_id: int) -> int:
+        """尚未写回数据库的使用次数"""
+        with self._lock:
+            pending = self._pending.get(token_id)
+            return pending[0] if pending else 0
+
+    def _take(self) -> List[Tuple[int, int, datetime]]:
+        with self._lock:
+            pending, self._pending = self._pending, {}
+        return [(token_id, count, used_at) for token_id, (count, used_at) in pending.items()]
+
+    def _restore(self, usage: List[Tuple[int, int, datetime]]):
+        with self._lock:
+            for token_id, count, used_at in usage:
+                pending = self._pending.setdefault(token_id, [0, used_at])
+                pending[0] += count
+                pending[1] = max(pending[1], used_at)
+
+    def clear(self):
+        """丢弃尚未写回的计数"""
+        with self._lock:
+            self._pending.clear()
+
+    async def flush(self) -> int:
+        """把累计的使用计数写回数据库，返回写入的使用次数"""
+        usage = self._take()
+        if not usage:
+            return 0
+        try:
+            await self.writer.execute(_apply_usage, usage)
+        except Exception:
+            self._restore(usage)
+            self._failed_flushes += 1
+            raise
+        uses = sum(count for _, count, _ in usage)
+        self._flushes += 1
+        self._uses_flushed += uses
+        return uses
+
+    # ==================== 生命周期 ====================
+
+    @property
+    def is_running(self) -> bool:
+        return self._task is not None and not self._task.done()
+
+    def start(self):
+        """在当前事件循环中启动定期刷新任务（重复调用无副作用）"""
+        if self.is_running:
+            return
+        self._task = asyncio.get_running_loop().create_task(self._run(), name="token-usage-flusher")
+
+    async def stop(self):
+        """停止定期刷新任务，并把剩余计数写回数据库"""
+        if self.is_running:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        try:
+            await self.flush()
+        except Exception as e:
+            logger.error(f"令牌使用计数写回失败: {str(e)}")
+
+    async def _run(self):
+        while True:
+            await asyncio.sleep(self.flush_interval)
+            try:
+                await self.flush()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.warning(f"令牌使用计数写回失败，将在下次刷新时重试: {str(e)}")
+
+    # ==================== 监控 ====================
+
+    def get_metrics(self) -> Dict[str, Any]:
+        """获取待写回的计数和刷新统计"""
+        with self._lock:
+            pending_uses = sum(count for count, _ in self._pending.values())
+            pending_tokens = len(self._pending)
+        return {
+            "running": self.is_running,
+            "flush_interval": self.flush_interval,
+            "pending_tokens": pending_tokens,
+            "pending_uses": pending_uses,
+            "flushes": self._flushes,
+            "failed_flushes": self._failed_flushes,
+            "uses_flushed": self._uses_flushed,
+        }
+
+
+# 全局实例
+api_token_cache = ApiTokenCache(
+    max_entries=settings.API_TOKEN_CACHE_MAX_ENTRIES,
+    ttl_seconds=settings.API_TOKEN_CACHE_TTL,
+    enabled=settings.API_TOKEN_CACHE_ENABLED
+)
+token_usage_recorder = TokenUsageRecorder(flush_interval=settings.API_TOKEN_USAGE_FLUSH_INTERVAL)
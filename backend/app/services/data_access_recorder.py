@@ -0,0 +1,188 @@
+"""
+产品数据访问统计
+读取产品数据时访问次数和最近访问时间先按 (产品ID, 键) 在内存中累加，由后台任务定期
+用一条批量 UPDATE 写回 product_data_storage，数据读取接口不再开启写事务。
+
+返回给调用方的访问次数是「数据库中的值 + 尚未写回的次数」，写回前后读到的结果一致。
+"""
+
+import asyncio
+import logging
+import threading
+from datetime import datetime, timezone
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from sqlalchemy import bindparam, func, update
+from sqlalchemy.orm import Session
+
+from ..config import settings
+from ..models import ProductDataStorage
+from .db_writer_service import DatabaseWriterService, db_writer_service
+
+logger = logging.getLogger(__name__)
+
+_storage = ProductDataStorage.__table__
+
+_accessed_at = bindparam("b_accessed_at", type_=_storage.c.accessed_at.type)
+
+# 按 (产品ID, 键) 累加访问次数；accessed_at 只前进不后退
+_APPLY_ACCESS = (
+    update(_storage)
+    .where(_storage.c.product_id == bindparam("b_product_id"), _storage.c.storage_key == bindparam("b_key"))
+    .values(
+        access_count=func.coalesce(_storage.c.access_count, 0) + bindparam("b_count"),
+        accessed_at=func.max(func.coalesce(_storage.c.accessed_at, _accessed_at), _accessed_at)
+    )
+)
+
+
+def _apply_access(session: Session, access: List[Tuple[int, str, int, datetime]]) -> int:
+    """把累计的访问次数和最近访问时间写回数据存储表（一次 executemany），返回涉及的键数"""
+    session.connection().execute(_APPLY_ACCESS, [
+        {"b_product_id": product_id, "b_key": key, "b_count": count, "b_accessed_at": accessed_at}
+        for product_id, key, count, accessed_at in access
+    ])
+    return len(access)
+
+
+class DataAccessRecorder:
+    """
+    产品数据访问计数器
+
+    record() 只在内存中累加；flush() 把累计值作为一个写操作交给单写者队列，
+    写入失败时累计值合并回内存，下次刷新重试。进程异常退出时最多丢失一个刷新周期的计数。
+    键被删除时应调用 discard()，避免删除后重建的同名键继承旧计数。
+    """
+
+    def __init__(self, writer: Optional[DatabaseWriterService] = None, flush_interval: float = 5):
+        self._writer = writer
+        self.flush_interval = max(flush_interval, 0.1)
+        self._pending: Dict[Tuple[int, str], List[Any]] = {}  # (产品ID, 键) -> [次数, 最近访问时间]
+        self._lock = threading.Lock()
+        self._task: Optional[asyncio.Task] = None
+        self._flushes = 0
+        self._failed_flushes = 0
+        self._reads_flushed = 0
+
+    @property
+    def writer(self) -> DatabaseWriterService:
+        return self._writer or db_writer_service
+
+    def record(self, product_id: int, keys: Iterable[str], accessed_at: Optional[datetime] = None):
+        """记录一次对若干键的读取"""
+        accessed_at = accessed_at or datetime.now(timezone.utc)
+        with self._lock:
+            for key in keys:
+                pending = self._pending.get((product_id, key))
+                if pending is None:
+                    self._pending[(product_id, key)] = [1, accessed_at]
+                else:
+                    pending[0] += 1
+                    pending[1] = max(pending[1], accessed_at)
+
+    def pending(self, product_id: int, key: str) -> Tuple[int, Optional[datetime]]:
+        """尚未写回数据库的 (访问次数, 最近访问时间)"""
+        with self._lock:
+            pending = self._pending.get((product_id, key))
+            return (pending[0], pending[1]) if pending else (0, None)
+
+    def discard(self, product_id: int, keys: Optional[Iterable[str]] = None):
+        """丢弃已删除键的待写回计数，keys 为 None 时丢弃该产品的全部计数"""
+        with self._lock:
+            if keys is None:
+                for entry in [entry for entry in self._pending if entry[0] == product_id]:
+                    del self._pending[entry]
+            else:
+                for key in keys:
+                    self._pending.pop((product_id, key), None)
+
+    def _take(self) -> List[Tuple[int, str, int, datetime]]:
+        with self._lock:
+            pending, self._pending = self._pending, {}
+        return [(product_id, key, count, accessed_at)
+                for (product_id, key), (count, accessed_at) in pending.items()]
+
+    def _restore(self, access: List[Tuple[int, str, int, datetime]]):
+        with self._lock:
+            for product_id, key, count, accessed_at in access:
+                pending = self._pending.setdefault((product_id, key), [0, accessed_at])
+                pending[0] += count
+                pending[1] = max(pending[1], accessed_at)
+
+    def clear(self):
+        """丢弃尚未写回的计数"""
+        with self._lock:
+            self._pending.clear()
+
+    async def flush(self) -> int:
+        """把累计的访问计数写回数据库，返回写入的访问次数"""
+        access = self._take()
+        if not access:
+            return 0
+        try:
+            await self.writer.execute(_apply_access, access)
+        except Exception:
+            self._restore(access)
+            self._failed_flushes += 1
+            raise
+        reads = sum(count for _, _, count, _ in access)
+        self._flushes += 1
+        self._reads_flushed += reads
+        return reads
+
+    # ==================== 生命周期 ====================
+
+    @property
+    def is_running(self) -> bool:
+        return self._task is not None and not self._task.done()
+
+    def start(self):
+        """在当前事件循环中启动定期刷新任务（重复调用无副作用）"""
+        if self.is_running:
+            return
+        self._task = asyncio.get_running_loop().create_task(self._run(), name="data-access-flusher")
+
+    async def stop(self):
+        """停止定期刷新任务，并把剩余计数写回数据库"""
+        if self.is_running:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        try:
+            await self.flush()
+        except Exception as e:
+            logger.error(f"数据访问计数写回失败: {str(e)}")
+
+    async def _run(self):
+        while True:
+            await asyncio.sleep(self.flush_interval)
+            try:
+                await self.flush()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.warning(f"数据访问计数写回失败，将在下次刷新时重试: {str(e)}")
+
+    # ==================== 监控 ====================
+
+    def get_metrics(self) -> Dict[str, Any]:
+        """获取待写回的计数和刷新统计"""
+        with self._lock:
+            pending_reads = sum(count for count, _ in self._pending.values())
+            pending_keys = len(self._pending)
+        return {
+            "running": self.is_running,
+            "flush_interval": self.flush_interval,
+            "pending_keys": pending_keys,
+            "pending_reads": pending_reads,
+            "flushes": self._flushes,
+            "failed_flushes": self._failed_flushes,
+            "reads_flushed": self._reads_flushed,
+        }
+
+
+# 全局实例
+data_access_recorder = DataAccessRecorder(flush_interval=settings.DATA_ACCESS_FLUSH_INTERVAL)
@@ -0,0 +1,325 @@
+"""
+产品数据大值文件存储
+序列化后超过阈值的产品数据不再以 JSON 保存在 product_data_storage 行内，而是按内容寻址写入
+产品目录下的文件：文件名是 JSON 字节的 SHA-256，行内只保存哈希和编码。相同的值只保存一份。
+
+- 位置：默认在数据库文件旁边的 data_blobs 目录，不能放在对外提供静态文件的目录内（产品数据需要认证）。
+- 编码：raw 为原始 JSON 字节；zlib 为压缩后的字节（只有压缩后更小时才使用）。
+- 写入：先写临时文件再原子重命名；复用已有文件时刷新修改时间。
+- 读取：按块读取并解压，单键读取接口直接把文件内容拼入响应流，不解析 JSON。
+- 回收：删除或覆盖键不会立即删除文件（其他键可能引用同一内容）。DataBlobCollector 定期在写队列中
+  读取仍被引用的哈希，再在写队列之外遍历目录，删除没有行引用且超过宽限期未被写入的文件；
+  宽限期保护刚写入、所在事务尚未提交的文件。
+"""
+
+import asyncio
+import hashlib
+import logging
+import os
+import shutil
+import tempfile
+import time
+import zlib
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any, Dict, Iterator, Optional, Set, Tuple
+
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+
+from ..config import settings
+from ..database import DATABASE_DIR
+from ..models import ProductDataStorage
+from .db_writer_service import DatabaseWriterService, db_writer_service
+from .product_file_service import product_file_service
+
+logger = logging.getLogger(__name__)
+
+ENCODING_RAW = "raw"
+ENCODING_ZLIB = "zlib"
+
+# 各编码的文件后缀
+_SUFFIXES = {ENCODING_RAW: "", ENCODING_ZLIB: ".z"}
+_CHUNK_SIZE = 64 * 1024
+# 回收时文件先改名为该前缀再删除
+_GC_PREFIX = ".gc-"
+# 旧版本的默认目录，位于对外提供静态文件的产品目录内
+LEGACY_DATA_BLOB_DIR = product_file_service.base_dir / "data_blobs"
+
+
+def referenced_hashes(session: Session) -> Set[str]:
+    """读取仍被产品数据引用的文件哈希"""
+    return set(session.execute(
+        select(ProductDataStorage.blob_hash).where(ProductDataStorage.blob_hash.isnot(None)).distinct()
+    ).scalars())
+
+
+class DataBlobStore:
+    """按内容寻址的产品数据文件存储"""
+
+    def __init__(self, root: Path, threshold_bytes: int = 64 * 1024, compress: bool = True,
+                 compress_level: int = 6, gc_grace_seconds: float = 3600):
+        self.root = Path(root)
+        self.threshold_bytes = max(threshold_bytes, 0)
+        self.compress = compress
+        self.compress_level = compress_level
+        self.gc_grace_seconds = max(gc_grace_seconds, 0)
+        self._files_written = 0
+        self._files_reused = 0
+        self._files_reclaimed = 0
+
+    def should_offload(self, size_bytes: int) -> bool:
+        """序列化后的大小超过阈值时写入文件"""
+        return size_bytes > self.threshold_bytes
+
+    def path_for(self, digest: str, encoding: str) -> Path:
+        return self.root / digest[:2] / f"{digest}{_SUFFIXES[encoding]}"
+
+    def _existing(self, digest: str) -> Optional[Tuple[str, Path]]:
+        for encoding in (ENCODING_ZLIB, ENCODING_RAW):
+            path = self.path_for(digest, encoding)
+            if path.exists():
+                return encoding, path
+        return None
+
+    def put(self, payload: bytes) -> Tuple[str, str]:
+        """
+        保存一个值的 JSON 字节
+
+        Returns:
+            (SHA-256 十六进制哈希, 编码)
+        """
+        digest = hashlib.sha256(payload).hexdigest()
+        existing = self._existing(digest)
+        if existing:
+            encoding, path = existing
+            try:
+                # 刷新修改时间，避免正在被新行引用的文件在宽限期内被回收
+                os.utime(path)
+                self._files_reused += 1
+                return digest, encoding
+            except FileNotFoundError:
+                pass
+
+        encoding, content = ENCODING_RAW, payload
+        if self.compress:
+            compressed = zlib.compress(payload, self.compress_level)
+            if len(compressed) < len(payload):
+                encoding, content = ENCODING_ZLIB, compressed
+
+        path = self.path_for(digest, encoding)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        fd, temp_path = tempfile.mkstemp(dir=path.parent, prefix=".tmp-")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                f.write(content)
+            os.replace(temp_path, path)
+        except BaseException:
+            if os.path.exists(temp_path):
+                os.unlink(temp_path)
+            raise
+        self._files_written += 1
+        return digest, encoding
+
+    def open(self, digest: str, encoding: str) -> Iterator[bytes]:
+        """
+        按块读取值的 JSON 字节（zlib 编码边读边解压）
+
+        文件在调用时打开，文件不存在时立即抛出 FileNotFoundError，而不是在迭代中途
+        """
+        f = open(self.path_for(digest, encoding), "rb")
+        return self._chunks(f, encoding)
+
+    @staticmethod
+    def _chunks(f, encoding: str) -> Iterator[bytes]:
+        with f:
+            decompressor = zlib.decompressobj() if encoding == ENCODING_ZLIB else None
+            while chunk := f.read(_CHUNK_SIZE):
+                if decompressor is not None:
+                    chunk = decompressor.decompress(chunk)
+                if chunk:
+                    yield chunk
+            if decompressor is not None and (tail := decompressor.flush()):
+                yield tail
+
+    def read(self, digest: str, encoding: str) -> bytes:
+        """读取值的全部 JSON 字节"""
+        return b"".join(self.open(digest, encoding))
+
+    def collect_garbage(self, referenced: Set[str]) -> int:
+        """
+        删除不在 referenced 中且超过宽限期的文件，返回删除的文件数
+
+        在写队列之外执行：文件先改名再检查修改时间，改名前被 put() 复用（刷新了修改时间）的文件
+        改回原名；改名后的 put() 找不到文件会重新写入，因此不会删除正在被引用的内容。
+        """
+        if not self.root.exists():
+            return 0
+        cutoff = time.time() - self.gc_grace_seconds
+        reclaimed = 0
+        for path in self.root.glob("*/*"):
+            digest = path.name.split(".")[0]  # 残留的临时文件为空字符串
+            try:
+                if digest in referenced or path.stat().st_mtime > cutoff:
+                    continue
+                doomed = path.with_name(_GC_PREFIX + path.name)
+                os.replace(path, doomed)
+                if doomed.stat().st_mtime > cutoff:
+                    os.replace(doomed, path)
+                    continue
+                doomed.unlink()
+                reclaimed += 1
+            except FileNotFoundError:
+                continue
+        self._files_reclaimed += reclaimed
+        if reclaimed:
+            logger.info(f"已回收 {reclaimed} 个未被引用的产品数据文件")
+        return reclaimed
+
+    def adopt_legacy_files(self, legacy_root: Path) -> int:
+        """
+        把旧默认目录中的文件移到当前目录，返回移动的文件数（启动时调用，可重复执行）
+
+        先写临时文件再原子重命名，多个 worker 同时执行也不会产生不完整的文件。
+        """
+        if not legacy_root.is_dir() or legacy_root.resolve() == self.root.resolve():
+            return 0
+        moved = 0
+        for path in legacy_root.glob("*/*"):
+            if path.name.startswith("."):
+                continue  # 临时文件和待删除的文件
+            target = self.root / path.parent.name / path.name
+            try:
+                if not target.exists():
+                    target.parent.mkdir(parents=True, exist_ok=True)
+                    fd, temp_path = tempfile.mkstemp(dir=target.parent, prefix=".tmp-")
+                    with os.fdopen(fd, "wb") as f, open(path, "rb") as src:
+                        shutil.copyfileobj(src, f)
+                    os.replace(temp_path, target)
+                path.unlink()
+                moved += 1
+            except FileNotFoundError:
+                continue
+        if moved:
+            logger.warning(f"已将 {moved} 个产品数据文件从静态文件目录 {legacy_root} 移到 {self.root}")
+        return moved
+
+    def get_metrics(self) -> Dict[str, Any]:
+        """获取文件写入、复用和回收统计"""
+        return {
+            "root": str(self.root),
+            "threshold_bytes": self.threshold_bytes,
+            "compress": self.compress,
+            "files_written": self._files_written,
+            "files_reused": self._files_reused,
+            "files_reclaimed": self._files_reclaimed,
+        }
+
+
+class DataBlobCollector:
+    """
+    未引用文件的定期回收任务
+
+    每隔 interval_seconds 秒执行一轮：在单写者队列中用一次查询读取仍被引用的哈希，
+    目录遍历和删除在线程中执行，不占用写队列和事件循环。
+    """
+
+    def __init__(self, store: Optional[DataBlobStore] = None, writer: Optional[DatabaseWriterService] = None,
+                 interval_seconds: float = 3600, enabled: bool = True):
+        self._store = store
+        self._writer = writer
+        self.interval_seconds = max(interval_seconds, 1)
+        self.enabled = enabled
+        self._task: Optional[asyncio.Task] = None
+        self._runs = 0
+        self._failed_runs = 0
+        self._files_reclaimed = 0
+        self._last_run: Dict[str, Any] = {}
+
+    @property
+    def store(self) -> DataBlobStore:
+        return self._store or data_blob_store
+
+    @property
+    def writer(self) -> DatabaseWriterService:
+        return self._writer or db_writer_service
+
+    # ==================== 生命周期 ====================
+
+    @property
+    def is_running(self) -> bool:
+        return self._task is not None and not self._task.done()
+
+    def start(self):
+        """在当前事件循环中启动回收任务（重复调用无副作用）"""
+        if not self.enabled or self.is_running:
+            return
+        self._task = asyncio.get_running_loop().create_task(self._run(), name="data-blob-collector")
+        logger.info(f"产品数据文件回收任务已启动，间隔 {self.interval_seconds} 秒")
+
+    async def stop(self):
+        """停止回收任务"""
+        if not self.is_running:
+            return
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+
+    async def _run(self):
+        while True:
+            await asyncio.sleep(self.interval_seconds)
+            try:
+                await self.run_once()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                self._failed_runs += 1
+                logger.error(f"产品数据文件回收失败: {str(e)}")
+
+    # ==================== 回收 ====================
+
+    async def run_once(self) -> int:
+        """执行一轮回收，返回删除的文件数"""
+        started_at = time.monotonic()
+        reclaimed = 0
+        if self.store.root.exists():
+            referenced = await self.writer.execute(referenced_hashes)
+            reclaimed = await asyncio.to_thread(self.store.collect_garbage, referenced)
+        self._runs += 1
+        self._files_reclaimed += reclaimed
+        self._last_run = {
+            "finished_at": datetime.now(timezone.utc).isoformat(),
+            "duration_ms": round((time.monotonic() - started_at) * 1000, 3),
+            "files_reclaimed": reclaimed,
+        }
+        return reclaimed
+
+    # ==================== 监控 ====================
+
+    def get_metrics(self) -> Dict[str, Any]:
+        """获取回收次数和删除文件数统计"""
+        return {
+            "enabled": self.enabled,
+            "running": self.is_running,
+            "interval_seconds": self.interval_seconds,
+            "runs": self._runs,
+            "failed_runs": self._failed_runs,
+            "files_reclaimed": self._files_reclaimed,
+            "last_run": self._last_run,
+        }
+
+
+# 全局实例
+data_blob_store = DataBlobStore(
+    root=Path(settings.DATA_BLOB_DIR) if settings.DATA_BLOB_DIR else DATABASE_DIR / "data_blobs",
+    threshold_bytes=settings.DATA_BLOB_THRESHOLD_BYTES,
+    compress=settings.DATA_BLOB_COMPRESS,
+    gc_grace_seconds=settings.DATA_BLOB_GC_GRACE_SECONDS
+)
+data_blob_collector = DataBlobCollector(
+    interval_seconds=settings.DATA_BLOB_GC_INTERVAL,
+    enabled=settings.DATA_BLOB_GC_ENABLED
+)
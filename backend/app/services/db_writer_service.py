@@ -0,0 +1,297 @@
+"""
+数据库单写者批量提交服务
+由一个专用线程持有写连接，所有排队的写操作在同一个事务中分组提交（group commit），
+把突发的大量小事务合并为少量 fsync，减少 "database is locked" 重试
+"""
+
+import asyncio
+import logging
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, List, Optional
+
+from sqlalchemy.exc import OperationalError
+from sqlalchemy.orm import Session, sessionmaker
+
+from ..config import settings
+
+logger = logging.getLogger(__name__)
+
+
+class WriteQueueFullError(Exception):
+    """写入队列已满"""
+    pass
+
+
+@dataclass
+class WriteJob:
+    """排队中的写操作"""
+    func: Callable[..., Any]
+    args: tuple
+    kwargs: dict
+    future: Future
+    enqueued_at: float = field(default_factory=time.monotonic)
+
+
+# 批大小分布的统计区间（上界，包含）
+BATCH_SIZE_BUCKETS = (1, 4, 16, 64, 256)
+
+# 通知写线程退出的哨兵
+_STOP = object()
+
+
+class DatabaseWriterService:
+    """
+    单写者批量提交服务
+
+    写操作是一个接收 Session 的函数：func(session, *args, **kwargs)。
+    每个写操作在独立的 SAVEPOINT 中执行，单个操作失败只回滚它自己，不影响同批次的其他操作；
+    一批操作共享一次 COMMIT。
+    """
+
+    def __init__(
+        self,
+        session_factory: Optional[sessionmaker] = None,
+        max_batch_size: int = 100,
+        max_batch_latency_ms: float = 10,
+        max_queue_size: int = 10000,
+        max_retries: int = 3
+    ):
+        self._session_factory = session_factory
+        self.max_batch_size = max(max_batch_size, 1)
+        self.max_batch_latency = max(max_batch_latency_ms, 0) / 1000
+        self.max_retries = max_retries
+        self._queue: "queue.Queue[Any]" = queue.Queue(maxsize=max_queue_size)
+        self._thread: Optional[threading.Thread] = None
+        self._start_lock = threading.Lock()
+        self._metrics_lock = threading.Lock()
+        self._reset_metrics()
+
+    def _reset_metrics(self):
+        self._batches_committed = 0
+        self._jobs_committed = 0
+        self._jobs_failed = 0
+        self._batches_failed = 0
+        self._last_batch_size = 0
+        self._max_batch_size_seen = 0
+        self._total_queue_wait = 0.0
+        self._total_commit_time = 0.0
+        self._batch_size_histogram = {bucket: 0 for bucket in BATCH_SIZE_BUCKETS}
+        self._batch_size_histogram["more"] = 0
+
+    # ==================== 生命周期 ====================
+
+    @property
+    def is_running(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+
+    def start(self):
+        """启动写线程（重复调用无副作用）"""
+        with self._start_lock:
+            if self.is_running:
+                return
+            if self._session_factory is None:
+                from ..database import engine
+                self._session_factory = sessionmaker(
+                    autocommit=False, autoflush=False, expire_on_commit=False, bind=engine
+                )
+            self._thread = threading.Thread(target=self._run, name="db-writer", daemon=True)
+            self._thread.start()
+            logger.info("数据库写线程已启动")
+
+    def stop(self, timeout: float = 10.0):
+        """停止写线程，退出前会提交队列中剩余的写操作"""
+        with self._start_lock:
+            if not self.is_running:
+                return
+            self._queue.put(_STOP)
+            self._thread.join(timeout)
+            if self._thread.is_alive():
+                logger.warning(f"数据库写线程未能在 {timeout} 秒内退出")
+            else:
+                logger.info("数据库写线程已停止")
+            self._thread = None
+
+    # ==================== 提交写操作 ====================
+
+    def submit(self, func: Callable[..., Any], *args, **kwargs) -> Future:
+        """
+        提交写操作，立即返回 Future
+
+        需要结果时调用 future.result()；不关心结果时直接忽略返回值即可（失败会记录日志）。
+
+        Raises:
+            WriteQueueFullError: 队列已满
+        """
+        if not self.is_running:
+            self.start()
+
+        future: Future = Future()
+        future.add_done_callback(self._log_failure)
+        try:
+            self._queue.put_nowait(WriteJob(func=func, args=args, kwargs=kwargs, future=future))
+        except queue.Full:
+            raise WriteQueueFullError("写入队列已满")
+        return future
+
+    async def execute(self, func: Callable[..., Any], *args, **kwargs) -> Any:
+        """提交写操作并等待其提交完成（异步接口）"""
+        return await asyncio.wrap_future(self.submit(func, *args, **kwargs))
+
+    def execute_sync(self, func: Callable[..., Any], *args, timeout: Optional[float] = None, **kwargs) -> Any:
+        """提交写操作并阻塞等待其提交完成（同步接口）"""
+        return self.submit(func, *args, **kwargs).result(timeout=timeout)
+
+    @staticmethod
+    def _log_failure(future: Future):
+        if not future.cancelled() and future.exception() is not None:
+            logger.debug(f"写操作失败: {future.exception()!r}")
+
+    # ==================== 写线程 ====================
+
+    def _run(self):
+        stopping = False
+        while not stopping:
+            job = self._queue.get()
+            if job is _STOP:
+                break
+
+            batch = [job]
+            deadline = job.enqueued_at + self.max_batch_latency
+            while len(batch) < self.max_batch_size:
+                remaining = deadline - time.monotonic()
+                try:
+                    next_job = self._queue.get_nowait() if remaining <= 0 else self._queue.get(timeout=remaining)
+                except queue.Empty:
+                    break
+                if next_job is _STOP:
+                    stopping = True
+                    break
+                batch.append(next_job)
+
+            self._commit_batch(batch)
+
+        # 退出前提交剩余的写操作
+        remaining_jobs: List[WriteJob] = []
+        while True:
+            try:
+                job = self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if job is not _STOP:
+                remaining_jobs.append(job)
+        for start in range(0, len(remaining_jobs), self.max_batch_size):
+            self._commit_batch(remaining_jobs[start:start + self.max_batch_size])
+
+    def _commit_batch(self, batch: List[WriteJob]):
+        """在一个事务中执行并提交一批写操作"""
+        batch = [job for job in batch if job.future.set_running_or_notify_cancel()]
+        if not batch:
+            return
+
+        started_at = time.monotonic()
+        attempt = 0
+        while True:
+            outcomes = []
+            session: Session = self._session_factory()
+            try:
+                connection = session.connection()
+                if connection.dialect.name == "sqlite":
+                    # 显式开启事务并立即获取写锁，使 SAVEPOINT 嵌套在同一事务中
+                    connection.exec_driver_sql("BEGIN IMMEDIATE")
+
+                for job in batch:
+                    savepoint = session.begin_nested()
+                    try:
+                        result = job.func(session, *job.args, **job.kwargs)
+                        savepoint.commit()
+                        outcomes.append((job, result, None))
+                    except OperationalError:
+                        raise
+                    except Exception as e:
+                        savepoint.rollback()
+                        outcomes.append((job, None, e))
+
+                session.commit()
+                break
+            except OperationalError as e:
+                session.rollback()
+                attempt += 1
+                if attempt <= self.max_retries:
+                    logger.warning(f"批量提交失败，正在重试 ({attempt}/{self.max_retries}): {str(e)}")
+                    time.sleep(0.05 * attempt)
+                    continue
+                logger.error(f"批量提交失败，重试次数已用完: {str(e)}")
+                self._fail_batch(batch, e)
+                return
+            except Exception as e:
+                session.rollback()
+                logger.error(f"批量提交失败: {str(e)}")
+                self._fail_batch(batch, e)
+                return
+            finally:
+                session.close()
+
+        self._record_batch(batch, outcomes, time.monotonic() - started_at)
+        for job, result, error in outcomes:
+            if error is not None:
+                job.future.set_exception(error)
+            else:
+                job.future.set_result(result)
+
+    def _fail_batch(self, batch: List[WriteJob], error: Exception):
+        with self._metrics_lock:
+            self._batches_failed += 1
+            self._jobs_failed += len(batch)
+        for job in batch:
+            job.future.set_exception(error)
+
+    def _record_batch(self, batch: List[WriteJob], outcomes: list, commit_time: float):
+        now = time.monotonic()
+        failed = sum(1 for _, _, error in outcomes if error is not None)
+        size = len(batch)
+        with self._metrics_lock:
+            self._batches_committed += 1
+            self._jobs_committed += size - failed
+            self._jobs_failed += failed
+            self._last_batch_size = size
+            self._max_batch_size_seen = max(self._max_batch_size_seen, size)
+            self._total_queue_wait += sum(now - job.enqueued_at for job in batch)
+            self._total_commit_time += commit_time
+            bucket = next((b for b in BATCH_SIZE_BUCKETS if size <= b), "more")
+            self._batch_size_histogram[bucket] += 1
+
+    # ==================== 监控 ====================
+
+    def get_metrics(self) -> Dict[str, Any]:
+        """获取队列深度和批量提交统计"""
+        with self._metrics_lock:
+            jobs_total = self._jobs_committed + self._jobs_failed
+            return {
+                "running": self.is_running,
+                "queue_depth": self._queue.qsize(),
+                "max_queue_size": self._queue.maxsize,
+                "max_batch_size": self.max_batch_size,
+                "max_batch_latency_ms": self.max_batch_latency * 1000,
+                "batches_committed": self._batches_committed,
+                "batches_failed": self._batches_failed,
+                "jobs_committed": self._jobs_committed,
+                "jobs_failed": self._jobs_failed,
+                "last_batch_size": self._last_batch_size,
+                "largest_batch_size": self._max_batch_size_seen,
+                "average_batch_size": round(jobs_total / self._batches_committed, 2) if self._batches_committed else 0.0,
+                "average_queue_wait_ms": round(self._total_queue_wait / jobs_total * 1000, 3) if jobs_total else 0.0,
+                "average_commit_ms": round(self._total_commit_time / self._batches_committed * 1000, 3) if self._batches_committed else 0.0,
+                "batch_size_histogram": {str(k): v for k, v in self._batch_size_histogram.items()},
+            }
+
+
+# 全局写服务实例
+db_writer_service = DatabaseWriterService(
+    max_batch_size=settings.WRITE_QUEUE_MAX_BATCH_SIZE,
+    max_batch_latency_ms=settings.WRITE_QUEUE_MAX_LATENCY_MS,
+    max_queue_size=settings.WRITE_QUEUE_MAX_SIZE
+)
@@ -0,0 +1,194 @@
+"""
+过期数据清理服务
+后台 asyncio 任务定期删除已过期的管理员会话、产品用户会话和产品 API 令牌。
+删除按 expires_at 索引分小批进行，每批作为一个写操作交给单写者队列，
+不会长时间占用写锁；可选在清理后执行增量 VACUUM 归还空闲页。
+"""
+
+import asyncio
+import logging
+import time
+from datetime import datetime, timezone
+from typing import Any, Dict, Optional, Tuple, Type
+
+from sqlalchemy import delete, select, text, update
+from sqlalchemy.orm import Session
+
+from ..config import settings
+from ..models import ProductAPICall, ProductAPIToken, ProductUserSession
+from ..models import Session as SessionModel
+from .db_writer_service import DatabaseWriterService, db_writer_service
+
+logger = logging.getLogger(__name__)
+
+# 清理目标：(表名, 模型)，各表都有 expires_at 索引
+SWEEP_TARGETS: Tuple[Tuple[str, Type], ...] = (
+    ("sessions", SessionModel),
+    ("product_user_sessions", ProductUserSession),
+    ("product_api_tokens", ProductAPIToken),
+)
+
+
+def _delete_expired_batch(session: Session, model: Type, now: datetime, batch_size: int) -> int:
+    """删除一批已过期的行，返回删除的行数"""
+    expired_ids = session.execute(
+        select(model.id).where(model.expires_at < now).limit(batch_size)
+    ).scalars().all()
+    if not expired_ids:
+        return 0
+    if model is ProductAPIToken:
+        # SQLite 未开启外键约束，手动执行 ON DELETE SET NULL，避免调用记录指向不存在的令牌
+        session.execute(
+            update(ProductAPICall).where(ProductAPICall.token_id.in_(expired_ids)).values(token_id=None)
+        )
+    session.execute(delete(model).where(model.id.in_(expired_ids)))
+    return len(expired_ids)
+
+
+def _incremental_vacuum(session: Session, pages: int) -> Optional[int]:
+    """
+    执行增量 VACUUM，返回释放的页数；数据库不是 auto_vacuum=INCREMENTAL 时返回 None
+
+    已有数据库需要先执行 PRAGMA auto_vacuum = INCREMENTAL 和一次完整 VACUUM 才能启用
+    """
+    if session.execute(text("PRAGMA auto_vacuum")).scalar() != 2:
+        return None
+    before = session.execute(text("PRAGMA freelist_count")).scalar()
+    # Python sqlite3 每次执行 incremental_vacuum 只推进一步、释放一页，需要逐页执行
+    for _ in range(min(pages, before)):
+        session.execute(text("PRAGMA incremental_vacuum(1)"))
+    return before - session.execute(text("PRAGMA freelist_count")).scalar()
+
+
+class ExpirySweeper:
+    """
+    过期数据清理服务
+
+    每隔 interval_seconds 秒对每张表循环删除 batch_size 行，直到某批不足 batch_size 行；
+    批与批之间让出事件循环，其他写操作可以插队进入写队列。
+    """
+
+    def __init__(
+        self,
+        writer: Optional[DatabaseWriterService] = None,
+        interval_seconds: float = 600,
+        batch_size: int = 500,
+        vacuum_pages: int = 0,
+        enabled: bool = True
+    ):
+        self._writer = writer
+        self.interval_seconds = max(interval_seconds, 1)
+        self.batch_size = max(batch_size, 1)
+        self.vacuum_pages = max(vacuum_pages, 0)
+        self.enabled = enabled
+        self._task: Optional[asyncio.Task] = None
+        self._vacuum_unsupported_logged = False
+        self._runs = 0
+        self._failed_runs = 0
+        self._rows_reclaimed: Dict[str, int] = {name: 0 for name, _ in SWEEP_TARGETS}
+        self._last_run: Dict[str, Any] = {}
+        self._pages_vacuumed = 0
+
+    @property
+    def writer(self) -> DatabaseWriterService:
+        return self._writer or db_writer_service
+
+    # ==================== 生命周期 ====================
+
+    @property
+    def is_running(self) -> bool:
+        return self._task is not None and not self._task.done()
+
+    def start(self):
+        """在当前事件循环中启动后台清理任务（重复调用无副作用）"""
+        if not self.enabled or self.is_running:
+            return
+        self._task = asyncio.get_running_loop().create_task(self._run(), name="expiry-sweeper")
+        logger.info(f"过期数据清理任务已启动，间隔 {self.interval_seconds} 秒，每批 {self.batch_size} 行")
+
+    async def stop(self):
+        """停止后台清理任务"""
+        if not self.is_running:
+            return
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+        logger.info("过期数据清理任务已停止")
+
+    async def _run(self):
+        while True:
+            try:
+                await self.sweep_once()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                self._failed_runs += 1
+                logger.error(f"过期数据清理失败: {str(e)}")
+            await asyncio.sleep(self.interval_seconds)
+
+    # ==================== 清理 ====================
+
+    async def sweep_once(self) -> Dict[str, int]:
+        """执行一轮清理，返回各表删除的行数"""
+        started_at = time.monotonic()
+        now = datetime.now(timezone.utc)
+        reclaimed: Dict[str, int] = {}
+
+        for name, model in SWEEP_TARGETS:
+            total = 0
+            while True:
+                deleted = await self.writer.execute(_delete_expired_batch, model, now, self.batch_size)
+                total += deleted
+                if deleted < self.batch_size:
+                    break
+                await asyncio.sleep(0)
+            reclaimed[name] = total
+            self._rows_reclaimed[name] += total
+
+        pages = None
+        if self.vacuum_pages and any(reclaimed.values()):
+            pages = await self.writer.execute(_incremental_vacuum, self.vacuum_pages)
+            if pages is None and not self._vacuum_unsupported_logged:
+                self._vacuum_unsupported_logged = True
+                logger.warning("数据库未启用 auto_vacuum=INCREMENTAL，跳过增量 VACUUM")
+            self._pages_vacuumed += pages or 0
+
+        self._runs += 1
+        self._last_run = {
+            "finished_at": datetime.now(timezone.utc).isoformat(),
+            "duration_ms": round((time.monotonic() - started_at) * 1000, 3),
+            "rows_reclaimed": reclaimed,
+            "pages_vacuumed": pages,
+        }
+        if any(reclaimed.values()):
+            logger.info(f"过期数据清理完成: {reclaimed}")
+        return reclaimed
+
+    # ==================== 监控 ====================
+
+    def get_metrics(self) -> Dict[str, Any]:
+        """获取清理次数和回收行数统计"""
+        return {
+            "enabled": self.enabled,
+            "running": self.is_running,
+            "interval_seconds": self.interval_seconds,
+            "batch_size": self.batch_size,
+            "vacuum_pages": self.vacuum_pages,
+            "runs": self._runs,
+            "failed_runs": self._failed_runs,
+            "rows_reclaimed": dict(self._rows_reclaimed),
+            "pages_vacuumed": self._pages_vacuumed,
+            "last_run": self._last_run,
+        }
+
+
+# 全局清理服务实例
+expiry_sweeper = ExpirySweeper(
+    interval_seconds=settings.EXPIRY_SWEEP_INTERVAL,
+    batch_size=settings.EXPIRY_SWEEP_BATCH_SIZE,
+    vacuum_pages=settings.EXPIRY_SWEEP_VACUUM_PAGES,
+    enabled=settings.EXPIRY_SWEEP_ENABLED
+)
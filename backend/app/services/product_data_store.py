@@ -0,0 +1,233 @@
+"""
+产品数据存储的批量读写
+嵌入式产品通过 /api/products/{id}/data 保存键值数据。批量接口在一个事务中处理多个键：
+读取是一条 IN 查询（访问次数交给 data_access_recorder 写回），写入是一条依赖 (product_id, storage_key) 唯一索引的 INSERT ... ON CONFLICT，
+删除是一条带 RETURNING 的 DELETE；配额只在写入前检查一次，每个键单独返回处理结果。
+
+序列化后超过 data_blob_store 阈值的值写入按内容寻址的文件，行内只保存哈希；
+写入路径统一经过 storage_fields()，读取路径经过 load_value() / value_chunks()。
+"""
+
+import itertools
+import json
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
+
+from sqlalchemy import delete, func, select
+from sqlalchemy.dialects.sqlite import insert
+from sqlalchemy.orm import Session
+
+from ..models import ProductDataStorage
+from ..security import SecurityQueryBuilder
+from .data_access_recorder import data_access_recorder
+from .data_blob_store import data_blob_store
+
+# 每个产品的存储配额
+DATA_QUOTA_BYTES = 100 * 1024 * 1024
+MAX_KEY_LENGTH = 255
+
+# 单键处理结果
+STATUS_OK = "ok"
+STATUS_CREATED = "created"
+STATUS_UPDATED = "updated"
+STATUS_DELETED = "deleted"
+STATUS_NOT_FOUND = "not_found"
+STATUS_INVALID = "invalid"
+
+
+class DataQuotaExceededError(Exception):
+    """批量写入后会超出产品存储配额"""
+
+    def __init__(self, used_bytes: int, requested_bytes: int, quota_bytes: int):
+        self.used_bytes = used_bytes
+        self.requested_bytes = requested_bytes
+        self.quota_bytes = quota_bytes
+        super().__init__(f"存储配额不足：已使用 {used_bytes} 字节，本次写入后将达到 {requested_bytes} 字节，配额 {quota_bytes} 字节")
+
+
+def key_error(key: str) -> Optional[str]:
+    """检查存储键名，合法时返回 None"""
+    if not isinstance(key, str) or not key or len(key) > MAX_KEY_LENGTH:
+        return "存储键名无效"
+    if SecurityQueryBuilder.detect_sql_injection(key):
+        return "输入包含非法字符"
+    return None
+
+
+def value_bytes(value: Any) -> bytes:
+    """数据的 JSON 序列化字节，也是大值文件的内容"""
+    return json.dumps(value).encode("utf-8")
+
+
+def storage_fields(value: Any, payload: Optional[bytes] = None) -> Dict[str, Any]:
+    """
+    一个值写入 product_data_storage 时的列值
+
+    payload 为已序列化的 JSON 字节；超过阈值时值写入文件，行内 storage_value 为空
+    """
+    payload = value_bytes(value) if payload is None else payload
+    if data_blob_store.should_offload(len(payload)):
+        blob_hash, blob_encoding = data_blob_store.put(payload)
+        return {"storage_value": None, "blob_hash": blob_hash, "blob_encoding": blob_encoding,
+                "size_bytes": len(payload)}
+    return {"storage_value": value, "blob_hash": None, "blob_encoding": None, "size_bytes": len(payload)}
+
+
+def load_value(record) -> Any:
+    """读取记录的值（文件中的值需要完整解析）"""
+    if record.blob_hash:
+        return json.loads(data_blob_store.read(record.blob_hash, record.blob_encoding))
+    return record.storage_value
+
+
+def value_chunks(record) -> Iterator[bytes]:
+    """按块返回记录值的 JSON 字节，文件中的值直接从磁盘读取、不解析"""
+    if record.blob_hash:
+        return data_blob_store.open(record.blob_hash, record.blob_encoding)
+    return iter([value_bytes(record.storage_value)])
+
+
+def json_with_value(envelope: Dict[str, Any], record) -> Iterator[bytes]:
+    """
+    按块生成 {**envelope, "data": 值} 的 JSON，值的字节原样拼入
+
+    文件在调用时打开，文件丢失时在开始响应前抛出 FileNotFoundError
+    """
+    head = json.dumps(envelope)
+    head = f'{head[:-1]}, "data": ' if envelope else '{"data": '
+    return itertools.chain([head.encode("utf-8")], value_chunks(record), [b"}"])
+
+
+def used_bytes(db: Session, product_id: int) -> int:
+    """产品已使用的存储字节数"""
+    return db.execute(
+        select(func.sum(ProductDataStorage.size_bytes)).where(ProductDataStorage.product_id == product_id)
+    ).scalar() or 0
+
+
+def _split_keys(keys: Iterable[str]) -> Tuple[List[str], List[str], Dict[str, str]]:
+    """去重后返回 (全部键, 合法键, 非法键 -> 原因)，保持请求顺序"""
+    ordered = list(dict.fromkeys(keys))
+    invalid = {key: error for key in ordered if (error := key_error(key))}
+    return ordered, [key for key in ordered if key not in invalid], invalid
+
+
+def access_stats(record) -> Tuple[int, Optional[str]]:
+    """记录的 (访问次数, 最近访问时间)，包含尚未写回数据库的访问"""
+    pending_count, pending_at = data_access_recorder.pending(record.product_id, record.storage_key)
+    accessed_at = pending_at or record.accessed_at
+    return (record.access_count or 0) + pending_count, accessed_at.isoformat() if accessed_at else None
+
+
+def _record_dict(record) -> Dict[str, Any]:
+    access_count, accessed_at = access_stats(record)
+    return {
+        "data": load_value(record),
+        "size_bytes": record.size_bytes,
+        "access_count": access_count,
+        "created_at": record.created_at.isoformat() if record.created_at else None,
+        "updated_at": record.updated_at.isoformat() if record.updated_at else None,
+        "accessed_at": accessed_at,
+    }
+
+
+def get_many(db: Session, product_id: int, keys: Iterable[str]) -> List[Dict[str, Any]]:
+    """
+    读取多个键，并与单键读取一样累加访问次数（只读，计数由 data_access_recorder 批量写回）
+
+    Returns:
+        按请求顺序（去重后）排列的单键结果
+    """
+    ordered, valid, invalid = _split_keys(keys)
+    records = {}
+    if valid:
+        records = {
+            record.storage_key: record
+            for record in db.execute(select(ProductDataStorage).where(
+                ProductDataStorage.product_id == product_id,
+                ProductDataStorage.storage_key.in_(valid)
+            )).scalars()
+        }
+        data_access_recorder.record(product_id, records)
+
+    results = []
+    for key in ordered:
+        if key in invalid:
+            results.append({"key": key, "status": STATUS_INVALID, "error": invalid[key]})
+        elif key in records:
+            results.append({"key": key, "status": STATUS_OK, **_record_dict(records[key])})
+        else:
+            results.append({"key": key, "status": STATUS_NOT_FOUND})
+    return results
+
+
+def put_many(db: Session, product_id: int, items: Iterable[Tuple[str, Any]],
+             quota_bytes: Optional[int] = None) -> List[Dict[str, Any]]:
+    """
+    写入多个键（存在则更新，否则创建），同一个键出现多次时以最后一次为准
+
+    Raises:
+        DataQuotaExceededError: 写入后超出配额，整批不写入
+    """
+    quota_bytes = DATA_QUOTA_BYTES if quota_bytes is None else quota_bytes
+    values: Dict[str, Any] = dict(items)
+    ordered, valid, invalid = _split_keys(values)
+    payloads = {key: value_bytes(values[key]) for key in valid}
+    sizes = {key: len(payload) for key, payload in payloads.items()}
+
+    results = {key: {"key": key, "status": STATUS_INVALID, "error": error} for key, error in invalid.items()}
+    if valid:
+        existing = dict(db.execute(select(ProductDataStorage.storage_key, ProductDataStorage.size_bytes).where(
+            ProductDataStorage.product_id == product_id,
+            ProductDataStorage.storage_key.in_(valid)
+        )).all())
+        current = used_bytes(db, product_id)
+        requested = current - sum(size or 0 for size in existing.values()) + sum(sizes.values())
+        if requested > quota_bytes:
+            raise DataQuotaExceededError(current, requested, quota_bytes)
+
+        statement = insert(ProductDataStorage).values([
+            {"product_id": product_id, "storage_key": key, **storage_fields(values[key], payloads[key])}
+            for key in valid
+        ])
+        statement = statement.on_conflict_do_update(
+            index_elements=[ProductDataStorage.product_id, ProductDataStorage.storage_key],
+            set_={
+                "storage_value": statement.excluded.storage_value,
+                "blob_hash": statement.excluded.blob_hash,
+                "blob_encoding": statement.excluded.blob_encoding,
+                "size_bytes": statement.excluded.size_bytes,
+                "updated_at": func.now(),
+            }
+        ).returning(ProductDataStorage.storage_key, ProductDataStorage.created_at, ProductDataStorage.updated_at)
+        for key, created_at, updated_at in db.execute(statement):
+            results[key] = {
+                "key": key,
+                "status": STATUS_UPDATED if key in existing else STATUS_CREATED,
+                "size_bytes": sizes[key],
+                "created_at": created_at.isoformat() if created_at else None,
+                "updated_at": updated_at.isoformat() if updated_at else None,
+            }
+    return [results[key] for key in ordered]
+
+
+def delete_many(db: Session, product_id: int, keys: Iterable[str]) -> List[Dict[str, Any]]:
+    """删除多个键"""
+    ordered, valid, invalid = _split_keys(keys)
+    deleted = set()
+    if valid:
+        deleted = set(db.execute(
+            delete(ProductDataStorage).where(
+                ProductDataStorage.product_id == product_id,
+                ProductDataStorage.storage_key.in_(valid)
+            ).returning(ProductDataStorage.storage_key),
+            execution_options={"synchronize_session": False}
+        ).scalars())
+        data_access_recorder.discard(product_id, deleted)
+
+    results = []
+    for key in ordered:
+        if key in invalid:
+            results.append({"key": key, "status": STATUS_INVALID, "error": invalid[key]})
+        else:
+            results.append({"key": key, "status": STATUS_DELETED if key in deleted else STATUS_NOT_FOUND})
+    return results
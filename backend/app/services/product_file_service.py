@@ -12,6 +12,8 @@ import hashlib
 import mimetypes
 import json
 import re
+import threading
+from functools import wraps
 from pathlib import Path
 from typing import List, Dict, Optional, Tuple, Union, BinaryIO
 from datetime import datetime, timezone
@@ -66,6 +68,17 @@ class SecurityScanResult:
         }
 
 
+def _updates_storage(method):
+    """写入产品目录的方法执行后，重新统计该产品目录的占用（只遍历这一个目录）"""
+    @wraps(method)
+    def wrapper(self, product, *args, **kwargs):
+        try:
+            return method(self, product, *args, **kwargs)
+        finally:
+            self._refresh_product_usage(getattr(product, "id", product))
+    return wrapper
+
+
 class ProductFileService:
     """产品文件存储服务 - 扩展版本"""
     
@@ -88,6 +101,13 @@ class ProductFileService:
         for dir_path in [self.versions_dir, self.backups_dir, self.temp_dir]:
             dir_path.mkdir(exist_ok=True)
         
+        # 存储占用统计：首次读取时全量扫描，之后由写入产品目录的方法增量更新
+        self._storage_lock = threading.Lock()
+        self._product_usage: Dict[int, Tuple[int, int]] = {}  # 产品ID -> (文件数, 字节数)
+        self._storage_totals = [0, 0]  # 文件数, 字节数
+        self._storage_scanned_at: Optional[datetime] = None
+        self._storage_updated_at: Optional[datetime] = None
+        
         # 文件安全配置
         self.max_file_size = 100 * 1024 * 1024  # 100MB
         self.max_total_size = 500 * 1024 * 1024  # 500MB per product
@@ -259,6 +279,7 @@ class ProductFileService:
         """
         return self.base_dir / str(product_id)
     
+    @_updates_storage
     def create_product_directory(self, product_id: int) -> Path:
         """
         为产品创建存储目录（如果已存在则先清理）
@@ -278,6 +299,7 @@ class ProductFileService:
         product_dir.mkdir(parents=True, exist_ok=True)
         return product_dir.absolute()
     
+    @_updates_storage
     def upload_product_files(self, product: ProductModel, file_path: str) -> ProductUploadResponse:
         """
         上传并处理产品文件
@@ -403,6 +425,7 @@ class ProductFileService:
             "total_size": sum(f["size"] for f in files)
         }
     
+    @_updates_storage
     def delete_product_files(self, product_id: int) -> bool:
         """删除产品文件（基于ID的固定路径）"""
         product_dir = self.get_product_directory(product_id)
@@ -459,36 +482,65 @@ class ProductFileService:
         except Exception as e:
             return False, f"验证失败: {str(e)}"
     
-    def get_storage_stats(self) -> Dict:
-        """获取存储统计信息"""
-        if not self.base_dir.exists():
-            return {
-                "total_products": 0,
-                "total_size": 0,
-                "total_files": 0
-            }
-        
-        total_size = 0
+    @staticmethod
+    def _scan_directory_usage(directory: Path) -> Tuple[int, int]:
+        """统计目录下的文件数和字节数"""
         total_files = 0
-        product_count = 0
-        
-        for product_dir in self.base_dir.iterdir():
-            if product_dir.is_dir() and product_dir.name.isdigit():
-                product_count += 1
-                for file_path in product_dir.rglob('*'):
-                    if file_path.is_file():
-                        total_files += 1
-                        total_size += file_path.stat().st_size
+        total_size = 0
+        for file_path in directory.rglob('*'):
+            if file_path.is_file():
+                total_files += 1
+                total_size += file_path.stat().st_size
+        return total_files, total_size
+    
+    def _scan_all_usage(self):
+        """全量扫描所有产品目录（调用方持有 _storage_lock）"""
+        usage = {}
+        if self.base_dir.exists():
+            for product_dir in self.base_dir.iterdir():
+                if product_dir.is_dir() and product_dir.name.isdigit():
+                    usage[int(product_dir.name)] = self._scan_directory_usage(product_dir)
+        self._product_usage = usage
+        self._storage_totals = [sum(files for files, _ in usage.values()), sum(size for _, size in usage.values())]
+        self._storage_scanned_at = self._storage_updated_at = datetime.now(timezone.utc)
+    
+    def _refresh_product_usage(self, product_id: int):
+        """重新统计单个产品目录的占用并调整总数（尚未全量扫描时跳过，首次读取会统计到）"""
+        with self._storage_lock:
+            if self._storage_scanned_at is None:
+                return
+            product_dir = self.get_product_directory(product_id)
+            usage = self._scan_directory_usage(product_dir) if product_dir.is_dir() else None
+            old_files, old_size = self._product_usage.pop(product_id, (0, 0))
+            if usage is not None:
+                self._product_usage[product_id] = usage
+            new_files, new_size = usage or (0, 0)
+            self._storage_totals[0] += new_files - old_files
+            self._storage_totals[1] += new_size - old_size
+            self._storage_updated_at = datetime.now(timezone.utc)
+    
+    def get_storage_stats(self, refresh: bool = False) -> Dict:
+        """
+        获取存储统计信息
         
-        return {
-            "total_products": product_count,
-            "total_size": total_size,
-            "total_files": total_files,
-            "storage_path": str(self.base_dir)
-        }
+        首次调用时全量扫描，之后返回由写入操作增量维护的结果；
+        绕过本服务直接修改的文件只在 refresh=True 重新扫描后计入（scanned_at 为上次全量扫描时间）。
+        """
+        with self._storage_lock:
+            if refresh or self._storage_scanned_at is None:
+                self._scan_all_usage()
+            return {
+                "total_products": len(self._product_usage),
+                "total_size": self._storage_totals[1],
+                "total_files": self._storage_totals[0],
+                "storage_path": str(self.base_dir),
+                "scanned_at": self._storage_scanned_at.isoformat(),
+                "updated_at": self._storage_updated_at.isoformat()
+            }
     
     # ==================== 扩展功能：文件上传下载 ====================
     
+    @_updates_storage
     def upload_individual_file(self, product_id: int, file_name: str, file_content: Union[bytes, BinaryIO], 
                              description: str = None) -> Dict:
         """
@@ -596,6 +648,7 @@ class ProductFileService:
         
         return content, full_path.name, mime_type
     
+    @_updates_storage
     def delete_file(self, product_id: int, file_path: str) -> Dict:
         """
         删除产品文件
@@ -739,6 +792,7 @@ class ProductFileService:
         versions.sort(key=lambda x: x.get('timestamp', ''), reverse=True)
         return versions
     
+    @_updates_storage
     def restore_version(self, product_id: int, version: str) -> Dict:
         """
         恢复到指定版本
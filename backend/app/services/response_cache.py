@@ -0,0 +1,346 @@
+"""
+公开读接口响应缓存
+按「命名空间 + 路由 + 规范化后的查询参数」缓存序列化好的 JSON 响应体，
+命中时跳过数据库查询和 Pydantic 序列化；写接口提交成功后按命名空间/资源ID精确失效。
+缓存的响应带有内容哈希 ETag 和 Last-Modified，配合 ConditionalGetMiddleware 返回 304。
+
+缓存在进程内，多 worker 部署时其他 worker 的旧条目最长保留一个 TTL。
+"""
+
+import functools
+import hashlib
+import inspect
+import logging
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from email.utils import format_datetime
+from typing import Any, Callable, Dict, Hashable, Optional, Tuple
+
+from fastapi import params as fastapi_params
+from fastapi.responses import Response
+from pydantic import TypeAdapter
+
+from ..config import settings
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class CacheEntry:
+    """一条缓存的响应"""
+    body: bytes
+    namespace: str
+    item_id: Optional[Hashable]
+    expires_at: float
+    etag: Optional[str] = None
+    last_modified: Optional[str] = None  # HTTP 日期格式
+
+    def to_response(self) -> Response:
+        """构造 JSON 响应：带验证器，允许浏览器和代理缓存但每次都要重新验证"""
+        headers = {"Cache-Control": CONTENT_CACHE_CONTROL}
+        if self.etag:
+            headers["ETag"] = self.etag
+        if self.last_modified:
+            headers["Last-Modified"] = self.last_modified
+        return Response(content=self.body, media_type="application/json", headers=headers)
+
+
+# 公开内容接口的缓存策略：可以缓存，但使用前必须用 ETag/Last-Modified 重新验证
+CONTENT_CACHE_CONTROL = "no-cache"
+
+
+def content_etag(body: bytes) -> str:
+    """由响应体内容计算强 ETag"""
+    return '"' + hashlib.blake2b(body, digest_size=16).hexdigest() + '"'
+
+
+def last_modified_of(result: Any, not_before: Optional[float] = None) -> Optional[str]:
+    """
+    取结果中所有对象 updated_at 的最大值，格式化为 HTTP 日期
+
+    Args:
+        result: 路由返回的对象或对象列表
+        not_before: 时间下限（Unix 时间戳）。删除记录不会更新任何 updated_at，
+            列表的 Last-Modified 需要不早于命名空间最近一次变更的时间
+    """
+    items = result if isinstance(result, (list, tuple)) else [result]
+    latest: Optional[datetime] = None
+    if not_before is not None:
+        latest = datetime.fromtimestamp(not_before, tz=timezone.utc)
+    for item in items:
+        value = item.get("updated_at") if isinstance(item, dict) else getattr(item, "updated_at", None)
+        if not isinstance(value, datetime):
+            continue
+        if value.tzinfo is None:
+            # SQLite 的 func.now() 存储的是 UTC 时间
+            value = value.replace(tzinfo=timezone.utc)
+        if latest is None or value > latest:
+            latest = value
+    return format_datetime(latest.astimezone(timezone.utc), usegmt=True) if latest else None
+
+
+class ResponseCache:
+    """
+    LRU + TTL 响应缓存
+
+    条目带有命名空间和可选的资源ID：item_id 为 None 的是列表类响应，
+    任何写操作都会使同命名空间的列表失效；带 item_id 的详情响应只在该资源变更时失效。
+    每个命名空间有一个版本号，失效时递增；查询开始后发生过失效的结果不会写入缓存，
+    避免「读到旧数据 → 写操作提交并失效 → 旧数据写入缓存」的竞态。
+    """
+
+    def __init__(self, max_entries: int = 512, ttl_seconds: float = 300, enabled: bool = True):
+        self.max_entries = max(max_entries, 1)
+        self.ttl_seconds = ttl_seconds
+        self.enabled = enabled
+        self._entries: "OrderedDict[Tuple, CacheEntry]" = OrderedDict()
+        self._generations: Dict[str, int] = {}
+        # 各命名空间最近一次失效的时间；未知时按进程启动时间算，重启后不会误返回 304
+        self._changed_at: Dict[str, float] = {}
+        self._started_at = time.time()
+        self._lock = threading.Lock()
+        self._reset_metrics()
+
+    def _reset_metrics(self):
+        self._hits = 0
+        self._misses = 0
+        self._evictions = 0
+        self._expirations = 0
+        self._invalidations = 0
+
+    def generation(self, namespace: str) -> int:
+        """获取命名空间当前的版本号"""
+        with self._lock:
+            return self._generations.get(namespace, 0)
+
+    def changed_at(self, namespace: str) -> float:
+        """获取命名空间最近一次失效的时间（Unix 时间戳）"""
+        with self._lock:
+            return self._changed_at.get(namespace, self._started_at)
+
+    def get(self, key: Tuple) -> Optional[bytes]:
+        """读取缓存的响应体，过期条目视为未命中并删除"""
+        entry = self.get_entry(key)
+        return entry.body if entry else None
+
+    def get_entry(self, key: Tuple) -> Optional[CacheEntry]:
+        """读取缓存条目，过期条目视为未命中并删除"""
+        if not self.enabled:
+            return None
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self._misses += 1
+                return None
+            if entry.expires_at <= time.monotonic():
+                del self._entries[key]
+                self._expirations += 1
+                self._misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self._hits += 1
+            return entry
+
+    def set(self, key: Tuple, body: bytes, namespace: str, item_id: Optional[Hashable] = None,
+            generation: Optional[int] = None, etag: Optional[str] = None,
+            last_modified: Optional[str] = None) -> CacheEntry:
+        """
+        写入缓存，返回构造的条目（缓存关闭或放弃写入时也返回，便于直接用来响应）
+
+        Args:
+            generation: 查询开始时的命名空间版本号；期间发生过失效则放弃写入
+            etag: 响应的 ETag
+            last_modified: 响应的 Last-Modified（HTTP 日期格式）
+        """
+        entry = CacheEntry(
+            body=body, namespace=namespace, item_id=item_id,
+            expires_at=time.monotonic() + self.ttl_seconds,
+            etag=etag, last_modified=last_modified
+        )
+        if not self.enabled:
+            return entry
+        with self._lock:
+            if generation is not None and generation != self._generations.get(namespace, 0):
+                return entry
+            self._entries[key] = entry
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self._evictions += 1
+        return entry
+
+    def invalidate(self, namespace: str, item_id: Optional[Hashable] = None) -> int:
+        """
+        使命名空间下的列表响应失效；给定 item_id 时同时使该资源的详情响应失效
+
+        Returns:
+            删除的条目数量
+        """
+        with self._lock:
+            self._generations[namespace] = self._generations.get(namespace, 0) + 1
+            self._changed_at[namespace] = time.time()
+            stale_keys = [
+                key for key, entry in self._entries.items()
+                if entry.namespace == namespace and (entry.item_id is None or entry.item_id == item_id)
+            ]
+            for key in stale_keys:
+                del self._entries[key]
+            self._invalidations += len(stale_keys)
+            return len(stale_keys)
+
+    def clear(self):
+        """清空全部缓存"""
+        with self._lock:
+            for namespace in {entry.namespace for entry in self._entries.values()}:
+                self._generations[namespace] = self._generations.get(namespace, 0) + 1
+            self._entries.clear()
+
+    # ==================== 监控 ====================
+
+    def get_metrics(self) -> Dict[str, Any]:
+        """获取命中、未命中和淘汰统计"""
+        with self._lock:
+            lookups = self._hits + self._misses
+            return {
+                "enabled": self.enabled,
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+                "ttl_seconds": self.ttl_seconds,
+                "hits": self._hits,
+                "misses": self._misses,
+                "hit_rate": round(self._hits / lookups, 4) if lookups else 0.0,
+                "evictions": self._evictions,
+                "expirations": self._expirations,
+                "invalidations": self._invalidations,
+            }
+
+
+# 全局响应缓存实例
+response_cache = ResponseCache(
+    max_entries=settings.RESPONSE_CACHE_MAX_ENTRIES,
+    ttl_seconds=settings.RESPONSE_CACHE_TTL,
+    enabled=settings.RESPONSE_CACHE_ENABLED
+)
+
+
+def _cache_key(namespace: str, func: Callable, signature: inspect.Signature,
+               args: tuple, kwargs: dict) -> Tuple[Tuple, Dict[str, Any]]:
+    """由路由函数和规范化后的参数（补齐默认值、排除依赖注入参数）生成缓存键"""
+    bound = signature.bind_partial(*args, **kwargs)
+    bound.apply_defaults()
+    arguments = {
+        name: value for name, value in bound.arguments.items()
+        if not isinstance(signature.parameters[name].default, fastapi_params.Depends)
+    }
+    normalized = tuple(
+        (name, value if isinstance(value, Hashable) else repr(value))
+        for name, value in sorted(arguments.items())
+    )
+    return (namespace, func.__module__, func.__qualname__, normalized), arguments
+
+
+def cached_response(namespace: str, response_model: Any, id_param: Optional[str] = None,
+                    cache: Optional[ResponseCache] = None):
+    """
+    公开读接口响应缓存装饰器
+
+    放在 @router.get 之下、其他装饰器之上。未命中时按 response_model 序列化结果并缓存；
+    命中时直接返回缓存的 JSON。只缓存正常返回的结果，异常（如 404）不缓存。
+    响应带内容哈希 ETag、由 updated_at 得出的 Last-Modified 和要求重新验证的 Cache-Control。
+
+    Args:
+        namespace: 缓存命名空间，写接口按它失效
+        response_model: 路由的响应模型，用于序列化
+        id_param: 详情接口的资源ID参数名；列表接口不传
+        cache: 使用的缓存实例，默认为全局 response_cache
+    """
+    adapter = TypeAdapter(response_model)
+
+    def decorator(func):
+        signature = inspect.signature(func)
+
+        def lookup(args, kwargs):
+            target = cache or response_cache
+            key, arguments = _cache_key(namespace, func, signature, args, kwargs)
+            item_id = arguments.get(id_param) if id_param else None
+            return target, key, item_id
+
+        def store(target: ResponseCache, key, item_id, generation: int, result):
+            if isinstance(result, Response):
+                return result
+            body = adapter.dump_json(adapter.validate_python(result, from_attributes=True))
+            entry = target.set(
+                key, body, namespace, item_id=item_id, generation=generation,
+                etag=content_etag(body),
+                last_modified=last_modified_of(result, None if item_id is not None else target.changed_at(namespace))
+            )
+            return entry.to_response()
+
+        if inspect.iscoroutinefunction(func):
+            @functools.wraps(func)
+            async def async_wrapper(*args, **kwargs):
+                target, key, item_id = lookup(args, kwargs)
+                entry = target.get_entry(key)
+                if entry is not None:
+                    return entry.to_response()
+                generation = target.generation(namespace)
+                return store(target, key, item_id, generation, await func(*args, **kwargs))
+
+            return async_wrapper
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            target, key, item_id = lookup(args, kwargs)
+            entry = target.get_entry(key)
+            if entry is not None:
+                return entry.to_response()
+            generation = target.generation(namespace)
+            return store(target, key, item_id, generation, func(*args, **kwargs))
+
+        return wrapper
+
+    return decorator
+
+
+def invalidates_response_cache(namespace: str, id_param: Optional[str] = None,
+                               cache: Optional[ResponseCache] = None):
+    """
+    写接口缓存失效装饰器
+
+    放在 @transactional 之上，保证事务提交成功后才失效；写操作抛出异常时不失效。
+
+    Args:
+        namespace: 要失效的缓存命名空间
+        id_param: 被修改资源的ID参数名；创建类接口不传，只失效列表
+        cache: 使用的缓存实例，默认为全局 response_cache
+    """
+    def decorator(func):
+        signature = inspect.signature(func)
+
+        def invalidate(args, kwargs):
+            item_id = None
+            if id_param:
+                item_id = signature.bind_partial(*args, **kwargs).arguments.get(id_param)
+            (cache or response_cache).invalidate(namespace, item_id)
+
+        if inspect.iscoroutinefunction(func):
+            @functools.wraps(func)
+            async def async_wrapper(*args, **kwargs):
+                result = await func(*args, **kwargs)
+                invalidate(args, kwargs)
+                return result
+
+            return async_wrapper
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            result = func(*args, **kwargs)
+            invalidate(args, kwargs)
+            return result
+
+        return wrapper
+
+    return decorator
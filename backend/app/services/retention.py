@@ -0,0 +1,398 @@
+"""
+数据保留服务
+product_stats、product_api_calls、product_logs 只追加不删除，表越大聚合查询和索引越慢、备份也越大。
+后台任务按每张表的保留天数处理早于截止时间的原始行：
+
+1. 汇总：访问统计已由 analytics_rollup 汇总为小时数据，只删除汇总水位线之前的行；
+   API 调用和日志在删除前按天汇总进 product_api_call_daily / product_log_daily。
+2. 归档：按行的日期追加到 <归档目录>/<表名>/<YYYY-MM-DD>.ndjson.gz（多成员 gzip，可直接 zcat）。
+   归档目录默认在数据库文件旁边，不在任何静态文件目录内。
+3. 删除：按时间索引分小批进行，每批作为一个写操作交给单写者队列。
+
+同一批的汇总、归档和删除在一个写操作中完成，归档文件在删除提交前写入并落盘；
+提交失败时这些行下次会被再次归档，恢复时按 id 去重即可。
+"""
+
+import asyncio
+import gzip
+import json
+import logging
+import os
+import time
+from dataclasses import dataclass
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple, Type
+
+from sqlalchemy import bindparam, delete, func, select, text
+from sqlalchemy.exc import OperationalError
+from sqlalchemy.orm import Session
+
+from ..config import settings
+from ..database import DATABASE_DIR
+from ..models import (
+    ProductAPICall, ProductAPICallDaily, ProductLog, ProductLogDaily, ProductStats, RollupWatermark
+)
+from .analytics_rollup import STATS_SOURCE, StatsRollupJob, hour_bucket, stats_rollup_job
+from .db_writer_service import DatabaseWriterService, db_writer_service
+from .product_file_service import product_file_service
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass(frozen=True)
+class RetentionPolicy:
+    """单张表的保留策略"""
+    table: str
+    model: Type
+    time_column: str
+    days: int  # 0 表示永久保留
+
+
+def default_policies() -> Tuple[RetentionPolicy, ...]:
+    """按配置生成各表的保留策略"""
+    return (
+        RetentionPolicy("product_stats", ProductStats, "access_time", settings.RETENTION_STATS_DAYS),
+        RetentionPolicy("product_api_calls", ProductAPICall, "timestamp", settings.RETENTION_API_CALLS_DAYS),
+        RetentionPolicy("product_logs", ProductLog, "timestamp", settings.RETENTION_LOGS_DAYS),
+    )
+
+
+def day_start(value: datetime) -> datetime:
+    """时间所在日期的零点（不带时区的 UTC）"""
+    return hour_bucket(value).replace(hour=0)
+
+
+# ==================== 按天汇总 ====================
+
+def _merge_daily(session: Session, model: Type, key_names: Sequence[str],
+                 deltas: Dict[tuple, Dict[str, int]]):
+    """把增量合并进按天汇总表（deltas 的键与 key_names 一一对应，前两项为 product_id 和 day）"""
+    days = [key[1] for key in deltas]
+    existing = {
+        tuple(getattr(row, name) for name in key_names): row
+        for row in session.query(model).filter(
+            model.product_id.in_({key[0] for key in deltas}),
+            model.day >= min(days),
+            model.day <= max(days)
+        )
+    }
+    for key, values in deltas.items():
+        row = existing.get(key)
+        if row is None:
+            session.add(model(**dict(zip(key_names, key)), **values))
+            continue
+        for name, value in values.items():
+            setattr(row, name, getattr(row, name) + value)
+
+
+def _aggregate_api_calls(session: Session, rows: List[ProductAPICall]):
+    deltas: Dict[tuple, Dict[str, int]] = {}
+    for row in rows:
+        key = (row.product_id, day_start(row.timestamp), row.method, row.status_code)
+        delta = deltas.setdefault(key, {"calls": 0, "response_time_sum": 0, "request_bytes": 0, "response_bytes": 0})
+        delta["calls"] += 1
+        delta["response_time_sum"] += row.response_time or 0
+        delta["request_bytes"] += row.request_size or 0
+        delta["response_bytes"] += row.response_size or 0
+    _merge_daily(session, ProductAPICallDaily, ("product_id", "day", "method", "status_code"), deltas)
+
+
+def _aggregate_logs(session: Session, rows: List[ProductLog]):
+    deltas: Dict[tuple, Dict[str, int]] = {}
+    for row in rows:
+        key = (row.product_id, day_start(row.timestamp), row.log_type, row.log_level or "info")
+        deltas.setdefault(key, {"count": 0})["count"] += 1
+    _merge_daily(session, ProductLogDaily, ("product_id", "day", "log_type", "log_level"), deltas)
+
+
+# 删除前需要按天汇总的表（访问统计由 analytics_rollup 负责）
+_AGGREGATORS: Dict[str, Callable[[Session, list], None]] = {
+    "product_api_calls": _aggregate_api_calls,
+    "product_logs": _aggregate_logs,
+}
+
+
+# ==================== 归档 ====================
+
+def _json_default(value: Any):
+    if isinstance(value, datetime):
+        return value.isoformat()
+    if isinstance(value, bytes):
+        return value.hex()
+    return str(value)
+
+
+def _archive_rows(archive_dir: Path, policy: RetentionPolicy, rows: list) -> int:
+    """按行的日期追加写入 gzip NDJSON 归档并落盘，返回写入的压缩字节数"""
+    columns = [column.key for column in policy.model.__table__.columns]
+    partitions: Dict[str, List[str]] = {}
+    for row in rows:
+        day = getattr(row, policy.time_column).strftime("%Y-%m-%d")
+        line = json.dumps({name: getattr(row, name) for name in columns},
+                          ensure_ascii=False, default=_json_default)
+        partitions.setdefault(day, []).append(line)
+
+    table_dir = archive_dir / policy.table
+    table_dir.mkdir(parents=True, exist_ok=True)
+    written = 0
+    for day, lines in partitions.items():
+        path = table_dir / f"{day}.ndjson.gz"
+        with open(path, "ab") as raw:
+            start = raw.tell()
+            # 每次追加一个独立的 gzip 成员，读取时 gzip 会把所有成员拼接起来
+            with gzip.GzipFile(fileobj=raw, mode="wb") as archive:
+                archive.write(("\n".join(lines) + "\n").encode("utf-8"))
+            raw.flush()
+            os.fsync(raw.fileno())
+            written += raw.tell() - start
+    return written
+
+
+def read_archive(path: Path) -> List[Dict[str, Any]]:
+    """读取归档文件（按 id 去重）"""
+    rows: Dict[Any, Dict[str, Any]] = {}
+    with gzip.open(path, "rt", encoding="utf-8") as archive:
+        for line in archive:
+            if line.strip():
+                row = json.loads(line)
+                rows[row.get("id")] = row
+    return list(rows.values())
+
+
+# ==================== 写线程中执行的操作 ====================
+
+def _purge_batch(session: Session, policy: RetentionPolicy, cutoff: datetime, batch_size: int,
+                 archive_dir: Path, max_id: Optional[int] = None) -> Tuple[int, int]:
+    """汇总、归档并删除一批过期行，返回 (删除行数, 归档字节数)"""
+    model = policy.model
+    time_column = getattr(model, policy.time_column)
+    query = session.query(model).filter(time_column < cutoff)
+    if max_id is not None:
+        query = query.filter(model.id <= max_id)
+    rows = query.order_by(time_column, model.id).limit(batch_size).all()
+    if not rows:
+        return 0, 0
+
+    aggregate = _AGGREGATORS.get(policy.table)
+    if aggregate is not None:
+        aggregate(session, rows)
+    archived_bytes = _archive_rows(archive_dir, policy, rows)
+    session.execute(delete(model).where(model.id.in_([row.id for row in rows])))
+    return len(rows), archived_bytes
+
+
+def _read_stats_watermark(session: Session) -> int:
+    return session.execute(
+        select(RollupWatermark.last_id).where(RollupWatermark.source == STATS_SOURCE)
+    ).scalar() or 0
+
+
+def _bytes_in_use(session: Session) -> int:
+    """数据库中已使用页面的字节数（总页数减去空闲页）"""
+    page_size = session.execute(text("PRAGMA page_size")).scalar()
+    page_count = session.execute(text("PRAGMA page_count")).scalar()
+    freelist = session.execute(text("PRAGMA freelist_count")).scalar()
+    return (page_count - freelist) * page_size
+
+
+def table_report(db: Session, policies: Sequence[RetentionPolicy]) -> Dict[str, Dict[str, Any]]:
+    """各表的行数和占用字节数（含索引；SQLite 未编译 dbstat 时字节数为 None）"""
+    report = {}
+    for policy in policies:
+        report[policy.table] = {
+            "rows": db.execute(select(func.count()).select_from(policy.model)).scalar(),
+            "bytes": None,
+            "retention_days": policy.days,
+        }
+    try:
+        # 只遍历这几张表及其索引的 B 树（dbstat 按 name 约束定位）
+        sizes = db.execute(text(
+            "SELECT s.tbl_name, SUM(d.pgsize) FROM sqlite_schema AS s "
+            "JOIN dbstat AS d ON d.name = s.name WHERE s.tbl_name IN :tables GROUP BY s.tbl_name"
+        ).bindparams(bindparam("tables", expanding=True)), {"tables": list(report)}).all()
+    except OperationalError:
+        return report
+    for table, size in sizes:
+        if table in report:
+            report[table]["bytes"] = size
+    return report
+
+
+# 旧版本的默认归档目录，位于对外提供静态文件的产品目录内
+LEGACY_ARCHIVE_DIR = product_file_service.backups_dir / "archive"
+
+
+def _move_legacy_archives(legacy_dir: Path, archive_dir: Path) -> int:
+    """把旧默认目录中的归档移到新目录（同名文件追加为新的 gzip 成员），返回移动的文件数"""
+    if not legacy_dir.is_dir() or legacy_dir.resolve() == archive_dir.resolve():
+        return 0
+    moved = 0
+    for path in sorted(legacy_dir.glob("*/*.ndjson.gz")):
+        target = archive_dir / path.parent.name / path.name
+        target.parent.mkdir(parents=True, exist_ok=True)
+        with open(target, "ab") as out, open(path, "rb") as src:
+            out.write(src.read())
+            out.flush()
+            os.fsync(out.fileno())
+        path.unlink()
+        moved += 1
+    if moved:
+        logger.warning(f"已将 {moved} 个归档文件从静态文件目录 {legacy_dir} 移到 {archive_dir}")
+    return moved
+
+
+class RetentionJob:
+    """
+    数据保留任务
+
+    每隔 interval_seconds 秒对每张表循环处理 batch_size 行，直到某批不足 batch_size 行；
+    批与批之间让出事件循环。处理访问统计前先运行一次汇总，保证删除的行都已计入小时汇总。
+    """
+
+    def __init__(
+        self,
+        writer: Optional[DatabaseWriterService] = None,
+        rollup_job: Optional[StatsRollupJob] = None,
+        policies: Optional[Sequence[RetentionPolicy]] = None,
+        archive_dir: Optional[Path] = None,
+        interval_seconds: float = 3600,
+        batch_size: int = 1000,
+        enabled: bool = True
+    ):
+        self._writer = writer
+        self._rollup_job = rollup_job
+        self.policies = tuple(policies) if policies is not None else default_policies()
+        # 默认放在数据库文件旁边：归档含访客 IP、会话 ID 等，不能放进对外提供静态文件的产品目录
+        self.archive_dir = Path(archive_dir) if archive_dir else DATABASE_DIR / "retention_archive"
+        self._default_archive_dir = archive_dir is None
+        self.interval_seconds = max(interval_seconds, 1)
+        self.batch_size = max(batch_size, 1)
+        self.enabled = enabled
+        self._task: Optional[asyncio.Task] = None
+        self._runs = 0
+        self._failed_runs = 0
+        self._totals: Dict[str, Dict[str, int]] = {
+            policy.table: {"rows_deleted": 0, "bytes_archived": 0, "bytes_reclaimed": 0}
+            for policy in self.policies
+        }
+        self._last_run: Dict[str, Any] = {}
+
+    @property
+    def writer(self) -> DatabaseWriterService:
+        return self._writer or db_writer_service
+
+    @property
+    def rollup_job(self) -> StatsRollupJob:
+        return self._rollup_job or stats_rollup_job
+
+    # ==================== 生命周期 ====================
+
+    @property
+    def is_running(self) -> bool:
+        return self._task is not None and not self._task.done()
+
+    def start(self):
+        """在当前事件循环中启动后台保留任务（重复调用无副作用）"""
+        if not self.enabled or self.is_running:
+            return
+        if self._default_archive_dir:
+            _move_legacy_archives(LEGACY_ARCHIVE_DIR, self.archive_dir)
+        self._task = asyncio.get_running_loop().create_task(self._run(), name="retention")
+        logger.info(f"数据保留任务已启动，间隔 {self.interval_seconds} 秒，归档目录 {self.archive_dir}")
+
+    async def stop(self):
+        """停止后台保留任务"""
+        if not self.is_running:
+            return
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+        logger.info("数据保留任务已停止")
+
+    async def _run(self):
+        while True:
+            try:
+                await self.run_once()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                self._failed_runs += 1
+                logger.error(f"数据保留任务失败: {str(e)}")
+            await asyncio.sleep(self.interval_seconds)
+
+    # ==================== 清理 ====================
+
+    async def _stats_watermark(self) -> int:
+        # 先把新行汇总进小时汇总表，再只删除水位线之前的行
+        await self.rollup_job.run_once()
+        return await self.writer.execute(_read_stats_watermark)
+
+    async def run_once(self, now: Optional[datetime] = None) -> Dict[str, Dict[str, int]]:
+        """执行一轮保留处理，返回各表删除的行数、归档字节数和回收的字节数"""
+        started_at = time.monotonic()
+        now = now or datetime.now(timezone.utc)
+        results: Dict[str, Dict[str, int]] = {}
+
+        for policy in self.policies:
+            if policy.days <= 0:
+                continue
+            cutoff = now - timedelta(days=policy.days)
+            max_id = await self._stats_watermark() if policy.model is ProductStats else None
+
+            before = await self.writer.execute(_bytes_in_use)
+            deleted = archived = 0
+            while True:
+                rows, archived_bytes = await self.writer.execute(
+                    _purge_batch, policy, cutoff, self.batch_size, self.archive_dir, max_id
+                )
+                deleted += rows
+                archived += archived_bytes
+                if rows < self.batch_size:
+                    break
+                await asyncio.sleep(0)
+            reclaimed = max(before - await self.writer.execute(_bytes_in_use), 0) if deleted else 0
+
+            results[policy.table] = {"rows_deleted": deleted, "bytes_archived": archived, "bytes_reclaimed": reclaimed}
+            totals = self._totals.setdefault(policy.table, {"rows_deleted": 0, "bytes_archived": 0, "bytes_reclaimed": 0})
+            for name, value in results[policy.table].items():
+                totals[name] += value
+
+        self._runs += 1
+        self._last_run = {
+            "finished_at": datetime.now(timezone.utc).isoformat(),
+            "duration_ms": round((time.monotonic() - started_at) * 1000, 3),
+            "tables": results,
+        }
+        if any(result["rows_deleted"] for result in results.values()):
+            logger.info(f"数据保留处理完成: {results}")
+        return results
+
+    # ==================== 监控 ====================
+
+    def get_metrics(self) -> Dict[str, Any]:
+        """获取运行次数和各表累计删除、归档、回收统计"""
+        return {
+            "enabled": self.enabled,
+            "running": self.is_running,
+            "interval_seconds": self.interval_seconds,
+            "batch_size": self.batch_size,
+            "archive_dir": str(self.archive_dir),
+            "policies": {policy.table: policy.days for policy in self.policies},
+            "runs": self._runs,
+            "failed_runs": self._failed_runs,
+            "totals": {table: dict(totals) for table, totals in self._totals.items()},
+            "last_run": self._last_run,
+        }
+
+
+# 全局保留任务实例
+retention_job = RetentionJob(
+    archive_dir=Path(settings.RETENTION_ARCHIVE_DIR) if settings.RETENTION_ARCHIVE_DIR else None,
+    interval_seconds=settings.RETENTION_INTERVAL,
+    batch_size=settings.RETENTION_BATCH_SIZE,
+    enabled=settings.RETENTION_ENABLED
+)
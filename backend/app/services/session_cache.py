@@ -0,0 +1,129 @@
+"""
+管理员会话缓存
+按访问令牌缓存会话的 user_id 和过期时间，热会话的认证不再查询 sessions 表。
+
+缓存在进程内：登出只能立即失效当前 worker 的条目，其他 worker 的条目最长保留一个 TTL，
+因此 TTL 应保持较短；未命中时总是回退到数据库查询。
+"""
+
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from typing import Any, Dict, Optional
+
+from ..config import settings
+
+
+@dataclass
+class CachedSession:
+    """一条缓存的会话"""
+    user_id: str
+    session_expires_at: float  # 会话本身的过期时间（Unix 时间戳）
+    cached_until: float  # 缓存条目的过期时间（time.monotonic）
+
+
+def _timestamp(value: datetime) -> float:
+    # SQLite 读回的 DateTime 不带时区，存储的是 UTC 时间
+    if value.tzinfo is None:
+        value = value.replace(tzinfo=timezone.utc)
+    return value.timestamp()
+
+
+class SessionCache:
+    """
+    LRU + TTL 会话缓存
+
+    条目在缓存 TTL 到期或会话本身过期时（以先到者为准）视为未命中。
+    失效的令牌在一个 TTL 内不会再被写入，避免登出事务提交前并发请求读到旧状态又把会话缓存回来。
+    """
+
+    def __init__(self, max_entries: int = 1024, ttl_seconds: float = 60, enabled: bool = True):
+        self.max_entries = max(max_entries, 1)
+        self.ttl_seconds = ttl_seconds
+        self.enabled = enabled
+        self._entries: "OrderedDict[str, CachedSession]" = OrderedDict()
+        self._revoked: Dict[str, float] = {}  # 令牌 -> 禁止回填截止时间（time.monotonic）
+        self._lock = threading.Lock()
+        self._hits = 0
+        self._misses = 0
+        self._evictions = 0
+        self._invalidations = 0
+
+    def get(self, token: str) -> Optional[str]:
+        """返回令牌对应的 user_id；未缓存、缓存过期或会话已过期时返回 None"""
+        if not self.enabled:
+            return None
+        with self._lock:
+            entry = self._entries.get(token)
+            if entry is None:
+                self._misses += 1
+                return None
+            if entry.cached_until <= time.monotonic() or entry.session_expires_at <= time.time():
+                del self._entries[token]
+                self._misses += 1
+                return None
+            self._entries.move_to_end(token)
+            self._hits += 1
+            return entry.user_id
+
+    def set(self, token: str, user_id: str, expires_at: datetime):
+        """缓存一个有效会话"""
+        if not self.enabled:
+            return
+        entry = CachedSession(
+            user_id=user_id,
+            session_expires_at=_timestamp(expires_at),
+            cached_until=time.monotonic() + self.ttl_seconds
+        )
+        with self._lock:
+            revoked_until = self._revoked.get(token)
+            if revoked_until is not None and revoked_until > time.monotonic():
+                return
+            self._entries[token] = entry
+            self._entries.move_to_end(token)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self._evictions += 1
+
+    def invalidate(self, token: str) -> bool:
+        """使令牌的缓存失效（登出时调用），返回是否删除了条目"""
+        now = time.monotonic()
+        with self._lock:
+            self._revoked = {key: until for key, until in self._revoked.items() if until > now}
+            self._revoked[token] = now + self.ttl_seconds
+            removed = self._entries.pop(token, None) is not None
+            if removed:
+                self._invalidations += 1
+            return removed
+
+    def clear(self):
+        """清空全部缓存"""
+        with self._lock:
+            self._entries.clear()
+            self._revoked.clear()
+
+    def get_metrics(self) -> Dict[str, Any]:
+        """获取命中、未命中和淘汰统计"""
+        with self._lock:
+            lookups = self._hits + self._misses
+            return {
+                "enabled": self.enabled,
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+                "ttl_seconds": self.ttl_seconds,
+                "hits": self._hits,
+                "misses": self._misses,
+                "hit_rate": round(self._hits / lookups, 4) if lookups else 0.0,
+                "evictions": self._evictions,
+                "invalidations": self._invalidations,
+            }
+
+
+# 全局会话缓存实例
+session_cache = SessionCache(
+    max_entries=settings.SESSION_CACHE_MAX_ENTRIES,
+    ttl_seconds=settings.SESSION_CACHE_TTL,
+    enabled=settings.SESSION_CACHE_ENABLED
+)
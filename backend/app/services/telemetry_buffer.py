@@ -0,0 +1,283 @@
+"""
+遥测写缓冲服务
+批量上报接口把访问统计和客户端日志放进有界的内存缓冲区后立即返回，
+缓冲区达到 flush_size 条或每隔 flush_interval 秒，作为一个写操作交给单写者队列，
+用一条多值 INSERT 写入（产品是否存在也在这一步用一次查询统一检查）。
+
+缓冲区满时拒绝新的批次（接口返回 429），由客户端稍后重试；停止时会把剩余事件全部写入。
+进程异常退出时最多丢失一个刷新周期的事件。
+
+写入失败的处理：
+- 暂时性错误（数据库锁、写队列已满）：整批放回缓冲区下次重试，连续失败 max_retries 次后丢弃该批。
+- 其他错误（事件本身无法写入）：二分拆批重写，只丢弃无法写入的事件，其余事件照常写入。
+"""
+
+import asyncio
+import logging
+import threading
+from typing import Any, Dict, List, Optional, Set, Tuple
+
+from sqlalchemy import insert, select
+from sqlalchemy.exc import OperationalError
+from sqlalchemy.orm import Session
+
+from ..config import settings
+from ..models import Product, ProductLog, ProductStats
+from .db_writer_service import DatabaseWriterService, WriteQueueFullError, db_writer_service
+
+logger = logging.getLogger(__name__)
+
+# 重试可能成功的写入错误，其他错误视为事件本身无法写入
+TRANSIENT_ERRORS = (OperationalError, WriteQueueFullError)
+
+
+class TelemetryBufferFullError(Exception):
+    """遥测缓冲区已满"""
+    pass
+
+
+def _bulk_insert(session: Session, stats: List[Dict[str, Any]], logs: List[Dict[str, Any]]) -> Tuple[int, int]:
+    """批量写入访问统计和日志，丢弃不存在的产品的事件（在写线程中执行）"""
+    product_ids = {row["product_id"] for row in stats} | {row["product_id"] for row in logs}
+    existing = set(session.execute(select(Product.id).where(Product.id.in_(product_ids))).scalars())
+    stats = [row for row in stats if row["product_id"] in existing]
+    logs = [row for row in logs if row["product_id"] in existing]
+    if stats:
+        session.execute(insert(ProductStats), stats)
+    if logs:
+        session.execute(insert(ProductLog), logs)
+    return len(stats), len(logs)
+
+
+class TelemetryBuffer:
+    """
+    遥测写缓冲区
+
+    add() 在事件循环中调用，要么整批接受、要么整批拒绝；
+    暂时性错误导致写入失败的事件放回缓冲区，下次刷新重试。
+    """
+
+    def __init__(
+        self,
+        writer: Optional[DatabaseWriterService] = None,
+        max_events: int = 10000,
+        flush_size: int = 500,
+        flush_interval: float = 1.0,
+        max_retries: int = 5
+    ):
+        self._writer = writer
+        self.max_events = max(max_events, 1)
+        self.flush_size = max(min(flush_size, self.max_events), 1)
+        self.flush_interval = max(flush_interval, 0.05)
+        self.max_retries = max(max_retries, 1)
+        self._consecutive_failures = 0
+        self._stats: List[Dict[str, Any]] = []
+        self._logs: List[Dict[str, Any]] = []
+        self._lock = threading.Lock()
+        self._task: Optional[asyncio.Task] = None
+        self._flush_tasks: Set[asyncio.Task] = set()
+        self._reset_metrics()
+
+    def _reset_metrics(self):
+        self._events_accepted = 0
+        self._events_rejected = 0
+        self._events_written = 0
+        self._events_dropped = 0
+        self._flushes = 0
+        self._failed_flushes = 0
+        self._events_unwritable = 0
+
+    @property
+    def writer(self) -> DatabaseWriterService:
+        return self._writer or db_writer_service
+
+    @property
+    def pending(self) -> int:
+        """尚未写入数据库的事件数"""
+        with self._lock:
+            return len(self._stats) + len(self._logs)
+
+    def add(self, stats: List[Dict[str, Any]], logs: List[Dict[str, Any]]) -> int:
+        """
+        把一批事件放入缓冲区，达到 flush_size 时在后台触发刷新
+
+        Returns:
+            放入的事件数
+
+        Raises:
+            TelemetryBufferFullError: 放入后会超过 max_events
+        """
+        count = len(stats) + len(logs)
+        with self._lock:
+            if len(self._stats) + len(self._logs) + count > self.max_events:
+                self._events_rejected += count
+                raise TelemetryBufferFullError("遥测缓冲区已满")
+            self._stats.extend(stats)
+            self._logs.extend(logs)
+            self._events_accepted += count
+            should_flush = len(self._stats) + len(self._logs) >= self.flush_size
+        if should_flush:
+            self._schedule_flush()
+        return count
+
+    def _schedule_flush(self):
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            return  # 不在事件循环中（如同步测试），等待定时刷新或手动 flush()
+        task = loop.create_task(self._flush_quietly())
+        self._flush_tasks.add(task)
+        task.add_done_callback(self._flush_tasks.discard)
+
+    def _take(self) -> Tuple[List[Dict[str, Any]], List[Dict[str, Any]]]:
+        with self._lock:
+            stats, self._stats = self._stats, []
+            logs, self._logs = self._logs, []
+        return stats, logs
+
+    def _restore(self, stats: List[Dict[str, Any]], logs: List[Dict[str, Any]]):
+        # 放回队首，保持写入顺序（不受 max_events 限制，避免丢失已接受的事件）
+        with self._lock:
+            self._stats[:0] = stats
+            self._logs[:0] = logs
+
+    def clear(self):
+        """丢弃尚未写入的事件"""
+        with self._lock:
+            self._stats.clear()
+            self._logs.clear()
+
+    async def flush(self) -> int:
+        """
+        把缓冲区中的事件写入数据库，并等待正在后台写入的批次完成
+
+        返回值为本次调用写入的事件数（不含后台批次）。
+        """
+        written = await self._write_pending()
+        in_flight = [task for task in self._flush_tasks if task is not asyncio.current_task()]
+        if in_flight:
+            await asyncio.gather(*in_flight, return_exceptions=True)
+        return written
+
+    async def _write_pending(self) -> int:
+        stats, logs = self._take()
+        if not stats and not logs:
+            return 0
+        try:
+            written = await self._write_batch(stats, logs)
+        except TRANSIENT_ERRORS:
+            self._consecutive_failures += 1
+            self._failed_flushes += 1
+            raise
+        self._consecutive_failures = 0
+        self._flushes += 1
+        return written
+
+    async def _write_batch(self, stats: List[Dict[str, Any]], logs: List[Dict[str, Any]]) -> int:
+        """
+        写入一批事件，返回写入数
+
+        暂时性错误时未写入的事件放回缓冲区（已连续失败 max_retries 次时丢弃）后抛出；
+        其他错误时拆成两半分别写入，直到定位并丢弃无法写入的单个事件。
+        """
+        count = len(stats) + len(logs)
+        try:
+            written_stats, written_logs = await self.writer.execute(_bulk_insert, stats, logs)
+        except TRANSIENT_ERRORS as e:
+            if self._consecutive_failures + 1 >= self.max_retries:
+                logger.error(f"遥测事件连续 {self.max_retries} 次写入失败，丢弃 {count} 条: {str(e)}")
+                self._events_dropped += count
+            else:
+                self._restore(stats, logs)
+            raise
+        except Exception as e:
+            if count == 1:
+                logger.warning(f"丢弃无法写入的遥测事件: {str(e)}")
+                self._events_dropped += 1
+                self._events_unwritable += 1
+                return 0
+            halves = [
+                (stats[:len(stats) // 2], logs[:len(logs) // 2]),
+                (stats[len(stats) // 2:], logs[len(logs) // 2:]),
+            ]
+            written = 0
+            for index, (half_stats, half_logs) in enumerate(halves):
+                if not half_stats and not half_logs:
+                    continue
+                try:
+                    written += await self._write_batch(half_stats, half_logs)
+                except TRANSIENT_ERRORS:
+                    # 后面尚未写入的一半也放回缓冲区（放回队首，先放后面的保持顺序）
+                    for rest_stats, rest_logs in reversed(halves[index + 1:]):
+                        self._restore(rest_stats, rest_logs)
+                    raise
+            return written
+        written = written_stats + written_logs
+        self._events_written += written
+        self._events_dropped += count - written
+        return written
+
+    async def _flush_quietly(self):
+        try:
+            await self._write_pending()
+        except Exception as e:
+            logger.warning(f"遥测事件写入失败，将在下次刷新时重试: {str(e)}")
+
+    # ==================== 生命周期 ====================
+
+    @property
+    def is_running(self) -> bool:
+        return self._task is not None and not self._task.done()
+
+    def start(self):
+        """在当前事件循环中启动定时刷新任务（重复调用无副作用）"""
+        if self.is_running:
+            return
+        self._task = asyncio.get_running_loop().create_task(self._run(), name="telemetry-flusher")
+
+    async def stop(self):
+        """停止定时刷新任务，并把缓冲区中剩余的事件写入数据库"""
+        if self.is_running:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        try:
+            await self.flush()
+        except Exception as e:
+            logger.error(f"遥测事件写入失败，丢弃 {self.pending} 条: {str(e)}")
+
+    async def _run(self):
+        while True:
+            await asyncio.sleep(self.flush_interval)
+            await self._flush_quietly()
+
+    # ==================== 监控 ====================
+
+    def get_metrics(self) -> Dict[str, Any]:
+        """获取缓冲区占用和写入统计"""
+        return {
+            "running": self.is_running,
+            "max_events": self.max_events,
+            "flush_size": self.flush_size,
+            "flush_interval": self.flush_interval,
+            "pending_events": self.pending,
+            "events_accepted": self._events_accepted,
+            "events_rejected": self._events_rejected,
+            "events_written": self._events_written,
+            "events_dropped": self._events_dropped,
+            "events_unwritable": self._events_unwritable,
+            "flushes": self._flushes,
+            "failed_flushes": self._failed_flushes,
+        }
+
+
+# 全局实例
+telemetry_buffer = TelemetryBuffer(
+    max_events=settings.TELEMETRY_BUFFER_MAX_EVENTS,
+    flush_size=settings.TELEMETRY_FLUSH_SIZE,
+    flush_interval=settings.TELEMETRY_FLUSH_INTERVAL,
+    max_retries=settings.TELEMETRY_MAX_RETRIES
+)
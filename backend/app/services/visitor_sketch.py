@@ -0,0 +1,165 @@
+"""
+访客集合
+汇总表中每个时间桶保存一个访客集合，多个桶的集合可以合并，用于回答任意时间范围内的独立访客数。
+访客以 IP 的 64 位哈希保存（不保存 IP 明文）。
+
+集合有两种形态：
+- 精确：访客不超过 EXACT_LIMIT 个时保存哈希本身，计数精确。小产品和小时间桶始终是这种形态；
+  序列化为「格式字节 + 排序后的小端 uint64 数组」。
+- HyperLogLog：超过 EXACT_LIMIT 个后转为 2^PRECISION 个寄存器（每个 1 字节，共 4 KB），
+  占用不再随访客数增长；序列化为「格式字节 + 精度字节 + 寄存器」。
+  估计值的相对标准误差约为 STANDARD_ERROR（1.04 / sqrt(4096) ≈ 1.6%），
+  约 95% 的估计落在 ±3.3% 以内、99.7% 落在 ±4.9% 以内。
+
+两种形态可以任意合并：精确集合并入 HyperLogLog 时逐个加入哈希，HyperLogLog 之间按寄存器取最大值，
+结果与合并顺序无关。精度写入序列化数据，修改 PRECISION 后旧数据无法合并，需要重建汇总表。
+"""
+
+import hashlib
+import math
+import struct
+from collections import Counter
+from typing import Iterable, Optional, Set
+
+# 序列化格式标记
+FORMAT_EXACT = 1
+FORMAT_HLL = 2
+
+# HyperLogLog 精度：寄存器数为 2^PRECISION
+PRECISION = 12
+REGISTER_COUNT = 1 << PRECISION
+# 精确集合的大小上限，取与寄存器占用相同的字节数（512 个 uint64 = 4 KB）
+EXACT_LIMIT = REGISTER_COUNT // 8
+# HyperLogLog 估计的相对标准误差
+STANDARD_ERROR = 1.04 / math.sqrt(REGISTER_COUNT)
+
+# 哈希高 PRECISION 位选择寄存器，其余位的前导零个数决定寄存器的值
+_VALUE_BITS = 64 - PRECISION
+_VALUE_MASK = (1 << _VALUE_BITS) - 1
+_ALPHA_INF = 1 / (2 * math.log(2))
+
+
+def visitor_hash(visitor_ip: str) -> int:
+    """访客 IP 的 64 位哈希"""
+    return int.from_bytes(hashlib.blake2b(visitor_ip.encode("utf-8"), digest_size=8).digest(), "little")
+
+
+def _sigma(x: float) -> float:
+    if x == 1:
+        return math.inf
+    y, z = 1.0, x
+    while True:
+        x *= x
+        previous = z
+        z += x * y
+        y += y
+        if z == previous:
+            return z
+
+
+def _tau(x: float) -> float:
+    if x == 0 or x == 1:
+        return 0.0
+    y, z = 1.0, 1 - x
+    while True:
+        x = math.sqrt(x)
+        previous = z
+        y *= 0.5
+        z -= (1 - x) ** 2 * y
+        if z == previous:
+            return z / 3
+
+
+def _estimate(registers: bytearray) -> float:
+    """
+    由寄存器估计基数
+
+    使用 Ertl 改进的估计公式（"New cardinality estimation algorithms for HyperLogLog sketches", 2017），
+    在整个基数范围内无需经验偏差表或在线性计数和原始估计之间切换。
+    """
+    counts = [0] * (_VALUE_BITS + 2)
+    for value, count in Counter(registers).items():
+        counts[value] = count
+    m = len(registers)
+    z = m * _tau(1 - counts[_VALUE_BITS + 1] / m)
+    for k in range(_VALUE_BITS, 0, -1):
+        z = 0.5 * (z + counts[k])
+    z += m * _sigma(counts[0] / m)
+    return _ALPHA_INF * m * m / z
+
+
+class VisitorSketch:
+    """可合并的访客集合：少量访客时精确计数，超过 EXACT_LIMIT 后转为 HyperLogLog 估计"""
+
+    __slots__ = ("_hashes", "_registers")
+
+    def __init__(self, hashes: Optional[Iterable[int]] = None):
+        self._hashes: Set[int] = set()
+        self._registers: Optional[bytearray] = None
+        for value in hashes or ():
+            self._add_hash(value)
+
+    @property
+    def is_exact(self) -> bool:
+        """计数是否精确（未转为 HyperLogLog）"""
+        return self._registers is None
+
+    def add(self, visitor_ip: Optional[str]):
+        """加入一个访客，空 IP 不计入"""
+        if visitor_ip:
+            self._add_hash(visitor_hash(visitor_ip))
+
+    def _add_hash(self, value: int):
+        if self._registers is not None:
+            self._update_register(value)
+            return
+        self._hashes.add(value)
+        if len(self._hashes) > EXACT_LIMIT:
+            self._to_registers()
+
+    def _update_register(self, value: int):
+        index = value >> _VALUE_BITS
+        rank = _VALUE_BITS - (value & _VALUE_MASK).bit_length() + 1
+        if rank > self._registers[index]:
+            self._registers[index] = rank
+
+    def _to_registers(self):
+        self._registers = bytearray(REGISTER_COUNT)
+        for value in self._hashes:
+            self._update_register(value)
+        self._hashes = set()
+
+    def merge(self, other: "VisitorSketch") -> "VisitorSketch":
+        """合并另一个集合（就地修改并返回自身）"""
+        if other._registers is None:
+            for value in tuple(other._hashes):
+                self._add_hash(value)
+            return self
+        if self._registers is None:
+            self._to_registers()
+        self._registers = bytearray(map(max, self._registers, other._registers))
+        return self
+
+    def cardinality(self) -> int:
+        """独立访客数（HyperLogLog 形态下为估计值，误差见模块说明）"""
+        if self._registers is None:
+            return len(self._hashes)
+        return round(_estimate(self._registers))
+
+    def to_bytes(self) -> bytes:
+        if self._registers is not None:
+            return bytes([FORMAT_HLL, PRECISION]) + bytes(self._registers)
+        hashes = sorted(self._hashes)
+        return bytes([FORMAT_EXACT]) + struct.pack(f"<{len(hashes)}Q", *hashes)
+
+    @classmethod
+    def from_bytes(cls, data: Optional[bytes]) -> "VisitorSketch":
+        if not data:
+            return cls()
+        if data[0] == FORMAT_EXACT and not (len(data) - 1) % 8:
+            return cls(struct.unpack(f"<{(len(data) - 1) // 8}Q", data[1:]))
+        if data[0] == FORMAT_HLL and len(data) == 2 + REGISTER_COUNT and data[1] == PRECISION:
+            sketch = cls()
+            sketch._registers = bytearray(data[2:])
+            return sketch
+        raise ValueError("无法识别的访客集合格式")
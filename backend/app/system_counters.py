@@ -0,0 +1,119 @@
+"""
+系统计数器
+系统状态接口需要的产品数、已发布产品数、日志数和错误日志数保存在 system_counters 表中，
+由 SQLite 触发器在插入、删除、更新时增量维护：计数与原表在同一个事务中变化，
+批量 INSERT、数据保留任务的删除和直接写库也都会计入，读取只需按主键取几行。
+
+已有数据库升级时计数器是新建的，用 count(*) 初始化一次；计数器已存在时不做任何事。
+"""
+
+import logging
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Dict, Optional, Tuple
+
+from sqlalchemy import select, text
+from sqlalchemy.orm import Session
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass(frozen=True)
+class CounterSpec:
+    """一个计数器：统计 table 中满足 condition 的行数"""
+    name: str
+    table: str
+    condition: Optional[str] = None  # 用 {row} 表示行别名，如 "{row}.log_type = 'error'"
+    columns: Tuple[str, ...] = ()  # condition 依赖的列，这些列更新时重新判断
+
+    def predicate(self, row: str) -> str:
+        # 条件结果为 NULL 时按不计入处理
+        return f"COALESCE(({self.condition.format(row=row)}), 0)" if self.condition else "1"
+
+
+COUNTERS: Tuple[CounterSpec, ...] = (
+    CounterSpec("products_total", "products"),
+    CounterSpec("products_published", "products", "{row}.is_published = 1", ("is_published",)),
+    CounterSpec("product_logs_total", "product_logs"),
+    CounterSpec("product_logs_error", "product_logs", "{row}.log_type = 'error'", ("log_type",)),
+)
+
+
+def _update(counter: CounterSpec, delta: str) -> str:
+    return (
+        f"UPDATE system_counters SET value = value + ({delta}), updated_at = CURRENT_TIMESTAMP "
+        f"WHERE name = '{counter.name}';"
+    )
+
+
+def _trigger_names(counter: CounterSpec) -> Tuple[str, ...]:
+    suffixes = ("ai", "ad", "au") if counter.condition else ("ai", "ad")
+    return tuple(f"counter_{counter.name}_{suffix}" for suffix in suffixes)
+
+
+def _counter_ddl(counter: CounterSpec) -> list:
+    """计数触发器；带条件的计数器在条件依赖的列更新时按新旧值之差调整"""
+    names = _trigger_names(counter)
+    new, old = counter.predicate("NEW"), counter.predicate("OLD")
+    statements = [
+        f"CREATE TRIGGER IF NOT EXISTS {names[0]} AFTER INSERT ON {counter.table} "
+        f"{'WHEN ' + new if counter.condition else ''} BEGIN {_update(counter, '1')} END",
+        f"CREATE TRIGGER IF NOT EXISTS {names[1]} AFTER DELETE ON {counter.table} "
+        f"{'WHEN ' + old if counter.condition else ''} BEGIN {_update(counter, '-1')} END",
+    ]
+    if counter.condition:
+        statements.append(
+            f"CREATE TRIGGER IF NOT EXISTS {names[2]} AFTER UPDATE OF {', '.join(counter.columns)} "
+            f"ON {counter.table} WHEN {new} != {old} BEGIN {_update(counter, f'{new} - {old}')} END"
+        )
+    return statements
+
+
+def _seed_statement(counter: CounterSpec) -> str:
+    where = f" WHERE {counter.predicate(counter.table)}" if counter.condition else ""
+    return (
+        "INSERT OR IGNORE INTO system_counters (name, value, updated_at) "
+        f"SELECT '{counter.name}', COUNT(*), CURRENT_TIMESTAMP FROM {counter.table}{where}"
+    )
+
+
+def create_counter_triggers(target, connection, **kw):
+    """建表后创建计数触发器并初始化缺失的计数器（metadata after_create 事件）"""
+    if connection.dialect.name != "sqlite":
+        return
+    for counter in COUNTERS:
+        for statement in _counter_ddl(counter):
+            connection.exec_driver_sql(statement)
+        # 与触发器在同一事务中初始化，之后的变化都由触发器计入
+        if connection.exec_driver_sql(_seed_statement(counter)).rowcount:
+            logger.info(f"已初始化系统计数器 {counter.name}")
+
+
+def drop_counter_triggers(target, connection, **kw):
+    """删表前删除计数触发器（metadata before_drop 事件）"""
+    if connection.dialect.name != "sqlite":
+        return
+    for counter in COUNTERS:
+        for name in _trigger_names(counter):
+            connection.exec_driver_sql(f"DROP TRIGGER IF EXISTS {name}")
+
+
+def read_counters(db: Session) -> Dict[str, Tuple[int, Optional[datetime]]]:
+    """
+    读取全部计数器
+
+    Returns:
+        计数器名 -> (值, 最近变化时间)；计数器缺失（如非 SQLite 数据库）时现场 count 一次，时间为 None
+    """
+    from .models import SystemCounter
+
+    counters = {
+        row.name: (row.value, row.updated_at)
+        for row in db.execute(select(SystemCounter)).scalars()
+    }
+    for counter in COUNTERS:
+        if counter.name not in counters:
+            where = f" WHERE {counter.predicate(counter.table)}" if counter.condition else ""
+            value = db.execute(text(f"SELECT COUNT(*) FROM {counter.table}{where}")).scalar()
+            counters[counter.name] = (value, None)
+    return counters
@@ -0,0 +1,126 @@
+#!/usr/bin/env python3
+"""
+公开读接口基准测试：同步路径 vs 异步路径
+
+同步路径：def 路由 + 只读连接池 + SafeQueryExecutor，每个请求占用一个线程池线程
+异步路径：async def 路由（即 /api/blog/ 的实际实现）+ aiosqlite
+
+用法:
+    python benchmarks/bench_async_reads.py --requests 2000 --concurrency 10 50 200
+"""
+
+import argparse
+import asyncio
+import os
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import List
+
+# 基准测试使用独立的临时数据库，必须在导入 app 之前设置
+_tmp_dir = tempfile.mkdtemp(prefix="august_bench_")
+os.environ["DATABASE_URL"] = f"sqlite:///{Path(_tmp_dir, 'bench.db').as_posix()}"
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import httpx
+from fastapi import Depends, FastAPI
+from sqlalchemy.orm import Session
+
+from app.database import Base, SessionLocal, engine, get_db, async_read_engine
+from app.models import Blog as BlogModel
+from app.routers import blog
+from app.schemas import Blog
+from app.security import create_safe_query_executor
+
+
+def build_app() -> FastAPI:
+    app = FastAPI()
+
+    @app.get("/sync/blogs", response_model=List[Blog])
+    def get_blogs_sync(skip: int = 0, limit: int = 20, db: Session = Depends(get_db)):
+        safe_executor = create_safe_query_executor(db)
+        return safe_executor.safe_filter_query(
+            BlogModel, {"is_published": True}, limit=limit, offset=skip, order_by="created_at"
+        )
+
+    app.include_router(blog.router, prefix="/async/blogs")
+    return app
+
+
+def seed(rows: int):
+    Base.metadata.create_all(bind=engine)
+    db = SessionLocal()
+    try:
+        db.add_all([
+            BlogModel(
+                title=f"基准测试文章 {i}",
+                content="内容" * 200,
+                summary=f"摘要 {i}",
+                tags=["bench"],
+                is_published=True,
+            )
+            for i in range(rows)
+        ])
+        db.commit()
+    finally:
+        db.close()
+
+
+def percentile(sorted_values: List[float], pct: float) -> float:
+    index = min(int(len(sorted_values) * pct / 100), len(sorted_values) - 1)
+    return sorted_values[index]
+
+
+async def run_load(client: httpx.AsyncClient, url: str, total: int, concurrency: int):
+    latencies: List[float] = []
+    counter = iter(range(total))
+
+    async def worker():
+        for _ in counter:
+            started = time.perf_counter()
+            response = await client.get(url)
+            latencies.append(time.perf_counter() - started)
+            assert response.status_code == 200, response.text
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - started
+    latencies.sort()
+    return {
+        "rps": total / elapsed,
+        "p50_ms": percentile(latencies, 50) * 1000,
+        "p99_ms": percentile(latencies, 99) * 1000,
+    }
+
+
+async def main_async(args):
+    app = build_app()
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        # 预热连接池
+        await run_load(client, "/sync/blogs", 50, 10)
+        await run_load(client, "/async/blogs/?limit=20", 50, 10)
+
+        print(f"{'路径':<8}{'并发':>6}{'吞吐(req/s)':>14}{'p50(ms)':>10}{'p99(ms)':>10}")
+        for concurrency in args.concurrency:
+            for name, url in (("sync", "/sync/blogs?limit=20"), ("async", "/async/blogs/?limit=20")):
+                result = await run_load(client, url, args.requests, concurrency)
+                print(f"{name:<8}{concurrency:>6}{result['rps']:>14.1f}{result['p50_ms']:>10.2f}{result['p99_ms']:>10.2f}")
+    await async_read_engine.dispose()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="同步/异步读路径基准测试")
+    parser.add_argument("--rows", type=int, default=500, help="预置博客数量")
+    parser.add_argument("--requests", type=int, default=2000, help="每轮请求数")
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[10, 50, 200], help="并发数")
+    args = parser.parse_args()
+
+    seed(args.rows)
+    asyncio.run(main_async(args))
+
+
+if __name__ == "__main__":
+    main()
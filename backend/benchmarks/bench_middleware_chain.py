@@ -0,0 +1,106 @@
+#!/usr/bin/env python3
+"""
+中间件链基准测试：每个请求在中间件链上的额外开销
+
+与 main.py 相同顺序挂载请求ID、GZip、速率限制、CORS、禁止缓存和 SPA 回退中间件，
+分别测量 API 路由和静态文件路由在「完整中间件链」与「无中间件」两种应用上的延迟，
+差值即中间件链的开销。
+
+用法:
+    python benchmarks/bench_middleware_chain.py --requests 5000
+"""
+
+import argparse
+import asyncio
+import os
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import List
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import httpx
+from fastapi import FastAPI
+from fastapi.middleware.cors import CORSMiddleware
+from fastapi.middleware.gzip import GZipMiddleware
+from fastapi.staticfiles import StaticFiles
+
+from app.error_handlers import RequestIDMiddleware
+from app.middleware.rate_limit import RateLimitMiddleware
+from app.middleware.spa import SPA404Middleware, NoCacheAPIMiddleware
+
+
+def build_app(static_dir: Path, spa_dir: Path, with_middleware: bool) -> FastAPI:
+    app = FastAPI()
+
+    @app.get("/api/items")
+    async def items():
+        return [{"id": i, "title": f"item {i}"} for i in range(20)]
+
+    app.mount("/products", StaticFiles(directory=str(static_dir)), name="products")
+
+    if with_middleware:
+        app.add_middleware(RequestIDMiddleware)
+        app.add_middleware(GZipMiddleware, minimum_size=1000)
+        app.add_middleware(RateLimitMiddleware, requests_per_window=10_000_000, window_seconds=3600)
+        app.add_middleware(CORSMiddleware, allow_origins=["http://localhost:3000"], allow_credentials=True,
+                           allow_methods=["*"], allow_headers=["*"])
+        app.add_middleware(NoCacheAPIMiddleware)
+        app.add_middleware(SPA404Middleware, spa_dir=spa_dir)
+    return app
+
+
+def percentile(sorted_values: List[float], pct: float) -> float:
+    index = min(int(len(sorted_values) * pct / 100), len(sorted_values) - 1)
+    return sorted_values[index]
+
+
+async def measure(app: FastAPI, url: str, total: int) -> dict:
+    transport = httpx.ASGITransport(app=app)
+    latencies: List[float] = []
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        for _ in range(50):  # 预热
+            await client.get(url)
+        for _ in range(total):
+            started = time.perf_counter()
+            response = await client.get(url)
+            latencies.append(time.perf_counter() - started)
+            assert response.status_code == 200, response.status_code
+    latencies.sort()
+    return {
+        "mean_us": sum(latencies) / len(latencies) * 1e6,
+        "p99_us": percentile(latencies, 99) * 1e6,
+    }
+
+
+async def main_async(args):
+    tmp_dir = Path(tempfile.mkdtemp(prefix="august_mw_bench_"))
+    static_dir = tmp_dir / "products"
+    spa_dir = tmp_dir / "dist"
+    (static_dir / "1").mkdir(parents=True)
+    spa_dir.mkdir()
+    (static_dir / "1" / "index.html").write_text("<html>" + "x" * 4096 + "</html>", encoding="utf-8")
+    (spa_dir / "index.html").write_text("<html>spa</html>", encoding="utf-8")
+
+    bare = build_app(static_dir, spa_dir, with_middleware=False)
+    chained = build_app(static_dir, spa_dir, with_middleware=True)
+
+    print(f"{'路由':<10}{'无中间件(us)':>14}{'中间件链(us)':>14}{'开销(us)':>10}{'p99(us)':>10}")
+    for name, url in (("api", "/api/items"), ("static", "/products/1/index.html")):
+        base = await measure(bare, url, args.requests)
+        full = await measure(chained, url, args.requests)
+        overhead = full["mean_us"] - base["mean_us"]
+        print(f"{name:<10}{base['mean_us']:>14.1f}{full['mean_us']:>14.1f}{overhead:>10.1f}{full['p99_us']:>10.1f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="中间件链开销基准测试")
+    parser.add_argument("--requests", type=int, default=5000, help="每个路由的请求数")
+    args = parser.parse_args()
+    asyncio.run(main_async(args))
+
+
+if __name__ == "__main__":
+    main()
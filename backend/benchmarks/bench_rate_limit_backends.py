@@ -0,0 +1,97 @@
+#!/usr/bin/env python3
+"""
+限流后端基准测试：每次判定的开销随 worker 数量的变化
+
+每个 worker 是一个独立进程，模拟一个 uvicorn worker 持续对限流引擎发起判定；
+memory 后端各进程独立计数，sqlite 后端所有进程共享同一个存储文件。
+
+用法:
+    python benchmarks/bench_rate_limit_backends.py --hits 20000 --workers 1 4 8
+"""
+
+import argparse
+import multiprocessing
+import os
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import List
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.middleware.rate_limit import create_rate_limiter
+
+
+def percentile(sorted_values: List[float], pct: float) -> float:
+    index = min(int(len(sorted_values) * pct / 100), len(sorted_values) - 1)
+    return sorted_values[index]
+
+
+def worker(backend: str, store_path: str, hits: int, keys: int, worker_id: int, start_barrier, queue):
+    limiter = create_rate_limiter(backend, store_path=store_path)
+    latencies = []
+    start_barrier.wait()
+    run_started = time.perf_counter()
+    for i in range(hits):
+        key = f"10.0.{(i * 7 + worker_id) % keys // 256}.{(i * 7 + worker_id) % 256}"
+        started = time.perf_counter()
+        limiter.hit(key, 1_000_000, 3600)
+        latencies.append(time.perf_counter() - started)
+    elapsed = time.perf_counter() - run_started
+    limiter.stop()
+    queue.put((latencies, elapsed))
+
+
+def run(backend: str, workers: int, hits: int, keys: int) -> dict:
+    store_path = str(Path(tempfile.mkdtemp(prefix="august_ratelimit_")) / "rate_limit.db")
+    if backend == "sqlite":
+        create_rate_limiter(backend, store_path=store_path).stop()  # 预先建表
+
+    ctx = multiprocessing.get_context("spawn")
+    # 所有进程完成导入后同时开始
+    start_barrier = ctx.Barrier(workers + 1)
+    queue = ctx.Queue()
+    processes = [
+        ctx.Process(target=worker, args=(backend, store_path, hits, keys, worker_id, start_barrier, queue))
+        for worker_id in range(workers)
+    ]
+    for process in processes:
+        process.start()
+
+    start_barrier.wait()
+    # 吞吐按最慢的 worker 计算
+    latencies: List[float] = []
+    elapsed = 0.0
+    for _ in processes:
+        worker_latencies, worker_elapsed = queue.get()
+        latencies.extend(worker_latencies)
+        elapsed = max(elapsed, worker_elapsed)
+    for process in processes:
+        process.join()
+
+    latencies.sort()
+    return {
+        "throughput": len(latencies) / elapsed,
+        "mean_us": sum(latencies) / len(latencies) * 1e6,
+        "p99_us": percentile(latencies, 99) * 1e6,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="限流后端多 worker 基准测试")
+    parser.add_argument("--hits", type=int, default=20000, help="每个 worker 的判定次数")
+    parser.add_argument("--keys", type=int, default=10000, help="不同客户端 IP 的数量")
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 4, 8], help="worker 进程数")
+    parser.add_argument("--backends", nargs="+", default=["memory", "sqlite"], help="要测试的后端")
+    args = parser.parse_args()
+
+    print(f"{'后端':<8}{'worker':>8}{'总吞吐(次/s)':>16}{'平均(us)':>12}{'p99(us)':>12}")
+    for backend in args.backends:
+        for workers in args.workers:
+            result = run(backend, workers, args.hits, args.keys)
+            print(f"{backend:<8}{workers:>8}{result['throughput']:>16.0f}{result['mean_us']:>12.1f}{result['p99_us']:>12.1f}")
+
+
+if __name__ == "__main__":
+    main()
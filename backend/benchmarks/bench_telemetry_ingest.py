@@ -0,0 +1,129 @@
+#!/usr/bin/env python3
+"""
+遥测写入基准测试：逐条上报 vs 批量上报
+
+逐条：每个访问事件一个 POST /api/products/{id}/stats，每个请求单独查产品、清理输入、等待提交
+批量：POST /api/products/telemetry/batch，每个请求带 --batch-size 个事件，进入缓冲区后立即返回
+
+计时包含把缓冲区剩余事件写入数据库的时间，两种方式比较的都是「事件落盘」的吞吐。
+
+用法:
+    python benchmarks/bench_telemetry_ingest.py --events 5000 --batch-size 50 --concurrency 10 50
+"""
+
+import argparse
+import asyncio
+import os
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import List
+
+# 基准测试使用独立的临时数据库，必须在导入 app 之前设置
+_tmp_dir = tempfile.mkdtemp(prefix="august_bench_")
+os.environ["DATABASE_URL"] = f"sqlite:///{Path(_tmp_dir, 'bench.db').as_posix()}"
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import httpx
+from fastapi import FastAPI
+
+from app.database import Base, SessionLocal, engine
+from app.models import Product, ProductStats
+from app.routers import products
+from app.services.db_writer_service import db_writer_service
+from app.services.telemetry_buffer import telemetry_buffer
+
+PRODUCT_ID = 1
+
+
+def build_app() -> FastAPI:
+    app = FastAPI()
+    app.include_router(products.router, prefix="/api/products")
+    return app
+
+
+def seed():
+    Base.metadata.create_all(bind=engine)
+    db = SessionLocal()
+    try:
+        db.add(Product(id=PRODUCT_ID, title="基准测试产品", product_type="tool"))
+        db.commit()
+    finally:
+        db.close()
+
+
+def count_stats() -> int:
+    db = SessionLocal()
+    try:
+        return db.query(ProductStats).count()
+    finally:
+        db.close()
+
+
+def make_event(i: int) -> dict:
+    return {
+        "product_id": PRODUCT_ID,
+        "visitor_ip": f"10.0.{i // 256 % 256}.{i % 256}",
+        "session_id": f"bench-{i}",
+        "duration_seconds": i % 120,
+        "user_agent": "Mozilla/5.0 (bench)",
+        "referrer": "https://example.com/",
+    }
+
+
+async def run_load(client: httpx.AsyncClient, requests: List[tuple], concurrency: int) -> float:
+    pending = iter(requests)
+
+    async def worker():
+        for url, body in pending:
+            response = await client.post(url, json=body)
+            assert response.status_code in (200, 202), response.text
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    await telemetry_buffer.flush()
+    return time.perf_counter() - started
+
+
+async def main_async(args):
+    app = build_app()
+    telemetry_buffer.start()
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        single = [(f"/api/products/{PRODUCT_ID}/stats", make_event(i)) for i in range(args.events)]
+        batched = [
+            ("/api/products/telemetry/batch",
+             {"stats": [make_event(i) for i in range(start, min(start + args.batch_size, args.events))]})
+            for start in range(0, args.events, args.batch_size)
+        ]
+
+        # 预热
+        await run_load(client, single[:50], 10)
+
+        print(f"{'路径':<8}{'并发':>6}{'请求数':>8}{'事件/秒':>12}{'耗时(s)':>10}")
+        for concurrency in args.concurrency:
+            for name, requests in (("single", single), ("batch", batched)):
+                before = count_stats()
+                elapsed = await run_load(client, requests, concurrency)
+                written = count_stats() - before
+                assert written == args.events, f"{name}: 写入 {written} 条，期望 {args.events} 条"
+                print(f"{name:<8}{concurrency:>6}{len(requests):>8}{args.events / elapsed:>12.1f}{elapsed:>10.2f}")
+    await telemetry_buffer.stop()
+    db_writer_service.stop()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="逐条/批量遥测写入基准测试")
+    parser.add_argument("--events", type=int, default=5000, help="每轮事件数")
+    parser.add_argument("--batch-size", type=int, default=50, help="批量上报时每个请求的事件数")
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[10, 50], help="并发数")
+    args = parser.parse_args()
+
+    seed()
+    asyncio.run(main_async(args))
+
+
+if __name__ == "__main__":
+    main()
@@ -2,23 +2,27 @@ from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.middleware.gzip import GZipMiddleware
 from fastapi.staticfiles import StaticFiles
-from fastapi.responses import FileResponse, Response
 import os
 from datetime import datetime, timezone
-from starlette.middleware.base import BaseHTTPMiddleware
-from starlette.requests import Request
+from pathlib import Path
 
-from app.database import engine, Base
+from app.database import engine, Base, PROJECT_ROOT
 from app import models  # 导入模型以确保它们被注册到 Base.metadata
-from app.routers import auth, portfolio, blog, profile, upload, products
+from app.routers import auth, portfolio, blog, profile, upload, products, search
 from app.database_init import init_database
-from app.error_handlers import setup_error_handlers, request_id_middleware
+from app.migrations import DatabaseMigrationError
+from app.error_handlers import setup_error_handlers, RequestIDMiddleware
 from app.config import settings
-from app.middleware.rate_limit import RateLimitMiddleware
+from app.middleware.rate_limit import RateLimitMiddleware, create_rate_limiter
+from app.middleware.spa import SPA404Middleware, NoCacheAPIMiddleware
+from app.middleware.conditional import ConditionalGetMiddleware
 
 # 初始化数据库（包含表创建和示例数据）
 try:
     init_database()
+except DatabaseMigrationError:
+    # 表结构未升级时所有相关查询都会失败，不能带着旧结构继续启动
+    raise
 except Exception as e:
     print(f"数据库初始化警告: {e}")
     # 如果初始化失败，至少确保表被创建
@@ -33,17 +37,31 @@ app = FastAPI(
 # 设置全局错误处理器
 setup_error_handlers(app)
 
+# 条件请求中间件：公开内容接口带 ETag/Last-Modified，验证通过时返回 304（放在最内层，304 不再经过压缩）
+app.add_middleware(ConditionalGetMiddleware)
+
 # 添加请求ID中间件
-app.middleware("http")(request_id_middleware)
+app.add_middleware(RequestIDMiddleware)
 
 # GZip压缩中间件
 app.add_middleware(GZipMiddleware, minimum_size=1000)
 
-# 速率限制中间件
+# 速率限制中间件（sqlite 后端的存储文件相对路径基于项目根目录）
+# 限流引擎在这里创建，关闭时由 _stop_rate_limiter 停止清理线程并关闭连接
+rate_limit_store_path = Path(settings.RATE_LIMIT_STORE_PATH)
+if not rate_limit_store_path.is_absolute():
+    rate_limit_store_path = PROJECT_ROOT / rate_limit_store_path
+rate_limiter = create_rate_limiter(
+    settings.RATE_LIMIT_BACKEND,
+    lock_stripes=settings.RATE_LIMIT_LOCK_STRIPES,
+    eviction_interval=settings.RATE_LIMIT_EVICTION_INTERVAL,
+    store_path=str(rate_limit_store_path)
+)
 app.add_middleware(
     RateLimitMiddleware,
     requests_per_window=settings.RATE_LIMIT_REQUESTS,
-    window_seconds=settings.RATE_LIMIT_WINDOW
+    window_seconds=settings.RATE_LIMIT_WINDOW,
+    limiter=rate_limiter
 )
 
 # CORS中间件配置
@@ -106,6 +124,7 @@ app.include_router(blog.router, prefix="/api/blog", tags=["博客管理"])
 app.include_router(profile.router, prefix="/api/profile", tags=["个人信息"])
 app.include_router(upload.router, prefix="/api/upload", tags=["文件上传"])
 app.include_router(products.router, prefix="/api/products", tags=["产品管理"])
+app.include_router(search.router, prefix="/api/search", tags=["全文搜索"])
 
 @app.get("/health")
 async def health_check():
@@ -124,51 +143,9 @@ _spa_candidates = [
 ]
 spa_dir = next((d for d in _spa_candidates if d.exists()), None)
 
-
-def _spa_file_path(relative_path: str) -> Path | None:
-    """解析 SPA 静态文件路径，防止路径穿越；不存在或非法则返回 None。"""
-    if not spa_dir or not relative_path:
-        return None
-    parts = Path(relative_path).parts
-    if ".." in parts or relative_path.startswith("/"):
-        return None
-    full = (spa_dir / relative_path).resolve()
-    try:
-        full.resolve().relative_to(spa_dir.resolve())
-    except ValueError:
-        return None
-    return full if full.is_file() else None
-
-
-# 用中间件做 SPA 回退：先走正常路由（API 先匹配），只有返回 404 的 GET 且非 /api 等时才回退到 index.html，避免 /api 被当成前端路由返回 HTML
-class SPA404Middleware(BaseHTTPMiddleware):
-    async def dispatch(self, request: Request, call_next):
-        response = await call_next(request)
-        if response.status_code != 404 or request.method != "GET":
-            return response
-        path = request.url.path.strip("/")
-        if path.startswith("api/") or path.startswith("uploads/") or path.startswith("products/") or path == "health":
-            return response
-        if not spa_dir or not (spa_dir / "index.html").exists():
-            return response
-        file_path = _spa_file_path(path)
-        if file_path:
-            return FileResponse(str(file_path))
-        return FileResponse(str(spa_dir / "index.html"))
-
-
-# 禁止浏览器缓存 /api 响应，避免 API 被误缓存成 HTML 后一直返回错误内容
-class NoCacheAPIMiddleware(BaseHTTPMiddleware):
-    async def dispatch(self, request: Request, call_next):
-        response = await call_next(request)
-        if request.url.path.startswith("/api/"):
-            response.headers.append("Cache-Control", "no-store, no-cache, must-revalidate")
-            response.headers.append("Pragma", "no-cache")
-        return response
-
-
+# SPA 回退：只有返回 404 的 GET 且非 /api 等时才回退到 index.html
 app.add_middleware(NoCacheAPIMiddleware)
-app.add_middleware(SPA404Middleware)
+app.add_middleware(SPA404Middleware, spa_dir=spa_dir)
 
 if not (spa_dir and (spa_dir / "index.html").exists()):
     @app.get("/")
@@ -176,6 +153,134 @@ if not (spa_dir and (spa_dir / "index.html").exists()):
         return {"message": "August.Lab API Server"}
 
 
+@app.on_event("startup")
+async def _start_db_writer():
+    """启动单写者批量提交线程"""
+    from app.services.db_writer_service import db_writer_service
+    db_writer_service.start()
+
+
+@app.on_event("startup")
+async def _start_expiry_sweeper():
+    """启动过期会话和 API 令牌的后台清理任务"""
+    from app.services.expiry_sweeper import expiry_sweeper
+    expiry_sweeper.start()
+
+
+@app.on_event("shutdown")
+async def _stop_expiry_sweeper():
+    """在写线程停止前停止清理任务"""
+    from app.services.expiry_sweeper import expiry_sweeper
+    await expiry_sweeper.stop()
+
+
+@app.on_event("startup")
+async def _start_token_usage_recorder():
+    """启动 API 令牌使用计数的定期写回任务"""
+    from app.services.api_token_cache import token_usage_recorder
+    token_usage_recorder.start()
+
+
+@app.on_event("shutdown")
+async def _stop_token_usage_recorder():
+    """在写线程停止前写回剩余的令牌使用计数"""
+    from app.services.api_token_cache import token_usage_recorder
+    await token_usage_recorder.stop()
+
+
+@app.on_event("startup")
+async def _start_data_access_recorder():
+    """启动产品数据访问计数的定期写回任务"""
+    from app.services.data_access_recorder import data_access_recorder
+    data_access_recorder.start()
+
+
+@app.on_event("shutdown")
+async def _stop_data_access_recorder():
+    """在写线程停止前写回剩余的数据访问计数"""
+    from app.services.data_access_recorder import data_access_recorder
+    await data_access_recorder.stop()
+
+
+@app.on_event("startup")
+async def _start_data_blob_collector():
+    """把旧默认目录（静态文件目录内）中的产品数据文件移走，启动未引用文件的定期回收任务"""
+    import asyncio
+    from app.services.data_blob_store import LEGACY_DATA_BLOB_DIR, data_blob_collector, data_blob_store
+    if not settings.DATA_BLOB_DIR:
+        await asyncio.to_thread(data_blob_store.adopt_legacy_files, LEGACY_DATA_BLOB_DIR)
+    data_blob_collector.start()
+
+
+@app.on_event("shutdown")
+async def _stop_data_blob_collector():
+    """在写线程停止前停止文件回收任务"""
+    from app.services.data_blob_store import data_blob_collector
+    await data_blob_collector.stop()
+
+
+@app.on_event("startup")
+async def _start_telemetry_buffer():
+    """启动遥测缓冲区定时刷新"""
+    from app.services.telemetry_buffer import telemetry_buffer
+    telemetry_buffer.start()
+
+
+@app.on_event("shutdown")
+async def _stop_telemetry_buffer():
+    """在写线程停止前写入缓冲区中剩余的遥测事件"""
+    from app.services.telemetry_buffer import telemetry_buffer
+    await telemetry_buffer.stop()
+
+
+@app.on_event("startup")
+async def _start_stats_rollup_job():
+    """启动访问统计小时汇总任务"""
+    from app.services.analytics_rollup import stats_rollup_job
+    stats_rollup_job.start()
+
+
+@app.on_event("shutdown")
+async def _stop_stats_rollup_job():
+    """在写线程停止前停止汇总任务"""
+    from app.services.analytics_rollup import stats_rollup_job
+    await stats_rollup_job.stop()
+
+
+@app.on_event("startup")
+async def _start_retention_job():
+    """启动数据保留任务（RETENTION_ENABLED=false 时不启动）"""
+    from app.services.retention import retention_job
+    retention_job.start()
+
+
+@app.on_event("shutdown")
+async def _stop_retention_job():
+    """在写线程停止前停止数据保留任务"""
+    from app.services.retention import retention_job
+    await retention_job.stop()
+
+
+@app.on_event("shutdown")
+async def _stop_rate_limiter():
+    """停止限流空闲键清理线程，关闭 sqlite 后端的连接"""
+    rate_limiter.stop()
+
+
+@app.on_event("shutdown")
+async def _stop_db_writer():
+    """停止写线程，提交队列中剩余的写操作"""
+    from app.services.db_writer_service import db_writer_service
+    db_writer_service.stop()
+
+
+@app.on_event("shutdown")
+async def _dispose_async_read_engine():
+    """关闭异步只读连接池"""
+    from app.database import async_read_engine
+    await async_read_engine.dispose()
+
+
 @app.on_event("startup")
 async def _log_routes():
     """启动时输出 SPA 目录与路由情况，便于排查 404。"""
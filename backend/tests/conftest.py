@@ -6,6 +6,8 @@ pytest 配置文件
 import pytest
 from sqlalchemy import create_engine
 from sqlalchemy.orm import sessionmaker
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker
+from sqlalchemy.pool import NullPool
 from fastapi.testclient import TestClient
 import tempfile
 import os
@@ -15,14 +17,21 @@ import sys
 import os
 sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
-from app.database import Base, get_db
+from app.database import Base, get_db, get_async_db
 from app import models  # 导入所有模型以确保它们被注册到 Base.metadata
-from main import app
+from app.services.response_cache import response_cache
+from app.services.session_cache import session_cache
+from app.services.api_token_cache import api_token_cache, token_usage_recorder
+from app.services.data_access_recorder import data_access_recorder
+from app.services.db_writer_service import DatabaseWriterService
+from app.services.telemetry_buffer import telemetry_buffer
+from main import app, rate_limiter
 
 # 使用临时文件数据库进行测试（避免多线程问题）
 import tempfile
 import os
 TEST_DATABASE_URL = "sqlite:///./test_temp.db"
+TEST_ASYNC_DATABASE_URL = "sqlite+aiosqlite:///./test_temp.db"
 
 @pytest.fixture(scope="function")
 def test_engine():
@@ -66,6 +75,14 @@ def test_db(test_engine):
     finally:
         db.close()
 
+@pytest.fixture(scope="function")
+def writer(test_engine):
+    """创建写入测试数据库的单写者队列（不等待攒批，测试结束时停止）"""
+    session_factory = sessionmaker(autocommit=False, autoflush=False, expire_on_commit=False, bind=test_engine)
+    db_writer = DatabaseWriterService(session_factory=session_factory, max_batch_latency_ms=0)
+    yield db_writer
+    db_writer.stop()
+
 @pytest.fixture(scope="function")
 def client(test_engine):
     """创建测试客户端"""
@@ -78,12 +95,36 @@ def client(test_engine):
         finally:
             db.close()
     
+    # 异步读接口使用同一个测试数据库；NullPool 避免连接跨事件循环复用
+    async_engine = create_async_engine(TEST_ASYNC_DATABASE_URL, poolclass=NullPool)
+    TestingAsyncSessionLocal = async_sessionmaker(async_engine, autoflush=False, expire_on_commit=False)
+    
+    async def override_get_async_db():
+        async with TestingAsyncSessionLocal() as db:
+            yield db
+    
     app.dependency_overrides[get_db] = override_get_db
+    app.dependency_overrides[get_async_db] = override_get_async_db
+    # 每个测试使用新数据库，清空上一个测试留下的响应缓存、会话缓存、令牌缓存、使用计数、访问计数和遥测缓冲
+    response_cache.clear()
+    session_cache.clear()
+    api_token_cache.clear()
+    token_usage_recorder.clear()
+    data_access_recorder.clear()
+    telemetry_buffer.clear()
+    # 清空速率限制计数（登录每小时只允许 10 次）
+    rate_limiter.clear()
     
     test_client = TestClient(app)
     yield test_client
     
     app.dependency_overrides.clear()
+    response_cache.clear()
+    session_cache.clear()
+    api_token_cache.clear()
+    token_usage_recorder.clear()
+    data_access_recorder.clear()
+    telemetry_buffer.clear()
 
 @pytest.fixture
 def auth_headers(client):
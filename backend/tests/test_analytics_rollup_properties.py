@@ -0,0 +1,171 @@
+"""
+访问统计汇总属性测试
+
+Feature: performance
+验证分析结果在汇总前、汇总后和只汇总了一部分时都与直接扫描原始表一致，时间范围按小时过滤
+"""
+
+import asyncio
+from datetime import datetime, timedelta
+
+from hypothesis import given, settings, strategies as st, HealthCheck
+from sqlalchemy import text
+import sys
+import os
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.models import Product, ProductStats, ProductStatsRollup
+from app.services.analytics_rollup import StatsRollupJob, resolve_range, summarize_stats
+from app.services.visitor_sketch import VisitorSketch
+
+BASE = datetime(2024, 3, 1, 8, 30)
+
+
+def roll_up(writer, batch_size=1000):
+    return asyncio.run(StatsRollupJob(writer=writer, batch_size=batch_size).run_once())
+
+
+def seed(db, rows):
+    """rows: (product_id, 相对 BASE 的分钟数或 None, 访客编号, 时长)"""
+    for product_id in {row[0] for row in rows} | {1}:
+        if db.get(Product, product_id) is None:
+            db.add(Product(id=product_id, title=f"product {product_id}", product_type="tool"))
+    db.flush()
+    for product_id, minutes, visitor, duration in rows:
+        db.add(ProductStats(
+            product_id=product_id,
+            visitor_ip=f"10.0.0.{visitor}" if visitor is not None else None,
+            access_time=BASE + timedelta(minutes=minutes) if minutes is not None else None,
+            duration_seconds=duration
+        ))
+    db.commit()
+
+
+def raw_summary(db, product_id, start=None, end=None):
+    """直接扫描原始表的参考结果"""
+    stats = db.query(ProductStats).filter(ProductStats.product_id == product_id).all()
+    if start is not None or end is not None:
+        stats = [s for s in stats if s.access_time is not None
+                 and (start is None or s.access_time >= start) and (end is None or s.access_time < end)]
+    hours = {}
+    for s in stats:
+        if s.access_time is not None:
+            hours[s.access_time.hour] = hours.get(s.access_time.hour, 0) + 1
+    timed = [s.access_time for s in stats if s.access_time is not None]
+    return {
+        "total_visits": len(stats),
+        "unique_visitors": len({s.visitor_ip for s in stats if s.visitor_ip}),
+        "duration_sum": sum(s.duration_seconds or 0 for s in stats),
+        "last_access": max(timed) if timed else None,
+        "popular_times": [{"hour": h, "visits": c} for h, c in sorted(hours.items())],
+    }
+
+
+def as_dict(summary):
+    return {
+        "total_visits": summary.total_visits,
+        "unique_visitors": summary.unique_visitors,
+        "duration_sum": summary.duration_sum,
+        "last_access": summary.last_access,
+        "popular_times": summary.popular_times,
+    }
+
+
+rows_strategy = st.lists(
+    st.tuples(st.integers(1, 2), st.one_of(st.none(), st.integers(0, 72 * 60)),
+              st.one_of(st.none(), st.integers(0, 6)), st.integers(0, 300)),
+    min_size=1, max_size=30
+)
+
+
+@given(rows_strategy, st.integers(1, 7), st.integers(0, 48), st.integers(1, 48))
+@settings(max_examples=25, deadline=None, suppress_health_check=[HealthCheck.function_scoped_fixture])
+def test_property_16_rollup_matches_raw_scan(test_db, writer, rows, batch_size, start_hour, span_hours):
+    """
+    Feature: performance, Property 16: 汇总前后以及只汇总了一部分时，分析结果都与原始表扫描一致
+    """
+    test_db.execute(text("DELETE FROM product_stats_rollups"))
+    test_db.execute(text("DELETE FROM product_visitor_daily"))
+    test_db.execute(text("DELETE FROM rollup_watermarks"))
+    test_db.execute(text("DELETE FROM product_stats"))
+    test_db.commit()
+
+    start = BASE.replace(minute=0) + timedelta(hours=start_hour)
+    end = start + timedelta(hours=span_hours)
+    half = len(rows) // 2
+
+    seed(test_db, rows[:half])
+    roll_up(writer, batch_size)
+    seed(test_db, rows[half:])  # 这部分还在水位线之后
+
+    for _ in range(2):
+        for product_id in (1, 2):
+            assert as_dict(summarize_stats(test_db, product_id)) == raw_summary(test_db, product_id)
+            assert as_dict(summarize_stats(test_db, product_id, start, end)) == \
+                raw_summary(test_db, product_id, start, end)
+        roll_up(writer, batch_size)
+        test_db.expire_all()
+
+
+def test_property_16_rollup_is_incremental(test_db, writer):
+    """
+    Feature: performance, Property 16: 同一小时的新数据合并进已有汇总行，水位线之前的行不会重复计入
+    """
+    seed(test_db, [(1, 0, 1, 10), (1, 5, 2, 20)])
+    assert roll_up(writer) == 2
+    seed(test_db, [(1, 10, 1, 30)])
+    assert roll_up(writer) == 1
+    assert roll_up(writer) == 0
+
+    rollups = test_db.query(ProductStatsRollup).all()
+    assert len(rollups) == 1
+    assert (rollups[0].visits, rollups[0].duration_sum) == (3, 60)
+    assert VisitorSketch.from_bytes(rollups[0].visitor_sketch).cardinality() == 2
+
+
+def test_property_16_resolve_range():
+    """
+    Feature: performance, Property 16: 时间范围按小时对齐，终点所在小时包含在内
+    """
+    now = datetime(2024, 3, 2, 10, 15)
+    assert resolve_range("all", now=now) == (None, None)
+    assert resolve_range("24h", now=now) == (datetime(2024, 3, 1, 10), datetime(2024, 3, 2, 11))
+    assert resolve_range("custom", start=datetime(2024, 3, 1, 9, 59), end=datetime(2024, 3, 1, 12),
+                         now=now) == (datetime(2024, 3, 1, 9), datetime(2024, 3, 1, 12))
+    for args in (("week",), ("custom",)):
+        try:
+            resolve_range(*args, now=now)
+        except ValueError:
+            continue
+        raise AssertionError(f"{args} 应当被拒绝")
+
+
+def test_property_16_analytics_endpoint_ranges(client, auth_headers, test_db, writer):
+    """
+    Feature: performance, Property 16: 分析接口按范围参数读取汇总，非法范围返回 400
+    """
+    seed(test_db, [(1, 0, 1, 10), (1, 60, 2, 20), (1, 24 * 60, 3, 30)])
+    roll_up(writer)
+
+    body = client.get("/api/products/1/analytics", headers=auth_headers).json()
+    assert (body["total_visits"], body["unique_visitors"], body["average_duration"]) == (3, 3, 20.0)
+
+    response = client.get("/api/products/1/analytics", headers=auth_headers, params={
+        "range": "custom", "start": "2024-03-01T08:00:00Z", "end": "2024-03-01T10:00:00Z"
+    })
+    assert response.status_code == 200
+    body = response.json()
+    assert body["total_visits"] == 2
+    assert body["popular_times"] == [{"hour": 8, "visits": 1}, {"hour": 9, "visits": 1}]
+    assert body["range_start"].startswith("2024-03-01T08:00:00")
+
+    assert client.get("/api/products/1/analytics", headers=auth_headers,
+                      params={"range": "90d"}).status_code == 400
+
+    stats = client.get("/api/products/1/stats").json()
+    assert stats["summary"]["total_visits"] == 3
+    assert stats["summary"]["unique_visitors"] == 3
+
+    metrics = client.get("/api/products/monitoring/analytics-rollup", headers=auth_headers).json()
+    assert metrics["watermark"] == 3
@@ -0,0 +1,80 @@
+"""
+产品 API 令牌缓存属性测试
+
+Feature: performance
+验证热令牌验证不查询令牌表、撤销立即失效、使用计数批量写回
+"""
+
+import asyncio
+from datetime import datetime, timezone
+
+from sqlalchemy import event
+import sys
+import os
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.models import Product, ProductAPIToken
+from app.services.api_token_cache import TokenUsageRecorder
+
+
+def test_usage_is_accumulated_and_flushed_in_one_write(test_db, writer):
+    """
+    Feature: performance, Property 11: 使用计数在内存中累加，一次写操作批量写回
+    """
+    test_db.add(ProductAPIToken(id=1, product_id=1, token="a", expires_at=datetime(2099, 1, 1), usage_count=3))
+    test_db.add(ProductAPIToken(id=2, product_id=1, token="b", expires_at=datetime(2099, 1, 1)))
+    test_db.commit()
+
+    recorder = TokenUsageRecorder(writer=writer)
+    latest = datetime(2030, 1, 1, tzinfo=timezone.utc)
+    for _ in range(5):
+        recorder.record(1)
+    recorder.record(1, used_at=latest)
+    recorder.record(2)
+    assert recorder.pending(1) == 6
+
+    assert asyncio.run(recorder.flush()) == 7
+    assert recorder.pending(1) == 0
+    assert writer.get_metrics()["jobs_committed"] == 1
+
+    test_db.expire_all()
+    first, second = test_db.query(ProductAPIToken).order_by(ProductAPIToken.id).all()
+    assert first.usage_count == 9
+    assert first.last_used_at.replace(tzinfo=timezone.utc) == latest
+    assert second.usage_count == 1
+    assert recorder.get_metrics()["uses_flushed"] == 7
+
+
+def test_cached_validation_and_revocation(client, auth_headers, test_engine, test_db):
+    """
+    Feature: performance, Property 11: 热令牌验证不查询令牌表，撤销后立即失效
+    """
+    test_db.add(Product(id=1, title="demo", product_type="tool"))
+    test_db.add(Product(id=2, title="other", product_type="tool"))
+    test_db.commit()
+
+    token = client.post("/api/products/1/api/token", json={"permissions": ["read"]}, headers=auth_headers).json()["token"]
+    assert client.post("/api/products/1/api/validate", json={"token": token}).json()["valid"] is True
+
+    statements = []
+
+    def record(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    event.listen(test_engine, "before_cursor_execute", record)
+    try:
+        for _ in range(3):
+            assert client.post("/api/products/1/api/validate", json={"token": token}).json()["valid"] is True
+    finally:
+        event.remove(test_engine, "before_cursor_execute", record)
+    assert not any("product_api_tokens" in statement for statement in statements)
+
+    tokens = client.get("/api/products/1/api/tokens", headers=auth_headers).json()
+    assert tokens[0]["usage_count"] == 4  # 包含尚未写回的计数
+
+    # 其他产品不能使用该令牌
+    assert client.post("/api/products/2/api/validate", json={"token": token}).json()["valid"] is False
+
+    client.request("DELETE", "/api/products/1/api/token", json={"token": token}, headers=auth_headers)
+    assert client.post("/api/products/1/api/validate", json={"token": token}).json()["valid"] is False
@@ -0,0 +1,80 @@
+"""
+纯 ASGI 中间件属性测试
+
+Feature: performance
+验证请求ID、API 禁止缓存和 SPA 404 回退在改为纯 ASGI 实现后行为不变
+"""
+
+import pytest
+from fastapi import FastAPI, Request
+from fastapi.staticfiles import StaticFiles
+from fastapi.testclient import TestClient
+import sys
+import os
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.error_handlers import RequestIDMiddleware
+from app.middleware.spa import SPA404Middleware, NoCacheAPIMiddleware
+
+
+@pytest.fixture
+def client(tmp_path):
+    spa_dir = tmp_path / "dist"
+    (spa_dir / "assets").mkdir(parents=True)
+    (spa_dir / "index.html").write_text("<html>index</html>", encoding="utf-8")
+    (spa_dir / "assets" / "app.js").write_text("console.log(1)", encoding="utf-8")
+    uploads_dir = tmp_path / "uploads"
+    uploads_dir.mkdir()
+    (uploads_dir / "a.txt").write_text("upload", encoding="utf-8")
+
+    app = FastAPI()
+
+    @app.get("/api/echo-id")
+    async def echo_id(request: Request):
+        return {"request_id": request.state.request_id}
+
+    app.mount("/uploads", StaticFiles(directory=str(uploads_dir)), name="uploads")
+    app.add_middleware(RequestIDMiddleware)
+    app.add_middleware(NoCacheAPIMiddleware)
+    app.add_middleware(SPA404Middleware, spa_dir=spa_dir)
+    return TestClient(app)
+
+
+def test_request_id_header_matches_state(client):
+    """
+    Feature: performance, Property 6: 请求ID同时写入 request.state 和响应头
+    """
+    response = client.get("/api/echo-id")
+    assert response.status_code == 200
+    assert response.json()["request_id"] == response.headers["X-Request-ID"]
+
+
+def test_api_responses_are_not_cached(client):
+    """
+    Feature: performance, Property 6: /api 响应带禁止缓存头，静态文件不带
+    """
+    api = client.get("/api/echo-id")
+    assert "no-store" in api.headers["Cache-Control"]
+    assert api.headers["Pragma"] == "no-cache"
+
+    static = client.get("/uploads/a.txt")
+    assert static.status_code == 200
+    assert "no-store" not in static.headers.get("Cache-Control", "")
+
+
+def test_spa_fallback_only_for_non_api_get_404(client):
+    """
+    Feature: performance, Property 6: 仅非 /api 的 GET 404 回退到前端页面
+    """
+    page = client.get("/blog/some-post")
+    assert page.status_code == 200
+    assert page.text == "<html>index</html>"
+
+    asset = client.get("/assets/app.js")
+    assert asset.status_code == 200
+    assert asset.text == "console.log(1)"
+
+    assert client.get("/api/missing").status_code == 404
+    assert client.get("/uploads/missing.txt").status_code == 404
+    assert client.post("/blog/some-post").status_code in (404, 405)
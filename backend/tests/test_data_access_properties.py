@@ -0,0 +1,101 @@
+"""
+产品数据访问统计属性测试
+
+Feature: performance
+验证读取产品数据不执行写语句，访问次数在内存中累加后一次批量写回，写回前后读到的计数一致
+"""
+
+import asyncio
+from datetime import datetime, timezone
+
+from hypothesis import given, settings, strategies as st
+from sqlalchemy import event, text
+import sys
+import os
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.models import Product, ProductDataStorage
+from app.services.data_access_recorder import DataAccessRecorder, data_access_recorder
+
+
+def seed(db, keys=("a", "b")):
+    db.add(Product(id=1, title="demo", product_type="tool"))
+    db.add_all([ProductDataStorage(product_id=1, storage_key=key, storage_value={"v": key}, size_bytes=10)
+                for key in keys])
+    db.commit()
+
+
+@given(st.lists(st.sampled_from(["a", "b", "missing"]), max_size=30))
+@settings(max_examples=30, deadline=None)
+def test_property_24_counts_are_accumulated_and_flushed_once(reads):
+    """
+    Feature: performance, Property 24: 任意读取序列的访问次数在内存中累加，写回时每个键合并为一行
+    """
+    recorder = DataAccessRecorder()
+    for key in reads:
+        recorder.record(1, [key])
+    expected = {key: reads.count(key) for key in set(reads)}
+    assert {key: recorder.pending(1, key)[0] for key in expected} == expected
+    taken = recorder._take()
+    assert sorted((key, count) for _, key, count, _ in taken) == sorted(expected.items())
+    assert recorder.pending(1, "a") == (0, None)
+
+
+def test_property_24_flush_applies_counts_in_one_write(test_db, writer):
+    """
+    Feature: performance, Property 24: 写回是单写者队列中的一个写操作，累加次数、最近访问时间只前进，已删除的键被丢弃
+    """
+    seed(test_db, keys=("a", "b", "c"))
+    test_db.execute(text("UPDATE product_data_storage SET access_count = 3, accessed_at = '2035-01-01 00:00:00' "
+                         "WHERE storage_key = 'b'"))
+    test_db.commit()
+
+    recorder = DataAccessRecorder(writer=writer)
+    latest = datetime(2030, 1, 1, tzinfo=timezone.utc)
+    recorder.record(1, ["a", "b"])
+    recorder.record(1, ["a", "c"], accessed_at=latest)
+    recorder.discard(1, ["c"])
+    assert asyncio.run(recorder.flush()) == 3
+    assert writer.get_metrics()["jobs_committed"] == 1
+
+    rows = {key: (count, accessed_at) for key, count, accessed_at in test_db.execute(text(
+        "SELECT storage_key, access_count, accessed_at FROM product_data_storage"
+    ))}
+    assert rows["a"] == (2, "2030-01-01 00:00:00.000000")
+    assert rows["b"] == (4, "2035-01-01 00:00:00")
+    assert rows["c"][0] == 0
+    assert recorder.get_metrics()["reads_flushed"] == 3
+
+
+def test_property_24_reads_do_not_write(client, auth_headers, test_engine, test_db, writer, monkeypatch):
+    """
+    Feature: performance, Property 24: 单键与批量读取不执行写语句，返回的访问次数在写回前后一致
+    """
+    seed(test_db)
+    statements = []
+
+    def record(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    event.listen(test_engine, "before_cursor_execute", record)
+    try:
+        for _ in range(3):
+            response = client.get("/api/products/1/data/a", headers=auth_headers)
+            assert response.status_code == 200
+        batch = client.post("/api/products/1/data/batch/get", headers=auth_headers, json={"keys": ["a", "b"]})
+    finally:
+        event.remove(test_engine, "before_cursor_execute", record)
+
+    assert response.json()["access_count"] == 3
+    assert [r["access_count"] for r in batch.json()["results"]] == [4, 1]
+    writes = [s for s in statements if "product_data_storage" in s and not s.lstrip().upper().startswith("SELECT")]
+    assert writes == []
+
+    monkeypatch.setattr(data_access_recorder, "_writer", writer)
+    asyncio.run(data_access_recorder.flush())
+    test_db.expire_all()
+    assert {row.storage_key: row.access_count for row in test_db.query(ProductDataStorage)} == {"a": 4, "b": 1}
+    listed = client.get("/api/products/1/data", headers=auth_headers).json()["records"]
+    assert {r["key"]: r["access_count"] for r in listed} == {"a": 4, "b": 1}
+    assert all(r["accessed_at"] for r in listed)
@@ -0,0 +1,157 @@
+"""
+产品数据批量读写属性测试
+
+Feature: performance
+验证批量读取、写入、删除与逐键操作结果一致，每批只用固定条数的 SQL，配额只检查一次
+"""
+
+from hypothesis import given, settings, strategies as st, HealthCheck
+from sqlalchemy import create_engine, event, text
+from sqlalchemy.orm import sessionmaker
+import sys
+import os
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.config import settings as app_settings
+from app.database import Base
+from app.migrations import run_migrations
+from app.models import Product, ProductDataStorage
+from app.services import product_data_store
+
+keys = st.sampled_from([f"key{i}" for i in range(8)])
+batches = st.lists(st.one_of(
+    st.tuples(st.just("put"), st.lists(st.tuples(keys, st.integers(0, 100)), min_size=1, max_size=6)),
+    st.tuples(st.just("delete"), st.lists(keys, min_size=1, max_size=6)),
+), max_size=8)
+
+
+def reset(db):
+    db.execute(text("DELETE FROM product_data_storage"))
+    db.execute(text("DELETE FROM products"))
+    db.add(Product(id=1, title="demo", product_type="tool"))
+    db.commit()
+
+
+@given(batches)
+@settings(max_examples=30, deadline=None, suppress_health_check=[HealthCheck.function_scoped_fixture])
+def test_property_23_batches_match_model(test_db, ops):
+    """
+    Feature: performance, Property 23: 任意批量写入、删除序列后，批量读取结果与字典模型一致
+    """
+    reset(test_db)
+    model = {}
+    for op, arg in ops:
+        if op == "put":
+            results = product_data_store.put_many(test_db, 1, [(key, {"v": value}) for key, value in arg])
+            expected_status = {key: "updated" if key in model else "created" for key, _ in arg}
+            assert {r["key"]: r["status"] for r in results} == expected_status
+            model.update({key: {"v": value} for key, value in arg})
+        else:
+            results = product_data_store.delete_many(test_db, 1, arg)
+            assert {r["key"]: r["status"] for r in results} == \
+                {key: "deleted" if key in model else "not_found" for key in arg}
+            for key in arg:
+                model.pop(key, None)
+        test_db.commit()
+
+    all_keys = [f"key{i}" for i in range(8)]
+    results = product_data_store.get_many(test_db, 1, all_keys)
+    assert [r["key"] for r in results] == all_keys
+    assert {r["key"]: r["data"] for r in results if r["status"] == "ok"} == model
+    assert test_db.execute(text("SELECT COUNT(*) FROM product_data_storage")).scalar() == len(model)
+
+
+def test_property_23_fixed_statement_count(client, auth_headers, test_engine, test_db):
+    """
+    Feature: performance, Property 23: 批量写入 50 个键只执行固定条数的 SQL，与键数无关
+    """
+    reset(test_db)
+    statements = []
+
+    def record(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    event.listen(test_engine, "before_cursor_execute", record)
+    try:
+        response = client.post("/api/products/1/data/batch/put", headers=auth_headers, json={
+            "items": [{"key": f"level-{i}", "data": {"score": i}} for i in range(50)]
+        })
+    finally:
+        event.remove(test_engine, "before_cursor_execute", record)
+
+    assert response.status_code == 200
+    assert all(r["status"] == "created" for r in response.json()["results"])
+    storage_statements = [s for s in statements if "product_data_storage" in s]
+    assert len(storage_statements) == 3  # 已有键、已用空间、upsert
+    assert sum("ON CONFLICT" in s for s in storage_statements) == 1
+
+
+def test_property_23_per_key_errors_and_limits(client, auth_headers, test_db, monkeypatch):
+    """
+    Feature: performance, Property 23: 非法键单独报错，超出键数上限返回 413，超出配额整批不写入
+    """
+    reset(test_db)
+    response = client.post("/api/products/1/data/batch/put", headers=auth_headers, json={
+        "items": [{"key": "ok", "data": {"a": 1}}, {"key": "", "data": {}}, {"key": "x" * 256, "data": {}}]
+    })
+    assert response.status_code == 200
+    assert [r["status"] for r in response.json()["results"]] == ["created", "invalid", "invalid"]
+
+    monkeypatch.setattr(app_settings, "DATA_BATCH_MAX_KEYS", 2)
+    response = client.post("/api/products/1/data/batch/get", headers=auth_headers, json={"keys": ["a", "b", "c"]})
+    assert response.status_code == 413
+
+    monkeypatch.setattr(product_data_store, "DATA_QUOTA_BYTES", 30)
+    response = client.post("/api/products/1/data/batch/put", headers=auth_headers, json={
+        "items": [{"key": "ok", "data": {"a": 2}}, {"key": "big", "data": {"payload": "y" * 40}}]
+    })
+    assert response.status_code == 400
+    test_db.expire_all()
+    assert [(r.storage_key, r.storage_value) for r in test_db.query(ProductDataStorage)] == [("ok", {"a": 1})]
+
+    response = client.post("/api/products/999/data/batch/get", headers=auth_headers, json={"keys": ["a"]})
+    assert response.status_code == 404
+
+
+def test_property_23_reads_count_access(client, auth_headers, test_db):
+    """
+    Feature: performance, Property 23: 批量读取与单键读取一样累加访问次数
+    """
+    reset(test_db)
+    client.post("/api/products/1/data/batch/put", headers=auth_headers,
+                json={"items": [{"key": "a", "data": {"v": 1}}, {"key": "b", "data": {"v": 2}}]})
+    for _ in range(2):
+        response = client.post("/api/products/1/data/batch/get", headers=auth_headers, json={"keys": ["a", "zzz"]})
+    results = response.json()["results"]
+    assert (results[0]["access_count"], results[0]["accessed_at"] is not None) == (2, True)
+    assert results[1] == {"key": "zzz", "status": "not_found"}
+
+
+def test_property_23_upsert_after_startup_migration(tmp_path):
+    """
+    Feature: performance, Property 23: 已有数据库的非唯一索引在启动迁移中改为唯一索引，重复键保留最新一条，批量 upsert 可用
+    """
+    engine = create_engine(f"sqlite:///{(tmp_path / 'old.db').as_posix()}")
+    Base.metadata.create_all(bind=engine)
+    with engine.begin() as conn:
+        conn.execute(text("DROP INDEX idx_data_storage_product_key"))
+        conn.execute(text("CREATE INDEX idx_data_storage_product_key ON product_data_storage (product_id, storage_key)"))
+        conn.execute(text("INSERT INTO products (id, title, product_type) VALUES (1, 'demo', 'tool')"))
+        conn.execute(text(
+            "INSERT INTO product_data_storage (product_id, storage_key, storage_value, size_bytes) "
+            "VALUES (1, 'a', '{\"v\": 1}', 8), (1, 'a', '{\"v\": 2}', 8)"
+        ))
+
+    run_migrations(engine)
+
+    db = sessionmaker(bind=engine)()
+    try:
+        assert [r["data"] for r in product_data_store.get_many(db, 1, ["a"])] == [{"v": 2}]
+        results = product_data_store.put_many(db, 1, [("a", {"v": 3}), ("b", {"v": 4})])
+        db.commit()
+        assert [r["status"] for r in results] == ["updated", "created"]
+        assert db.execute(text("SELECT COUNT(*) FROM product_data_storage")).scalar() == 2
+    finally:
+        db.close()
+        engine.dispose()
@@ -0,0 +1,198 @@
+"""
+产品数据大值文件存储属性测试
+
+Feature: performance
+验证大值按内容寻址存为文件、行内只保存引用，相同的值只存一份，读取结果与行内存储一致，
+未被引用的文件在宽限期后回收
+"""
+
+import asyncio
+import json
+import shutil
+import uuid
+from pathlib import Path
+from unittest.mock import patch
+
+from hypothesis import given, settings, strategies as st
+from sqlalchemy import create_engine, text
+from sqlalchemy.orm import sessionmaker
+import sys
+import os
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.database import Base
+from app.migrations import run_migrations
+from app.models import Product, ProductDataStorage
+from app.services import product_data_store
+from app.services.data_blob_store import ENCODING_RAW, ENCODING_ZLIB, DataBlobCollector, DataBlobStore
+
+json_values = st.recursive(
+    st.one_of(st.none(), st.booleans(), st.integers(), st.text(max_size=50)),
+    lambda children: st.one_of(st.lists(children, max_size=8), st.dictionaries(st.text(max_size=8), children, max_size=8)),
+    max_leaves=40
+)
+
+
+@given(json_values, st.booleans())
+@settings(max_examples=60, deadline=None)
+def test_property_25_blob_round_trip_and_dedup(tmp_path_factory, value, compress):
+    """
+    Feature: performance, Property 25: 任意值写入文件后按块读回的字节不变，相同的值只保存一个文件
+    """
+    store = DataBlobStore(tmp_path_factory.mktemp("blobs"), threshold_bytes=0, compress=compress)
+    payload = product_data_store.value_bytes(value)
+    digest, encoding = store.put(payload)
+    assert store.put(payload) == (digest, encoding)
+    assert b"".join(store.open(digest, encoding)) == payload
+    assert json.loads(store.read(digest, encoding)) == value
+    assert len(list(store.root.glob("*/*"))) == 1
+    assert encoding == ENCODING_RAW or compress
+
+
+def large_value(seed):
+    return {"seed": seed, "rows": [{"id": i, "name": f"item-{i}"} for i in range(200)]}
+
+
+def test_property_25_large_values_are_offloaded(client, auth_headers, test_db, tmp_path, monkeypatch):
+    """
+    Feature: performance, Property 25: 超过阈值的值行内只保存引用，单键读取流式返回，批量读取与导出结果一致
+    """
+    store = DataBlobStore(tmp_path, threshold_bytes=1024)
+    monkeypatch.setattr(product_data_store, "data_blob_store", store)
+    test_db.add(Product(id=1, title="demo", product_type="tool"))
+    test_db.commit()
+
+    value = large_value(1)
+    assert client.post("/api/products/1/data/save", headers=auth_headers, json=value).status_code == 200
+    response = client.post("/api/products/1/data/batch/put", headers=auth_headers, json={
+        "items": [{"key": "copy", "data": value}, {"key": "small", "data": {"a": 1}}]
+    })
+    assert response.status_code == 200
+
+    rows = {row.storage_key: row for row in test_db.query(ProductDataStorage)}
+    assert rows["save"].storage_value is None and rows["save"].blob_hash
+    assert rows["save"].blob_hash == rows["copy"].blob_hash
+    assert rows["save"].blob_encoding == ENCODING_ZLIB
+    assert rows["save"].size_bytes == len(product_data_store.value_bytes(value))
+    assert rows["small"].blob_hash is None and rows["small"].storage_value == {"a": 1}
+    assert len(list(tmp_path.glob("*/*"))) == 1
+    assert store.get_metrics()["files_reused"] == 1
+
+    single = client.get("/api/products/1/data/save", headers=auth_headers)
+    assert single.status_code == 200
+    assert single.json()["data"] == value
+    assert single.json()["size_bytes"] == rows["save"].size_bytes
+    assert client.get("/api/products/1/data/small", headers=auth_headers).json()["data"] == {"a": 1}
+
+    results = client.post("/api/products/1/data/batch/get", headers=auth_headers,
+                          json={"keys": ["save", "copy", "small"]}).json()["results"]
+    assert [r["data"] for r in results] == [value, value, {"a": 1}]
+
+    # 覆盖为小值后回到行内存储
+    client.post("/api/products/1/data/save", headers=auth_headers, json={"b": 2})
+    test_db.expire_all()
+    row = test_db.query(ProductDataStorage).filter(ProductDataStorage.storage_key == "save").one()
+    assert (row.storage_value, row.blob_hash, row.blob_encoding) == ({"b": 2}, None, None)
+
+
+def test_property_25_unreferenced_blobs_are_collected(test_db, writer, tmp_path):
+    """
+    Feature: performance, Property 25: 回收任务只用一个写操作读取引用，仍被引用或在宽限期内复用的文件保留，
+    未被引用的文件在宽限期后回收
+    """
+    test_db.add(Product(id=1, title="demo", product_type="tool"))
+    test_db.commit()
+    store = DataBlobStore(tmp_path, threshold_bytes=0, gc_grace_seconds=3600)
+    shared, orphan, reused = store.put(b'{"a": 1}'), store.put(b'{"b": 2}'), store.put(b'{"c": 3}')
+    test_db.add_all([
+        ProductDataStorage(product_id=1, storage_key=key, blob_hash=shared[0], blob_encoding=shared[1], size_bytes=8)
+        for key in ("k1", "k2")
+    ])
+    test_db.commit()
+    stale = tmp_path / shared[0][:2] / ".tmp-stale"
+    stale.write_bytes(b"x")
+    for path in [*tmp_path.glob("*/*"), *tmp_path.glob("*/.tmp-*")]:
+        os.utime(path, (0, 0))
+    store.put(b'{"c": 3}')  # 复用已有文件会刷新修改时间
+
+    collector = DataBlobCollector(store=store, writer=writer)
+    assert asyncio.run(collector.run_once()) == 2
+    assert writer.get_metrics()["jobs_committed"] == 1
+    assert not store.path_for(*orphan).exists() and not stale.exists()
+    assert store.path_for(*shared).exists() and store.path_for(*reused).exists()
+
+    test_db.execute(text("DELETE FROM product_data_storage WHERE storage_key = 'k1'"))
+    test_db.commit()
+    assert asyncio.run(collector.run_once()) == 0
+
+    test_db.execute(text("DELETE FROM product_data_storage"))
+    test_db.commit()
+    store.gc_grace_seconds = 0
+    assert asyncio.run(collector.run_once()) == 2
+    assert list(tmp_path.glob("*/*")) == []
+    assert collector.get_metrics()["files_reclaimed"] == 4
+
+
+def test_property_25_blob_columns_added_by_startup_migration(tmp_path):
+    """
+    Feature: performance, Property 25: 已有数据库在启动迁移中补齐文件引用字段，原有行内数据可读，大值写入文件
+    """
+    engine = create_engine(f"sqlite:///{(tmp_path / 'old.db').as_posix()}")
+    Base.metadata.create_all(bind=engine)
+    with engine.begin() as conn:
+        conn.execute(text("DROP INDEX idx_data_storage_blob_hash"))
+        conn.execute(text("ALTER TABLE product_data_storage DROP COLUMN blob_hash"))
+        conn.execute(text("ALTER TABLE product_data_storage DROP COLUMN blob_encoding"))
+        conn.execute(text("INSERT INTO products (id, title, product_type) VALUES (1, 'demo', 'tool')"))
+        conn.execute(text(
+            "INSERT INTO product_data_storage (product_id, storage_key, storage_value, size_bytes) "
+            "VALUES (1, 'old', '{\"v\": 1}', 8)"
+        ))
+
+    run_migrations(engine)
+
+    store = DataBlobStore(tmp_path / "blobs", threshold_bytes=1024)
+    db = sessionmaker(bind=engine)()
+    try:
+        with patch.object(product_data_store, "data_blob_store", store):
+            product_data_store.put_many(db, 1, [("big", large_value(2))])
+            db.commit()
+            results = product_data_store.get_many(db, 1, ["old", "big"])
+        assert [r["data"] for r in results] == [{"v": 1}, large_value(2)]
+        assert db.query(ProductDataStorage).filter(ProductDataStorage.storage_key == "big").one().blob_hash
+    finally:
+        db.close()
+        engine.dispose()
+
+
+def test_property_25_blobs_are_not_served(client, tmp_path):
+    """
+    Feature: performance, Property 25: 默认文件目录不在任何静态文件目录内；旧默认目录中的文件启动时移走，
+    之后无法通过 HTTP 读取
+    """
+    from fastapi.staticfiles import StaticFiles
+    from starlette.routing import Mount
+    from app.services.data_blob_store import data_blob_store
+    from main import app
+
+    mounts = {route.path: Path(route.app.directory).resolve() for route in app.routes
+              if isinstance(route, Mount) and isinstance(route.app, StaticFiles)}
+    assert "/products" in mounts
+    assert not any(data_blob_store.root.resolve().is_relative_to(directory) for directory in mounts.values())
+
+    # 在产品静态目录中模拟旧默认目录
+    legacy_root = mounts["/products"] / f"legacy-blobs-{uuid.uuid4().hex}"
+    try:
+        payload = product_data_store.value_bytes(large_value(3))
+        digest, encoding = DataBlobStore(legacy_root, threshold_bytes=0).put(payload)
+        url = f"/products/{legacy_root.name}/{digest[:2]}/{DataBlobStore(legacy_root).path_for(digest, encoding).name}"
+        assert client.get(url).status_code == 200
+
+        store = DataBlobStore(tmp_path, threshold_bytes=0)
+        assert store.adopt_legacy_files(legacy_root) == 1
+        assert store.adopt_legacy_files(legacy_root) == 0
+        assert client.get(url).status_code == 404
+        assert store.read(digest, encoding) == payload
+    finally:
+        shutil.rmtree(legacy_root, ignore_errors=True)
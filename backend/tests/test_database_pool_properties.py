@@ -0,0 +1,119 @@
+"""
+数据库连接池属性测试
+
+Feature: performance
+验证 WAL 模式下的读写分离连接池
+"""
+
+import pytest
+from pathlib import Path
+from sqlalchemy import text
+from sqlalchemy.exc import OperationalError
+from starlette.requests import Request
+import sys
+import os
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.database import create_sqlite_engines, _wants_read_session, read_only, writes_on_read
+
+
+def _make_request(method: str, endpoint=None) -> Request:
+    scope = {"type": "http", "method": method, "path": "/", "headers": [], "query_string": b""}
+    if endpoint is not None:
+        scope["endpoint"] = endpoint
+    return Request(scope)
+
+
+@pytest.fixture
+def wal_engines(tmp_path: Path):
+    write_engine, read_engine = create_sqlite_engines(
+        f"sqlite:///{(tmp_path / 'wal_test.db').as_posix()}",
+        wal_mode=True,
+        read_pool_size=2
+    )
+    with write_engine.begin() as conn:
+        conn.execute(text("CREATE TABLE items (id INTEGER PRIMARY KEY, name TEXT)"))
+        conn.execute(text("INSERT INTO items (name) VALUES ('a')"))
+    yield write_engine, read_engine
+    write_engine.dispose()
+    read_engine.dispose()
+
+
+def test_wal_mode_enabled(wal_engines):
+    """
+    Feature: performance, Property 1: WAL 读写分离
+    写引擎与只读引擎均运行在 WAL 模式，只读连接开启 query_only
+    """
+    write_engine, read_engine = wal_engines
+    with write_engine.connect() as conn:
+        assert conn.execute(text("PRAGMA journal_mode")).scalar().lower() == "wal"
+    with read_engine.connect() as conn:
+        assert conn.execute(text("PRAGMA journal_mode")).scalar().lower() == "wal"
+        assert conn.execute(text("PRAGMA query_only")).scalar() == 1
+
+
+def test_read_connection_rejects_writes(wal_engines):
+    """
+    Feature: performance, Property 1: WAL 读写分离
+    只读连接上的写操作必须失败
+    """
+    _, read_engine = wal_engines
+    with read_engine.connect() as conn:
+        with pytest.raises(OperationalError):
+            conn.execute(text("INSERT INTO items (name) VALUES ('b')"))
+
+
+def test_reads_not_blocked_by_open_write_transaction(wal_engines):
+    """
+    Feature: performance, Property 1: WAL 读写分离
+    写事务未提交时，只读连接仍能读取到最近一次提交的数据
+    """
+    write_engine, read_engine = wal_engines
+    with write_engine.connect() as write_conn:
+        write_conn.execute(text("INSERT INTO items (name) VALUES ('pending')"))
+        with read_engine.connect() as read_conn:
+            count = read_conn.execute(text("SELECT COUNT(*) FROM items")).scalar()
+        assert count == 1
+        write_conn.commit()
+    with read_engine.connect() as read_conn:
+        assert read_conn.execute(text("SELECT COUNT(*) FROM items")).scalar() == 2
+
+
+def test_memory_database_shares_single_engine():
+    """
+    Feature: performance, Property 1: WAL 读写分离
+    内存数据库不启用读写分离
+    """
+    write_engine, read_engine = create_sqlite_engines("sqlite:///:memory:", wal_mode=True)
+    assert write_engine is read_engine
+    write_engine.dispose()
+
+
+def test_session_selection_by_method():
+    """
+    Feature: performance, Property 1: WAL 读写分离
+    GET 请求和标记为只读的非 GET 路由使用只读会话，写请求和被标记的 GET 路由使用写会话
+    """
+    def plain_endpoint():
+        pass
+
+    @writes_on_read
+    def writing_endpoint():
+        pass
+
+    @read_only
+    def batch_read_endpoint():
+        pass
+
+    assert _wants_read_session(_make_request("GET", plain_endpoint)) is True
+    assert _wants_read_session(_make_request("HEAD")) is True
+    assert _wants_read_session(_make_request("GET", writing_endpoint)) is False
+    for method in ("POST", "PUT", "DELETE", "PATCH"):
+        assert _wants_read_session(_make_request(method, plain_endpoint)) is False
+        assert _wants_read_session(_make_request(method, batch_read_endpoint)) is True
+    assert _wants_read_session(_make_request("GET", batch_read_endpoint)) is True
+    assert _wants_read_session(None) is False
+
+    from app.routers.products import batch_get_product_data
+    assert _wants_read_session(_make_request("POST", batch_get_product_data)) is True
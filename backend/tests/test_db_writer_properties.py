@@ -0,0 +1,102 @@
+"""
+单写者批量提交属性测试
+
+Feature: performance
+验证写操作分组提交、失败隔离和监控指标
+"""
+
+import pytest
+from concurrent.futures import wait
+from pathlib import Path
+from sqlalchemy import create_engine, text
+from sqlalchemy.orm import sessionmaker
+import sys
+import os
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.services.db_writer_service import DatabaseWriterService
+
+
+def _insert(session, value: int):
+    session.execute(text("INSERT INTO items (value) VALUES (:value)"), {"value": value})
+    return value
+
+
+def _insert_then_fail(session, value: int):
+    session.execute(text("INSERT INTO items (value) VALUES (:value)"), {"value": value})
+    raise ValueError("业务校验失败")
+
+
+@pytest.fixture
+def writer(tmp_path: Path):
+    engine = create_engine(
+        f"sqlite:///{(tmp_path / 'writer_test.db').as_posix()}",
+        connect_args={"check_same_thread": False}
+    )
+    with engine.begin() as conn:
+        conn.execute(text("CREATE TABLE items (id INTEGER PRIMARY KEY, value INTEGER)"))
+    session_factory = sessionmaker(autocommit=False, autoflush=False, expire_on_commit=False, bind=engine)
+    service = DatabaseWriterService(session_factory=session_factory, max_batch_size=50, max_batch_latency_ms=200)
+    yield service, engine
+    service.stop()
+    engine.dispose()
+
+
+def _count(engine) -> int:
+    with engine.connect() as conn:
+        return conn.execute(text("SELECT COUNT(*) FROM items")).scalar()
+
+
+def test_burst_is_group_committed(writer):
+    """
+    Feature: performance, Property 2: 单写者分组提交
+    突发写入被合并为少量事务，全部写入最终可见
+    """
+    service, engine = writer
+    futures = [service.submit(_insert, i) for i in range(120)]
+    wait(futures, timeout=10)
+    
+    assert [f.result() for f in futures] == list(range(120))
+    assert _count(engine) == 120
+    
+    metrics = service.get_metrics()
+    assert metrics["jobs_committed"] == 120
+    assert metrics["batches_committed"] < 120
+    assert metrics["largest_batch_size"] > 1
+    assert metrics["queue_depth"] == 0
+
+
+def test_failed_job_is_isolated(writer):
+    """
+    Feature: performance, Property 2: 单写者分组提交
+    同批次中失败的写操作只回滚自身
+    """
+    service, engine = writer
+    ok_before = service.submit(_insert, 1)
+    failing = service.submit(_insert_then_fail, 2)
+    ok_after = service.submit(_insert, 3)
+    wait([ok_before, failing, ok_after], timeout=10)
+    
+    assert ok_before.result() == 1
+    assert ok_after.result() == 3
+    with pytest.raises(ValueError):
+        failing.result()
+    
+    with engine.connect() as conn:
+        values = [row[0] for row in conn.execute(text("SELECT value FROM items ORDER BY value"))]
+    assert values == [1, 3]
+    assert service.get_metrics()["jobs_failed"] == 1
+
+
+def test_stop_flushes_pending_jobs(writer):
+    """
+    Feature: performance, Property 2: 单写者分组提交
+    停止服务时队列中剩余的写操作会被提交
+    """
+    service, engine = writer
+    futures = [service.submit(_insert, i) for i in range(30)]
+    service.stop()
+    
+    assert all(f.done() for f in futures)
+    assert _count(engine) == 30
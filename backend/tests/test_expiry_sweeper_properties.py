@@ -0,0 +1,76 @@
+"""
+过期数据清理属性测试
+
+Feature: performance
+验证过期会话和 API 令牌被分批删除、未过期数据保留、调用记录的令牌引用被置空
+"""
+
+import asyncio
+import pytest
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+from sqlalchemy import create_engine, text
+from sqlalchemy.orm import sessionmaker
+import sys
+import os
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.database import Base
+from app.models import ProductAPICall, ProductAPIToken, ProductUserSession
+from app.models import Session as SessionModel
+from app.services.expiry_sweeper import ExpirySweeper
+
+
+@pytest.fixture
+def test_engine(tmp_path: Path):
+    """覆盖 conftest 中的测试引擎：增量 VACUUM 需要在建表前设置 auto_vacuum"""
+    engine = create_engine(
+        f"sqlite:///{(tmp_path / 'sweeper_test.db').as_posix()}",
+        connect_args={"check_same_thread": False}
+    )
+    with engine.begin() as conn:
+        conn.execute(text("PRAGMA auto_vacuum = INCREMENTAL"))
+    Base.metadata.create_all(bind=engine)
+    yield engine
+    engine.dispose()
+
+
+def _seed(engine, expired: int, live: int):
+    now = datetime.now(timezone.utc)
+    db = sessionmaker(bind=engine)()
+    for i in range(expired + live):
+        expires_at = now - timedelta(hours=1) if i < expired else now + timedelta(hours=1)
+        db.add(SessionModel(id=f"admin-{i}", user_id="admin", expires_at=expires_at, is_active=True))
+        db.add(ProductUserSession(id=f"guest-{i}", product_id=1, is_guest=True, expires_at=expires_at))
+        db.add(ProductAPIToken(id=i + 1, product_id=1, token=f"token-{i}", expires_at=expires_at))
+    db.add(ProductAPICall(product_id=1, token_id=1, endpoint="/data", method="GET", status_code=200))
+    db.add(ProductAPICall(product_id=1, token_id=expired + 1, endpoint="/data", method="GET", status_code=200))
+    db.commit()
+    db.close()
+
+
+def test_expired_rows_are_deleted_in_batches(test_engine, writer):
+    """
+    Feature: performance, Property 10: 过期行被分批删除，未过期行保留
+    """
+    _seed(test_engine, expired=7, live=3)
+    sweeper = ExpirySweeper(writer=writer, batch_size=3, vacuum_pages=100)
+
+    reclaimed = asyncio.run(sweeper.sweep_once())
+
+    assert reclaimed == {"sessions": 7, "product_user_sessions": 7, "product_api_tokens": 7}
+    with test_engine.connect() as conn:
+        for table in ("sessions", "product_user_sessions", "product_api_tokens"):
+            assert conn.execute(text(f"SELECT COUNT(*) FROM {table}")).scalar() == 3
+        token_ids = conn.execute(text("SELECT token_id FROM product_api_calls ORDER BY id")).scalars().all()
+    assert token_ids == [None, 8]  # 指向已删除令牌的调用记录被置空
+
+    metrics = sweeper.get_metrics()
+    assert metrics["runs"] == 1
+    assert metrics["rows_reclaimed"]["sessions"] == 7
+    assert metrics["last_run"]["pages_vacuumed"] is not None  # auto_vacuum=INCREMENTAL 时执行了增量 VACUUM
+    # 每张表 7 行、每批 3 行：3 + 3 + 1，共 9 个删除批次，外加 1 次增量 VACUUM
+    assert writer.get_metrics()["jobs_committed"] == 10
+
+    assert asyncio.run(sweeper.sweep_once()) == {"sessions": 0, "product_user_sessions": 0, "product_api_tokens": 0}
@@ -0,0 +1,125 @@
+"""
+公开反馈属性测试
+
+Feature: performance
+验证公开反馈列表按写入时保存的排序键在数据库中分页，返回写入时过滤好的内容
+"""
+
+from datetime import datetime, timedelta
+
+from hypothesis import given, settings, strategies as st, HealthCheck
+from sqlalchemy import event, text
+import sys
+import os
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.feedback_content import filter_sensitive_content
+from app.models import Product, ProductFeedback
+
+BASE = datetime(2024, 1, 1)
+
+feedback_rows = st.lists(st.tuples(
+    st.sampled_from(["pending", "reviewed", "resolved", "closed"]),
+    st.integers(0, 1000),  # 创建时间偏移（分钟）
+    st.one_of(st.none(), st.integers(0, 1000)),  # 回复时间偏移（分钟）
+), max_size=30)
+
+
+def reference_order(rows):
+    """旧实现：取出全部已解决/已关闭的反馈，在 Python 中按回复时间或创建时间倒序"""
+    public = [row for row in rows if row.status in ("resolved", "closed")]
+    return [row.id for row in sorted(public, key=lambda row: (row.replied_at or row.created_at, row.id), reverse=True)]
+
+
+@given(feedback_rows, st.integers(0, 10), st.integers(1, 25))
+@settings(max_examples=40, deadline=None, suppress_health_check=[HealthCheck.function_scoped_fixture])
+def test_property_20_public_order_matches_reference(client, test_db, rows, skip, limit):
+    """
+    Feature: performance, Property 20: 数据库分页结果与在 Python 中全量排序后切片的结果一致
+    """
+    test_db.execute(text("DELETE FROM product_feedback"))
+    test_db.execute(text("DELETE FROM products"))
+    test_db.add(Product(id=1, title="demo", product_type="tool"))
+    for status, created, replied in rows:
+        test_db.add(ProductFeedback(
+            product_id=1, feedback_type="general", title="t", content="c", status=status,
+            created_at=BASE + timedelta(minutes=created),
+            replied_at=BASE + timedelta(minutes=replied) if replied is not None else None,
+            admin_reply="ok" if replied is not None else None
+        ))
+    test_db.commit()
+
+    response = client.get(f"/api/products/1/feedback/public?skip={skip}&limit={limit}")
+    assert response.status_code == 200
+    expected = reference_order(test_db.query(ProductFeedback).all())[skip:skip + min(limit, 20)]
+    assert [item["id"] for item in response.json()] == expected
+
+
+def test_property_20_content_is_filtered_at_write_time(client, auth_headers, test_engine, test_db):
+    """
+    Feature: performance, Property 20: 过滤后的内容在写入和回复时保存，公开接口读取时不再过滤
+    """
+    test_db.add(Product(id=1, title="demo", product_type="tool"))
+    test_db.commit()
+
+    created = client.post("/api/products/1/feedback", json={
+        "product_id": 1, "feedback_type": "bug", "title": "Broken link", "content": "see javascript:alert(1) here"
+    })
+    assert created.status_code == 200
+    feedback_id = created.json()["id"]
+    updated = client.put(f"/api/products/1/feedback/{feedback_id}", headers=auth_headers, json={
+        "status": "resolved", "admin_reply": "fixed, thanks"
+    })
+    assert updated.status_code == 200
+
+    test_db.expire_all()
+    feedback = test_db.get(ProductFeedback, feedback_id)
+    assert feedback.public_content == filter_sensitive_content(feedback.content)
+    assert "javascript:" not in feedback.public_content
+    assert feedback.public_reply == filter_sensitive_content(feedback.admin_reply)
+    assert feedback.sort_key == feedback.replied_at
+
+    statements = []
+
+    def record(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    event.listen(test_engine, "before_cursor_execute", record)
+    try:
+        response = client.get("/api/products/1/feedback/public")
+    finally:
+        event.remove(test_engine, "before_cursor_execute", record)
+
+    assert response.status_code == 200
+    assert [item["content"] for item in response.json()] == [feedback.public_content]
+    listing = [s for s in statements if "FROM product_feedback" in s]
+    assert len(listing) == 1 and "ORDER BY product_feedback.sort_key DESC" in listing[0] and "LIMIT" in listing[0]
+
+
+def test_property_20_rows_without_public_fields_are_filtered_on_read(client, test_db):
+    """
+    Feature: performance, Property 20: 绕过 ORM 写入、尚未回填公开字段的行在读取时现场过滤
+    """
+    test_db.add(Product(id=1, title="demo", product_type="tool"))
+    test_db.commit()
+    test_db.execute(text(
+        "INSERT INTO product_feedback (product_id, feedback_type, title, content, status, created_at) "
+        "VALUES (1, 'general', 't', '<script>x</script>ok', 'closed', '2024-01-01 00:00:00')"
+    ))
+    test_db.commit()
+
+    response = client.get("/api/products/1/feedback/public")
+    assert response.status_code == 200
+    assert [item["content"] for item in response.json()] == ["ok"]
+
+
+def test_property_20_query_uses_sort_index(test_db):
+    """
+    Feature: performance, Property 20: 公开列表查询使用 (product_id, status, sort_key) 索引
+    """
+    plan = test_db.execute(text(
+        "EXPLAIN QUERY PLAN SELECT id FROM product_feedback "
+        "WHERE product_id = 1 AND status IN ('resolved', 'closed') ORDER BY sort_key DESC LIMIT 20"
+    )).fetchall()
+    assert any("idx_feedback_product_status_sort" in row[-1] for row in plan)
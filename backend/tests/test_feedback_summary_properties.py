@@ -0,0 +1,141 @@
+"""
+反馈汇总属性测试
+
+Feature: performance
+验证反馈统计由 SQL 聚合得到，按产品的反馈汇总在任意创建、更新、删除序列后与全量统计一致
+"""
+
+from hypothesis import given, settings, strategies as st, HealthCheck
+from sqlalchemy import event, text
+import sys
+import os
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.database import Base
+from app.models import Product, ProductFeedback
+
+TYPES = ["bug", "feature", "improvement", "general"]
+STATUSES = ["pending", "reviewed", "resolved", "closed"]
+
+operations = st.lists(st.one_of(
+    st.tuples(st.just("create"), st.tuples(st.sampled_from([1, 2]), st.sampled_from(TYPES),
+                                           st.one_of(st.none(), st.integers(1, 5)))),
+    st.tuples(st.just("update"), st.tuples(st.integers(0, 10), st.sampled_from(STATUSES))),
+    st.tuples(st.just("delete"), st.integers(0, 10)),
+), max_size=15)
+
+
+def full_stats(db, product_id):
+    """参照实现：取出全部反馈在 Python 中统计"""
+    rows = db.query(ProductFeedback).filter(ProductFeedback.product_id == product_id).all()
+    ratings = [row.rating for row in rows if row.rating is not None]
+    by_type, by_status = {}, {}
+    for row in rows:
+        by_type[row.feedback_type] = by_type.get(row.feedback_type, 0) + 1
+        by_status[row.status] = by_status.get(row.status, 0) + 1
+    return {
+        "product_id": product_id,
+        "total_feedback": len(rows),
+        "average_rating": sum(ratings) / len(ratings) if ratings else None,
+        "feedback_by_type": by_type,
+        "feedback_by_status": by_status,
+    }
+
+
+def seed_products(db):
+    db.execute(text("DELETE FROM product_feedback"))
+    db.execute(text("DELETE FROM product_feedback_summary"))
+    db.execute(text("DELETE FROM products"))
+    db.add_all([Product(id=1, title="a", product_type="tool"), Product(id=2, title="b", product_type="tool")])
+    db.commit()
+
+
+@given(operations)
+@settings(max_examples=25, deadline=None, suppress_health_check=[HealthCheck.function_scoped_fixture])
+def test_property_21_summary_matches_full_scan(client, auth_headers, test_db, ops):
+    """
+    Feature: performance, Property 21: 任意创建、更新、删除序列后，汇总和 SQL 聚合统计都与全量统计一致
+    """
+    seed_products(test_db)
+    created = []
+    for op, arg in ops:
+        if op == "create":
+            product_id, feedback_type, rating = arg
+            response = client.post(f"/api/products/{product_id}/feedback", json={
+                "product_id": product_id, "feedback_type": feedback_type, "rating": rating,
+                "title": "title", "content": "content"
+            })
+            assert response.status_code == 200
+            created.append((product_id, response.json()["id"]))
+        elif op == "update" and created:
+            product_id, feedback_id = created[arg[0] % len(created)]
+            response = client.put(f"/api/products/{product_id}/feedback/{feedback_id}",
+                                  headers=auth_headers, json={"status": arg[1]})
+            assert response.status_code == 200
+        elif op == "delete" and created:
+            product_id, feedback_id = created.pop(arg % len(created))
+            response = client.delete(f"/api/products/{product_id}/feedback/{feedback_id}", headers=auth_headers)
+            assert response.status_code == 200
+
+    test_db.expire_all()
+    expected = {product_id: full_stats(test_db, product_id) for product_id in (1, 2)}
+
+    summaries = client.get("/api/products/feedback/summary", headers=auth_headers).json()
+    assert {item["product_id"]: item for item in summaries} == {
+        product_id: stats for product_id, stats in expected.items() if stats["total_feedback"]
+    }
+    for product_id, stats in expected.items():
+        body = client.get(f"/api/products/{product_id}/feedback-stats", headers=auth_headers).json()
+        assert {key: body[key] for key in stats} == stats
+        assert len(body["recent_feedback"]) == min(stats["total_feedback"], 5)
+
+
+def test_property_21_stats_use_sql_aggregates(client, auth_headers, test_engine, test_db):
+    """
+    Feature: performance, Property 21: 反馈统计只执行分组聚合和取最近 5 条，不再读取全部反馈
+    """
+    seed_products(test_db)
+    test_db.add_all([ProductFeedback(product_id=1, feedback_type="bug", title="t", content="c", rating=i % 5 + 1)
+                     for i in range(30)])
+    test_db.commit()
+
+    statements = []
+
+    def record(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    event.listen(test_engine, "before_cursor_execute", record)
+    try:
+        response = client.get("/api/products/1/feedback-stats", headers=auth_headers)
+    finally:
+        event.remove(test_engine, "before_cursor_execute", record)
+
+    assert response.status_code == 200
+    assert response.json()["total_feedback"] == 30
+    assert response.json()["average_rating"] == 3.0
+    feedback_queries = [s for s in statements if "FROM product_feedback" in s]
+    assert len(feedback_queries) == 2
+    assert any("GROUP BY" in s for s in feedback_queries)
+    assert any("LIMIT" in s for s in feedback_queries)
+
+
+def test_property_21_summary_seeded_from_existing_feedback(test_engine, test_db):
+    """
+    Feature: performance, Property 21: 已有数据库新建汇总表时用现有反馈初始化，之后不再重复初始化
+    """
+    with test_engine.begin() as connection:
+        connection.exec_driver_sql("DROP TABLE product_feedback_summary")
+    test_db.add(Product(id=1, title="a", product_type="tool"))
+    test_db.add_all([
+        ProductFeedback(product_id=1, feedback_type="bug", title="t", content="c", rating=4),
+        ProductFeedback(product_id=1, feedback_type="bug", title="t", content="c", status="resolved"),
+    ])
+    test_db.commit()
+
+    Base.metadata.create_all(bind=test_engine)
+    Base.metadata.create_all(bind=test_engine)
+    rows = test_db.execute(text(
+        "SELECT feedback_type, status, count, rating_sum, rating_count FROM product_feedback_summary ORDER BY status"
+    )).fetchall()
+    assert [tuple(row) for row in rows] == [("bug", "pending", 1, 4, 1), ("bug", "resolved", 1, 0, 0)]
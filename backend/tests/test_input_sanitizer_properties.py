@@ -0,0 +1,116 @@
+"""
+迭代式输入清理属性测试
+
+Feature: performance
+验证迭代清理与原递归实现结果一致、未变化的子树不复制、深度/节点数/字节数限制生效
+"""
+
+import pytest
+from hypothesis import given, settings, strategies as st
+import sys
+import os
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from fastapi import HTTPException
+
+from app.security import (
+    SecurityQueryBuilder, SanitizeBudget, SQLInjectionError, InputLimitExceededError,
+    validate_and_sanitize_input
+)
+
+
+def legacy_sanitize(input_value):
+    """原始递归实现"""
+    if input_value is None:
+        return None
+    if isinstance(input_value, str):
+        if SecurityQueryBuilder.detect_sql_injection(input_value):
+            raise SQLInjectionError(input_value)
+        return input_value.strip().replace("'", "''")
+    if isinstance(input_value, (list, tuple)):
+        return [legacy_sanitize(item) for item in input_value]
+    if isinstance(input_value, dict):
+        return {key: legacy_sanitize(value) for key, value in input_value.items()}
+    return input_value
+
+
+def outcome(func, value):
+    try:
+        return "ok", func(value)
+    except SQLInjectionError:
+        return "rejected", None
+
+
+json_leaves = st.one_of(
+    st.none(), st.booleans(), st.integers(), st.floats(allow_nan=False),
+    st.sampled_from(["plain", " padded ", "it's", "O'Reilly ", "drop table", "a--b", "名称"]),
+    st.text(max_size=10),
+)
+json_values = st.recursive(
+    json_leaves,
+    lambda children: st.one_of(
+        st.lists(children, max_size=5),
+        st.lists(children, max_size=3).map(tuple),
+        st.dictionaries(st.text(max_size=5), children, max_size=5),
+    ),
+    max_leaves=40,
+)
+
+
+@given(json_values)
+@settings(max_examples=200, deadline=None)
+def test_property_13_iterative_sanitizer_matches_recursive(value):
+    """
+    Feature: performance, Property 13: 迭代清理的结果和拒绝判定与原递归实现一致
+    """
+    assert outcome(SecurityQueryBuilder.sanitize_input, value) == outcome(legacy_sanitize, value)
+
+
+def test_property_13_unchanged_subtrees_are_not_copied():
+    """
+    Feature: performance, Property 13: 只复制值真正改变的容器
+    """
+    untouched = {"theme": "dark", "sizes": [1, 2, 3], "flags": {"beta": True}}
+    changed = {"title": " padded ", "tags": ["a", "it's"]}
+    data = {"untouched": untouched, "changed": changed}
+
+    result = SecurityQueryBuilder.sanitize_input(data)
+
+    assert result is not data
+    assert result["untouched"] is untouched
+    assert result["changed"] is not changed
+    assert result["changed"] == {"title": "padded", "tags": ["a", "it''s"]}
+    assert changed == {"title": " padded ", "tags": ["a", "it's"]}  # 输入不被修改
+
+
+def test_property_13_deep_nesting_does_not_recurse():
+    """
+    Feature: performance, Property 13: 超过 Python 递归深度的嵌套也能处理，深度由预算限制
+    """
+    deep = current = []
+    for _ in range(sys.getrecursionlimit() * 2):
+        child = []
+        current.append(child)
+        current = child
+
+    assert SecurityQueryBuilder.sanitize_input(deep, SanitizeBudget(max_depth=10 ** 6)) is deep
+    with pytest.raises(InputLimitExceededError):
+        SecurityQueryBuilder.sanitize_input(deep, SanitizeBudget(max_depth=32))
+
+
+def test_property_13_node_and_byte_budgets():
+    """
+    Feature: performance, Property 13: 节点数和字节数预算在整个请求体内共享
+    """
+    with pytest.raises(InputLimitExceededError):
+        SecurityQueryBuilder.sanitize_input(list(range(100)), SanitizeBudget(max_nodes=50))
+
+    budget = SanitizeBudget(max_bytes=10)
+    SecurityQueryBuilder.sanitize_input(["名称"], budget)  # 6 字节
+    with pytest.raises(InputLimitExceededError):
+        SecurityQueryBuilder.sanitize_input(["名称"], budget)
+
+    with pytest.raises(HTTPException) as exc_info:
+        validate_and_sanitize_input({"config": {"items": ["x"] * (SanitizeBudget().max_nodes + 1)}})
+    assert exc_info.value.status_code == 413
@@ -0,0 +1,132 @@
+"""
+游标分页属性测试
+
+Feature: performance
+验证游标分页与偏移分页顺序一致、不重复不遗漏，并走 (product_id, 时间) 复合索引
+"""
+
+from datetime import datetime, timedelta
+
+from hypothesis import given, settings, strategies as st, HealthCheck
+from sqlalchemy import event, text
+import sys
+import os
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.models import Product, ProductStats
+from app.pagination import NEXT_CURSOR_HEADER, decode_cursor, keyset_page
+
+
+def walk(db, limit, descending=True):
+    """按游标翻完所有页"""
+    query = db.query(ProductStats).filter(ProductStats.product_id == 1)
+    ids, cursor = [], None
+    while True:
+        items, next_cursor = keyset_page(query, ProductStats, "access_time", limit,
+                                         cursor=cursor, descending=descending)
+        ids += [item.id for item in items]
+        if next_cursor is None:
+            return ids
+        cursor = decode_cursor(next_cursor, "access_time")
+
+
+def seed_stats(db, access_times):
+    db.add(Product(id=1, title="demo", product_type="tool"))
+    db.flush()
+    for access_time in access_times:
+        stat = ProductStats(product_id=1, visitor_ip="127.0.0.1")
+        if access_time != "default":
+            stat.access_time = access_time
+        db.add(stat)
+    db.commit()
+
+
+def test_property_15_cursor_walk_matches_offset_order(test_db):
+    """
+    Feature: performance, Property 15: 秒级与微秒级时间戳混存、存在 NULL 时，游标翻页与偏移分页顺序一致
+    """
+    now = datetime.utcnow().replace(microsecond=0)
+    seed_stats(test_db, ["default", "default", now, now + timedelta(microseconds=1), None, None,
+                         now - timedelta(days=1), "default", None])
+
+    for descending in (True, False):
+        query = test_db.query(ProductStats).filter(ProductStats.product_id == 1)
+        expected, _ = keyset_page(query, ProductStats, "access_time", 100, descending=descending)
+        expected_ids = [item.id for item in expected]
+        assert len(expected_ids) == 9
+        for limit in (1, 2, 4):
+            assert walk(test_db, limit, descending) == expected_ids
+
+
+@given(st.lists(st.one_of(st.none(), st.just("default"), st.integers(0, 5)), min_size=1, max_size=12),
+       st.integers(1, 5))
+@settings(max_examples=30, deadline=None, suppress_health_check=[HealthCheck.function_scoped_fixture])
+def test_property_15_no_duplicates_or_gaps(test_db, offsets, limit):
+    """
+    Feature: performance, Property 15: 任意时间分布下游标翻页不重复、不遗漏
+    """
+    test_db.execute(text("DELETE FROM product_stats"))
+    test_db.execute(text("DELETE FROM products"))
+    test_db.commit()
+    base = datetime(2024, 1, 1)
+    seed_stats(test_db, [value if value in (None, "default") else base + timedelta(seconds=value)
+                         for value in offsets])
+
+    ids = walk(test_db, limit)
+    assert len(ids) == len(set(ids)) == len(offsets)
+
+
+def test_property_15_keyset_uses_composite_index(test_engine, test_db):
+    """
+    Feature: performance, Property 15: 游标页直接在 (product_id, access_time) 索引上定位，无需排序
+    """
+    seed_stats(test_db, [datetime(2024, 1, 1) + timedelta(minutes=i) for i in range(5)])
+    query = test_db.query(ProductStats).filter(ProductStats.product_id == 1)
+    _, next_cursor = keyset_page(query, ProductStats, "access_time", 2)
+
+    captured = []
+
+    def record(conn, cursor, statement, parameters, context, executemany):
+        captured.append((statement, parameters))
+
+    event.listen(test_engine, "before_cursor_execute", record)
+    try:
+        keyset_page(query, ProductStats, "access_time", 2, cursor=decode_cursor(next_cursor, "access_time"))
+    finally:
+        event.remove(test_engine, "before_cursor_execute", record)
+
+    statement, parameters = captured[0]
+    plan = " ".join(row[-1] for row in test_db.connection().exec_driver_sql(
+        "EXPLAIN QUERY PLAN " + statement, parameters
+    ))
+    assert "idx_product_stats_product_time" in plan
+    assert "TEMP B-TREE" not in plan
+
+
+def test_property_15_stats_endpoint_cursor(client, test_db):
+    """
+    Feature: performance, Property 15: 统计接口返回下一页游标，旧的 skip 分页保持可用
+    """
+    seed_stats(test_db, [datetime(2024, 1, 1) + timedelta(minutes=i) for i in range(5)])
+
+    first = client.get("/api/products/1/stats", params={"limit": 2})
+    assert first.status_code == 200
+    body = first.json()
+    assert body["pagination"]["total"] == 5
+    cursor = first.headers[NEXT_CURSOR_HEADER]
+    assert body["pagination"]["next_cursor"] == cursor
+
+    seen = [stat["id"] for stat in body["stats"]]
+    while cursor:
+        page = client.get("/api/products/1/stats", params={"limit": 2, "cursor": cursor})
+        seen += [stat["id"] for stat in page.json()["stats"]]
+        cursor = page.headers.get(NEXT_CURSOR_HEADER)
+    assert seen == [5, 4, 3, 2, 1]
+
+    skipped = client.get("/api/products/1/stats", params={"limit": 2, "skip": 2}).json()
+    assert [stat["id"] for stat in skipped["stats"]] == [3, 2]
+
+    assert client.get("/api/products/1/stats", params={"cursor": "not-a-cursor"}).status_code == 400
+    other_key = "5b22637265617465645f6174222c6e756c6c2c315d"  # ["created_at",null,1]
+    assert client.get("/api/products/1/stats", params={"cursor": other_key}).status_code == 400
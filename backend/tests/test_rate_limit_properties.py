@@ -0,0 +1,185 @@
+"""
+滑动窗口限流属性测试
+
+Feature: performance
+验证滑动窗口计数、登录独立配额、固定大小状态与空闲键清理，以及跨进程共享的 SQLite 后端
+"""
+
+import multiprocessing
+import threading
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+import sys
+import os
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.middleware.rate_limit import RateLimitMiddleware, SlidingWindowRateLimiter, SQLiteRateLimiter
+
+
+@pytest.fixture
+def limiter():
+    engine = SlidingWindowRateLimiter(lock_stripes=8)
+    yield engine
+    engine.stop()
+
+
+def test_limit_enforced_within_window(limiter):
+    """
+    Feature: performance, Property 4: 窗口内超过配额即拒绝
+    """
+    results = [limiter.hit("1.1.1.1", 5, 60, now=1000.0 + i) for i in range(6)]
+
+    assert [r.allowed for r in results] == [True] * 5 + [False]
+    assert [r.remaining for r in results[:5]] == [4, 3, 2, 1, 0]
+    assert results[-1].retry_after >= 1
+    assert results[-1].reset_at == 1020  # 当前窗口 [960, 1020)
+
+
+def test_previous_window_decays(limiter):
+    """
+    Feature: performance, Property 4: 上一窗口计数按已过去比例衰减
+    """
+    for i in range(10):
+        assert limiter.hit("ip", 10, 100, now=100.0 + i).allowed
+
+    # 新窗口刚开始：上一窗口 10 次几乎全额计入
+    assert not limiter.hit("ip", 10, 100, now=200.0).allowed
+    # 新窗口过半：估计值 10 * 0.5 = 5，可以再放行 5 次
+    allowed = [limiter.hit("ip", 10, 100, now=250.0).allowed for _ in range(6)]
+    assert allowed == [True] * 5 + [False]
+
+
+def test_retry_after_is_accurate(limiter):
+    """
+    Feature: performance, Property 4: Retry-After 之后请求可以被放行
+    """
+    for i in range(3):
+        limiter.hit("ip", 3, 60, now=30.0)
+    rejected = limiter.hit("ip", 3, 60, now=30.0)
+    assert not rejected.allowed
+
+    assert not limiter.hit("ip", 3, 60, now=30.0 + rejected.retry_after - 1).allowed
+    assert limiter.hit("ip", 3, 60, now=30.0 + rejected.retry_after).allowed
+
+
+def test_state_is_fixed_size_and_idle_keys_evicted(limiter):
+    """
+    Feature: performance, Property 4: 每个键状态固定，空闲键会被清理
+    """
+    for i in range(1000):
+        limiter.hit("busy", 10000, 60, now=10.0)
+    for i in range(100):
+        limiter.hit(f"idle-{i}", 10, 60, now=10.0)
+    assert len(limiter) == 101
+
+    limiter.hit("busy", 10000, 60, now=125.0)
+    assert limiter.evict_idle(now=125.0) == 100
+    assert len(limiter) == 1
+
+
+def test_middleware_headers_and_login_bucket():
+    """
+    Feature: performance, Property 4: 响应头保持不变，登录使用独立配额
+    """
+    app = FastAPI()
+
+    @app.get("/api/ping")
+    async def ping():
+        return {"ok": True}
+
+    @app.post("/api/auth/login")
+    async def login():
+        return {"ok": True}
+
+    app.add_middleware(RateLimitMiddleware, requests_per_window=3, window_seconds=3600)
+    client = TestClient(app)
+
+    responses = [client.get("/api/ping") for _ in range(4)]
+    assert [r.status_code for r in responses] == [200, 200, 200, 429]
+    assert responses[0].headers["X-RateLimit-Limit"] == "3"
+    assert responses[0].headers["X-RateLimit-Remaining"] == "2"
+    assert "X-RateLimit-Reset" in responses[0].headers
+    assert int(responses[-1].headers["Retry-After"]) >= 1
+    assert responses[-1].json()["error"]["code"] == "TOO_MANY_REQUESTS"
+
+    # 通用配额用尽不影响登录配额
+    login = client.post("/api/auth/login")
+    assert login.status_code == 200
+    assert login.headers["X-RateLimit-Limit"] == "10"
+
+
+def test_sqlite_backend_runs_off_event_loop_and_stops(tmp_path):
+    """
+    Feature: performance, Property 5: SQLite 后端的判定在线程池中执行，停止后清理线程退出、连接关闭
+    """
+    hit_threads = []
+
+    class RecordingLimiter(SQLiteRateLimiter):
+        def hit(self, *args, **kwargs):
+            hit_threads.append(threading.get_ident())
+            return super().hit(*args, **kwargs)
+
+    limiter = RecordingLimiter(str(tmp_path / "rate_limit.db"), eviction_interval=1)
+    app = FastAPI()
+
+    @app.get("/api/ping")
+    async def ping():
+        return {"loop_thread": threading.get_ident()}
+
+    app.add_middleware(RateLimitMiddleware, requests_per_window=5, window_seconds=3600, limiter=limiter)
+    response = TestClient(app).get("/api/ping")
+    assert response.status_code == 200
+    assert hit_threads and response.json()["loop_thread"] not in hit_threads
+
+    evictor = limiter._evictor
+    assert evictor.is_alive()
+    limiter.stop()
+    assert not evictor.is_alive()
+    # 连接已关闭：判定失败时放行
+    assert limiter.hit("ip", 1, 60).allowed
+
+
+def _hit_from_worker(path: str, count: int, queue):
+    limiter = SQLiteRateLimiter(path)
+    allowed = sum(limiter.hit("shared-ip", 100, 3600).allowed for _ in range(count))
+    limiter.stop()
+    queue.put(allowed)
+
+
+def test_sqlite_backend_matches_memory_backend(tmp_path, limiter):
+    """
+    Feature: performance, Property 5: SQLite 后端与进程内后端判定一致
+    """
+    shared = SQLiteRateLimiter(str(tmp_path / "rate_limit.db"))
+    try:
+        for i in range(30):
+            now = 1000.0 + i * 7
+            expected = limiter.hit("ip", 10, 60, now=now)
+            actual = shared.hit("ip", 10, 60, now=now)
+            assert actual == expected
+
+        assert shared.evict_idle(now=1000.0 + 30 * 7 + 120) == 1
+        assert len(shared) == 0
+    finally:
+        shared.stop()
+
+
+def test_sqlite_backend_shared_across_processes(tmp_path):
+    """
+    Feature: performance, Property 5: 多个 worker 进程共享同一份配额
+    """
+    path = str(tmp_path / "rate_limit.db")
+    SQLiteRateLimiter(path).stop()  # 预先建表，避免多个进程同时切换 WAL
+
+    ctx = multiprocessing.get_context("spawn")
+    queue = ctx.Queue()
+    workers = [ctx.Process(target=_hit_from_worker, args=(path, 60, queue)) for _ in range(4)]
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join(timeout=60)
+
+    # 4 个进程共请求 240 次，全局只放行配额内的 100 次
+    assert sum(queue.get(timeout=5) for _ in workers) == 100
@@ -0,0 +1,224 @@
+"""
+公开接口响应缓存属性测试
+
+Feature: performance
+验证 LRU/TTL 淘汰、按命名空间和资源ID精确失效、失效竞态保护、监控指标以及 ETag/Last-Modified 条件请求
+"""
+
+import pytest
+from typing import List
+from fastapi import Depends, FastAPI, HTTPException
+from fastapi.testclient import TestClient
+from pydantic import BaseModel
+import sys
+import os
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.middleware.conditional import ConditionalGetMiddleware
+from app.middleware.spa import NoCacheAPIMiddleware
+from app.services.response_cache import ResponseCache, cached_response, invalidates_response_cache
+
+
+class Item(BaseModel):
+    id: int
+    title: str
+
+
+def test_lru_eviction_and_ttl():
+    """
+    Feature: performance, Property 7: 超出容量按 LRU 淘汰，过期条目视为未命中
+    """
+    cache = ResponseCache(max_entries=2, ttl_seconds=60)
+    cache.set(("a",), b"1", "blog")
+    cache.set(("b",), b"2", "blog")
+    assert cache.get(("a",)) == b"1"  # a 变为最近使用
+    cache.set(("c",), b"3", "blog")
+
+    assert cache.get(("b",)) is None
+    assert cache.get(("a",)) == b"1"
+    assert cache.get_metrics()["evictions"] == 1
+
+    expired = ResponseCache(max_entries=2, ttl_seconds=0)
+    expired.set(("a",), b"1", "blog")
+    assert expired.get(("a",)) is None
+    assert expired.get_metrics()["expirations"] == 1
+
+
+def test_invalidation_is_precise():
+    """
+    Feature: performance, Property 7: 写操作只失效同命名空间的列表和对应资源的详情
+    """
+    cache = ResponseCache()
+    cache.set(("products", "list"), b"[]", "products")
+    cache.set(("products", 1), b"{}", "products", item_id=1)
+    cache.set(("products", 2), b"{}", "products", item_id=2)
+    cache.set(("blog", "list"), b"[]", "blog")
+
+    assert cache.invalidate("products", 1) == 2
+    assert cache.get(("products", "list")) is None
+    assert cache.get(("products", 1)) is None
+    assert cache.get(("products", 2)) == b"{}"
+    assert cache.get(("blog", "list")) == b"[]"
+
+
+def test_stale_result_not_stored_after_invalidation():
+    """
+    Feature: performance, Property 7: 查询期间发生失效时不写入旧结果
+    """
+    cache = ResponseCache()
+    generation = cache.generation("blog")
+    cache.invalidate("blog")
+    cache.set(("blog", "list"), b"old", "blog", generation=generation)
+
+    assert cache.get(("blog", "list")) is None
+
+
+@pytest.fixture
+def app_and_cache():
+    cache = ResponseCache(max_entries=16, ttl_seconds=60)
+    items = {1: "first", 2: "second"}
+    calls = {"list": 0, "detail": 0}
+
+    def get_store():
+        return items
+
+    app = FastAPI()
+    app.add_middleware(ConditionalGetMiddleware)
+
+    @app.get("/items", response_model=List[Item])
+    @cached_response("items", List[Item], cache=cache)
+    async def list_items(limit: int = 10, store: dict = Depends(get_store)):
+        calls["list"] += 1
+        return [Item(id=i, title=t) for i, t in sorted(store.items())][:limit]
+
+    @app.get("/items/{item_id}", response_model=Item)
+    @cached_response("items", Item, id_param="item_id", cache=cache)
+    def get_item(item_id: int, store: dict = Depends(get_store)):
+        calls["detail"] += 1
+        if item_id not in store:
+            raise HTTPException(status_code=404, detail="不存在")
+        return {"id": item_id, "title": store[item_id]}
+
+    @app.put("/items/{item_id}", response_model=Item)
+    @invalidates_response_cache("items", id_param="item_id", cache=cache)
+    def update_item(item_id: int, title: str, store: dict = Depends(get_store)):
+        store[item_id] = title
+        return {"id": item_id, "title": title}
+
+    return TestClient(app), cache, calls
+
+
+def test_endpoints_served_from_cache_until_write(app_and_cache):
+    """
+    Feature: performance, Property 7: 规范化参数命中缓存，写操作后返回新数据
+    """
+    client, cache, calls = app_and_cache
+
+    first = client.get("/items")
+    assert client.get("/items?limit=10").json() == first.json()  # 默认值与显式参数共用缓存
+    assert calls["list"] == 1
+    assert client.get("/items/1").json() == {"id": 1, "title": "first"}
+    assert client.get("/items/2").json() == {"id": 2, "title": "second"}
+    assert calls["detail"] == 2
+
+    client.put("/items/1", params={"title": "changed"})
+
+    assert client.get("/items/1").json()["title"] == "changed"
+    assert client.get("/items").json()[0]["title"] == "changed"
+    client.get("/items/2")
+    assert calls == {"list": 2, "detail": 3}  # /items/2 仍然命中缓存
+
+    metrics = cache.get_metrics()
+    assert metrics["hits"] == 2
+    assert metrics["invalidations"] == 2
+
+
+def test_errors_are_not_cached(app_and_cache):
+    """
+    Feature: performance, Property 7: 异常响应不缓存
+    """
+    client, cache, calls = app_and_cache
+
+    assert client.get("/items/9").status_code == 404
+    assert client.get("/items/9").status_code == 404
+    assert calls["detail"] == 2
+
+
+def test_conditional_requests_return_304(app_and_cache):
+    """
+    Feature: performance, Property 8: ETag 匹配返回 304，内容变化后 ETag 随之变化
+    """
+    client, cache, calls = app_and_cache
+
+    first = client.get("/items/1")
+    etag = first.headers["ETag"]
+    assert first.headers["Cache-Control"] == "no-cache"
+    assert etag.startswith('"')
+
+    not_modified = client.get("/items/1", headers={"If-None-Match": etag})
+    assert not_modified.status_code == 304
+    assert not_modified.content == b""
+    assert not_modified.headers["ETag"] == etag
+    assert calls["detail"] == 1  # 304 由缓存条目直接得出，不再查询
+
+    # 弱比较和多值列表
+    assert client.get("/items/1", headers={"If-None-Match": f'"other", W/{etag}'}).status_code == 304
+
+    client.put("/items/1", params={"title": "changed"})
+    changed = client.get("/items/1", headers={"If-None-Match": etag})
+    assert changed.status_code == 200
+    assert changed.headers["ETag"] != etag
+
+
+def test_if_modified_since_uses_last_modified():
+    """
+    Feature: performance, Property 8: Last-Modified 不晚于 If-Modified-Since 时返回 304
+    """
+    from datetime import datetime
+
+    cache = ResponseCache()
+    app = FastAPI()
+    app.add_middleware(ConditionalGetMiddleware)
+
+    class Post(BaseModel):
+        id: int
+        updated_at: datetime
+
+    @app.get("/posts/{post_id}", response_model=Post)
+    @cached_response("posts", Post, id_param="post_id", cache=cache)
+    def get_post(post_id: int):
+        return {"id": post_id, "updated_at": datetime(2024, 5, 1, 12, 0, 0)}
+
+    client = TestClient(app)
+    response = client.get("/posts/1")
+    assert response.headers["Last-Modified"] == "Wed, 01 May 2024 12:00:00 GMT"
+
+    assert client.get("/posts/1", headers={"If-Modified-Since": "Wed, 01 May 2024 12:00:00 GMT"}).status_code == 304
+    assert client.get("/posts/1", headers={"If-Modified-Since": "Tue, 30 Apr 2024 12:00:00 GMT"}).status_code == 200
+    # If-None-Match 优先于 If-Modified-Since
+    assert client.get("/posts/1", headers={
+        "If-None-Match": '"stale"', "If-Modified-Since": "Wed, 01 May 2024 12:00:00 GMT"
+    }).status_code == 200
+
+
+def test_route_cache_policy_overrides_no_store():
+    """
+    Feature: performance, Property 8: 公开内容接口使用重新验证策略，其他 /api 响应仍然 no-store
+    """
+    cache = ResponseCache()
+    app = FastAPI()
+    app.add_middleware(NoCacheAPIMiddleware)
+
+    @app.get("/api/items", response_model=List[Item])
+    @cached_response("items", List[Item], cache=cache)
+    def list_items():
+        return [{"id": 1, "title": "a"}]
+
+    @app.get("/api/private")
+    def private():
+        return {"ok": True}
+
+    client = TestClient(app)
+    assert client.get("/api/items").headers["Cache-Control"] == "no-cache"
+    assert "no-store" in client.get("/api/private").headers["Cache-Control"]
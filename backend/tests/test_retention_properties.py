@@ -0,0 +1,235 @@
+"""
+数据保留属性测试
+
+Feature: performance
+验证过期原始行先汇总、归档再删除：删除后分析结果不变，归档文件可完整还原被删除的行
+"""
+
+import asyncio
+import gzip
+import shutil
+import uuid
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+
+from sqlalchemy import text
+import sys
+import os
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.migrations import DatabaseMigration
+from app.models import (
+    Product, ProductAPICall, ProductAPICallDaily, ProductLog, ProductLogDaily, ProductStats, RollupWatermark
+)
+from app.services.analytics_rollup import StatsRollupJob, summarize_stats
+from app.services.retention import RetentionJob, RetentionPolicy, _move_legacy_archives, read_archive
+
+NOW = datetime(2024, 6, 30, 12, 0, tzinfo=timezone.utc)
+OLD = datetime(2024, 5, 1, 9, 30)
+RECENT = datetime(2024, 6, 29, 9, 30)
+
+
+def make_job(writer, archive_dir, batch_size=2, days=30):
+    policies = (
+        RetentionPolicy("product_stats", ProductStats, "access_time", days),
+        RetentionPolicy("product_api_calls", ProductAPICall, "timestamp", days),
+        RetentionPolicy("product_logs", ProductLog, "timestamp", days),
+    )
+    job = RetentionJob(writer=writer, rollup_job=StatsRollupJob(writer=writer), policies=policies,
+                       archive_dir=archive_dir, batch_size=batch_size)
+    return job
+
+
+def run(writer, archive_dir, **kwargs):
+    job = make_job(writer, archive_dir, **kwargs)
+    return asyncio.run(job.run_once(now=NOW)), job
+
+
+def seed(db):
+    db.add(Product(id=1, title="demo", product_type="tool"))
+    db.flush()
+    for i, when in enumerate([OLD, OLD + timedelta(days=1), OLD + timedelta(days=1), RECENT]):
+        db.add(ProductStats(product_id=1, visitor_ip=f"10.0.0.{i % 3}", access_time=when, duration_seconds=10))
+        db.add(ProductAPICall(product_id=1, endpoint="/x", method="GET", status_code=200 if i else 500,
+                              response_time=100, request_size=10, response_size=20, timestamp=when))
+        db.add(ProductLog(product_id=1, log_type="error", log_level="error", message=f"boom {i}",
+                          details={"i": i}, timestamp=when))
+    db.commit()
+
+
+def test_property_18_purge_keeps_aggregates(test_db, writer, tmp_path):
+    """
+    Feature: performance, Property 18: 删除过期原始行后，访问汇总不变，API 调用和日志的按天汇总计入被删除的行
+    """
+    seed(test_db)
+    before = summarize_stats(test_db, 1)
+    test_db.rollback()
+
+    results, job = run(writer, tmp_path)
+    assert {table: result["rows_deleted"] for table, result in results.items()} == {
+        "product_stats": 3, "product_api_calls": 3, "product_logs": 3
+    }
+
+    test_db.expire_all()
+    assert test_db.query(ProductStats).count() == 1
+    after = summarize_stats(test_db, 1)
+    assert (after.total_visits, after.unique_visitors, after.duration_sum, after.last_access) == \
+        (before.total_visits, before.unique_visitors, before.duration_sum, before.last_access)
+
+    daily_calls = {(row.day, row.status_code): row.calls for row in test_db.query(ProductAPICallDaily)}
+    assert daily_calls == {(datetime(2024, 5, 1), 500): 1, (datetime(2024, 5, 2), 200): 2}
+    assert sum(row.response_time_sum for row in test_db.query(ProductAPICallDaily)) == 300
+    assert sum(row.count for row in test_db.query(ProductLogDaily)) == 3
+
+    # 再运行一轮不会重复处理
+    results, _ = run(writer, tmp_path)
+    assert all(result["rows_deleted"] == 0 for result in results.values())
+    assert sum(row.calls for row in test_db.query(ProductAPICallDaily)) == 3
+
+
+def test_property_18_archive_restores_deleted_rows(test_db, writer, tmp_path):
+    """
+    Feature: performance, Property 18: 归档按日期分区，内容与被删除的行一致
+    """
+    seed(test_db)
+    expected = {log.id: (log.message, log.details) for log in test_db.query(ProductLog) if log.timestamp < RECENT}
+    test_db.rollback()
+
+    run(writer, tmp_path)
+
+    files = sorted(path.name for path in (tmp_path / "product_logs").iterdir())
+    assert files == ["2024-05-01.ndjson.gz", "2024-05-02.ndjson.gz"]
+    restored = {}
+    for name in files:
+        for row in read_archive(tmp_path / "product_logs" / name):
+            restored[row["id"]] = (row["message"], row["details"])
+    assert restored == expected
+    assert len(read_archive(tmp_path / "product_stats" / "2024-05-02.ndjson.gz")) == 2
+
+
+def test_property_18_only_rolled_up_stats_are_deleted(test_db, writer, tmp_path):
+    """
+    Feature: performance, Property 18: 访问统计只删除已计入小时汇总（水位线之前）的行
+    """
+    seed(test_db)
+    job = make_job(writer, tmp_path)
+
+    async def scenario():
+        job.rollup_job.run_once = _noop  # 模拟汇总任务尚未追上
+        return await job.run_once(now=NOW)
+
+    async def _noop():
+        return 0
+
+    results = asyncio.run(scenario())
+    assert results["product_stats"]["rows_deleted"] == 0
+    assert results["product_logs"]["rows_deleted"] == 3
+
+
+def test_property_18_retention_report_endpoint(client, auth_headers, test_db):
+    """
+    Feature: performance, Property 18: 报告接口返回各表行数和保留策略
+    """
+    seed(test_db)
+    response = client.get("/api/products/monitoring/retention", headers=auth_headers)
+    assert response.status_code == 200
+    body = response.json()
+    assert body["tables"]["product_logs"]["rows"] == 4
+    assert body["tables"]["product_stats"]["bytes"] is None or body["tables"]["product_stats"]["bytes"] > 0
+    assert set(body["totals"]) == {"product_stats", "product_api_calls", "product_logs"}
+
+
+def roll_up(writer):
+    asyncio.run(StatsRollupJob(writer=writer).run_once())
+
+
+def test_property_18_visits_after_full_purge_are_counted(test_db, writer, tmp_path):
+    """
+    Feature: performance, Property 18: 删除全部已汇总的访问统计后，新访问的 id 仍大于水位线并计入分析结果
+    """
+    test_db.add(Product(id=1, title="demo", product_type="tool"))
+    test_db.add_all([ProductStats(product_id=1, visitor_ip=f"10.0.0.{i}", access_time=OLD + timedelta(hours=i))
+                     for i in range(5)])
+    test_db.commit()
+
+    results, _ = run(writer, tmp_path, batch_size=10)
+    assert results["product_stats"]["rows_deleted"] == 5
+    test_db.expire_all()
+    assert test_db.query(ProductStats).count() == 0
+
+    visit = ProductStats(product_id=1, visitor_ip="10.0.1.1", access_time=RECENT)
+    test_db.add(visit)
+    test_db.commit()
+    assert visit.id > test_db.get(RollupWatermark, "product_stats").last_id
+
+    roll_up(writer)
+    test_db.expire_all()
+    assert summarize_stats(test_db, 1).total_visits == 6
+
+
+def test_property_18_migration_rebuilds_stats_with_autoincrement(test_engine, test_db):
+    """
+    Feature: performance, Property 18: 升级迁移把已有的 product_stats 重建为 AUTOINCREMENT，保留数据，序列不低于水位线
+    """
+    with test_engine.begin() as conn:
+        conn.execute(text("DROP TABLE product_stats"))
+        conn.execute(text(
+            "CREATE TABLE product_stats (id INTEGER NOT NULL PRIMARY KEY, product_id INTEGER NOT NULL, "
+            "visitor_ip VARCHAR(45), session_id VARCHAR(100), access_time DATETIME, duration_seconds INTEGER, "
+            "user_agent TEXT, referrer VARCHAR(500))"
+        ))
+        conn.execute(text("CREATE INDEX idx_product_stats_product_time ON product_stats (product_id, access_time)"))
+        conn.execute(text("INSERT INTO product_stats (id, product_id, visitor_ip) VALUES (1, 1, 'a'), (2, 1, 'b')"))
+    test_db.add(RollupWatermark(source="product_stats", last_id=7))
+    test_db.commit()
+
+    migration = DatabaseMigration(engine=test_engine)
+    migration.migrate_to_v1_6()
+    migration.migrate_to_v1_6()
+
+    with test_engine.begin() as conn:
+        table_sql = conn.execute(text("SELECT sql FROM sqlite_master WHERE name = 'product_stats'")).scalar()
+        assert "AUTOINCREMENT" in table_sql
+        assert conn.execute(text("SELECT id, visitor_ip FROM product_stats ORDER BY id")).fetchall() == [(1, "a"), (2, "b")]
+        conn.execute(text("DELETE FROM product_stats"))
+        conn.execute(text("INSERT INTO product_stats (product_id, visitor_ip) VALUES (1, 'c')"))
+        assert conn.execute(text("SELECT id FROM product_stats")).scalar() == 8
+    indexes = {idx["name"] for idx in migration.get_table_info("product_stats")["indexes"]}
+    assert {"idx_product_stats_product_time", "idx_product_stats_ip_time"} <= indexes
+
+
+def test_property_18_archives_are_not_served(client, test_db, writer, tmp_path):
+    """
+    Feature: performance, Property 18: 默认归档目录不在任何静态文件目录内；旧默认目录中的归档启动时移走，
+    之后无法通过 HTTP 下载
+    """
+    from fastapi.staticfiles import StaticFiles
+    from starlette.routing import Mount
+    from main import app
+
+    mounts = {route.path: Path(route.app.directory).resolve() for route in app.routes
+              if isinstance(route, Mount) and isinstance(route.app, StaticFiles)}
+    assert "/products" in mounts
+    archive_dir = RetentionJob().archive_dir.resolve()
+    assert not any(archive_dir.is_relative_to(directory) for directory in mounts.values())
+
+    # 在产品静态目录中模拟旧默认目录
+    legacy_dir = mounts["/products"] / f"legacy-archive-{uuid.uuid4().hex}"
+    try:
+        seed(test_db)
+        run(writer, legacy_dir)
+        archived = sorted(legacy_dir.glob("product_stats/*.ndjson.gz"))
+        url = f"/products/{legacy_dir.name}/product_stats/{archived[0].name}"
+        assert client.get(url).content == archived[0].read_bytes()
+
+        # 新目录中已有同名文件时追加为新的 gzip 成员
+        new_dir = tmp_path / "retention_archive"
+        (new_dir / "product_stats").mkdir(parents=True)
+        (new_dir / "product_stats" / archived[0].name).write_bytes(gzip.compress(b'{"id": 0}\n'))
+        assert _move_legacy_archives(legacy_dir, new_dir) == len(list(new_dir.glob("*/*.ndjson.gz")))
+        assert client.get(url).status_code == 404
+        restored = read_archive(new_dir / "product_stats" / archived[0].name)
+        assert restored[0] == {"id": 0} and len(restored) > 1
+    finally:
+        shutil.rmtree(legacy_dir, ignore_errors=True)
@@ -0,0 +1,122 @@
+"""
+全文搜索索引属性测试
+
+Feature: performance
+验证 FTS5 索引由触发器与原表同步、搜索按相关度排序并分页、发布状态在 SQL 中过滤
+"""
+
+import sys
+import os
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.models import Blog, Portfolio, Product
+from app.search_index import build_search_statement, count_statement, highlight_text
+
+BLOG_FIELDS = ["title", "summary", "content"]
+
+
+def search_ids(db, model_class, fields, term, conditions=()):
+    statement = build_search_statement(model_class, fields, term, conditions)
+    return [item.id for item in db.execute(statement).scalars().all()]
+
+
+def test_property_14_triggers_keep_index_in_sync(test_db):
+    """
+    Feature: performance, Property 14: 插入、更新、删除后索引与原表一致
+    """
+    test_db.add(Blog(id=1, title="SQLite 调优笔记", content="WAL 模式与检查点"))
+    test_db.add(Portfolio(id=1, title="像素编辑器", description="支持图层和撤销"))
+    test_db.commit()
+    assert search_ids(test_db, Blog, BLOG_FIELDS, "检查点") == [1]
+    assert search_ids(test_db, Portfolio, ["title", "description"], "撤销") == [1]
+
+    blog = test_db.get(Blog, 1)
+    blog.content = "查询计划与索引"
+    test_db.commit()
+    assert search_ids(test_db, Blog, BLOG_FIELDS, "检查点") == []
+    assert search_ids(test_db, Blog, BLOG_FIELDS, "查询计划") == [1]
+
+    test_db.delete(blog)
+    test_db.commit()
+    assert search_ids(test_db, Blog, BLOG_FIELDS, "查询计划") == []
+
+
+def test_property_14_ranked_and_paginated(test_db):
+    """
+    Feature: performance, Property 14: 标题命中排在正文命中之前，分页在 SQL 中完成
+    """
+    test_db.add(Blog(id=1, title="日常", content="顺便提到了 FastAPI"))
+    test_db.add(Blog(id=2, title="FastAPI 入门", content="路由与依赖注入"))
+    test_db.add(Blog(id=3, title="杂记", content="没有相关内容"))
+    test_db.commit()
+
+    statement = build_search_statement(Blog, BLOG_FIELDS, "fastapi")
+    assert [item.id for item in test_db.execute(statement).scalars()] == [2, 1]
+    assert [item.id for item in test_db.execute(statement.offset(1).limit(1)).scalars()] == [1]
+    assert test_db.execute(count_statement(statement)).scalar_one() == 2
+
+    # 多个词需要同时命中
+    assert search_ids(test_db, Blog, BLOG_FIELDS, "fastapi 依赖") == [2]
+    # 只搜索部分字段
+    assert search_ids(test_db, Blog, ["title"], "fastapi") == [2]
+
+
+def test_property_14_short_terms_fall_back_to_like(test_db):
+    """
+    Feature: performance, Property 14: 少于三个字符的词退回 LIKE，结果一致
+    """
+    test_db.add(Product(id=1, title="Go 小工具", product_type="tool"))
+    test_db.add(Product(id=2, title="其他", description="用 go 写的", product_type="tool"))
+    test_db.commit()
+
+    assert search_ids(test_db, Product, ["title", "description"], "go") == [1, 2]
+    assert highlight_text("Go 小工具", "go") == "<mark>Go</mark> 小工具"
+
+
+def test_property_14_search_endpoint_filters_in_sql(client, test_db):
+    """
+    Feature: performance, Property 14: 搜索接口只返回已发布内容，过滤和分页在同一条 SQL 中
+    """
+    for i in range(1, 6):
+        test_db.add(Blog(id=i, title=f"性能优化 第{i}篇", content="索引与缓存" * i, is_published=i != 3))
+    test_db.commit()
+
+    response = client.get("/api/blog/", params={"search": "性能优化", "skip": 1, "limit": 2})
+    assert response.status_code == 200
+    assert [blog["id"] for blog in response.json()] == [2, 4]
+
+    response = client.get("/api/search/", params={"q": "性能优化", "type": "blog", "limit": 3})
+    assert response.status_code == 200
+    body = response.json()
+    assert body["total"] == 4
+    assert len(body["items"]) == 3
+    assert 3 not in [item["id"] for item in body["items"]]
+    assert body["items"][0]["title_highlight"].startswith("<mark>性能优化</mark>")
+    assert "<mark>" not in (body["items"][0]["snippet"] or "")
+
+    # 两个字符的词走 LIKE，高亮和片段在 Python 中生成
+    items = client.get("/api/search/", params={"q": "缓存", "type": "blog", "skip": 3}).json()["items"]
+    assert [item["id"] for item in items] == [5]
+    assert "<mark>缓存</mark>" in items[0]["snippet"]
+
+    assert client.get("/api/search/", params={"q": "性能优化", "type": "users"}).status_code == 400
+
+
+def test_property_14_highlights_escape_stored_html(client, test_db):
+    """
+    Feature: performance, Property 14: 高亮标题和片段中的原文被转义，只有 <mark> 标签是 HTML
+    """
+    test_db.add(Blog(id=1, title="<script>alert(1)</script> 性能优化",
+                     content='<img src=x onerror="alert(2)"> 缓存 & 索引', is_published=True))
+    test_db.commit()
+
+    item = client.get("/api/search/", params={"q": "性能优化 script", "type": "blog"}).json()["items"][0]
+    assert item["title"] == "<script>alert(1)</script> 性能优化"
+    assert item["title_highlight"] == \
+        "&lt;<mark>script</mark>&gt;alert(1)&lt;/<mark>script</mark>&gt; <mark>性能优化</mark>"
+
+    # LIKE 退回路径同样转义
+    item = client.get("/api/search/", params={"q": "缓存", "type": "blog"}).json()["items"][0]
+    assert item["snippet"] == "&lt;img src=x onerror=&quot;alert(2)&quot;&gt; <mark>缓存</mark> &amp; 索引"
+    assert highlight_text("a < b", "zz") == "a &lt; b"
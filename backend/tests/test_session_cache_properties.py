@@ -0,0 +1,81 @@
+"""
+管理员会话缓存属性测试
+
+Feature: performance
+验证热会话认证不查询数据库、登出立即失效、会话过期和失效后不回填
+"""
+
+import time
+from datetime import datetime, timedelta, timezone
+
+from sqlalchemy import event
+import sys
+import os
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.services.session_cache import SessionCache
+
+
+def test_expired_session_is_a_miss():
+    """
+    Feature: performance, Property 9: 会话过期或缓存 TTL 到期时视为未命中
+    """
+    cache = SessionCache(ttl_seconds=60)
+    cache.set("live", "admin", datetime.now(timezone.utc) + timedelta(hours=1))
+    cache.set("expired", "admin", datetime.now(timezone.utc) - timedelta(seconds=1))
+    # SQLite 读回的不带时区的 UTC 时间
+    cache.set("naive", "admin", datetime.now(timezone.utc).replace(tzinfo=None) + timedelta(hours=1))
+
+    assert cache.get("live") == "admin"
+    assert cache.get("expired") is None
+    assert cache.get("naive") == "admin"
+
+    short = SessionCache(ttl_seconds=0)
+    short.set("live", "admin", datetime.now(timezone.utc) + timedelta(hours=1))
+    assert short.get("live") is None
+
+
+def test_invalidated_token_is_not_refilled():
+    """
+    Feature: performance, Property 9: 失效的令牌在一个 TTL 内不会被并发请求回填
+    """
+    cache = SessionCache(max_entries=2, ttl_seconds=60)
+    expires_at = datetime.now(timezone.utc) + timedelta(hours=1)
+    cache.set("a", "admin", expires_at)
+
+    assert cache.invalidate("a") is True
+    cache.set("a", "admin", expires_at)
+    assert cache.get("a") is None
+
+    cache.set("b", "admin", expires_at)
+    cache.set("c", "admin", expires_at)
+    cache.set("d", "admin", expires_at)
+    metrics = cache.get_metrics()
+    assert metrics["entries"] == 2
+    assert metrics["evictions"] == 1
+    assert metrics["invalidations"] == 1
+
+
+def test_warm_session_skips_sessions_query(client, test_engine):
+    """
+    Feature: performance, Property 9: 热会话的认证路径不执行 SQL，登出后立即拒绝
+    """
+    token = client.post("/api/auth/login", json={"username": "admin", "password": "admin123"}).json()["access_token"]
+    headers = {"Authorization": f"Bearer {token}"}
+
+    statements = []
+
+    def record(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    event.listen(test_engine, "before_cursor_execute", record)
+    try:
+        for _ in range(5):
+            assert client.get("/api/auth/verify", headers=headers).status_code == 200
+        assert not any("sessions" in statement for statement in statements)
+
+        assert client.post("/api/auth/logout", headers=headers).status_code == 200
+        assert client.get("/api/auth/verify", headers=headers).status_code == 401
+    finally:
+        event.remove(test_engine, "before_cursor_execute", record)
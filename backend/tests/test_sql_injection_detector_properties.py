@@ -0,0 +1,75 @@
+"""
+SQL注入检测引擎等价性属性测试
+
+Feature: performance
+验证预编译检测引擎与逐条 re.search 的原始规则判定完全一致
+"""
+
+import re
+from hypothesis import given, settings, strategies as st
+import sys
+import os
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.security import InjectionDetector, SecurityQueryBuilder
+
+
+def legacy_detect(input_value: str) -> bool:
+    """原始实现：小写后逐条规则 re.search"""
+    lower_input = input_value.lower()
+    return any(re.search(pattern, lower_input, re.IGNORECASE) for pattern in SecurityQueryBuilder.INJECTION_PATTERNS)
+
+
+# 规则关键字、规则中的标点，以及 IGNORECASE 下与 ASCII 字母等价或会改变长度的字符
+sql_fragments = st.sampled_from([
+    "union", "SELECT", "insert", "upDate", "delete", "drop", "create", "alter", "exec", "execute",
+    "--", "#", "/*", "*/", "-", "/", "*", ";", "|", "||", "&", "&&",
+    "or", "OR", "and", "AND", "1", "=", "1=1", "'", '"', " ", "\t", "\n", "　",
+    "xp_cmdshell", "sp_executesql", "into", "outfile", "load_file", "char", "(", ")",
+    "hex", "concat", "substring", "ascii", "order", "group", "by", "having", "limit", "offset",
+    "waitfor", "delay", "benchmark", "sleep", "_", "x", "é",
+    "ı", "ſ", "K", "İ", "unIon", "ſelect", "ınsert", "waıtfor",
+])
+
+mixed_text = st.lists(st.one_of(sql_fragments, st.text(max_size=5)), max_size=20).map("".join)
+
+
+class TestInjectionDetectorEquivalence:
+    """预编译检测引擎等价性测试"""
+
+    @given(mixed_text)
+    @settings(max_examples=2000, deadline=None)
+    def test_property_12_detector_matches_legacy_rules(self, input_value):
+        """
+        Feature: performance, Property 12: 检测引擎与逐条规则判定一致
+        """
+        assert SecurityQueryBuilder.detect_sql_injection(input_value) == legacy_detect(input_value)
+
+    @given(st.text(max_size=200))
+    @settings(max_examples=500, deadline=None)
+    def test_property_12_detector_matches_legacy_rules_on_arbitrary_text(self, input_value):
+        """
+        Feature: performance, Property 12: 任意 Unicode 文本上判定一致
+        """
+        assert SecurityQueryBuilder.detect_sql_injection(input_value) == legacy_detect(input_value)
+
+    def test_property_12_case_equivalent_characters(self):
+        """
+        Feature: performance, Property 12: ı、ſ 在忽略大小写时与 i、s 等价，不能被触发字面量漏掉
+        """
+        for input_value in ("ſelect", "ınto outfile", "waıtfor delay", "ordinary text"):
+            assert SecurityQueryBuilder.detect_sql_injection(input_value) == legacy_detect(input_value)
+        assert SecurityQueryBuilder.detect_sql_injection("ſelect")
+
+    def test_property_12_rules_require_triggers(self):
+        """
+        Feature: performance, Property 12: 规则与触发字面量必须一一对应
+        """
+        assert len(SecurityQueryBuilder.INJECTION_PATTERNS) == len(SecurityQueryBuilder.INJECTION_TRIGGERS)
+        try:
+            InjectionDetector([r"\bunion\b"], [])
+        except ValueError:
+            pass
+        else:
+            raise AssertionError("规则缺少触发字面量时应报错")
@@ -0,0 +1,73 @@
+"""
+启动迁移属性测试
+
+Feature: performance
+验证应用启动时的迁移把升级前的数据库补齐到当前结构，可重复执行
+"""
+
+from sqlalchemy import create_engine, text
+from sqlalchemy.orm import sessionmaker
+import sys
+import os
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.database import Base
+from app.migrations import run_migrations
+from app.models import Product, ProductDataStorage, ProductFeedback
+from app.services import product_data_store
+
+
+def downgrade(engine):
+    """去掉升级后新增的列和索引，模拟升级前的数据库"""
+    with engine.begin() as conn:
+        for statement in (
+            "DROP INDEX idx_feedback_product_status_sort",
+            "ALTER TABLE product_feedback DROP COLUMN sort_key",
+            "ALTER TABLE product_feedback DROP COLUMN public_title",
+            "ALTER TABLE product_feedback DROP COLUMN public_content",
+            "ALTER TABLE product_feedback DROP COLUMN public_reply",
+            "CREATE INDEX idx_feedback_product_status ON product_feedback (product_id, status)",
+            "DROP INDEX idx_data_storage_blob_hash",
+            "ALTER TABLE product_data_storage DROP COLUMN blob_hash",
+            "ALTER TABLE product_data_storage DROP COLUMN blob_encoding",
+            "DROP INDEX idx_data_storage_product_key",
+            "CREATE INDEX idx_data_storage_product_key ON product_data_storage (product_id, storage_key)",
+        ):
+            conn.execute(text(statement))
+        conn.execute(text("INSERT INTO products (id, title, product_type) VALUES (1, 'demo', 'tool')"))
+        conn.execute(text(
+            "INSERT INTO product_feedback (product_id, feedback_type, title, content, status, created_at) "
+            "VALUES (1, 'bug', 't', 'c', 'pending', '2024-01-01 00:00:00')"
+        ))
+        conn.execute(text(
+            "INSERT INTO product_data_storage (product_id, storage_key, storage_value, size_bytes) "
+            "VALUES (1, 'k', '{\"v\": 1}', 8), (1, 'k', '{\"v\": 2}', 8)"
+        ))
+
+
+def test_property_20_startup_migrations_upgrade_existing_database(tmp_path):
+    """
+    Feature: performance, Property 20: 升级前的数据库经启动迁移后，反馈和产品数据查询与批量写入可用，重复执行无副作用
+    """
+    engine = create_engine(f"sqlite:///{(tmp_path / 'old.db').as_posix()}")
+    Base.metadata.create_all(bind=engine)
+    downgrade(engine)
+
+    # 与 init_database 相同：create_all 不修改已存在的表，由迁移补齐
+    Base.metadata.create_all(bind=engine)
+    run_migrations(engine)
+    run_migrations(engine)
+
+    db = sessionmaker(bind=engine)()
+    try:
+        feedback = db.query(ProductFeedback).one()
+        assert feedback.sort_key is not None and feedback.public_content == "c"
+        assert db.query(ProductDataStorage).one().storage_value == {"v": 2}
+        results = product_data_store.put_many(db, 1, [("k", {"v": 3}), ("new", {"v": 4})])
+        db.commit()
+        assert [r["status"] for r in results] == ["updated", "created"]
+        assert db.get(Product, 1) is not None
+    finally:
+        db.close()
+        engine.dispose()
@@ -0,0 +1,156 @@
+"""
+系统计数器属性测试
+
+Feature: performance
+验证触发器维护的计数器在任意写入序列后都等于 count(*)，存储占用增量维护结果等于全量扫描
+"""
+
+from hypothesis import given, settings, strategies as st, HealthCheck
+from sqlalchemy import event, func, insert, text
+import sys
+import os
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.database import Base
+from app.models import Product, ProductLog
+from app.services.product_file_service import ProductFileService
+from app.system_counters import drop_counter_triggers, read_counters
+
+operations = st.lists(st.one_of(
+    st.tuples(st.just("add_product"), st.one_of(st.none(), st.booleans())),
+    st.tuples(st.just("toggle_publish"), st.integers(0, 5)),
+    st.tuples(st.just("delete_product"), st.integers(0, 5)),
+    st.tuples(st.just("add_logs"), st.lists(st.sampled_from(["error", "access", "performance"]), max_size=4)),
+    st.tuples(st.just("retype_log"), st.integers(0, 10)),
+    st.tuples(st.just("delete_logs"), st.integers(0, 10)),
+), max_size=25)
+
+
+def expected_counts(db):
+    return {
+        "products_total": db.query(func.count(Product.id)).scalar(),
+        "products_published": db.query(func.count(Product.id)).filter(Product.is_published == True).scalar(),
+        "product_logs_total": db.query(func.count(ProductLog.id)).scalar(),
+        "product_logs_error": db.query(func.count(ProductLog.id)).filter(ProductLog.log_type == "error").scalar(),
+    }
+
+
+def current_counts(db):
+    return {name: value for name, (value, _) in read_counters(db).items()}
+
+
+def nth_id(db, model, index):
+    ids = [row[0] for row in db.query(model.id).order_by(model.id)]
+    return ids[index % len(ids)] if ids else None
+
+
+@given(operations)
+@settings(max_examples=40, deadline=None, suppress_health_check=[HealthCheck.function_scoped_fixture])
+def test_property_19_counters_match_count(test_db, ops):
+    """
+    Feature: performance, Property 19: 任意插入、批量插入、更新、删除序列后，计数器等于 count(*)
+    """
+    test_db.execute(text("DELETE FROM product_logs"))
+    test_db.execute(text("DELETE FROM products"))
+    test_db.commit()
+
+    for op, arg in ops:
+        if op == "add_product":
+            test_db.add(Product(title="p", product_type="tool", is_published=arg))
+        elif op == "toggle_publish" and (product_id := nth_id(test_db, Product, arg)):
+            product = test_db.get(Product, product_id)
+            product.is_published = not product.is_published
+        elif op == "delete_product" and (product_id := nth_id(test_db, Product, arg)):
+            test_db.delete(test_db.get(Product, product_id))
+        elif op == "add_logs" and arg:
+            # 与遥测缓冲一样使用多行 INSERT，不经过 ORM 事件
+            test_db.execute(insert(ProductLog), [
+                {"product_id": 1, "log_type": log_type, "log_level": "info", "message": "m"} for log_type in arg
+            ])
+        elif op == "retype_log" and (log_id := nth_id(test_db, ProductLog, arg)):
+            log = test_db.get(ProductLog, log_id)
+            log.log_type = "access" if log.log_type == "error" else "error"
+        elif op == "delete_logs" and (log_id := nth_id(test_db, ProductLog, arg)):
+            test_db.execute(text("DELETE FROM product_logs WHERE id <= :id"), {"id": log_id})
+        test_db.flush()
+    test_db.commit()
+
+    assert current_counts(test_db) == expected_counts(test_db)
+
+
+def test_property_19_existing_database_is_seeded(test_engine, test_db):
+    """
+    Feature: performance, Property 19: 已有数据库升级时用现有数据初始化计数器
+    """
+    with test_engine.begin() as connection:
+        drop_counter_triggers(None, connection)
+        connection.exec_driver_sql("DROP TABLE system_counters")
+    test_db.add_all([Product(title="a", product_type="tool", is_published=True),
+                     Product(title="b", product_type="tool", is_published=False)])
+    test_db.add(ProductLog(product_id=1, log_type="error", message="boom"))
+    test_db.commit()
+
+    Base.metadata.create_all(bind=test_engine)
+    assert current_counts(test_db) == {
+        "products_total": 2, "products_published": 1, "product_logs_total": 1, "product_logs_error": 1
+    }
+    # 再次 create_all 不会重复初始化
+    Base.metadata.create_all(bind=test_engine)
+    assert current_counts(test_db)["products_total"] == 2
+
+
+def test_property_19_storage_usage_is_incremental(tmp_path):
+    """
+    Feature: performance, Property 19: 经文件服务的写入增量更新存储占用，结果等于全量扫描
+    """
+    service = ProductFileService(base_dir=str(tmp_path))
+    service.create_product_directory(1)
+    (tmp_path / "1" / "index.html").write_bytes(b"<html></html>")
+    assert service.get_storage_stats()["total_files"] == 1
+
+    service.create_product_directory(2)
+    service.upload_individual_file(2, "data.txt", b"hello world")
+    service.upload_individual_file(1, "app.js", b"console.log(1)")
+    incremental = service.get_storage_stats()
+    assert {key: incremental[key] for key in ("total_products", "total_files", "total_size")} == \
+        {key: value for key, value in service.get_storage_stats(refresh=True).items()
+         if key in ("total_products", "total_files", "total_size")}
+
+    service.delete_file(1, "app.js")
+    service.delete_product_files(2)
+    stats = service.get_storage_stats()
+    assert (stats["total_products"], stats["total_files"]) == (1, 2)  # index.html 和文件记录
+
+    # 绕过服务的修改在全量扫描后才计入
+    (tmp_path / "1" / "extra.txt").write_bytes(b"x")
+    assert service.get_storage_stats()["total_files"] == 2
+    assert service.get_storage_stats(refresh=True)["total_files"] == 3
+
+
+def test_property_19_system_status_reads_counters(client, auth_headers, test_engine, test_db):
+    """
+    Feature: performance, Property 19: 系统状态接口不再对 products / product_logs 执行 count()，并报告每个数字的新鲜度
+    """
+    test_db.add(Product(id=1, title="a", product_type="tool", is_published=True))
+    test_db.add_all([ProductLog(product_id=1, log_type="error" if i < 3 else "access", message="m")
+                     for i in range(50)])
+    test_db.commit()
+
+    statements = []
+
+    def record(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    event.listen(test_engine, "before_cursor_execute", record)
+    try:
+        response = client.get("/api/products/monitoring/system-status", headers=auth_headers)
+    finally:
+        event.remove(test_engine, "before_cursor_execute", record)
+
+    assert response.status_code == 200
+    body = response.json()
+    assert body["metrics"] == {"total_products": 1, "published_products": 1, "error_rate": 6.0, "recent_errors": 3}
+    assert not [s for s in statements if "count(" in s.lower()]
+    assert set(body["freshness"]) == {"total_products", "published_products", "error_rate", "recent_errors", "storage"}
+    assert body["freshness"]["storage"]["stale_seconds"] >= 0
@@ -0,0 +1,187 @@
+"""
+遥测写缓冲属性测试
+
+Feature: performance
+验证批量上报的事件全部写入、缓冲区有界并返回 429、停止时写入剩余事件
+"""
+
+import asyncio
+import json
+
+from sqlalchemy.exc import OperationalError
+import sys
+import os
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.models import Product, ProductLog, ProductStats
+from app.services.telemetry_buffer import TelemetryBuffer, TelemetryBufferFullError, telemetry_buffer
+
+
+def seed_products(db, *product_ids):
+    for product_id in product_ids:
+        db.add(Product(id=product_id, title=f"product {product_id}", product_type="tool"))
+    db.commit()
+
+
+def stats_row(product_id, visitor):
+    return {"product_id": product_id, "visitor_ip": f"10.0.0.{visitor}", "duration_seconds": 1}
+
+
+def test_property_17_flush_writes_every_accepted_event(test_db, writer):
+    """
+    Feature: performance, Property 17: 接受的事件全部写入，不存在的产品的事件被丢弃
+    """
+    seed_products(test_db, 1)
+    buffer = TelemetryBuffer(writer=writer, max_events=100, flush_size=100)
+
+    async def scenario():
+        buffer.add([stats_row(1, i) for i in range(5)],
+                   [{"product_id": 1, "log_type": "access", "log_level": "info", "message": "m"}])
+        buffer.add([stats_row(99, 1)], [])
+        assert buffer.pending == 7
+        return await buffer.flush()
+
+    assert asyncio.run(scenario()) == 6
+
+    assert test_db.query(ProductStats).count() == 5
+    assert test_db.query(ProductLog).count() == 1
+    metrics = buffer.get_metrics()
+    assert (metrics["events_written"], metrics["events_dropped"], metrics["pending_events"]) == (6, 1, 0)
+
+
+def test_property_17_bounded_buffer_and_size_trigger(test_db, writer):
+    """
+    Feature: performance, Property 17: 超过上限的批次整批拒绝；达到 flush_size 时自动写入，停止时写入剩余事件
+    """
+    seed_products(test_db, 1)
+    buffer = TelemetryBuffer(writer=writer, max_events=10, flush_size=4, flush_interval=60)
+
+    async def scenario():
+        buffer.start()
+        buffer.add([stats_row(1, i) for i in range(3)], [])
+        try:
+            buffer.add([stats_row(1, i) for i in range(8)], [])
+        except TelemetryBufferFullError:
+            pass
+        else:
+            raise AssertionError("超过上限的批次应当被拒绝")
+        assert buffer.pending == 3
+
+        buffer.add([stats_row(1, 3)], [])  # 达到 flush_size，后台写入
+        for _ in range(100):
+            if buffer.pending == 0:
+                break
+            await asyncio.sleep(0.01)
+        assert buffer.pending == 0
+
+        buffer.add([stats_row(1, 4)], [])
+        await buffer.stop()
+
+    asyncio.run(scenario())
+
+    assert test_db.query(ProductStats).count() == 5
+    assert buffer.get_metrics()["events_rejected"] == 8
+
+
+def test_property_17_failed_flush_keeps_events(test_db, writer):
+    """
+    Feature: performance, Property 17: 暂时性错误导致写入失败的事件放回缓冲区，下次刷新写入
+    """
+    seed_products(test_db, 1)
+    buffer = TelemetryBuffer(writer=writer)
+
+    class BrokenWriter:
+        async def execute(self, func, *args):
+            raise OperationalError("INSERT", {}, Exception("database or disk is full"))
+
+    async def scenario():
+        buffer.add([stats_row(1, 1), stats_row(1, 2)], [])
+        buffer._writer = BrokenWriter()
+        try:
+            await buffer.flush()
+        except OperationalError:
+            pass
+        assert buffer.pending == 2
+        buffer._writer = writer
+        return await buffer.flush()
+
+    assert asyncio.run(scenario()) == 2
+    assert [row.visitor_ip for row in test_db.query(ProductStats).order_by(ProductStats.id)] == \
+        ["10.0.0.1", "10.0.0.2"]
+
+
+def test_property_17_unwritable_events_are_dropped(client, test_db, writer):
+    """
+    Feature: performance, Property 17: 无法写入的事件被拆批定位后丢弃，不阻塞其他事件；
+    暂时性错误最多重试 max_retries 次；接口拒绝超出 SQLite 整数范围的 product_id
+    """
+    seed_products(test_db, 1)
+    response = client.post("/api/products/telemetry/batch", json={
+        "stats": [{"product_id": 2 ** 70}, {"product_id": 1, "duration_seconds": 2 ** 64}],
+        "logs": [{"product_id": -1, "log_type": "error", "message": "m"}],
+    })
+    assert response.json() == {"accepted": 0, "rejected": 3}
+
+    buffer = TelemetryBuffer(writer=writer, max_retries=2)
+
+    class BrokenWriter:
+        async def execute(self, func, *args):
+            raise OperationalError("INSERT", {}, Exception("database is locked"))
+
+    async def scenario():
+        # 绕过接口校验直接放入缓冲区，模拟任何原因产生的无法写入的事件
+        buffer.add([stats_row(1, 1), stats_row(2 ** 70, 2), stats_row(1, 3)],
+                   [{"product_id": 1, "log_type": "access", "log_level": "info", "message": "m"}])
+        assert await buffer.flush() == 3
+        buffer.add([stats_row(1, 4)], [])
+        assert await buffer.flush() == 1
+
+        buffer._writer = BrokenWriter()
+        buffer.add([stats_row(1, 5)], [])
+        for _ in range(2):
+            try:
+                await buffer.flush()
+            except OperationalError:
+                pass
+        assert buffer.pending == 0
+
+    asyncio.run(scenario())
+
+    assert [row.visitor_ip for row in test_db.query(ProductStats).order_by(ProductStats.id)] == \
+        ["10.0.0.1", "10.0.0.3", "10.0.0.4"]
+    metrics = buffer.get_metrics()
+    assert (metrics["events_written"], metrics["events_dropped"], metrics["events_unwritable"]) == (4, 2, 1)
+    assert metrics["failed_flushes"] == 2
+
+
+def test_property_17_batch_endpoint(client, test_db, writer, monkeypatch):
+    """
+    Feature: performance, Property 17: 批量接口接受 sendBeacon 文本请求体，跳过无效事件，缓冲区满时返回 429
+    """
+    seed_products(test_db, 1)
+    body = {
+        "stats": [stats_row(1, 1), stats_row(1, 2), {"visitor_ip": "missing product id"}],
+        "logs": [
+            {"product_id": 1, "log_type": "error", "log_level": "error", "message": "boom"},
+            {"product_id": 1, "log_type": "unknown", "message": "bad type"},
+        ],
+    }
+    response = client.post("/api/products/telemetry/batch", content=json.dumps(body),
+                           headers={"Content-Type": "text/plain;charset=UTF-8"})
+    assert response.status_code == 202
+    assert response.json() == {"accepted": 3, "rejected": 2}
+    assert telemetry_buffer.pending == 3
+
+    monkeypatch.setattr(telemetry_buffer, "_writer", writer)
+    assert asyncio.run(telemetry_buffer.flush()) == 3
+    assert test_db.query(ProductStats).count() == 2
+    assert test_db.query(ProductLog).one().message == "boom"
+
+    monkeypatch.setattr(telemetry_buffer, "max_events", 1)
+    response = client.post("/api/products/telemetry/batch", json={"stats": [stats_row(1, 3), stats_row(1, 4)]})
+    assert response.status_code == 429
+    assert "Retry-After" in response.headers
+
+    assert client.post("/api/products/telemetry/batch", content="not json").status_code == 400
+    assert client.post("/api/products/telemetry/batch", json={"stats": {}}).status_code == 400
@@ -0,0 +1,136 @@
+"""
+访客集合属性测试
+
+Feature: performance
+验证访客集合小规模时精确、大规模时误差在标准误差范围内，可按任意顺序合并，
+每日集合使任意日期范围的独立访客数只需合并有限大小的集合
+"""
+
+import asyncio
+from datetime import datetime, timedelta
+
+from hypothesis import given, settings, strategies as st
+from sqlalchemy import event, text
+import sys
+import os
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.models import Product, ProductStats, ProductVisitorDaily
+from app.services.analytics_rollup import StatsRollupJob, summarize_stats
+from app.services.visitor_sketch import (
+    EXACT_LIMIT, REGISTER_COUNT, STANDARD_ERROR, VisitorSketch
+)
+
+BASE = datetime(2024, 3, 1)
+
+hash_lists = st.lists(st.integers(0, 2 ** 64 - 1), max_size=1500)
+
+
+def sketch_of(hashes):
+    return VisitorSketch(hashes)
+
+
+@given(hash_lists, hash_lists)
+@settings(max_examples=50, deadline=None)
+def test_property_22_merge_equals_sketch_of_union(left, right):
+    """
+    Feature: performance, Property 22: 合并两个集合与直接构建并集的集合结果相同，与合并顺序无关
+    """
+    union = sketch_of(left + right)
+    assert sketch_of(left).merge(sketch_of(right)).to_bytes() == union.to_bytes()
+    assert sketch_of(right).merge(sketch_of(left)).to_bytes() == union.to_bytes()
+    if len(set(left + right)) <= EXACT_LIMIT:
+        assert union.is_exact and union.cardinality() == len(set(left + right))
+
+
+@given(hash_lists)
+@settings(max_examples=30, deadline=None)
+def test_property_22_serialization_round_trip(hashes):
+    """
+    Feature: performance, Property 22: 两种形态序列化后还原结果不变，HyperLogLog 形态大小固定
+    """
+    sketch = sketch_of(hashes)
+    restored = VisitorSketch.from_bytes(sketch.to_bytes())
+    assert restored.to_bytes() == sketch.to_bytes()
+    assert restored.cardinality() == sketch.cardinality()
+    if not sketch.is_exact:
+        assert len(sketch.to_bytes()) == REGISTER_COUNT + 2
+
+
+def test_property_22_estimate_within_error_bound():
+    """
+    Feature: performance, Property 22: 超过精确上限后估计值的相对误差在 4 倍标准误差以内
+    """
+    for count in (EXACT_LIMIT + 1, 2000, 20000, 100000):
+        sketch = VisitorSketch()
+        for i in range(count):
+            sketch.add(f"visitor-{count}-{i}")
+        assert not sketch.is_exact
+        assert abs(sketch.cardinality() - count) / count <= 4 * STANDARD_ERROR
+
+
+def roll_up(writer):
+    asyncio.run(StatsRollupJob(writer=writer, batch_size=7).run_once())
+
+
+def seed(db, days=5, per_day=30):
+    db.add(Product(id=1, title="demo", product_type="tool"))
+    for day in range(days):
+        for i in range(per_day):
+            db.add(ProductStats(product_id=1, visitor_ip=f"10.0.{day % 2}.{i}",
+                                access_time=BASE + timedelta(days=day, minutes=i * 40)))
+    db.commit()
+
+
+def raw_unique(db, start=None, end=None):
+    rows = db.query(ProductStats).filter(ProductStats.product_id == 1).all()
+    return len({row.visitor_ip for row in rows
+                if (start is None or row.access_time >= start) and (end is None or row.access_time < end)})
+
+
+def test_property_22_daily_sketches_answer_ranges(test_engine, test_db, writer):
+    """
+    Feature: performance, Property 22: 完整的日期读取每日集合，首尾不完整的日期读取小时集合，结果与原始扫描一致
+    """
+    seed(test_db)
+    roll_up(writer)
+    assert test_db.query(ProductVisitorDaily).count() == 5
+
+    statements = []
+
+    def record(conn, cursor, statement, parameters, context, executemany):
+        statements.append((statement, parameters))
+
+    ranges = [(None, None), (BASE + timedelta(days=1), BASE + timedelta(days=4)),
+              (BASE + timedelta(hours=30), BASE + timedelta(days=3, hours=5))]
+    for start, end in ranges:
+        statements.clear()
+        event.listen(test_engine, "before_cursor_execute", record)
+        try:
+            summary = summarize_stats(test_db, 1, start, end)
+        finally:
+            event.remove(test_engine, "before_cursor_execute", record)
+        assert summary.unique_visitors == raw_unique(test_db, start, end)
+        hourly_reads = [params for statement, params in statements
+                        if "product_stats_rollups.visitor_sketch" in statement]
+        # 范围按天对齐时不读取小时集合
+        assert bool(hourly_reads) == (start is not None and start.hour != 0)
+
+
+def test_property_22_days_without_daily_sketch_fall_back(test_db, writer):
+    """
+    Feature: performance, Property 22: 升级前只有小时汇总的日期回退到小时集合，新数据到达时补齐每日集合
+    """
+    seed(test_db, days=2)
+    roll_up(writer)
+    test_db.execute(text("DELETE FROM product_visitor_daily"))
+    test_db.commit()
+    assert summarize_stats(test_db, 1).unique_visitors == raw_unique(test_db)
+
+    test_db.add(ProductStats(product_id=1, visitor_ip="192.168.0.1", access_time=BASE + timedelta(hours=23)))
+    test_db.commit()
+    roll_up(writer)
+    daily = test_db.query(ProductVisitorDaily).one()
+    assert VisitorSketch.from_bytes(daily.visitor_sketch).cardinality() == raw_unique(test_db, BASE, BASE + timedelta(days=1))
+    assert summarize_stats(test_db, 1).unique_visitors == raw_unique(test_db)